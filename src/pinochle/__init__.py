@@ -1,6 +1,7 @@
 import logging
 from os import environ
 from sys import stdout
+from typing import List
 
 name = "pinochle"  # pragma: no mutate
 
@@ -11,10 +12,15 @@ if "GLOBAL_LOG_LEVEL" in environ:
 else:
     GLOBAL_LOG_LEVEL = logging.WARNING
 
+_ROOT_HANDLERS: List[logging.Handler] = []
+
 
 def setup_logging() -> logging.Logger:
     root_logger = logging.getLogger()
     root_logger.setLevel(GLOBAL_LOG_LEVEL)
+    # Every module calling this shares one handler, so each record is written once.
+    if _ROOT_HANDLERS:
+        return root_logger
 
     handler = logging.StreamHandler(stdout)
     handler.setLevel(root_logger.getEffectiveLevel())
@@ -22,5 +28,6 @@ def setup_logging() -> logging.Logger:
         "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )  # pragma: no mutate
     handler.setFormatter(formatter)
+    _ROOT_HANDLERS.append(handler)
     root_logger.addHandler(handler)
     return root_logger
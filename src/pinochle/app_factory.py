@@ -4,19 +4,20 @@ and adapted for use with connexion and my (likely) odd way of constructing the p
 project.
 """
 import os
+from typing import Any, Mapping, Optional
 
 import connexion
-
+import sqlalchemy
 
 from . import custom_log
-from .__init__ import GLOBAL_LOG_LEVEL
 from .exceptions import AppNotInstantiatedError
+from .models import sqlite_tuning
+from .models.GUID import GUID
 from .models.core import db
 
 
-def create_app(register_blueprints=True):
-    mylog = custom_log.get_logger()
-    mylog.setLevel(GLOBAL_LOG_LEVEL)
+def create_app(register_blueprints=True, config: Optional[Mapping[str, Any]] = None):
+    mylog = custom_log.get_logger(__name__)
 
     # Create the connexion application instance
     basedir = os.path.abspath(os.path.dirname(__file__))
@@ -34,6 +35,8 @@ def create_app(register_blueprints=True):
     except FileNotFoundError:
         # print("The application.cfg.py file was not found. Using defaults.")
         pass
+    # Settings given by the caller, such as a benchmark, win over the files.
+    app.config.update(config or {})
 
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False  # pragma: no mutate
 
@@ -59,9 +62,67 @@ def create_app(register_blueprints=True):
         app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///{db}".format(
             db=app.config["DB_NAME"]  # pragma: no mutate
         )
+        if app.config["SQLITE_TUNING"]:
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+                **sqlite_tuning.engine_options(app.config),
+                **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+            }
+    # Column types depend on this, so it's set before the database is touched.
+    GUID.set_storage(app.config["GUID_STORAGE"])
     db.init_app(app)
+    if app.config["SQLALCHEMY_DB_PREFIX"] == "sqlite" and app.config["SQLITE_TUNING"]:
+        sqlite_tuning.apply_pragmas(db.get_engine(app=app), app.config)
 
     # This is harmless if the database already exists.
     db.create_all(app=app)
+    create_missing_columns(app)
+    create_missing_indexes(app)
 
     return app
+
+
+def create_missing_columns(app) -> None:
+    """
+    Add the columns declared by the models that are missing from an existing
+    database, such as the version counters, as create_all only creates whole tables.
+    Only columns that may be null or have a server default can be added this way.
+
+    :param app: The application whose database is checked.
+    :type app: Flask
+    """
+    engine = db.get_engine(app=app)
+    inspector = sqlalchemy.inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {x["name"] for x in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = sqlalchemy.schema.CreateColumn(column).compile(dialect=engine.dialect)
+            engine.execute(
+                "ALTER TABLE {} ADD COLUMN {}".format(
+                    engine.dialect.identifier_preparer.quote(table.name), ddl
+                )
+            )
+
+
+def create_missing_indexes(app) -> None:
+    """
+    Create the indexes declared by the models that are missing from an existing
+    database, as create_all only creates whole tables.
+
+    :param app: The application whose database is checked.
+    :type app: Flask
+    """
+    engine = db.get_engine(app=app)
+    inspector = sqlalchemy.inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {x["name"] for x in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
@@ -28,7 +28,7 @@ single playing card, of a given value and suit.
 # Imports
 # ===============================================================================
 
-from typing import Union
+from typing import Dict, List, Tuple, Union
 
 from ..exceptions import InvalidSuitError, InvalidValueError
 from . import const
@@ -37,11 +37,18 @@ from . import const
 # PinochleCard Class
 # ===============================================================================
 
+# Shared card instances, keyed by (value, suit) as given to the constructor.
+_INTERNED: Dict[Tuple[str, str], "PinochleCard"] = {}
+
 
 class PinochleCard:
     """
     The PinocleCard class, each instance representing a single playing card.
 
+    There is only one instance of each of the 24 distinct cards: constructing a
+    card returns the shared, immutable instance for that value and suit, so cards
+    compare equal only when they're the same object.
+
     :arg str value:
         The card value.
     :arg str suit:
@@ -49,12 +56,18 @@ class PinochleCard:
 
     """
 
-    value: Union[str, None] = None
-    suit: Union[str, None] = None
+    __slots__ = ("value", "suit", "abbrev", "name", "card_id", "sort_key", "_hash")
 
-    def __init__(self, value: str, suit: Union[str, None]):
+    value: str
+    suit: str
+    abbrev: str
+    name: str
+    card_id: int
+    sort_key: int
+
+    def __new__(cls, value: str, suit: Union[str, None]):
         """
-        PinochleCard constructor method.
+        Return the shared instance of the card with the given value and suit.
 
         :arg str value:
             The card value.
@@ -62,14 +75,72 @@ class PinochleCard:
             The card suit.
 
         """
+        try:
+            return _INTERNED[(value, suit)]
+        except (KeyError, TypeError):
+            pass
         if str(value).capitalize() not in const.VALUES:
             raise InvalidValueError("%s is not a valid face value." % str(value))
         if str(suit).capitalize() not in const.SUITS:
             raise InvalidSuitError("%s is not a valid suit." % str(suit))
-        self.value: str = str(value).capitalize()
-        self.suit: str = str(suit).capitalize() if suit else suit
-        self.abbrev: str = card_abbrev(self.value, self.suit)
-        self.name: str = card_name(self.value, self.suit)
+        key = (str(value).capitalize(), str(suit).capitalize())
+        if key not in _INTERNED:
+            _INTERNED[key] = cls._create(*key)
+        if isinstance(value, str) and isinstance(suit, str):
+            # Remember the spelling as well, to skip validation next time.
+            _INTERNED[(value, suit)] = _INTERNED[key]
+        return _INTERNED[key]
+
+    def __init__(self, value: str, suit: Union[str, None]):
+        """
+        PinochleCard constructor method. The card is fully initialized by
+        ``__new__``.
+
+        :arg str value:
+            The card value.
+        :arg str suit:
+            The card suit.
+
+        """
+
+    @classmethod
+    def _create(cls, value: str, suit: str) -> "PinochleCard":
+        """
+        Create the single instance of a card. Value and suit must be valid.
+        """
+        new_card = object.__new__(cls)
+        value_rank = const.DEFAULT_RANKS["values"][value]
+        suit_rank = const.DEFAULT_RANKS["suits"][suit]
+        card_id = const.SUITS.index(suit) * len(const.VALUES) + const.VALUES.index(
+            value
+        )
+        for attr, attr_value in (
+            ("value", value),
+            ("suit", suit),
+            ("abbrev", card_abbrev(value, suit)),
+            ("name", card_name(value, suit)),
+            ("card_id", card_id),
+            # Orders cards by value, then suit, as the comparison operators do.
+            ("sort_key", value_rank * (len(const.SUITS) + 1) + suit_rank),
+            ("_hash", hash((value, suit))),
+        ):
+            object.__setattr__(new_card, attr, attr_value)
+        return new_card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PinochleCard instances are immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("PinochleCard instances are immutable.")
+
+    def __reduce__(self):
+        return (PinochleCard, (self.value, self.suit))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __eq__(self, other):
         """
@@ -82,11 +153,7 @@ class PinochleCard:
             ``True`` or ``False``.
 
         """
-        return (
-            isinstance(other, PinochleCard)
-            and self.value == other.value
-            and self.suit == other.suit
-        )
+        return self is other
 
     def __ne__(self, other):
         """
@@ -99,11 +166,7 @@ class PinochleCard:
             ``True`` or ``False``.
 
         """
-        return (
-            isinstance(other, PinochleCard)
-            and self.value != other.value
-            or self.suit != other.suit
-        )
+        return self is not other
 
     def __ge__(self, other):
         """
@@ -117,15 +180,7 @@ class PinochleCard:
 
         """
         if isinstance(other, PinochleCard):
-            return (
-                const.DEFAULT_RANKS["values"][self.value]
-                > const.DEFAULT_RANKS["values"][other.value]
-            ) or (
-                const.DEFAULT_RANKS["values"][self.value]
-                >= const.DEFAULT_RANKS["values"][other.value]
-                and const.DEFAULT_RANKS["suits"][self.suit]
-                >= const.DEFAULT_RANKS["suits"][other.suit]
-            )
+            return self.sort_key >= other.sort_key
 
         return False
 
@@ -141,15 +196,7 @@ class PinochleCard:
 
         """
         if isinstance(other, PinochleCard):
-            return (
-                const.DEFAULT_RANKS["values"][self.value]
-                > const.DEFAULT_RANKS["values"][other.value]
-            ) or (
-                const.DEFAULT_RANKS["values"][self.value]
-                >= const.DEFAULT_RANKS["values"][other.value]
-                and const.DEFAULT_RANKS["suits"][self.suit]
-                > const.DEFAULT_RANKS["suits"][other.suit]
-            )
+            return self.sort_key > other.sort_key
 
         return False
 
@@ -161,7 +208,7 @@ class PinochleCard:
             A unique number, or hash for the PinochleCard.
 
         """
-        return hash((self.value, self.suit))
+        return self._hash
 
     def __repr__(self):
         """
@@ -396,3 +443,23 @@ def card_name(value: str, suit: Union[str, None]) -> str:
         raise InvalidSuitError
 
     return "%s of %s" % (value, suit)
+
+
+def card_from_id(card_id: int) -> PinochleCard:
+    """
+    Returns the card with the given ``card_id``.
+
+    :arg int card_id:
+        The card id, 0 through 23.
+
+    :returns:
+        The PinochleCard instance.
+
+    """
+    return CARDS[card_id]
+
+
+# Every card, indexed by card_id.
+CARDS: List[PinochleCard] = [
+    PinochleCard(value, suit) for suit in const.SUITS for value in const.VALUES
+]
@@ -0,0 +1,314 @@
+"""
+This module contains the ``CompactHand`` class, a compact representation of a
+collection of Pinochle cards.
+
+A Pinochle deck holds only 24 distinct kinds of card, each of them twice. A
+``CompactHand`` stores how many of each kind it holds in a single integer, two bits
+per kind, so adding, removing and counting cards are a few integer operations and
+hands can be compared, hashed and stored cheaply.
+
+Kinds are numbered suit-major, following ``const.SUITS`` and ``const.VALUES``:
+kind ``0`` is the 9 of Diamonds and kind ``23`` the Ace of Spades. A card's kind is
+its ``PinochleCard.card_id``.
+
+License: GPLv3
+"""
+from typing import Iterable, Iterator, List
+
+from ..exceptions import InvalidSuitError, InvalidValueError
+from . import const
+from .card import CARDS, PinochleCard
+from .deck import PinochleDeck
+
+NUM_KINDS = len(const.SUITS) * len(const.VALUES)
+BITS_PER_KIND = 2
+KIND_MASK = (1 << BITS_PER_KIND) - 1
+# A field could hold 3, but the deck has only two of each kind.
+MAX_PER_KIND = 2
+# The low bit of every kind's field.
+_LOW_BITS = int("01" * NUM_KINDS, 2)
+
+# (value, suit) of each kind.
+KINDS = [(value, suit) for suit in const.SUITS for value in const.VALUES]
+# SVG card names ("diamond_9", "spade_ace", ...) of each kind.
+SVG_NAMES = [f"{suit.lower()[:-1]}_{value.lower()}" for (value, suit) in KINDS]
+
+_KIND_BY_CARD = {kind: index for index, kind in enumerate(KINDS)}
+_KIND_BY_SVG = {name: index for index, name in enumerate(SVG_NAMES)}
+
+
+def kind_index(value: str, suit: str) -> int:
+    """
+    Return the kind number of a card.
+
+    :param value: Card value, e.g. "Ace".
+    :type value: str
+    :param suit: Card suit, e.g. "Spades".
+    :type suit: str
+    :raises InvalidValueError: When the value is not a Pinochle card value.
+    :raises InvalidSuitError: When the suit is not a card suit.
+    :return: Kind number, 0 through 23.
+    :rtype: int
+    """
+    try:
+        return _KIND_BY_CARD[(value, suit)]
+    except KeyError:
+        if str(value).capitalize() not in const.VALUES:
+            raise InvalidValueError(
+                "%s is not a valid face value." % str(value)
+            ) from None
+        if str(suit).capitalize() not in const.SUITS:
+            raise InvalidSuitError("%s is not a valid suit." % str(suit)) from None
+        return _KIND_BY_CARD[(str(value).capitalize(), str(suit).capitalize())]
+
+
+def card_kind(card: PinochleCard) -> int:
+    """
+    Return the kind number of a ``PinochleCard``.
+
+    :param card: The card.
+    :type card: PinochleCard
+    :return: Kind number, 0 through 23.
+    :rtype: int
+    """
+    return card.card_id
+
+
+def svg_kind(name: str) -> int:
+    """
+    Return the kind number of a card given its SVG name, e.g. "spade_ace".
+
+    :param name: SVG name of the card.
+    :type name: str
+    :raises InvalidValueError: When the name doesn't describe a Pinochle card.
+    :return: Kind number, 0 through 23.
+    :rtype: int
+    """
+    try:
+        return _KIND_BY_SVG[name]
+    except KeyError:
+        raise InvalidValueError("%s is not a valid card name." % name) from None
+
+
+def kind_card(kind: int) -> PinochleCard:
+    """
+    Return the ``PinochleCard`` of the supplied kind.
+
+    :param kind: Kind number, 0 through 23.
+    :type kind: int
+    :return: The card.
+    :rtype: PinochleCard
+    """
+    return CARDS[kind]
+
+
+class CompactHand:
+    """
+    A collection of Pinochle cards stored as per-kind counts packed into one integer.
+
+    :arg int bits:
+        Packed counts, as returned by the ``bits`` attribute of another hand.
+    """
+
+    __slots__ = ("bits",)
+
+    def __init__(self, bits: int = 0):
+        if (
+            bits < 0
+            or bits >> (NUM_KINDS * BITS_PER_KIND)
+            or bits & (bits >> 1) & _LOW_BITS
+        ):
+            raise ValueError("%r is not a valid packed hand." % bits)
+        self.bits = bits
+
+    # ---------------------------------------------------------------------------
+    # Construction
+    # ---------------------------------------------------------------------------
+
+    @classmethod
+    def from_counts(cls, counts: Iterable[int]) -> "CompactHand":
+        """
+        Build a hand from the number of cards held of each kind.
+
+        :param counts: 24 counts, in kind order.
+        :type counts: Iterable[int]
+        :raises ValueError: When a count is negative or above MAX_PER_KIND.
+        :return: New hand.
+        :rtype: CompactHand
+        """
+        counts = list(counts)
+        if len(counts) != NUM_KINDS:
+            raise ValueError("Expected %d counts, got %d." % (NUM_KINDS, len(counts)))
+        bits = 0
+        for kind, count in enumerate(counts):
+            if not 0 <= count <= MAX_PER_KIND:
+                raise ValueError(
+                    "Count %d for kind %d is out of range." % (count, kind)
+                )
+            bits |= count << (kind * BITS_PER_KIND)
+        return cls(bits)
+
+    @classmethod
+    def from_kinds(cls, kinds: Iterable[int]) -> "CompactHand":
+        """
+        Build a hand from a sequence of kind numbers, one per card.
+
+        :param kinds: Kind number of each card.
+        :type kinds: Iterable[int]
+        :return: New hand.
+        :rtype: CompactHand
+        """
+        hand = cls()
+        for kind in kinds:
+            hand.add(kind)
+        return hand
+
+    @classmethod
+    def from_svg_names(cls, names: Iterable[str]) -> "CompactHand":
+        """
+        Build a hand from SVG card names, as stored in the database.
+
+        :param names: SVG names, e.g. ["spade_ace", "club_9"].
+        :type names: Iterable[str]
+        :return: New hand.
+        :rtype: CompactHand
+        """
+        return cls.from_kinds(svg_kind(name) for name in names)
+
+    @classmethod
+    def from_deck(cls, deck: Iterable[PinochleCard]) -> "CompactHand":
+        """
+        Build a hand from a ``PinochleDeck``, ``PinochleStack`` or list of cards.
+
+        :param deck: The cards.
+        :type deck: Iterable[PinochleCard]
+        :return: New hand.
+        :rtype: CompactHand
+        """
+        return cls.from_kinds(card_kind(card) for card in deck)
+
+    # ---------------------------------------------------------------------------
+    # Conversion
+    # ---------------------------------------------------------------------------
+
+    def counts(self) -> List[int]:
+        """
+        Return the number of cards held of each kind.
+
+        :return: 24 counts, in kind order.
+        :rtype: List[int]
+        """
+        bits = self.bits
+        return [
+            (bits >> (kind * BITS_PER_KIND)) & KIND_MASK for kind in range(NUM_KINDS)
+        ]
+
+    def kinds(self) -> List[int]:
+        """
+        Return the kind number of each card held, in kind order.
+
+        :return: Kind numbers, repeated for duplicate cards.
+        :rtype: List[int]
+        """
+        return [kind for kind, count in enumerate(self.counts()) for _ in range(count)]
+
+    def to_svg_names(self) -> List[str]:
+        """
+        Return the SVG names of the cards held, in kind order.
+
+        :return: SVG names.
+        :rtype: List[str]
+        """
+        return [SVG_NAMES[kind] for kind in self.kinds()]
+
+    def to_deck(self) -> PinochleDeck:
+        """
+        Return a new ``PinochleDeck`` holding the cards of this hand, in kind order.
+
+        :return: New deck.
+        :rtype: PinochleDeck
+        """
+        return PinochleDeck(cards=[kind_card(kind) for kind in self.kinds()])
+
+    # ---------------------------------------------------------------------------
+    # Manipulation
+    # ---------------------------------------------------------------------------
+
+    def count(self, kind: int) -> int:
+        """
+        Return the number of cards of the supplied kind in the hand.
+
+        :param kind: Kind number, 0 through 23.
+        :type kind: int
+        :return: Number of cards.
+        :rtype: int
+        """
+        return (self.bits >> (kind * BITS_PER_KIND)) & KIND_MASK
+
+    def add(self, kind: int, num: int = 1) -> None:
+        """
+        Add cards of the supplied kind to the hand.
+
+        :param kind: Kind number, 0 through 23.
+        :type kind: int
+        :param num: Number of cards to add.
+        :type num: int
+        :raises ValueError: When the hand would hold too many cards of the kind.
+        """
+        if self.count(kind) + num > MAX_PER_KIND:
+            raise ValueError("Too many %s cards in hand." % SVG_NAMES[kind])
+        self.bits += num << (kind * BITS_PER_KIND)
+
+    def remove(self, kind: int, num: int = 1) -> None:
+        """
+        Remove cards of the supplied kind from the hand.
+
+        :param kind: Kind number, 0 through 23.
+        :type kind: int
+        :param num: Number of cards to remove.
+        :type num: int
+        :raises ValueError: When the hand doesn't hold enough cards of the kind.
+        """
+        if self.count(kind) < num:
+            raise ValueError("Not enough %s cards in hand." % SVG_NAMES[kind])
+        self.bits -= num << (kind * BITS_PER_KIND)
+
+    def copy(self) -> "CompactHand":
+        """
+        Return a copy of the hand.
+
+        :return: New hand.
+        :rtype: CompactHand
+        """
+        return CompactHand(self.bits)
+
+    # ---------------------------------------------------------------------------
+    # Python protocols
+    # ---------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        low = self.bits & _LOW_BITS
+        high = (self.bits >> 1) & _LOW_BITS
+        return bin(low).count("1") + 2 * bin(high).count("1")
+
+    def __contains__(self, kind: int) -> bool:
+        return bool(self.count(kind))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.kinds())
+
+    def __add__(self, other: "CompactHand") -> "CompactHand":
+        result = CompactHand(self.bits)
+        for kind, count in enumerate(other.counts()):
+            if count:
+                result.add(kind, count)
+        return result
+
+    def __eq__(self, other):
+        return isinstance(other, CompactHand) and self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __repr__(self):
+        return "CompactHand(%r)" % self.to_svg_names()
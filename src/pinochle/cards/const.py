@@ -13,28 +13,65 @@ TRICK_SCORES = {
     "9": 0,
 }
 
+# ===============================================================================
+# Misc.
+# ===============================================================================
+
+# Stack/Deck ends.
+TOP = "top"
+BOTTOM = "bottom"
+TRUMP_VALUE = 20
+
 # ===============================================================================
 # Card Rank Dicts
 # ===============================================================================
-PINOCHLE_RANKS = {
-    "suits": {"Spades": 4, "Hearts": 3, "Clubs": 2, "Diamonds": 1},
-    "values": {
+
+
+class FrozenDict(dict):
+    """
+    A dict which can't be modified, so a single instance can be shared freely.
+    Copies of it are the instance itself.
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("Rank tables are shared and can't be modified.")
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def _build_ranks(trump=None):
+    """
+    Build the rank table used when ``trump`` is trump, or no suit when None.
+    """
+    suits = {"Spades": 4, "Hearts": 3, "Clubs": 2, "Diamonds": 1}
+    if trump is not None:
+        suits[trump] = TRUMP_VALUE
+    values = {
         "Ace": 6,
         "10": 5,
         "King": 4,
         "Queen": 3,
         "Jack": 2,
         "9": 1,
-    },
-}
+    }
+    return FrozenDict(suits=FrozenDict(suits), values=FrozenDict(values))
 
-DEFAULT_RANKS = PINOCHLE_RANKS
 
-# ===============================================================================
-# Misc.
-# ===============================================================================
+# One shared, immutable rank table for each trump suit and for no trump.
+RANKS_BY_TRUMP = FrozenDict(
+    (trump, _build_ranks(trump)) for trump in [None] + SUITS
+)
 
-# Stack/Deck ends.
-TOP = "top"
-BOTTOM = "bottom"
-TRUMP_VALUE = 20
+PINOCHLE_RANKS = RANKS_BY_TRUMP[None]
+
+DEFAULT_RANKS = PINOCHLE_RANKS
@@ -28,10 +28,11 @@ a subclass of the ``Stack`` class, with a few extra/differing methods.
 
 import uuid
 from collections import deque
-from copy import deepcopy
+from copy import copy
 
 from ..log_decorator import log_decorator
-from . import const
+from ..exceptions import InvalidSuitError
+from . import const, tools
 from .card import PinochleCard
 from .stack import PinochleStack
 
@@ -48,7 +49,7 @@ class PinochleDeck(PinochleStack):
         self.gameid = kwargs.get("gameid", uuid.uuid4())
         self.rebuild = kwargs.get("rebuild", False)
         self.re_shuffle = kwargs.get("re_shuffle", False)
-        self.ranks = kwargs.get("ranks", deepcopy(const.PINOCHLE_RANKS))
+        self.ranks = kwargs.get("ranks", const.PINOCHLE_RANKS)
         self.decks_used = 0
 
         if kwargs.get("build", False):
@@ -135,6 +136,11 @@ class PinochleDeck(PinochleStack):
         """
         ranks = ranks or self.ranks
 
+        keys = tools.rank_sort_keys(ranks, suit_major=True)
+        if keys is not None:
+            self.cards = sorted(self.cards, key=lambda x: -keys[x.card_id])
+            return
+
         if ranks.get("suits"):
             cards = sorted(
                 self.cards,
@@ -144,6 +150,27 @@ class PinochleDeck(PinochleStack):
             )
             self.cards = cards
 
+    def with_trump(self, trump=None):
+        """
+        Returns a view of the deck with ``trump`` as the trump suit. The view shares
+        the cards of this deck, so nothing is copied, and uses the shared rank table
+        for that trump suit.
+
+        :arg str trump:
+            The suit to make trump, or ``None`` for no trump.
+
+        :returns:
+            A PinochleDeck instance sharing this deck's cards.
+
+        """
+        try:
+            ranks = const.RANKS_BY_TRUMP[trump]
+        except (KeyError, TypeError):
+            raise InvalidSuitError("%s is not a valid suit." % str(trump)) from None
+        view = copy(self)
+        view.ranks = ranks
+        return view
+
     @log_decorator
     def deal(self, num=1, rebuild=False, shuffle=False, end=const.TOP):
         """
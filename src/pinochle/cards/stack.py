@@ -35,7 +35,6 @@ be used as a hand, or a discard pile, etc.
 
 import random
 from collections import deque
-from copy import deepcopy
 
 from . import tools
 from .const import BOTTOM, DEFAULT_RANKS, TOP
@@ -74,7 +73,7 @@ class PinochleStack:
 
         """
         self._cards = deque(kwargs.get("cards", []))
-        self.ranks = kwargs.get("ranks", deepcopy(DEFAULT_RANKS))
+        self.ranks = kwargs.get("ranks", DEFAULT_RANKS)
 
         self._i = 0
 
@@ -35,14 +35,56 @@ of which are used by the classes in the PyDealer package, such as the functions
 import random
 import time
 
-from .card import PinochleCard
-from .const import DEFAULT_RANKS, SUITS, VALUES
+from .card import CARDS, PinochleCard
+from .const import DEFAULT_RANKS, RANKS_BY_TRUMP, SUITS, VALUES
 
 # ===============================================================================
 # Utility Functions
 # ===============================================================================
 
 
+def _build_sort_keys(ranks, suit_major=False):
+    """
+    Sort keys, by ``card_id``, ordering cards by value then suit, or by suit then
+    value when ``suit_major``, for ``ranks``.
+    """
+    suits, values = ranks["suits"], ranks["values"]
+    if suit_major:
+        scale = max(values.values()) + 1
+        return [suits[x.suit] * scale + values[x.value] for x in CARDS]
+    scale = max(suits.values()) + 1
+    return [values[x.value] * scale + suits[x.suit] for x in CARDS]
+
+
+# Precomputed sort keys for the shared rank tables, keyed by id() of the table.
+_SORT_KEYS = {
+    id(ranks): (ranks, _build_sort_keys(ranks), _build_sort_keys(ranks, True))
+    for ranks in RANKS_BY_TRUMP.values()
+}
+
+
+def rank_sort_keys(ranks, suit_major=False):
+    """
+    Returns the precomputed sort keys for one of the shared rank tables in
+    ``const.RANKS_BY_TRUMP``. Sorting by ``keys[card.card_id]`` orders cards by
+    value, then suit, as ``sort_cards`` does, or by suit, then value.
+
+    :arg dict ranks:
+        The rank dict.
+    :arg bool suit_major:
+        Whether to order cards by suit first.
+
+    :returns:
+        The list of sort keys, indexed by ``card_id``, or ``None`` if ``ranks``
+        isn't a shared rank table.
+
+    """
+    entry = _SORT_KEYS.get(id(ranks))
+    if entry is not None and entry[0] is ranks:
+        return entry[2] if suit_major else entry[1]
+    return None
+
+
 def build_cards(jokers=False, num_jokers=0):
     """
     Builds a list containing a full French deck of 52 PinochleCard instances. The
@@ -425,6 +467,10 @@ def sort_card_indexes(cards, indexes, ranks=None):
     """
     ranks = ranks or DEFAULT_RANKS
 
+    keys = rank_sort_keys(ranks)
+    if keys is not None:
+        return sorted(indexes, key=lambda x: keys[cards[x].card_id])
+
     if ranks.get("suits"):
         indexes = sorted(
             indexes,
@@ -454,6 +500,10 @@ def sort_cards(cards, ranks=None):
     """
     ranks = ranks or DEFAULT_RANKS
 
+    keys = rank_sort_keys(ranks)
+    if keys is not None:
+        return sorted(cards, key=lambda x: keys[x.card_id])
+
     if ranks.get("suits"):
         cards = sorted(
             cards, key=lambda x: ranks["suits"][x.suit] if x.suit is not None else 0
@@ -6,7 +6,7 @@ Inspired by: https://github.com/Trebek/pydealer
 Modernized and modified for Pinochle by Paul Kronenwetter
 """
 
-from copy import deepcopy
+import random
 from typing import List, Tuple
 
 from .. import score_meld, score_tricks
@@ -14,7 +14,7 @@ from ..exceptions import InvalidDeckError, InvalidSuitError
 from ..log_decorator import log_decorator
 from ..models.hand import Hand
 from ..models.player import Player
-from . import const
+from . import compact, const, tools
 from .card import PinochleCard
 from .deck import PinochleDeck
 
@@ -73,10 +73,11 @@ def deal_hands(
         kitty += deck.deal(kitty_cards)
         deck.shuffle()
 
-    # Deal remaining cards equally to each player, one at a time
-    while deck.size > 0:
-        for index in range(players):
-            hand[index] += deck.deal()
+    # Deal remaining cards equally to each player, one at a time from the top
+    remaining = list(deck.cards)[::-1]
+    deck.cards.clear()
+    for index in range(players):
+        hand[index].cards.extend(remaining[index::players])
 
     # Make sure everyone has the same size hand
     for index in range(players - 1):
@@ -85,6 +86,33 @@ def deal_hands(
     return hand, kitty
 
 
+def deal_card_names(players=4, kitty_cards=0) -> Tuple[List[List[str]], List[str]]:
+    """
+    Shuffle a Pinochle deck once and deal it to the players and the kitty, giving the
+    SVG names of the cards, as they're stored in the database.
+
+    :param players: Number of players, defaults to 4
+    :type players: int, optional
+    :param kitty_cards: Number of cards for the kitty, defaults to 0
+    :type kitty_cards: int, optional
+    :return: Card names for each player's hand and for the kitty.
+    :rtype: Tuple[List[List[str]], List[str]]
+    """
+    cards = compact.SVG_NAMES * 2
+    random.shuffle(cards)
+
+    # If the number of players isn't evenly divisible into the size of the
+    # deck, force a number of kitty cards, if none are requested.
+    if kitty_cards == 0:
+        kitty_cards = len(cards) % players
+
+    # Make sure everyone will receive the same number of cards.
+    assert (len(cards) - kitty_cards) % players == 0
+
+    remaining = cards[kitty_cards:]
+    return [remaining[index::players] for index in range(players)], cards[:kitty_cards]
+
+
 @log_decorator
 # pylint: disable=unused-argument
 def build_cards(jokers=False, num_jokers=0):
@@ -131,6 +159,10 @@ def sort_cards(cards, ranks=None):  # pragma: no cover
     """
     ranks = ranks or const.PINOCHLE_RANKS
 
+    keys = tools.rank_sort_keys(ranks, suit_major=True)
+    if keys is not None:
+        return sorted(cards, key=lambda x: -keys[x.card_id])
+
     if ranks.get("suits"):
         cards = sorted(
             cards,
@@ -145,7 +177,8 @@ def sort_cards(cards, ranks=None):  # pragma: no cover
 @log_decorator
 def set_trump(trump="", f_deck=PinochleDeck()) -> PinochleDeck:
     """
-    Set trump for the supplied hand and return a new deck instance.
+    Set trump for the supplied hand and return a new deck instance. The new deck
+    shares the cards of the supplied one; only the rank table differs.
 
     :param trump: String containing suit to be made trump, defaults to ""
     :type trump: str, optional
@@ -163,11 +196,7 @@ def set_trump(trump="", f_deck=PinochleDeck()) -> PinochleDeck:
             "Supplied deck (hand) is not an instance of PinochleDeck."
         )
 
-    newhand = deepcopy(f_deck)
-    newhand.ranks["suits"][trump] = const.TRUMP_VALUE
-    # print(newhand.ranks)
-
-    return newhand
+    return f_deck.with_trump(trump)
 
 
 @log_decorator
@@ -186,16 +215,16 @@ def deck_list_summary(
     output += "-" * (25 * players) + "\n"
     output += r"  9  P  M  J  Q  K  A  R|" * players
     output += "\n"
-    # pylint: disable=protected-access
     for index in range(players):
-        output += " %2d " % score_meld._nines(hands[index])
-        output += "%2d " % score_meld._pinochle(hands[index])
-        output += "%2d " % score_meld._marriages(hands[index])
-        output += "%2d " % score_meld._jacks(hands[index])
-        output += "%2d " % score_meld._queens(hands[index])
-        output += "%2d " % score_meld._kings(hands[index])
-        output += "%2d " % score_meld._aces(hands[index])
-        output += r"%2d|" % score_meld._run(hands[index])
+        __, items = score_meld.breakdown(hands[index])
+        output += " %2d " % items["nines"]
+        output += "%2d " % items["pinochle"]
+        output += "%2d " % items["marriages"]
+        output += "%2d " % items["jacks"]
+        output += "%2d " % items["queens"]
+        output += "%2d " % items["kings"]
+        output += "%2d " % items["aces"]
+        output += r"%2d|" % items["run"]
     output += "\n"
     output += "Meld  "
     for index in range(players):
@@ -240,16 +269,16 @@ def hand_summary_score(hand: Hand) -> str:  # pragma: no cover
 
     output = r"  9  P  M  J  Q  K  A  R|" * len(player_list)
     output += "\n"
-    # pylint: disable=protected-access
     for __, e_player in enumerate(player_list):
-        output += " %2d " % score_meld._nines(e_player.hand)
-        output += "%2d " % score_meld._pinochle(e_player.hand)
-        output += "%2d " % score_meld._marriages(e_player.hand)
-        output += "%2d " % score_meld._jacks(e_player.hand)
-        output += "%2d " % score_meld._queens(e_player.hand)
-        output += "%2d " % score_meld._kings(e_player.hand)
-        output += "%2d " % score_meld._aces(e_player.hand)
-        output += r"%2d|" % score_meld._run(e_player.hand)
+        __, items = score_meld.breakdown(e_player.hand)
+        output += " %2d " % items["nines"]
+        output += "%2d " % items["pinochle"]
+        output += "%2d " % items["marriages"]
+        output += "%2d " % items["jacks"]
+        output += "%2d " % items["queens"]
+        output += "%2d " % items["kings"]
+        output += "%2d " % items["aces"]
+        output += r"%2d|" % items["run"]
     output += "\n"
     output += "Meld  "
     for __, e_player in enumerate(player_list):
@@ -1,13 +1,20 @@
 """
 Customized log configuration
 """
-import inspect
 import logging
 import sys
+import threading
+from typing import Dict, List, Optional
+
+from . import GLOBAL_LOG_LEVEL
 
 # Originally from https://github.com/hima03/log-decorator.git
 # Modified for my own preferences.
 
+_LOGGERS: Dict[str, logging.Logger] = {}
+_HANDLERS: List[logging.Handler] = []
+_LOCK = threading.Lock()
+
 
 class CustomFormatter(logging.Formatter):  # pragma: no cover
     """Custom Formatter does these 2 things:
@@ -25,28 +32,49 @@ class CustomFormatter(logging.Formatter):  # pragma: no cover
         return super(CustomFormatter, self).format(record)
 
 
-def get_logger() -> logging.Logger:  # pragma: no cover
-    """Customizes and returns a Logger object.
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """Returns the Logger for a module, creating it on first use.
     Set the formatter of 'CustomFormatter' type as we want to log base function name
-    and base file name
+    and base file name. Loggers are kept for the life of the process and share one
+    handler, so asking for one again costs a dictionary lookup.
+
+    :param name: Name of the module, the calling module's when not given.
+    :type name: Optional[str]
+    :return: The logger.
+    :rtype: logging.Logger
     """
+    if name is None:
+        # pylint: disable=protected-access
+        name = sys._getframe(1).f_globals.get("__name__", __package__)
+    try:
+        return _LOGGERS[name]
+    except KeyError:
+        pass
 
-    # Create logger object and set the format for logging and other attributes
-    logger = logging.Logger(f"{__package__}.{inspect.stack()[2][3]}")
-    if logger.getEffectiveLevel() != logging.getLogger(__package__).getEffectiveLevel():
-        logger.setLevel(logging.getLogger(__package__).getEffectiveLevel())
+    with _LOCK:
+        if name not in _LOGGERS:
+            # Create logger object and set the format for logging and other attributes.
+            # It's registered with logging so its cached level checks are cleared when
+            # levels change, but writes only through its own handler.
+            logger = logging.getLogger(name)
+            logger.setLevel(GLOBAL_LOG_LEVEL)
+            logger.propagate = False
+            logger.addHandler(_handler())
+            _LOGGERS[name] = logger
+    return _LOGGERS[name]
 
-    handler = logging.StreamHandler(stream=sys.stderr)
 
-    handler.setFormatter(
-        # CustomFormatter(
-        #     "%(asctime)s:%(levelname)-10s:%(filename)s:%(funcName)s:%(message)s"
-        # )
-        CustomFormatter(
-            "[%(asctime)s] - %(module)s:%(funcName)s - %(levelname)s - %(message)s"
+def _handler() -> logging.Handler:
+    if not _HANDLERS:
+        handler = logging.StreamHandler(stream=sys.stderr)
+        handler.setFormatter(
+            # CustomFormatter(
+            #     "%(asctime)s:%(levelname)-10s:%(filename)s:%(funcName)s:%(message)s"
+            # )
+            CustomFormatter(
+                "[%(asctime)s] - %(module)s:%(funcName)s - %(levelname)s - "
+                "%(message)s"
+            )
         )
-    )
-    logger.addHandler(handler)
-
-    # Return logger object
-    return logger
+        _HANDLERS.append(handler)
+    return _HANDLERS[0]
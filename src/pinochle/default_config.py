@@ -21,6 +21,91 @@ could contain this:
 
 The default points to an in-memory SQLite database for convenience in development
 and testing.
+
+When running more than one worker process (e.g. gunicorn --workers 4), websocket
+broadcasts must be shared between the workers. Select a broadcast backend:
+
+    # All workers on one host, relayed through a Unix domain socket.
+    WS_BROADCAST_BACKEND = "unix"
+    WS_BROADCAST_UNIX_PATH = "/run/pinochle/ws.sock"
+
+    # Workers on any number of hosts, relayed through Redis (or compatible server).
+    WS_BROADCAST_BACKEND = "redis"
+    WS_BROADCAST_REDIS_HOST = "redis.example.com"
+    WS_BROADCAST_REDIS_PORT = 6379
+
+Messages to each websocket client are queued and sent by a sender dedicated to that
+client. WS_SEND_QUEUE_SIZE bounds each queue and WS_BACKPRESSURE_POLICY selects what
+happens when a client falls that far behind: drop_oldest discards the oldest queued
+message, coalesce discards an older message superseded by a newer one (only game
+snapshots, player lists and team scores are) and disconnect closes the client's
+websocket.
+
+Each broadcast carries a sequence number and the last WS_REPLAY_BUFFER_SIZE
+broadcasts of every game are kept, so a reconnecting client is sent only what it
+missed. Clients further behind are sent a snapshot of the whole game instead.
+
+By default every card in a hand is stored in its own row of the hand table. Setting
+
+    HAND_STORAGE = "packed"
+
+stores each hand as a single row of the packed_hand table instead, two bytes per
+card, so dealing, playing a card or reading a hand touches one row per hand. Hands
+aren't converted between the two, so choose before any games are played.
+
+Which game each round belongs to and the players of each team and round are cached
+by every worker process. METADATA_CACHE_SIZE bounds the
+number of entries and METADATA_CACHE_TTL is how many seconds an entry is kept, which
+is how long a change made through another worker may go unseen.
+
+On databases other than PostgreSQL, IDs are stored as 32 hex characters. Setting
+
+    GUID_STORAGE = "binary"
+
+stores them as 16 bytes instead, halving the size of every key and index. Existing
+databases must be converted first, with
+
+    python -m pinochle.models.guid_migration OLD_URL NEW_URL --to binary
+
+SQLite connections are tuned for many workers and threads sharing one database
+file (see models.sqlite_tuning): the write-ahead log lets reads continue during a
+write, SQLITE_BUSY_TIMEOUT is how many milliseconds a write waits for another to
+finish, and connections are pooled, SQLITE_POOL_SIZE of them kept open plus up to
+SQLITE_POOL_OVERFLOW more when busy. SQLITE_CACHE_SIZE is in pages, or in KiB when
+negative, and SQLITE_MMAP_SIZE in bytes. Set SQLITE_TUNING = False to use SQLite's
+defaults and open a connection per request.
+
+Every action in a round is also appended to the game_event table (see
+game_events), and the state of the round is saved to the round_snapshot table every
+GAME_EVENT_SNAPSHOT_INTERVAL events, so rebuilding it replays at most that many.
+When every game is served by a single worker process, as with one worker or a proxy
+routing requests by game, set GAME_EVENT_WRITE_BEHIND = True to queue the events and
+write them every GAME_EVENT_FLUSH_INTERVAL seconds instead, keeping the state of up
+to GAME_EVENT_QUEUE_ROUNDS rounds in memory for their snapshots (see
+game_event_queue). Events queued when a worker is killed are lost from the log.
+
+Setting GAME_ENGINE = True plays each game in the memory of the worker process owning
+it (see game_engine): bids, trump, meld, discards and cards played are checked and
+answered there, and written to the database behind them. The worker processes of a
+host share GAME_ENGINE_DIR, where they take ownership of games and forward requests
+to the owner of their game, and each keeps up to GAME_ENGINE_MAX_GAMES games. With
+several hosts, the proxy in front of them must route each game to one host.
+
+Request, database and websocket metrics are served at /metrics (see metrics). When
+several worker processes serve the application, set METRICS_DIR to a directory they
+share; each writes its metrics there every METRICS_FLUSH_INTERVAL seconds and
+/metrics adds them up.
+
+The SQL statements issued for each request and websocket message are counted (see
+models.query_count). Those issuing more than QUERY_COUNT_LOG_THRESHOLD are logged,
+and in debug mode, or with QUERY_COUNT_HEADERS = True, every response carries the
+X-Query-Count and X-Query-Time headers.
+
+A worker can be profiled while it runs at /admin/profile?seconds=N (see profiler),
+which returns its sampled stacks in the collapsed format read by flame graph tools,
+or with format=pstats a cProfile report. The endpoint is only served when
+ADMIN_TOKEN is set, to requests carrying it in the X-Admin-Token header, and
+profiles for at most PROFILE_MAX_SECONDS.
 """
 # SERVER_NAME = "localhost:5000"
 
@@ -29,3 +114,63 @@ DB_PASSWORD = ""
 DB_SERVER = "localhost"
 DB_NAME = ":memory:"
 SQLALCHEMY_DB_PREFIX = "sqlite"
+
+# Websocket broadcast fan-out between worker processes: inprocess, unix or redis.
+WS_BROADCAST_BACKEND = "inprocess"
+WS_BROADCAST_UNIX_PATH = "/tmp/pinochle-ws.sock"
+WS_BROADCAST_REDIS_HOST = "localhost"
+WS_BROADCAST_REDIS_PORT = 6379
+WS_BROADCAST_REDIS_CHANNEL = "pinochle:ws"
+WS_BROADCAST_REDIS_PASSWORD = None
+
+# Per-client websocket send queues.
+WS_SEND_QUEUE_SIZE = 64
+WS_BACKPRESSURE_POLICY = "drop_oldest"
+
+# Broadcasts retained per game for replay to reconnecting clients.
+WS_REPLAY_BUFFER_SIZE = 256
+
+# Card storage for hands: rows (one row per card) or packed (one row per hand).
+HAND_STORAGE = "rows"
+
+# Per-process cache of game, round and team relationships.
+METADATA_CACHE_SIZE = 1024
+METADATA_CACHE_TTL = 300
+
+# Storage of IDs on databases other than PostgreSQL: char (hex) or binary (16 bytes).
+GUID_STORAGE = "char"
+
+# SQLite connection tuning.
+SQLITE_TUNING = True
+SQLITE_JOURNAL_MODE = "WAL"
+SQLITE_SYNCHRONOUS = "NORMAL"
+SQLITE_BUSY_TIMEOUT = 5000
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE = -64 * 1024
+SQLITE_POOL_SIZE = 8
+SQLITE_POOL_OVERFLOW = 32
+
+# Events in a round between snapshots of its state.
+GAME_EVENT_SNAPSHOT_INTERVAL = 16
+
+# Write the event log behind the actions, when each game is served by one worker.
+GAME_EVENT_WRITE_BEHIND = False
+GAME_EVENT_QUEUE_ROUNDS = 1024
+GAME_EVENT_FLUSH_INTERVAL = 1.0
+
+# Play each game in memory on the worker owning it, writing the database behind.
+GAME_ENGINE = False
+GAME_ENGINE_DIR = "/tmp/pinochle-games"
+GAME_ENGINE_MAX_GAMES = 1024
+
+# Metrics shared between worker processes; None for a single process.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+
+# SQL statements per request or websocket message.
+QUERY_COUNT_HEADERS = False
+QUERY_COUNT_LOG_THRESHOLD = 100
+
+# Token for the /admin endpoints; None leaves them disabled.
+ADMIN_TOKEN = None
+PROFILE_MAX_SECONDS = 60
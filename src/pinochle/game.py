@@ -6,7 +6,8 @@ from flask import abort, make_response
 
 from pinochle import play_pinochle
 
-from .models import utils
+from . import game_engine
+from .models import unit_of_work, utils
 from .models.core import db
 from .models.game import GameSchema
 from .play_pinochle import GameModes
@@ -70,7 +71,7 @@ def create(kitty_size=0):
 
     # Add the game to the database
     db.session.add(new_game)
-    db.session.commit()
+    unit_of_work.commit()
 
     # Serialize and return the newly created game in the response
     data = schema.dump(new_game)
@@ -78,6 +79,7 @@ def create(kitty_size=0):
     return data, 201
 
 
+@game_engine.synced("game_id")
 def update(game_id: str, kitty_size=None, state=None, dealer_id=None):
     """
     This function updates an existing game in the game structure
@@ -152,7 +154,7 @@ def _update_data(game_id: str, data: dict):
 
     # Add the updated data to the transaction.
     db_session.add(local_object)
-    db_session.commit()
+    unit_of_work.commit()
 
     # return updated game in the response
     schema = GameSchema()
@@ -185,5 +187,6 @@ def delete(game_id: str):
         abort(404, f"Game not found for Id: {game_id}")
 
     db.session.delete(game)
-    db.session.commit()
+    unit_of_work.commit()
+    unit_of_work.invalidate_cached("round_game")
     return make_response(f"Game {game_id} deleted", 200)
@@ -0,0 +1,908 @@
+"""
+In-memory game engine, with each game played on the worker process owning it.
+
+With GAME_ENGINE set, the worker owning a game holds a GameEngine for it: the seats,
+hands, kitty, bids, trump, meld, current trick and team scores of its active round,
+loaded from the database when first needed. Bids, trump, meld, discards, cards
+played and the start of each trick are checked against the engine and applied to it,
+and answered from it, without reading or writing the database.
+
+The actions taken are written behind. A writer thread replays each game's queued
+actions through the endpoints that took them before (play_pinochle, player and
+roundteams), as one transaction per game, and their broadcasts are published once
+it's committed. Each commit is a checkpoint of the game: a worker taking the game
+over, after its owner stops, loads the engine from there. Actions not yet written
+when a worker is killed are lost, but as they were never broadcast the players see
+the game go back to its last checkpoint. When the database refuses an action being
+replayed, the engine and the actions queued after it are dropped, and the engine is
+loaded from the database again.
+
+Endpoints changing a round in other ways, such as starting it, advancing the game's
+state or changing a round or a hand directly, are run on the worker owning the game,
+once its queued actions are written, and its engine is loaded again afterwards.
+
+Workers sharing GAME_ENGINE_DIR, those of a host, own games through a lock file for
+each game kept there: the worker holding the lock owns the game, and writes the path
+of its Unix domain socket in the file. A worker given a request for a game another
+one owns forwards the request to it through that socket, and answers with its
+response. Locks are released when a worker stops, or when it drops its engine of a
+game as one of more than GAME_ENGINE_MAX_GAMES, so another worker can take the game
+over. Across several hosts, each game must be routed to one host by the proxy in
+front of them.
+
+Without GAME_ENGINE, every endpoint runs against the database where it's called.
+
+License: GPLv3
+"""
+import atexit
+import fcntl
+import functools
+import inspect
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from flask import Flask, Response, abort, make_response
+from werkzeug.exceptions import HTTPException
+
+from . import custom_log, score_meld, score_tricks, trick_resolver
+from .cards.compact import CompactHand, svg_kind
+from .cards.const import SUITS
+from .exceptions import InvalidValueError
+from .models import unit_of_work, utils
+
+LOG = custom_log.get_logger(__name__)
+
+# Defaults, overridden from the application config by configure().
+DEFAULT_DIRECTORY = "/tmp/pinochle-games"
+DEFAULT_MAX_GAMES = 1024
+# Seconds to wait for the owner of a game to answer a forwarded request.
+FORWARD_TIMEOUT = 30.0
+# Times a request may be forwarded before it's refused.
+MAX_HOPS = 3
+# Seconds to wait for a new owner to write its address into a game's lock file.
+CLAIM_TIMEOUT = 1.0
+
+_settings: Dict[str, Any] = {
+    "enabled": False,
+    "max_games": DEFAULT_MAX_GAMES,
+    "writer_started": False,
+}
+
+# Endpoints routed by game, by name, for the requests forwarded between workers.
+_endpoints: Dict[str, Callable] = {}
+_engines: "OrderedDict[str, GameEngine]" = OrderedDict()
+_engines_lock = threading.Lock()
+_wake = threading.Event()
+# Whether this thread runs endpoints against the database as they are, and the
+# router and forwarding count of the request it serves.
+_local = threading.local()
+
+
+class _Unheld(Exception):
+    """
+    The action concerns something the engine doesn't hold, such as another round or
+    an unknown player, so it's left to the database.
+    """
+
+
+class GameEngine:
+    """
+    State of the active round of a game, and the actions taken in it.
+
+    :arg str game_id:
+        ID of the game.
+    """
+
+    def __init__(self, game_id: str):
+        self.game_id = str(game_id)
+        # Held while the state is read or changed.
+        self.lock = threading.RLock()
+        # Held while actions are written, so they're written in order.
+        self.write_lock = threading.Lock()
+        # Actions taken but not yet written: the endpoint and its arguments.
+        self.pending: List[Tuple[Callable, Dict[str, Any]]] = []
+        self.loaded = False
+        self.dropped = False
+
+        self.round_id = ""
+        self.round_seq = 0
+        self.kitty_id = ""
+        self.kitty = CompactHand()
+        self.bid = 0
+        self.bid_winner: Optional[str] = None
+        self.trump = ""
+        # Players in team order, as utils.query_player_ids_for_round gives them.
+        self.seats: List[str] = []
+        self.team_of: Dict[str, str] = {}
+        self.hand_ids: Dict[str, str] = {}
+        self.hands: Dict[str, CompactHand] = {}
+        self.bidding: Set[str] = set()
+        self.meld: Dict[str, int] = {}
+        self.meld_final: Set[str] = set()
+        self.team_hand_ids: Dict[str, str] = {}
+        self.team_cards: Dict[str, CompactHand] = {}
+        self.team_scores: Dict[str, int] = {}
+        # Cards played to the current trick, by position from its starter.
+        self.trick_starter: Optional[str] = None
+        self.trick_winner: Optional[str] = None
+        self.trick: Dict[int, str] = {}
+
+    def load(self) -> None:
+        """
+        Load the state of the game's active round from the database.
+
+        :raises _Unheld: When the game has no active round, or its hands can't be
+            held.
+        """
+        round_id = utils.query_active_round_id(self.game_id)
+        a_round = utils.query_round(round_id) if round_id else None
+        if a_round is None:
+            raise _Unheld()
+        self.round_id = str(a_round.round_id)
+        self.round_seq = a_round.round_seq
+        self.kitty_id = str(a_round.hand_id)
+        self.bid = a_round.bid
+        self.bid_winner = str(a_round.bid_winner) if a_round.bid_winner else None
+        self.trump = a_round.trump
+        self.seats = utils.query_player_ids_for_round(self.round_id)
+
+        try:
+            self.kitty = _read_hand(a_round.hand_id)
+            self.team_of, self.hand_ids, self.hands, self.meld = {}, {}, {}, {}
+            self.bidding, self.meld_final = set(), set()
+            for team_id, a_player in utils.query_round_players(self.round_id):
+                player_id = str(a_player.player_id)
+                self.team_of[player_id] = team_id
+                self.hand_ids[player_id] = str(a_player.hand_id)
+                self.hands[player_id] = _read_hand(a_player.hand_id)
+                self.meld[player_id] = a_player.meld_score
+                if a_player.bidding:
+                    self.bidding.add(player_id)
+                if a_player.meld_final:
+                    self.meld_final.add(player_id)
+
+            self.team_hand_ids, self.team_cards, self.team_scores = {}, {}, {}
+            for a_roundteam in utils.query_roundteam_list(self.round_id):
+                team_id = str(a_roundteam.team_id)
+                self.team_hand_ids[team_id] = str(a_roundteam.hand_id)
+                self.team_cards[team_id] = _read_hand(a_roundteam.hand_id)
+                self.team_scores[team_id] = utils.query_team(team_id).score
+        except (ValueError, InvalidValueError) as err:
+            LOG.warning("Game %s can't be held in memory: %s", self.game_id, err)
+            raise _Unheld() from err
+
+        a_trick = utils.query_trick_for_round_id(self.round_id)
+        self.trick_starter = self.trick_winner = None
+        self.trick = {}
+        if a_trick is not None:
+            if a_trick.trick_starter:
+                self.trick_starter = str(a_trick.trick_starter)
+            if a_trick.trick_winner:
+                self.trick_winner = str(a_trick.trick_winner)
+            self.trick = {
+                x.seq: x.card for x in utils.query_hand_list(str(a_trick.hand_id))
+            }
+        self.loaded = True
+
+    def unload(self) -> None:
+        """
+        Forget the state, so it's loaded from the database when next needed.
+        """
+        self.loaded = False
+
+    def submit_bid(self, round_id: str, player_id: str, bid: int):
+        """
+        Take a bid, or a pass when the bid is -1 (see play_pinochle.submit_bid).
+        """
+        self._check_round(round_id)
+        player = self._player(player_id)
+        if player not in self.bidding:
+            abort(409, f"Player {player_id} has already passed.")
+        if bid != -1 and self.bid >= bid:
+            abort(409, f"Bid {bid} is below current bid {self.bid}.")
+
+        still_bidding = [x for x in self._bid_order() if x in self.bidding]
+        next_bidder = still_bidding[
+            (still_bidding.index(player) + 1) % len(still_bidding)
+        ]
+        if bid > 0:
+            self.bid, self.bid_winner = bid, player
+            return self._round_data(), 200
+
+        self.bidding.discard(player)
+        if len(still_bidding) == 2:
+            # The last player bidding wins the bid, and the kitty.
+            self.hands[next_bidder] = self.hands[next_bidder] + self.kitty
+            self.bid_winner = next_bidder
+            self._start_trick(next_bidder)
+        return {}, 200
+
+    def set_trump(self, round_id: str, player_id: str, trump: str):
+        """
+        Take the trump declared by the bid winner (see play_pinochle.set_trump).
+        """
+        self._check_round(round_id)
+        self._player(player_id)
+        if self.bid_winner != _canonical(player_id):
+            abort(409, f"Bid winner {self.bid_winner} must submit trump.")
+        if "{}s".format(trump.capitalize()) not in SUITS:
+            abort(409, f"Trump suit must be one of {SUITS}.")
+        self.trump = trump
+        return self._round_data(), 200
+
+    def score_hand_meld(self, round_id: str, player_id: str, cards: str):
+        """
+        Score the meld a player shows (see play_pinochle.score_hand_meld).
+        """
+        self._check_round(round_id)
+        player = self._player(player_id)
+        score = 0
+        if len(cards) > 2:
+            card_list = cards.split(",")
+            for item in card_list:
+                if not self._holds(player, item):
+                    abort(409, f"Card {item} not in player's hand.")
+            try:
+                meld = CompactHand.from_svg_names(card_list)
+            except ValueError as err:
+                # The same card shown more often than it's dealt.
+                raise _Unheld() from err
+            score = score_meld.score_hand(meld, self._trump_suit())[0]
+        self.meld[player] = score
+        return make_response(json.dumps({"score": score}), 200)
+
+    def finalize_meld(self, round_id: str, player_id: str):
+        """
+        Mark a player's meld final, adding up the team's meld once everyone's is (see
+        play_pinochle.finalize_meld).
+        """
+        self._check_round(round_id)
+        self.meld_final.add(self._player(player_id))
+        if self.meld_final.issuperset(self.seats):
+            for team_id in self.team_scores:
+                self.team_scores[team_id] += sum(
+                    self.meld[x] for x, y in self.team_of.items() if y == team_id
+                )
+
+    def play_trick_card(self, round_id: str, player_id: str, card: str):
+        """
+        Take a card played to the current trick, and score the trick and the round as
+        they end (see play_pinochle.play_trick_card).
+        """
+        self._check_round(round_id)
+        player = self._player(player_id)
+        if self.trick_starter is None:
+            raise _Unheld()
+        if not self._holds(player, card):
+            abort(409, f"Card {card} not in player's hand.")
+        order = self._players_from(self.trick_starter)
+        player_seq = order.index(player)
+        if player_seq in self.trick:
+            abort(409, f"Player {player_id} already played to this trick.")
+
+        self.hands[player].remove(svg_kind(card))
+        self.trick[player_seq] = card
+        if len(self.trick) == len(order):
+            trick_cards = [self.trick[x] for x in sorted(self.trick)]
+            winning_index = trick_resolver.winning_index(
+                trick_resolver.card_ids(trick_cards), self._trump_suit()
+            )
+            self.trick_winner = order[winning_index]
+            winning_team_id = self.team_of[self.trick_winner]
+            self.team_cards[winning_team_id] = self.team_cards[
+                winning_team_id
+            ] + CompactHand.from_svg_names(trick_cards)
+            if not self.hands[player]:
+                self._score_round(winning_team_id)
+        return make_response("Card accepted", 200)
+
+    def start_next_trick(self, round_id: str, player_id: str):
+        """
+        Start the next trick, led by the player (see play_pinochle.start_next_trick).
+        """
+        self._check_round(round_id)
+        self._start_trick(self._player(player_id))
+        return make_response("Start next trick", 200)
+
+    def add_team_card(self, round_id: str, team_id: str, card: str):
+        """
+        Add a card discarded by a player to their team's pile (see
+        roundteams.addcard).
+        """
+        self._check_round(round_id)
+        team_id = _canonical(team_id)
+        if team_id not in self.team_cards:
+            raise _Unheld()
+        try:
+            self.team_cards[team_id] = self.team_cards[
+                team_id
+            ] + CompactHand.from_svg_names([card])
+        except (ValueError, InvalidValueError) as err:
+            raise _Unheld() from err
+        return {"hand_id": self.team_hand_ids[team_id], "card": card}, 201
+
+    def delete_card(self, player_id: str, card: str):
+        """
+        Remove a card from a player's hand (see player.deletecard).
+        """
+        player = self._player(player_id)
+        if not self._holds(player, card):
+            abort(404, f"Hand/card not found for: {self.hand_ids[player]}/{card}")
+        self.hands[player].remove(svg_kind(card))
+        return make_response(f"Player's card {card} deleted", 200)
+
+    def _check_round(self, round_id: str) -> None:
+        if _canonical(round_id) != self.round_id:
+            raise _Unheld()
+
+    def _player(self, player_id: str) -> str:
+        player = _canonical(player_id)
+        if player not in self.team_of:
+            raise _Unheld()
+        return player
+
+    def _holds(self, player: str, card: str) -> bool:
+        try:
+            return svg_kind(card) in self.hands[player]
+        except InvalidValueError:
+            return False
+
+    def _trump_suit(self) -> Optional[str]:
+        suit = "{}s".format(self.trump.capitalize())
+        return suit if suit in SUITS else None
+
+    def _bid_order(self) -> List[str]:
+        # Alternate players by team, as roundteams.create_ordered_player_list does.
+        return self.seats[::2] + self.seats[1::2]
+
+    def _players_from(self, player: str) -> List[str]:
+        # As play_pinochle.reorder_players does.
+        index = self.seats.index(player)
+        return self.seats[index:] + self.seats[:index]
+
+    def _start_trick(self, player: str) -> None:
+        self.trick_starter, self.trick_winner = player, None
+        self.trick = {}
+
+    def _score_round(self, last_team_id: str) -> None:
+        # As play_pinochle.notify_round_complete does, the team winning the last
+        # trick scoring one more.
+        for team_id, cards in self.team_cards.items():
+            if cards:
+                score = score_tricks.score_counts(cards.counts())
+                if team_id == last_team_id:
+                    score += 1
+                self.team_scores[team_id] += score
+
+    def _round_data(self) -> Dict[str, Any]:
+        return {
+            "round_id": self.round_id,
+            "round_seq": self.round_seq,
+            "hand_id": self.kitty_id,
+            "bid": self.bid,
+            "bid_winner": self.bid_winner,
+            "trump": self.trump,
+        }
+
+
+class Router:
+    """
+    Ownership of games among the worker processes sharing a directory, and the
+    forwarding of requests to the worker owning their game.
+
+    :arg str directory:
+        Directory shared by the worker processes, for the lock file of each game and
+        the socket of each worker.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.address = os.path.join(directory, f"worker-{uuid.uuid4().hex}.sock")
+        # Open lock file of each game owned.
+        self._leases: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+
+    def claim(self, game_id: str) -> Optional[str]:
+        """
+        Take ownership of a game, unless another worker owns it.
+
+        :param game_id: ID of the game.
+        :type game_id: str
+        :return: Socket path of the worker owning the game, or None for this one.
+        :rtype: Optional[str]
+        """
+        with self._lock:
+            if game_id in self._leases:
+                return None
+        path = os.path.join(self.directory, f"game-{game_id}.lock")
+        deadline = time.monotonic() + CLAIM_TIMEOUT
+        while True:
+            lock_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                owner = os.read(lock_fd, 4096).decode()
+                os.close(lock_fd)
+                if owner:
+                    return owner
+                if time.monotonic() > deadline:
+                    abort(503, f"No worker could take game {game_id}.")
+                # The new owner hasn't written its address yet.
+                time.sleep(0.01)
+                continue
+            os.ftruncate(lock_fd, 0)
+            os.write(lock_fd, self.address.encode())
+            with self._lock:
+                self._leases[game_id] = lock_fd
+            return None
+
+    def release(self, game_id: str) -> None:
+        """
+        Give up ownership of a game.
+
+        :param game_id: ID of the game.
+        :type game_id: str
+        """
+        with self._lock:
+            lock_fd = self._leases.pop(game_id, None)
+        if lock_fd is not None:
+            os.ftruncate(lock_fd, 0)
+            os.close(lock_fd)
+
+    def forward(self, owner: str, name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        Have the worker owning a game run an endpoint, and return its response.
+
+        :param owner: Socket path of the worker owning the game.
+        :type owner: str
+        :param name: Name of the endpoint.
+        :type name: str
+        :param arguments: Arguments of the endpoint, by name.
+        :type arguments: Dict[str, Any]
+        :raises ConnectionError: When the owner can't be reached, and the request
+            wasn't sent.
+        :return: The response.
+        :rtype: Any
+        """
+        hops = getattr(_local, "hops", 0) + 1
+        if hops > MAX_HOPS:
+            abort(503, f"Request forwarded {MAX_HOPS} times without reaching {name}.")
+        request = {"name": name, "arguments": arguments, "hops": hops}
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(FORWARD_TIMEOUT)
+            try:
+                conn.connect(owner)
+            except (FileNotFoundError, ConnectionRefusedError) as err:
+                raise ConnectionError(f"Worker {owner} is gone.") from err
+            try:
+                with conn.makefile("rwb") as stream:
+                    stream.write(json.dumps(request, default=str).encode() + b"\n")
+                    stream.flush()
+                    line = stream.readline()
+            except OSError as err:
+                abort(504, f"Worker {owner} didn't answer: {err}")
+        if not line:
+            abort(502, f"Worker {owner} closed the connection.")
+        reply = json.loads(line)
+        if "error" in reply:
+            abort(reply["error"], reply["description"])
+        return _decode_result(reply)
+
+    def start(self, app: Flask) -> None:
+        """
+        Serve the requests forwarded by other workers.
+
+        :param app: The application.
+        :type app: Flask
+        """
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.address)
+        server.listen()
+        self._server = server
+
+        def _accept():
+            while self._server is server:
+                try:
+                    conn, __ = server.accept()
+                except OSError:
+                    return
+                threading.Thread(
+                    target=self._serve, args=(app, conn), daemon=True
+                ).start()
+
+        threading.Thread(target=_accept, name="game-engine-router", daemon=True).start()
+
+    def close(self) -> None:
+        """
+        Stop serving forwarded requests and give up every game owned.
+        """
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+            try:
+                os.unlink(self.address)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            games = list(self._leases)
+        for game_id in games:
+            self.release(game_id)
+
+    def _serve(self, app: Flask, conn: socket.socket) -> None:
+        with conn, conn.makefile("rwb") as stream:
+            line = stream.readline()
+            if not line:
+                return
+            reply = self._call(app, json.loads(line))
+            stream.write(json.dumps(reply, default=str).encode() + b"\n")
+            stream.flush()
+
+    def _call(self, app: Flask, request: Dict[str, Any]) -> Dict[str, Any]:
+        previous = getattr(_local, "router", None), getattr(_local, "hops", 0)
+        _local.router, _local.hops = self, request["hops"]
+        try:
+            with app.app_context():
+                result = _endpoints[request["name"]](**request["arguments"])
+                return _encode_result(result)
+        except HTTPException as err:
+            return {"error": err.code, "description": err.description}
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception("Forwarded request for %s failed.", request["name"])
+            return {"error": 500, "description": f"{request['name']} failed."}
+        finally:
+            _local.router, _local.hops = previous
+
+
+ROUTER: Optional[Router] = None
+
+
+def configure(
+    enabled: bool,
+    directory: str = DEFAULT_DIRECTORY,
+    max_games: int = DEFAULT_MAX_GAMES,
+) -> None:
+    """
+    Set whether games are played in memory on the worker owning them, and how many
+    are kept.
+
+    :param enabled: Whether to play games in memory.
+    :type enabled: bool
+    :param directory: Directory shared by the worker processes of the host.
+    :type directory: str
+    :param max_games: Games kept in memory at most.
+    :type max_games: int
+    """
+    global ROUTER  # pylint: disable=global-statement
+    if max_games < 1:
+        raise ValueError("At least one game must be kept.")
+    _settings["enabled"] = bool(enabled)
+    _settings["max_games"] = int(max_games)
+    if enabled and (ROUTER is None or ROUTER.directory != directory):
+        ROUTER = Router(directory)
+
+
+def init_app(app: Flask) -> None:
+    """
+    Write the actions taken in the background, and serve the requests forwarded by
+    other workers.
+
+    :param app: The application.
+    :type app: Flask
+    """
+    if not _settings["enabled"] or _settings["writer_started"]:
+        return
+    _settings["writer_started"] = True
+    router = ROUTER
+    router.start(app)
+
+    def _flush():
+        with app.app_context():
+            try:
+                flush()
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception("Writing the game actions failed.")
+
+    def _loop():
+        while _settings["enabled"]:
+            _wake.wait()
+            _wake.clear()
+            _flush()
+
+    def _stop():
+        _flush()
+        router.close()
+
+    threading.Thread(target=_loop, name="game-engine-writer", daemon=True).start()
+    atexit.register(_stop)
+
+
+def enabled() -> bool:
+    """
+    Report whether games are played in memory.
+
+    :return: Whether GAME_ENGINE is set.
+    :rtype: bool
+    """
+    return _settings["enabled"]
+
+
+def action(key: str, method: Optional[str] = None) -> Callable:
+    """
+    Route an endpoint to the worker owning its game, where the game's engine takes
+    the action, when games are played in memory. The endpoint itself is then run
+    behind it, to write the action to the database.
+
+    :param key: Parameter identifying the game: game_id, round_id or player_id.
+    :type key: str
+    :param method: GameEngine method taking the action, by default the endpoint's
+        name.
+    :type method: str, optional
+    :return: Decorator for the endpoint.
+    :rtype: Callable
+    """
+    return functools.partial(_route, key=key, method=method, in_memory=True)
+
+
+def synced(key: str) -> Callable:
+    """
+    Route an endpoint to the worker owning its game, where it's run against the
+    database once the game's actions are written, when games are played in memory.
+    The game's engine is loaded again afterwards.
+
+    :param key: Parameter identifying the game: game_id, round_id or player_id.
+    :type key: str
+    :return: Decorator for the endpoint.
+    :rtype: Callable
+    """
+    return functools.partial(_route, key=key, method=None, in_memory=False)
+
+
+def for_game(game_id: str) -> GameEngine:
+    """
+    Retrieve the engine of a game, creating it on first use.
+
+    :param game_id: ID of the game.
+    :type game_id: str
+    :return: The engine, loaded or not.
+    :rtype: GameEngine
+    """
+    with _engines_lock:
+        engine = _engines.get(game_id)
+        if engine is None:
+            engine = _engines[game_id] = GameEngine(game_id)
+        _engines.move_to_end(game_id)
+        _evict()
+    return engine
+
+
+def flush(game_id: Optional[str] = None) -> int:
+    """
+    Write the actions taken in every game, or in one.
+
+    :param game_id: ID of the game, or None for every game.
+    :type game_id: str, optional
+    :return: Number of actions written.
+    :rtype: int
+    """
+    with _engines_lock:
+        engines = [x for x in _engines.values() if game_id in (None, x.game_id)]
+    written = 0
+    for engine in engines:
+        with engine.write_lock:
+            written += _write(engine)
+    return written
+
+
+def forget() -> None:
+    """
+    Drop the engines whose actions are all written, giving up their games.
+    """
+    with _engines_lock:
+        for game_id in list(_engines):
+            _drop(game_id)
+
+
+def _route(func: Callable, key: str, method: Optional[str], in_memory: bool):
+    name = f"{func.__module__}.{func.__name__}"
+    signature = inspect.signature(func)
+    method = method or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _settings["enabled"] or getattr(_local, "bypass", False):
+            return func(*args, **kwargs)
+        arguments = dict(signature.bind(*args, **kwargs).arguments)
+        game_id = _game_of(key, arguments[key])
+        if game_id is None:
+            return func(*args, **kwargs)
+
+        router = getattr(_local, "router", None) or ROUTER
+        for __ in range(MAX_HOPS):
+            owner = router.claim(game_id)
+            if owner is None:
+                break
+            try:
+                return router.forward(owner, name, arguments)
+            except ConnectionError:
+                # The owner stopped, releasing its lock.
+                LOG.warning("Worker %s owning game %s is gone.", owner, game_id)
+        else:
+            abort(503, f"No worker could take game {game_id}.")
+
+        if in_memory:
+            result = _take(game_id, method, func, arguments)
+            if result is not _Unheld:
+                return result
+        return _run_synced(game_id, func, arguments)
+
+    _endpoints[name] = wrapper
+    return wrapper
+
+
+def _game_of(key: str, value: Any) -> Optional[str]:
+    """
+    Find the game a request is about, from the value of the parameter given.
+    """
+    if key == "game_id":
+        try:
+            return _canonical(value)
+        except _Unheld:
+            return None
+    if key == "round_id":
+        return utils.query_game_id_for_round(str(value))
+    return utils.query_active_game_id_for_player(str(value))
+
+
+def _take(game_id: str, method: str, func: Callable, arguments: Dict[str, Any]):
+    """
+    Have the engine of the game take an action and queue it to be written, or return
+    _Unheld when the action is left to the database.
+    """
+    while True:
+        engine = for_game(game_id)
+        with engine.lock:
+            if engine.dropped:
+                continue
+            try:
+                if not engine.loaded:
+                    engine.load()
+                result = getattr(engine, method)(**arguments)
+            except _Unheld:
+                return _Unheld
+            engine.pending.append((func, arguments))
+        _wake.set()
+        return result
+
+
+def _run_synced(game_id: str, func: Callable, arguments: Dict[str, Any]):
+    """
+    Run an endpoint against the database once the game's actions are written, and
+    load the game's engine again afterwards.
+    """
+    while True:
+        engine = for_game(game_id)
+        with engine.write_lock, engine.lock:
+            if engine.dropped:
+                continue
+            _write(engine)
+            engine.unload()
+            return _bypassed(func, arguments)
+
+
+def _bypassed(func: Callable, arguments: Dict[str, Any]):
+    """
+    Run an endpoint, and those it calls, against the database as they are.
+    """
+    previous = getattr(_local, "bypass", False)
+    _local.bypass = True
+    try:
+        return func(**arguments)
+    finally:
+        _local.bypass = previous
+
+
+def _write(engine: GameEngine) -> int:
+    """
+    Write the actions queued by an engine, as one transaction. Call with the
+    engine's write_lock held.
+    """
+    with engine.lock:
+        actions, engine.pending = engine.pending, []
+    if not actions:
+        return 0
+    try:
+        _bypassed(_replay, {"actions": actions})
+    except Exception:  # pylint: disable=broad-except
+        with engine.lock:
+            dropped, engine.pending = len(engine.pending), []
+            engine.unload()
+        LOG.exception(
+            "Writing %d actions of game %s failed; dropping them and %d more.",
+            len(actions),
+            engine.game_id,
+            dropped,
+        )
+        return 0
+    return len(actions)
+
+
+@unit_of_work.transactional
+def _replay(actions: List[Tuple[Callable, Dict[str, Any]]]) -> None:
+    for func, arguments in actions:
+        func(**arguments)
+
+
+def _drop(game_id: str) -> bool:
+    """
+    Drop the engine of a game if its actions are all written and it isn't in use,
+    giving up the game. Call with _engines_lock held.
+    """
+    engine = _engines[game_id]
+    if not engine.lock.acquire(blocking=False):
+        return False
+    try:
+        if engine.pending or engine.write_lock.locked():
+            return False
+        engine.dropped = True
+        del _engines[game_id]
+    finally:
+        engine.lock.release()
+    if ROUTER is not None:
+        ROUTER.release(game_id)
+    return True
+
+
+def _evict() -> None:
+    """
+    Drop the least recently used engines, while there are too many, keeping the one
+    used last. Call with _engines_lock held.
+    """
+    excess = len(_engines) - _settings["max_games"]
+    for game_id in list(_engines)[:-1]:
+        if excess <= 0:
+            break
+        if _drop(game_id):
+            excess -= 1
+
+
+def _canonical(value: Any) -> str:
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        raise _Unheld() from None
+
+
+def _read_hand(hand_id: Any) -> CompactHand:
+    if hand_id is None:
+        return CompactHand()
+    return CompactHand.from_svg_names(
+        x.card for x in utils.query_hand_list(str(hand_id))
+    )
+
+
+def _encode_result(result: Any) -> Dict[str, Any]:
+    if isinstance(result, Response):
+        return {
+            "body": result.get_data(as_text=True),
+            "status": result.status_code,
+            "mimetype": result.mimetype,
+        }
+    if isinstance(result, tuple):
+        return {"value": result[0], "status": result[1]}
+    return {"value": result}
+
+
+def _decode_result(reply: Dict[str, Any]) -> Any:
+    if "body" in reply:
+        return Response(reply["body"], reply["status"], mimetype=reply["mimetype"])
+    if "status" in reply:
+        return reply["value"], reply["status"]
+    return reply["value"]
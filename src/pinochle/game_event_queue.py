@@ -0,0 +1,272 @@
+"""
+Write-behind of the game event log, for worker processes that serve their games
+alone.
+
+When every game is served by a single process, either because there's one worker
+or because the proxy in front of them routes requests by game, set
+GAME_EVENT_WRITE_BEHIND. Events are then queued once their action is committed,
+rather than written with it, and written in batches every GAME_EVENT_FLUSH_INTERVAL
+seconds by a background thread. Each batch includes a snapshot of the rounds it
+covers as a checkpoint, so the process keeps the state of each round with queued
+events, as a game_events.RoundState, to write it. Stopping the process normally
+writes what's left.
+
+The log may lose the events queued since the last batch when the process is killed,
+so nothing decides whether an action is allowed from it; the database tables of the
+game remain its record. Each action saves the query for the next seq and the insert
+of its events, while the first event of a round in the process replays its log.
+
+At most GAME_EVENT_QUEUE_ROUNDS rounds are kept, the least recently used being
+dropped first once their events are written.
+
+Otherwise, when any worker may serve any game, events are written with each action
+(see game_events.record).
+
+License: GPLv3
+"""
+import atexit
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from flask import Flask
+
+from . import custom_log, game_events
+from .models import unit_of_work, utils
+from .models.core import db
+from .models.game_event import GameEvent, RoundSnapshot
+from .models.GUID import guid_hex
+
+LOG = custom_log.get_logger(__name__)
+
+# Defaults, overridden from the application config by configure().
+DEFAULT_MAX_ROUNDS = 1024
+DEFAULT_FLUSH_INTERVAL = 1.0
+_settings: Dict[str, Any] = {
+    "write_behind": False,
+    "max_rounds": DEFAULT_MAX_ROUNDS,
+    "flush_interval": DEFAULT_FLUSH_INTERVAL,
+    "flusher_started": False,
+}
+
+_rounds: "OrderedDict[str, RoundQueue]" = OrderedDict()
+_rounds_lock = threading.Lock()
+
+
+class RoundQueue:
+    """
+    Events of one round waiting to be written, and the state they build up.
+
+    :arg str round_id:
+        ID of the round.
+    :arg RoundState state:
+        State of the round, from game_events.replay.
+    """
+
+    def __init__(self, round_id: str, state: game_events.RoundState):
+        self.round_id = str(round_id)
+        self.state = state
+        self.lock = threading.RLock()
+        # Events committed but not yet written, in the order of their seqs, and
+        # those being written.
+        self.pending: List[GameEvent] = []
+        self.writing: List[GameEvent] = []
+
+    def idle(self) -> bool:
+        """
+        Report whether every event of the round is written.
+
+        :return: Whether the round can be dropped.
+        :rtype: bool
+        """
+        return not self.pending and not self.writing
+
+
+def configure(
+    write_behind: bool,
+    max_rounds: int = DEFAULT_MAX_ROUNDS,
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+) -> None:
+    """
+    Set whether the event log is written behind the actions, and how many rounds
+    are kept.
+
+    :param write_behind: Whether every game is served by a single process.
+    :type write_behind: bool
+    :param max_rounds: Rounds kept at most.
+    :type max_rounds: int
+    :param flush_interval: Seconds between writes of the event log.
+    :type flush_interval: float
+    """
+    if max_rounds < 1:
+        raise ValueError("At least one round must be kept.")
+    _settings["write_behind"] = bool(write_behind)
+    _settings["max_rounds"] = int(max_rounds)
+    _settings["flush_interval"] = float(flush_interval)
+
+
+def init_app(app: Flask) -> None:
+    """
+    Write the queued events of the application in the background.
+
+    :param app: The application.
+    :type app: Flask
+    """
+    if not _settings["write_behind"] or _settings["flusher_started"]:
+        return
+    _settings["flusher_started"] = True
+
+    def _flush():
+        with app.app_context():
+            try:
+                flush()
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception("Writing the game event log failed.")
+
+    def _loop():
+        while _settings["write_behind"]:
+            time.sleep(_settings["flush_interval"])
+            _flush()
+
+    threading.Thread(target=_loop, name="game-event-flush", daemon=True).start()
+    atexit.register(_flush)
+
+
+def writes_behind() -> bool:
+    """
+    Report whether the event log is written behind the actions.
+
+    :return: Whether events are queued.
+    :rtype: bool
+    """
+    return _settings["write_behind"]
+
+
+def for_round(round_id: str) -> RoundQueue:
+    """
+    Retrieve the queue of a round, loading its state on first use.
+
+    :param round_id: ID of the round.
+    :type round_id: str
+    :return: The queue.
+    :rtype: RoundQueue
+    """
+    key = guid_hex(round_id)
+    with _rounds_lock:
+        queue = _rounds.get(key)
+        if queue is not None:
+            _rounds.move_to_end(key)
+            return queue
+
+    queue = RoundQueue(str(round_id), game_events.replay(round_id))
+    with _rounds_lock:
+        queue = _rounds.setdefault(key, queue)
+        _evict()
+    return queue
+
+
+def forget() -> None:
+    """
+    Drop the rounds whose events are all written.
+    """
+    with _rounds_lock:
+        for key in [x for x, y in _rounds.items() if y.idle()]:
+            del _rounds[key]
+
+
+def log_behind(round_id: str, kind: str, payload: Dict[str, Any]) -> GameEvent:
+    """
+    Queue an event to be written to the round's log once its action is committed.
+    Its seq is given when it's queued, so seqs follow the order of the commits.
+
+    :param round_id: ID of the round.
+    :type round_id: str
+    :param kind: Kind of the event.
+    :type kind: str
+    :param payload: Payload of the event.
+    :type payload: Dict[str, Any]
+    :return: The event, not yet added to the session.
+    :rtype: GameEvent
+    """
+    event = GameEvent(
+        game_id=utils.query_game_id_for_round(round_id),
+        round_id=str(round_id),
+        kind=kind,
+        payload=game_events.encode(payload),
+    )
+    unit_of_work.after_commit(functools.partial(_queue, str(round_id), event, payload))
+    return event
+
+
+def flush() -> int:
+    """
+    Write the queued events, with a snapshot of each round they belong to.
+
+    :return: Number of events written.
+    :rtype: int
+    """
+    with _rounds_lock:
+        queues = list(_rounds.values())
+    events: List[GameEvent] = []
+    snapshots: List[RoundSnapshot] = []
+    for queue in queues:
+        with queue.lock:
+            if not queue.pending:
+                continue
+            queue.writing, queue.pending = queue.pending, []
+            events += queue.writing
+            snapshots.append(
+                RoundSnapshot(
+                    round_id=queue.round_id,
+                    seq=queue.state.seq,
+                    state=queue.state.to_json(),
+                )
+            )
+    if not events:
+        return 0
+    try:
+        db.session.add_all(events + snapshots)
+        unit_of_work.commit()
+    except Exception:
+        # Queue the events again, to be written with the next batch.
+        db.session.rollback()
+        for queue in queues:
+            with queue.lock:
+                queue.pending[:0], queue.writing = queue.writing, []
+        raise
+    for queue in queues:
+        with queue.lock:
+            queue.writing = []
+    with _rounds_lock:
+        _evict()
+    return len(events)
+
+
+def _queue(round_id: str, event: GameEvent, payload: Dict[str, Any]) -> None:
+    # Run once the action is committed: failing here would skip the rest of its
+    # callbacks, such as its broadcasts, so errors are only logged.
+    try:
+        queue = for_round(round_id)
+        with queue.lock:
+            event.seq = queue.state.seq + 1
+            queue.state.apply(event.kind, payload)
+            queue.state.seq = event.seq
+            queue.pending.append(event)
+    except Exception:  # pylint: disable=broad-except
+        LOG.exception("Queueing a %s event of round %s failed.", event.kind, round_id)
+
+
+def _evict() -> None:
+    """
+    Drop the least recently used rounds whose events are all written, while there
+    are too many, keeping the one used last. Call with _rounds_lock held.
+    """
+    excess = len(_rounds) - _settings["max_rounds"]
+    for key in list(_rounds)[:-1]:
+        if excess <= 0:
+            break
+        if _rounds[key].idle():
+            del _rounds[key]
+            excess -= 1
@@ -0,0 +1,384 @@
+"""
+Append-only log of the actions taken in each round, and the replay engine that
+rebuilds a round's state from it.
+
+Each game action appends one ``game_event`` row in the same transaction as its
+other changes: the deal, each bid and pass, the trump, each player's meld, each
+card played and each trick won, and the cards the bid winner discards to their team's
+pile. Payloads are compact JSON, holding IDs as 32 hex
+digits and cards as their kind number (see ``cards.compact``):
+
+=======  =====================================================
+kind     payload
+=======  =====================================================
+deal     ``h``: cards dealt to each player, ``k``: kitty cards
+bid      ``p``: player, ``b``: bid
+pass     ``p``: player
+trump    ``t``: trump suit, e.g. "heart"
+discard  ``t``: the bid winner's team, ``c``: card discarded
+meld     ``p``: player, ``c``: cards shown, ``s``: meld score
+play     ``p``: player, ``c``: card
+trick    ``p``: player winning the trick, ``t``: their team
+=======  =====================================================
+
+Every SNAPSHOT_INTERVAL events the round's state is also saved, so ``replay`` only
+applies the events logged since the latest snapshot.
+
+When each game is served by a single worker process, events can instead be queued
+once their action is committed and written in batches (see ``game_event_queue``).
+
+License: GPLv3
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from .cards.compact import SVG_NAMES, svg_kind
+from .models import unit_of_work, utils
+from .models.core import db
+from .models.game_event import GameEvent, RoundSnapshot
+from .models.GUID import guid_hex
+
+DEAL = "deal"
+BID = "bid"
+PASS = "pass"
+TRUMP = "trump"
+DISCARD = "discard"
+MELD = "meld"
+PLAY = "play"
+TRICK = "trick"
+
+# Events between snapshots of a round's state, overridden from the application
+# config by configure().
+DEFAULT_SNAPSHOT_INTERVAL = 16
+_settings = {"snapshot_interval": DEFAULT_SNAPSHOT_INTERVAL}
+
+
+def configure(snapshot_interval: int) -> None:
+    """
+    Set how often a round's state is saved.
+
+    :param snapshot_interval: Events between snapshots.
+    :type snapshot_interval: int
+    """
+    if snapshot_interval < 1:
+        raise ValueError("The snapshot interval must be at least 1.")
+    _settings["snapshot_interval"] = int(snapshot_interval)
+
+
+def snapshot_interval() -> int:
+    """
+    Report how often a round's state is saved.
+
+    :return: Events between snapshots.
+    :rtype: int
+    """
+    return _settings["snapshot_interval"]
+
+
+class RoundState:
+    """
+    State of a round rebuilt from its events. Players and teams are identified by
+    32 hex digits, cards by their SVG names.
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.players: List[str] = []
+        self.hands: Dict[str, List[str]] = {}
+        self.kitty: List[str] = []
+        self.bid = 0
+        self.bid_winner: Optional[str] = None
+        self.passed: List[str] = []
+        self.trump: Optional[str] = None
+        self.meld: Dict[str, int] = {}
+        self.trick: List[List[str]] = []
+        self.tricks_won: Dict[str, int] = {}
+        self.team_cards: Dict[str, List[str]] = {}
+
+    def apply(self, kind: str, payload: Dict[str, Any]) -> None:
+        """
+        Apply an event to the state.
+
+        :param kind: Kind of the event.
+        :type kind: str
+        :param payload: Decoded payload of the event.
+        :type payload: Dict[str, Any]
+        :raises ValueError: If the kind of event is unknown.
+        """
+        try:
+            handler = getattr(self, f"_apply_{kind}")
+        except AttributeError:
+            raise ValueError(f"Unknown event kind: {kind}") from None
+        handler(payload)
+
+    def _apply_deal(self, payload: Dict[str, Any]) -> None:
+        seq = self.seq
+        self.__init__()  # pylint: disable=unnecessary-dunder-call
+        self.seq = seq
+        self.players = list(payload["h"])
+        self.hands = {p: _card_names(c) for p, c in payload["h"].items()}
+        self.kitty = _card_names(payload["k"])
+
+    def _apply_bid(self, payload: Dict[str, Any]) -> None:
+        self.bid = payload["b"]
+        self.bid_winner = payload["p"]
+
+    def _apply_pass(self, payload: Dict[str, Any]) -> None:
+        self.passed.append(payload["p"])
+        bidding = [x for x in self.players if x not in self.passed]
+        if len(bidding) == 1:
+            # The last player bidding wins the bid, and a copy of the kitty.
+            self.bid_winner = bidding[0]
+            self.hands[self.bid_winner] += self.kitty
+
+    def _apply_trump(self, payload: Dict[str, Any]) -> None:
+        self.trump = payload["t"]
+
+    def _apply_discard(self, payload: Dict[str, Any]) -> None:
+        card = SVG_NAMES[payload["c"]]
+        hand = self.hands.get(self.bid_winner, [])
+        if card in hand:
+            hand.remove(card)
+        self.team_cards.setdefault(payload["t"], []).append(card)
+
+    def _apply_meld(self, payload: Dict[str, Any]) -> None:
+        self.meld[payload["p"]] = payload["s"]
+
+    def _apply_play(self, payload: Dict[str, Any]) -> None:
+        card = SVG_NAMES[payload["c"]]
+        hand = self.hands.setdefault(payload["p"], [])
+        if card in hand:
+            hand.remove(card)
+        self.trick.append([payload["p"], card])
+
+    def _apply_trick(self, payload: Dict[str, Any]) -> None:
+        cards = self.team_cards.setdefault(payload["t"], [])
+        cards += [card for __, card in self.trick]
+        self.tricks_won[payload["p"]] = self.tricks_won.get(payload["p"], 0) + 1
+        self.trick = []
+
+    def to_json(self) -> str:
+        """
+        Encode the state for a snapshot.
+
+        :return: Compact JSON.
+        :rtype: str
+        """
+        return encode(self.__dict__)
+
+    @classmethod
+    def from_json(cls, text: str) -> "RoundState":
+        """
+        Decode the state from a snapshot.
+
+        :param text: JSON from to_json.
+        :type text: str
+        :return: The state.
+        :rtype: RoundState
+        """
+        state = cls()
+        state.__dict__.update(json.loads(text))
+        return state
+
+
+def deal(round_id: str, hands: Dict[str, List[str]], kitty: List[str]) -> None:
+    """
+    Log the cards dealt to each player and the kitty.
+
+    :param round_id: ID of the round.
+    :type round_id: str
+    :param hands: Cards dealt to each player, by player ID.
+    :type hands: Dict[str, List[str]]
+    :param kitty: Cards dealt to the kitty.
+    :type kitty: List[str]
+    """
+    record(
+        round_id,
+        DEAL,
+        {
+            "h": {guid_hex(p): _card_kinds(c) for p, c in hands.items()},
+            "k": _card_kinds(kitty),
+        },
+    )
+
+
+def bid(round_id: str, player_id: str, amount: int) -> None:
+    """
+    Log a player's bid.
+    """
+    record(round_id, BID, {"p": guid_hex(player_id), "b": amount})
+
+
+def passed(round_id: str, player_id: str) -> None:
+    """
+    Log a player passing on the bid.
+    """
+    record(round_id, PASS, {"p": guid_hex(player_id)})
+
+
+def trump(round_id: str, suit: str) -> None:
+    """
+    Log the trump suit declared by the bid winner.
+    """
+    record(round_id, TRUMP, {"t": suit})
+
+
+def discard(round_id: str, team_id: str, card: str) -> None:
+    """
+    Log a card the bid winner discards to their team's pile.
+    """
+    record(round_id, DISCARD, {"t": guid_hex(team_id), "c": svg_kind(card)})
+
+
+def meld(round_id: str, player_id: str, cards: List[str], score: int) -> None:
+    """
+    Log the cards a player showed for meld, and their score.
+    """
+    record(
+        round_id,
+        MELD,
+        {"p": guid_hex(player_id), "c": _card_kinds(cards), "s": score},
+    )
+
+
+def play(round_id: str, player_id: str, card: str) -> None:
+    """
+    Log a card played to the current trick.
+    """
+    record(round_id, PLAY, {"p": guid_hex(player_id), "c": svg_kind(card)})
+
+
+def trick_won(round_id: str, player_id: str, team_id: str) -> None:
+    """
+    Log the player, and team, winning the current trick.
+    """
+    record(round_id, TRICK, {"p": guid_hex(player_id), "t": guid_hex(team_id)})
+
+
+def record(round_id: str, kind: str, payload: Dict[str, Any]) -> GameEvent:
+    """
+    Append an event to a round's log, saving a snapshot of the round's state when
+    one is due. Changes are committed as the helpers in the rest of the
+    application do, so with the action's transaction when there is one. With
+    GAME_EVENT_WRITE_BEHIND, the event is queued to be written behind the action
+    instead (see game_event_queue).
+
+    An event logged concurrently with the same seq raises StaleDataError, like any
+    other conflict between actions.
+
+    :param round_id: ID of the round.
+    :type round_id: str
+    :param kind: Kind of the event.
+    :type kind: str
+    :param payload: Payload of the event.
+    :type payload: Dict[str, Any]
+    :return: The event.
+    :rtype: GameEvent
+    """
+    # pylint: disable=import-outside-toplevel
+    from . import game_event_queue
+
+    if game_event_queue.writes_behind():
+        return game_event_queue.log_behind(round_id, kind, payload)
+
+    seq = utils.query_last_event_seq(round_id) + 1
+    event = GameEvent(
+        game_id=utils.query_game_id_for_round(round_id),
+        round_id=str(round_id),
+        seq=seq,
+        kind=kind,
+        payload=encode(payload),
+    )
+    db.session.add(event)
+    try:
+        # Insert it now, so that a concurrent action having taken the same seq
+        # conflicts here and is run again by unit_of_work.transactional.
+        db.session.flush()
+    except IntegrityError as err:
+        raise StaleDataError(
+            f"Event {seq} of round {round_id} was logged concurrently."
+        ) from err
+    if seq % _settings["snapshot_interval"] == 0:
+        state = replay(round_id)
+        db.session.add(
+            RoundSnapshot(round_id=str(round_id), seq=state.seq, state=state.to_json())
+        )
+    unit_of_work.commit()
+    return event
+
+
+def replay(round_id: str, from_snapshot: bool = True) -> RoundState:
+    """
+    Rebuild the state of a round from its latest snapshot and the events logged
+    since, or from all of its events.
+
+    :param round_id: ID of the round.
+    :type round_id: str
+    :param from_snapshot: Whether to start from the latest snapshot.
+    :type from_snapshot: bool
+    :return: The state.
+    :rtype: RoundState
+    """
+    snapshot = utils.query_round_snapshot(round_id) if from_snapshot else None
+    state = RoundState.from_json(snapshot.state) if snapshot else RoundState()
+    for event in utils.query_round_events(round_id, state.seq):
+        state.apply(event.kind, decode(event.payload))
+        state.seq = event.seq
+    return state
+
+
+def read(game_id: str) -> List[Dict[str, Any]]:
+    """
+    Read the events of every round of a game, in the order they were logged, with
+    cards given by their SVG names. For auditing and analysis.
+
+    :param game_id: ID of the game.
+    :type game_id: str
+    :return: Each event's round ID, seq, kind, time and payload.
+    :rtype: List[Dict[str, Any]]
+    """
+    events = []
+    for event in utils.query_game_events(game_id):
+        payload = decode(event.payload)
+        if event.kind == DEAL:
+            payload["h"] = {p: _card_names(c) for p, c in payload["h"].items()}
+            payload["k"] = _card_names(payload["k"])
+        elif event.kind == MELD:
+            payload["c"] = _card_names(payload["c"])
+        elif event.kind in (PLAY, DISCARD):
+            payload["c"] = SVG_NAMES[payload["c"]]
+        events.append(
+            {
+                "round_id": str(event.round_id),
+                "seq": event.seq,
+                "kind": event.kind,
+                "timestamp": event.timestamp,
+                "payload": payload,
+            }
+        )
+    return events
+
+
+def encode(value: Any) -> str:
+    """
+    Encode an event's payload, or a round's state, as compact JSON.
+    """
+    return json.dumps(value, separators=(",", ":"))
+
+
+def decode(text: str) -> Any:
+    """
+    Decode an event's payload, or a round's state.
+    """
+    return json.loads(text)
+
+
+def _card_kinds(cards: List[str]) -> List[int]:
+    return [svg_kind(card) for card in cards]
+
+
+def _card_names(kinds: List[int]) -> List[str]:
+    return [SVG_NAMES[kind] for kind in kinds]
@@ -0,0 +1,209 @@
+"""
+Build a complete picture of a game in a single message for (re)connecting clients.
+
+The snapshot replaces the series of separate team score, bid, reveal and trump
+messages previously sent when a player refreshed the page. It is gathered with a
+handful of joined queries rather than one lookup per team and player.
+
+License: GPLv3
+"""
+from typing import Dict, List, Optional
+
+from .models import utils
+from .models.core import db
+from .models.game import Game
+from .models.gameround import GameRound
+from .models.player import Player
+from .models.round_ import Round
+from .models.roundteam import RoundTeam
+from .models.team import Team
+from .models.teamplayers import TeamPlayers
+from .models.trick import Trick
+
+# Also contained in play_pinochle.py and cardtable.py.
+MODES = ["game", "bid", "bidfinal", "reveal", "meld", "trick"]
+
+
+class GameSnapshot:
+    """
+    State of a game and its active round as seen by every player at the table.
+
+    :arg str game_id:
+        Game to describe.
+    """
+
+    def __init__(self, game_id: str):
+        self.game_id = str(game_id)
+        self.state = 0
+        self.round: Dict = {}
+        self.teams: List[Dict] = []
+        self.players: List[Dict] = []
+        self.player_order: List[str] = []
+        self.kitty_count = 0
+        self.trick: Optional[Dict] = None
+        self._round_player_ids: List[str] = []
+        self.found = self._load()
+
+    @property
+    def mode(self) -> str:
+        """Name of the game mode."""
+        return MODES[self.state]
+
+    def to_message(self, seq: int = 0, epoch: str = "") -> Dict:
+        """
+        Express the snapshot as a websocket message.
+
+        :param seq: Sequence number of the last broadcast reflected in the snapshot.
+        :type seq: int
+        :param epoch: Identifier of the broadcast stream the sequence belongs to.
+        :type epoch: str
+        :return: Message ready to be encoded and sent.
+        :rtype: Dict
+        """
+        return {
+            "action": "game_snapshot",
+            "game_id": self.game_id,
+            "epoch": epoch,
+            "seq": seq,
+            "state": self.state,
+            "mode": self.mode,
+            "round": self.round,
+            "teams": self.teams,
+            "players": self.players,
+            "player_order": self.player_order,
+            "kitty_count": self.kitty_count,
+            "trick": self.trick,
+        }
+
+    def _load(self) -> bool:
+        game_round = (
+            db.session.query(Game, Round)
+            .join(GameRound, GameRound.game_id == Game.game_id)
+            .join(Round, Round.round_id == GameRound.round_id)
+            .filter(Game.game_id == self.game_id, GameRound.active_flag.is_(True))
+            .one_or_none()
+        )
+        if game_round is None:
+            return False
+        a_game, a_round = game_round
+        round_id = str(a_round.round_id)
+        self.state = a_game.state
+
+        roster = (
+            db.session.query(
+                RoundTeam.team_id,
+                Team.name,
+                Team.score,
+                TeamPlayers.player_id,
+                Player.name.label("player_name"),
+                Player.hand_id,
+                Player.bidding,
+                Player.meld_score,
+            )
+            .join(Team, Team.team_id == RoundTeam.team_id)
+            .outerjoin(TeamPlayers, TeamPlayers.team_id == RoundTeam.team_id)
+            .outerjoin(Player, Player.player_id == TeamPlayers.player_id)
+            .filter(RoundTeam.round_id == round_id)
+            .order_by(RoundTeam.team_order, TeamPlayers.player_order)
+            .all()
+        )
+
+        trick = (
+            Trick.query.filter(Trick.round_id == round_id)
+            .order_by(Trick._id.desc())  # pylint: disable=protected-access
+            .first()
+        )
+
+        hand_ids = [str(row.hand_id) for row in roster if row.hand_id is not None]
+        hand_ids.append(str(a_round.hand_id))
+        counts = utils.query_hand_counts(hand_ids)
+        self.kitty_count = counts.get(str(a_round.hand_id), 0)
+
+        teams: Dict[str, Dict] = {}
+        team_players: List[List[str]] = []
+        for row in roster:
+            team_id = str(row.team_id)
+            if team_id not in teams:
+                teams[team_id] = {
+                    "team_id": team_id,
+                    "name": row.name,
+                    "score": row.score,
+                    "player_ids": [],
+                }
+                team_players.append(teams[team_id]["player_ids"])
+            if row.player_id is None:
+                continue
+            player_id = str(row.player_id)
+            teams[team_id]["player_ids"].append(player_id)
+            self.players.append(
+                {
+                    "player_id": player_id,
+                    "name": row.player_name,
+                    "team_id": team_id,
+                    "bidding": bool(row.bidding),
+                    "meld_score": row.meld_score,
+                    "hand_count": counts.get(str(row.hand_id), 0),
+                }
+            )
+        self.teams = list(teams.values())
+
+        # Alternate players by team, as roundteams.create_ordered_player_list does.
+        flat = [player_id for players in team_players for player_id in players]
+        self.player_order = flat[::2] + flat[1::2]
+        self._round_player_ids = flat
+
+        self.round = {
+            "round_id": round_id,
+            "round_seq": a_round.round_seq,
+            "bid": a_round.bid,
+            "bid_winner": str(a_round.bid_winner) if a_round.bid_winner else None,
+            "trump": a_round.trump,
+            "bidder": self._next_bidder(a_round),
+        }
+
+        if trick is not None:
+            self.trick = self._describe_trick(trick)
+        return True
+
+    def _next_bidder(self, a_round: Round) -> Optional[str]:
+        """
+        Determine the player being prompted to bid, if bidding is under way.
+        """
+        if self.mode != "bid" or not self.player_order:
+            return None
+        still_bidding = {x["player_id"] for x in self.players if x["bidding"]}
+        if not still_bidding:
+            return None
+        order = self.player_order
+        if a_round.bid_winner is not None and str(a_round.bid_winner) in order:
+            # Everyone between the last bidder and the next one has passed.
+            start = order.index(str(a_round.bid_winner)) + 1
+        else:
+            # Nobody has bid yet, so bidding starts where play_pinochle.start began.
+            start = a_round.round_seq
+        for offset in range(len(order)):
+            candidate = order[(start + offset) % len(order)]
+            if candidate in still_bidding:
+                return candidate
+        return None
+
+    def _describe_trick(self, trick: Trick) -> Dict:
+        """
+        Describe the trick in progress and the cards played to it so far.
+        """
+        starter = str(trick.trick_starter) if trick.trick_starter else None
+        # Cards are stored in the order play_pinochle.reorder_players gives.
+        order = self._round_player_ids
+        if starter in order:
+            index = order.index(starter)
+            order = order[index:] + order[:index]
+        cards = []
+        for a_hand in utils.query_hand_list(str(trick.hand_id)):
+            player_id = order[a_hand.seq] if 0 <= a_hand.seq < len(order) else None
+            cards.append({"player_id": player_id, "card": a_hand.card})
+        return {
+            "trick_id": str(trick.trick_id),
+            "trick_starter": starter,
+            "trick_winner": str(trick.trick_winner) if trick.trick_winner else None,
+            "cards": cards,
+        }
@@ -4,7 +4,7 @@ This is the roundplayer module and supports all the REST actions roundplayer dat
 
 from flask import abort, make_response
 
-from .models import utils
+from .models import unit_of_work, utils
 from .models.core import db
 from .models.gameround import GameRoundSchema
 
@@ -104,7 +104,8 @@ def create(game_id: str, round_id: dict):
 
     # Add the round to the database
     db.session.add(new_gameround)
-    db.session.commit()
+    unit_of_work.commit()
+    unit_of_work.invalidate_cached("round_game", r_id)
 
     # Serialize and return the newly created round in the response
     data = schema.dump(new_gameround)
@@ -151,7 +152,7 @@ def _update_data(game_id: str, round_id: str, data: dict):
 
     # Add the updated data to the transaction.
     db_session.add(local_object)
-    db_session.commit()
+    unit_of_work.commit()
 
     # return updated round in the response
     schema = GameRoundSchema()
@@ -175,7 +176,8 @@ def delete(game_id: str, round_id: str):
         db_session = db.session()
         local_object = db_session.merge(a_round)
         db_session.delete(local_object)
-        db_session.commit()
+        unit_of_work.commit()
+        unit_of_work.invalidate_cached("round_game", round_id)
         return make_response(f"round {game_id} deleted", 200)
 
     # Otherwise, nope, didn't find that round
@@ -2,17 +2,23 @@
 This is the hand module and supports common database queries for cards in a hand.
 """
 
-from typing import List
+from typing import Callable, Dict, List, Optional
 
 from flask import abort, make_response
+from sqlalchemy.orm.exc import StaleDataError
 
-from .models import utils
+from .exceptions import InvalidValueError
+from .models import packed_hand, unit_of_work, utils
 from .models.core import db
 from .models.hand import Hand, HandSchema
+from .models.packed_hand import PackedHand
 
 # Suppress invalid no-member messages from pylint.
 # pylint: disable=no-member
 
+# Attempts at updating a packed hand changed concurrently by someone else.
+PACKED_UPDATE_ATTEMPTS = 3
+
 
 def read_all():
     """
@@ -22,7 +28,14 @@ def read_all():
     :return:        json string of list of game rounds
     """
     # Create the list of game-rounds from our data
-    hands = Hand.query.all()
+    if utils.packed_hands():
+        hands = [
+            card
+            for a_hand in PackedHand.query.all()
+            for card in packed_hand.expand(a_hand.hand_id, a_hand.cards)
+        ]
+    else:
+        hands = Hand.query.all()
 
     # Serialize the data for the response
     hand_schema = HandSchema(many=True)
@@ -65,6 +78,12 @@ def addcard(hand_id: str, card: str, seq: int = -1):
     :return:           None.
     """
     if hand_id is not None and card is not None:
+        if utils.packed_hands():
+            _update_packed(
+                hand_id, lambda cards: packed_hand.insert_card(cards, card, seq)
+            )
+            return make_response(f"Card {card} added to requested hand", 201)
+
         # Create a hand instance using the schema and the passed in card
         schema = HandSchema()
         new_card = schema.load(
@@ -73,7 +92,7 @@ def addcard(hand_id: str, card: str, seq: int = -1):
 
         # Add the round to the database
         db.session.add(new_card)
-        db.session.commit()
+        unit_of_work.commit()
         return make_response(f"Card {card} added to requested hand", 201)
 
     # Otherwise, nope, didn't find that player
@@ -90,6 +109,10 @@ def addcards(hand_id: str, cards: List[str]):
     :return:           None.
     """
     if hand_id is not None and cards is not None:
+        if utils.packed_hands():
+            addcards_bulk({hand_id: cards})
+            return make_response(f"Card {cards} added to player's hand", 201)
+
         # Create a hand instance using the schema and the passed in card
         schema = HandSchema(many=False)
         for item in cards:
@@ -99,13 +122,40 @@ def addcards(hand_id: str, cards: List[str]):
 
             # Add the round to the database
             db.session.add(new_card)
-        db.session.commit()
+        unit_of_work.commit()
         return make_response(f"Card {cards} added to player's hand", 201)
 
     # Otherwise, nope, didn't find that player
     abort(404, f"Could not add cards to: {hand_id}")
 
 
+def addcards_bulk(hands: Dict[str, List[str]]):
+    """
+    This function adds cards to several hands at once, as when dealing, with a
+    single multi-row insert and a single commit.
+
+    :param hands:      Cards to add, keyed by the ID of the hand receiving them.
+    :return:           None.
+    """
+    if utils.packed_hands():
+        for hand_id, cards in hands.items():
+            new_cards = _encode([(card, -1) for card in cards])
+            _update_packed(
+                hand_id, lambda packed, new_cards=new_cards: packed + new_cards, False
+            )
+        unit_of_work.commit()
+        return
+
+    rows = [
+        {"hand_id": hand_id, "card": card, "seq": -1}
+        for hand_id, cards in hands.items()
+        for card in cards
+    ]
+    if rows:
+        db.session.execute(Hand.__table__.insert(), rows)
+    unit_of_work.commit()
+
+
 def deletecard(hand_id: str, card: str):
     """
     This function responds to API requests database access
@@ -116,6 +166,13 @@ def deletecard(hand_id: str, card: str):
     :return:           None.
     """
     if hand_id is not None and card is not None:
+        if utils.packed_hands():
+            if _update_packed(
+                hand_id, lambda cards: packed_hand.remove_card(cards, card)[0]
+            ):
+                return make_response(f"Player's card {card} deleted", 200)
+            abort(404, f"Hand/card not found for: {hand_id}/{card}")
+
         # Create a hand instance using the schema and the passed in card
         a_card = utils.query_hand_card(hand_id=hand_id, card=card)
 
@@ -124,7 +181,7 @@ def deletecard(hand_id: str, card: str):
             db_session = db.session()
             local_object = db_session.merge(a_card)
             db_session.delete(local_object)
-            db_session.commit()
+            unit_of_work.commit()
             return make_response(f"Player's card {card} deleted", 200)
 
     # Otherwise, nope, didn't find that player
@@ -141,6 +198,11 @@ def deleteallcards(hand_id: str):
     """
     # Create a hand instance using the schema and the passed in card
     if hand_id is not None:
+        if utils.packed_hands():
+            PackedHand.query.filter(PackedHand.hand_id == str(hand_id)).delete()
+            unit_of_work.commit()
+            return make_response("All cards deleted", 200)
+
         a_card = utils.query_hand_list(hand_id)
 
         db_session = db.session()
@@ -149,8 +211,107 @@ def deleteallcards(hand_id: str):
                 # Delete the cards from the database
                 local_object = db_session.merge(item)
                 db_session.delete(local_object)
-            db_session.commit()
+            unit_of_work.commit()
             return make_response("All cards deleted", 200)
 
     # Otherwise, nope, didn't find that player
     abort(404, f"Error occurred deleting cards for: {hand_id}")
+
+
+def movecard(from_hand_id: str, to_hand_id: str, card: str, seq: int = -1) -> bool:
+    """
+    Move a card from one hand to another, as when a card is played to a trick.
+    With row storage this is an update of the card's row; with packed storage, an
+    update of each hand's row.
+
+    :param from_hand_id: Id of the hand holding the card.
+    :param to_hand_id:   Id of the hand to receive the card.
+    :param card:         String of the card to move.
+    :param seq:          Sequence of the card in the receiving hand.
+    :return:             Whether the card was found and moved.
+    """
+    if utils.packed_hands():
+        # Within a transaction the caller's changes can't be redone here; the
+        # whole action is retried instead.
+        attempts = 1 if unit_of_work.active() else PACKED_UPDATE_ATTEMPTS
+        for attempt in range(attempts):
+            try:
+                if not _update_packed(
+                    from_hand_id,
+                    lambda cards: packed_hand.remove_card(cards, card)[0],
+                    commit=False,
+                ):
+                    return False
+                _update_packed(
+                    to_hand_id,
+                    lambda cards: packed_hand.insert_card(cards, card, seq),
+                    commit=False,
+                )
+                unit_of_work.commit()
+                return True
+            except StaleDataError:
+                db.session.rollback()
+                if attempt + 1 == attempts:
+                    raise
+
+    a_card = utils.query_hand_card(hand_id=from_hand_id, card=card)
+    if a_card is None:
+        return False
+    a_card.hand_id = to_hand_id
+    a_card.seq = seq
+    unit_of_work.commit()
+    return True
+
+
+def _encode(cards: List) -> bytes:
+    """
+    Pack cards, rejecting the request when a card isn't a Pinochle card.
+    """
+    try:
+        return packed_hand.encode_cards(cards)
+    except (InvalidValueError, ValueError) as err:
+        abort(409, f"Cards could not be stored: {err}")
+    return b""  # pragma: no cover
+
+
+def _update_packed(
+    hand_id: str, change: Callable[[bytes], bytes], commit: bool = True
+) -> Optional[bool]:
+    """
+    Apply a change to the packed cards of a hand, creating the hand's row if needed
+    and deleting it once empty. When committing, the change is retried if someone
+    else updated the hand first; otherwise retrying is left to the caller, as the
+    rollback discards the caller's other changes too. During a transaction the
+    change is only flushed.
+
+    :param hand_id: Id of the hand to change.
+    :param change:  Function computing the new packed cards from the current ones.
+    :param commit:  Whether to commit the change, or only flush it.
+    :return:        Whether the cards changed.
+    """
+    for attempt in range(PACKED_UPDATE_ATTEMPTS):
+        a_hand = utils.query_packed_hand(hand_id)
+        current = a_hand.cards if a_hand is not None else b""
+        try:
+            updated = change(current)
+        except (InvalidValueError, ValueError) as err:
+            abort(409, f"Cards could not be stored: {err}")
+        if updated == current:
+            return False
+        if a_hand is None:
+            db.session.add(PackedHand(hand_id=str(hand_id), cards=updated))
+        elif updated:
+            a_hand.cards = updated
+        else:
+            db.session.delete(a_hand)
+        if not commit or unit_of_work.active():
+            db.session.flush()
+            return True
+        try:
+            db.session.commit()
+            return True
+        except StaleDataError:
+            db.session.rollback()
+            if attempt + 1 == PACKED_UPDATE_ATTEMPTS:
+                raise
+    return None  # pragma: no cover
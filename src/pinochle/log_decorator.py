@@ -3,9 +3,10 @@ Definition of a decorator that logs function entry/exit with parameters and
 return values.
 """
 import functools
+import inspect
+import logging
 import os
 import sys
-from inspect import getframeinfo, stack
 from typing import Any
 
 from . import custom_log
@@ -14,63 +15,68 @@ from . import custom_log
 # Modified for my own preferences.
 
 
+class _Arguments:
+    """
+    Arguments of a call, formatted only if a log record is actually emitted.
+    """
+
+    __slots__ = ("args", "kwargs")
+
+    def __init__(self, args: tuple, kwargs: dict):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        # Using repr() for string representation for each argument. repr() is
+        # similar to str() only difference being it prints with a pair of quotes
+        # and if we calculate a value we get more precise value than str().
+        # The f-string formats each keyword argument as key=value, where the !r
+        # specifier means that repr() is used to represent the value.
+        formatted_args = ", ".join(repr(a) for a in self.args)
+        formatted_kwargs = ", ".join(f"{k}={v!r}" for k, v in self.kwargs.items())
+        return f"{formatted_args}, {formatted_kwargs}"
+
+
 def log_decorator(_func=None) -> Any:  # pragma: no cover
     """The log decorator is used when a log entry is desired upon function
     entry or exit. The decorator emits the argument list and return values along
-    with the begin/end message."""
+    with the begin/end message. Unless the function's module logs at INFO, the
+    function is called directly, without looking at its caller or its arguments."""
 
     def log_decorator_info(func) -> object:
+        # Build logger object
+        logger_obj = custom_log.get_logger(func.__module__)
+        # The instance of a method, which may not be set up yet, isn't logged.
+        skip = int(next(iter(inspect.signature(func).parameters), "") == "self")
+
         @functools.wraps(func)
-        def log_decorator_wrapper(self=None, *args, **kwargs) -> Any:
-            # Build logger object
-            logger_obj = custom_log.get_logger()
-
-            # Create a list of the positional arguments passed to function.
-            # - Using repr() for string representation for each argument. repr() is
-            #   similar to str() only difference being it prints with a pair of quotes
-            #   and if we calculate a value we get more precise value than str().
-            args_passed_in_function = [repr(a) for a in args]
-
-            # Create a list of the keyword arguments. The f-string formats each
-            # argument as key=value, where the !r specifier means that repr() is used
-            # to represent the value.
-            kwargs_passed_in_function = [f"{k}={v!r}" for k, v in kwargs.items()]
-
-            # The lists of positional and keyword arguments is joined together to form
-            # the final string
-            formatted_args = ", ".join(args_passed_in_function)
-            formatted_kwargs = ", ".join(kwargs_passed_in_function)
-            formatted_arguments = f"{formatted_args}, {formatted_kwargs}"
+        def log_decorator_wrapper(*args, **kwargs) -> Any:
+            if not logger_obj.isEnabledFor(logging.INFO):
+                return func(*args, **kwargs)
 
             # Generate file name and function name for calling function. __func.name__
             # will give the name of the caller function ie. wrapper_log_info and caller
             # file name ie log-decorator.py
             # - In order to get actual function and file name we will use 'extra'
             #   parameter.
-            # - To get the file name we are using in-built module inspect.getframeinfo
-            #   which returns calling file name
-            py_file_caller = getframeinfo(stack()[1][0])
+            # - The calling file name is that of the frame calling this wrapper.
+            # pylint: disable=protected-access
+            py_file_caller = sys._getframe(1).f_code.co_filename
             extra_args = {
                 "func_name_override": func.__name__,
-                "file_name_override": os.path.basename(py_file_caller.filename),
+                "file_name_override": os.path.basename(py_file_caller),
             }
 
             # Before to the function execution, log function details.
             logger_obj.info(
-                "Begin function: Arguments: %r",formatted_arguments , extra=extra_args
+                "Begin function: Arguments: %s",
+                _Arguments(args[skip:], kwargs),
+                extra=extra_args,
             )
             try:
-                # log return value from the function
-                value = func(self, *args, **kwargs)
-                logger_obj.info(
-                    "End function  : Returned: %r",value, extra=extra_args
-                )
-            except TypeError:
                 # log return value from the function
                 value = func(*args, **kwargs)
-                logger_obj.info(
-                    "End function  : Returned: %r",value, extra=extra_args
-                )
+                logger_obj.info("End function  : Returned: %r", value, extra=extra_args)
             except Exception:
                 # log exception if occurs in function
                 logger_obj.error("Exception     : %s", str(sys.exc_info()[1]))
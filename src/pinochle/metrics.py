@@ -0,0 +1,491 @@
+"""
+Counters and latency histograms for monitoring, served by the /metrics endpoint in
+the Prometheus text format.
+
+Each worker process keeps its own registry, updated under one short lock, with:
+
+- requests and their latency, by the connexion operationId (or view function) that
+  handled them,
+- database queries and their duration, by kind of statement,
+- websocket messages sent, failed and dropped, and the time taken to fan each
+  broadcast out to the clients attached to the worker,
+- use of the request and metadata caches,
+- gauges sampled when the metrics are gathered, such as the clients connected to
+  each game and the messages queued for them.
+
+With several worker processes, set METRICS_DIR to a directory shared by them. Each
+worker then writes its metrics there every METRICS_FLUSH_INTERVAL seconds, from when
+it's configured or first handles a request or broadcast, and whichever worker
+answers /metrics adds them all up. Gauges are only counted for workers that are
+still running; the counters of workers that have stopped are moved into
+metrics-retired.json and their files deleted. Games and active rounds by state are
+read from the database when the metrics are served.
+
+License: GPLv3
+"""
+import bisect
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .models import metadata_cache, request_cache, utils
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Labels = Tuple[Tuple[str, str], ...]
+# (kind, name, labels, value), where kind is "counter" or "gauge".
+Sample = Tuple[str, str, Labels, float]
+
+PREFIX = "pinochle_"
+HELP = {
+    "http_requests_total": "Requests handled, by operation, method and status.",
+    "http_request_duration_seconds": "Time taken to handle requests, by operation.",
+    "db_queries_total": "Database statements executed, by kind.",
+    "db_query_duration_seconds": "Time taken by database statements, by kind.",
+    "ws_messages_total": "Websocket messages, by outcome.",
+    "ws_fanout_duration_seconds": "Time taken to queue a broadcast for its clients.",
+    "ws_clients": "Websocket clients connected, by game.",
+    "ws_queue_depth": "Websocket messages waiting to be sent, by game.",
+    "request_cache_hits_total": "Lookups answered from the request cache.",
+    "request_cache_misses_total": "Lookups made by the request cache.",
+    "metadata_cache_hits_total": "Lookups answered from the metadata cache.",
+    "metadata_cache_misses_total": "Lookups made by the metadata cache.",
+    "metadata_cache_evictions_total": "Entries evicted from the metadata cache.",
+    "metadata_cache_size": "Entries in the metadata cache.",
+    "games": "Games, by state.",
+    "active_rounds": "Active rounds, by the state of their game.",
+}
+
+
+class Registry:
+    """
+    Counters and histograms of one worker process.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        # Count of observations in each bucket, then one for larger values, then
+        # the sum and the count of all the observations.
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1) -> None:
+        """
+        Add to a counter.
+
+        :param name: Name of the counter.
+        :type name: str
+        :param labels: Label names and values.
+        :type labels: Labels
+        :param amount: Amount to add.
+        :type amount: float
+        """
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        """
+        Record an observation in a histogram.
+
+        :param name: Name of the histogram.
+        :type name: str
+        :param value: The observation, in seconds.
+        :type value: float
+        :param labels: Label names and values.
+        :type labels: Labels
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        key = (name, labels)
+        with self._lock:
+            counts = self.histograms.get(key)
+            if counts is None:
+                counts = self.histograms[key] = [0] * (len(self.buckets) + 3)
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Copy the counters and histograms, in a form that can be saved as JSON.
+
+        :return: The counters and histograms.
+        :rtype: Dict[str, Any]
+        """
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "counters": [[n, l, v] for (n, l), v in self.counters.items()],
+                "histograms": [
+                    [n, l, list(c)] for (n, l), c in self.histograms.items()
+                ],
+            }
+
+    def clear(self) -> None:
+        """
+        Forget every counter and histogram.
+        """
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+REGISTRY = Registry()
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+_settings: Dict[str, Any] = {
+    "directory": None,
+    "interval": 5.0,
+    "writer_pid": None,
+    "writer": None,
+}
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]) -> None:
+    """
+    Add a function giving samples of this worker's state whenever the metrics are
+    gathered.
+
+    :param collector: Returns (kind, name, labels, value) for each sample.
+    :type collector: Callable[[], Iterable[Sample]]
+    """
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def configure(directory: Optional[str], interval: float = 5.0) -> None:
+    """
+    Set where worker processes share their metrics.
+
+    :param directory: Directory shared by the worker processes, or None for one.
+    :type directory: Optional[str]
+    :param interval: Seconds between each worker writing its metrics.
+    :type interval: float
+    """
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _settings["directory"] = directory or None
+    _settings["interval"] = float(interval)
+    _settings["writer_pid"] = None
+    start_writer()
+
+
+def init_app(app: Flask) -> None:
+    """
+    Time each request handled by the application, and each database statement.
+
+    :param app: The application.
+    :type app: Flask
+    """
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    if not event.contains(Engine, "before_cursor_execute", _start_query):
+        event.listen(Engine, "before_cursor_execute", _start_query)
+        event.listen(Engine, "after_cursor_execute", _finish_query)
+
+
+def render() -> str:
+    """
+    Gather the metrics of every worker process, and the games and active rounds by
+    state, in the Prometheus text format.
+
+    :return: The metrics.
+    :rtype: str
+    """
+    snapshots = [_worker_snapshot()]
+    directory = _settings["directory"]
+    if directory:
+        _write(snapshots[0])
+        _retire(directory)
+        snapshots = _read_all(directory)
+
+    counters: Dict[Tuple[str, Labels], float] = {}
+    gauges: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    buckets: List[float] = list(REGISTRY.buckets)
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, _labels(labels))
+            counters[key] = counters.get(key, 0) + value
+        if snapshot.get("alive", True):
+            for name, labels, value in snapshot["gauges"]:
+                key = (name, _labels(labels))
+                gauges[key] = gauges.get(key, 0) + value
+        if snapshot["buckets"] != buckets:
+            continue
+        for name, labels, counts in snapshot["histograms"]:
+            key = (name, _labels(labels))
+            total = histograms.setdefault(key, [0] * len(counts))
+            for index, count in enumerate(counts):
+                total[index] += count
+
+    # The database is shared, so these are only counted once.
+    for name, by_state in (
+        ("games", utils.query_game_state_counts()),
+        ("active_rounds", utils.query_active_round_state_counts()),
+    ):
+        for state in sorted(set(range(len(_modes()))) | set(by_state), key=str):
+            gauges[(name, (("state", _mode_name(state)),))] = by_state.get(state, 0)
+
+    lines: List[str] = []
+    _render_simple(lines, "counter", counters)
+    _render_simple(lines, "gauge", gauges)
+    _render_histograms(lines, buckets, histograms)
+    return "\n".join(lines) + "\n"
+
+
+def _start_request() -> None:
+    g.metrics_start = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.pop("metrics_start", None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        view = request.url_rule and _view_name(request.url_rule.endpoint)
+        operation = (("operation", view or "unmatched"),)
+        REGISTRY.observe("http_request_duration_seconds", elapsed, operation)
+        REGISTRY.inc(
+            "http_requests_total",
+            operation
+            + (("method", request.method), ("status", str(response.status_code))),
+        )
+        cache = request_cache.stats()
+        if cache["hits"]:
+            REGISTRY.inc("request_cache_hits_total", (), cache["hits"])
+        if cache["misses"]:
+            REGISTRY.inc("request_cache_misses_total", (), cache["misses"])
+    start_writer()
+    return response
+
+
+def _view_name(endpoint: str) -> Optional[str]:
+    view = current_app.view_functions.get(endpoint)
+    if view is None:
+        return None
+    # For connexion operations this is the operationId from swagger.yml.
+    return f"{view.__module__}.{view.__name__}"
+
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument,too-many-arguments
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+def _finish_query(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument,too-many-arguments
+    started = conn.info.get("metrics_start")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    kind = (("statement", statement.lstrip()[:6].upper() or "OTHER"),)
+    REGISTRY.inc("db_queries_total", kind)
+    REGISTRY.observe("db_query_duration_seconds", elapsed, kind)
+
+
+def _worker_snapshot() -> Dict[str, Any]:
+    snapshot = REGISTRY.snapshot()
+    snapshot["pid"] = os.getpid()
+    snapshot["gauges"] = []
+    for collector in list(_collectors):
+        for kind, name, labels, value in collector():
+            section = "counters" if kind == "counter" else "gauges"
+            snapshot[section].append([name, labels, value])
+    return snapshot
+
+
+def start_writer() -> None:
+    """
+    Start writing this worker's metrics to the shared directory, once per process.
+    """
+    pid = os.getpid()
+    if not _settings["directory"] or _settings["writer_pid"] == pid:
+        return
+    _settings["writer_pid"] = pid
+    token = _settings["writer"] = object()
+
+    def _loop():
+        while _settings["writer"] is token and _settings["directory"]:
+            try:
+                _write(_worker_snapshot())
+            except OSError:
+                pass
+            time.sleep(_settings["interval"])
+
+    threading.Thread(target=_loop, name="metrics-writer", daemon=True).start()
+
+
+def _write(snapshot: Dict[str, Any]) -> None:
+    path = os.path.join(_settings["directory"], f"metrics-{snapshot['pid']}.json")
+    # The writer thread and a request rendering the metrics may write it at once.
+    temp = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp, "w") as output:
+        json.dump(snapshot, output)
+    os.replace(temp, path)
+
+
+def _read_all(directory: str) -> List[Dict[str, Any]]:
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        snapshot = _read(path)
+        if snapshot is None:
+            continue
+        snapshot["alive"] = snapshot.get("retired") or _alive(snapshot["pid"])
+        snapshot["path"] = path
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def _read(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+def _retire(directory: str) -> None:
+    """
+    Add the counters and histograms of workers that have stopped to those of the
+    workers retired before them, and delete their files.
+    """
+    with open(os.path.join(directory, "metrics.lock"), "w") as lock:
+        # Only one worker at a time, so none are added twice.
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        stopped = [x for x in _read_all(directory) if not x["alive"]]
+        if not stopped:
+            return
+        path = os.path.join(directory, "metrics-retired.json")
+        retired = _read(path) or {
+            "pid": 0,
+            "retired": True,
+            "buckets": list(REGISTRY.buckets),
+            "counters": [],
+            "gauges": [],
+            "histograms": [],
+        }
+        counters = {(x, _labels(y)): z for x, y, z in retired["counters"]}
+        histograms = {(x, _labels(y)): z for x, y, z in retired["histograms"]}
+        for snapshot in stopped:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, _labels(labels))
+                counters[key] = counters.get(key, 0) + value
+            if snapshot["buckets"] != retired["buckets"]:
+                continue
+            for name, labels, counts in snapshot["histograms"]:
+                key = (name, _labels(labels))
+                total = histograms.setdefault(key, [0] * len(counts))
+                for index, count in enumerate(counts):
+                    total[index] += count
+        retired["counters"] = [[x, y, z] for (x, y), z in counters.items()]
+        retired["histograms"] = [[x, y, z] for (x, y), z in histograms.items()]
+        temp = f"{path}.tmp"
+        with open(temp, "w") as output:
+            json.dump(retired, output)
+        os.replace(temp, path)
+        for snapshot in stopped:
+            os.remove(snapshot["path"])
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(labels) -> Labels:
+    return tuple((str(x), str(y)) for x, y in labels)
+
+
+def _modes() -> List[str]:
+    # play_pinochle reaches this module through the websocket messenger.
+    from . import play_pinochle  # pylint: disable=import-outside-toplevel
+
+    return play_pinochle.GameModes.modes
+
+
+def _mode_name(state: Optional[int]) -> str:
+    modes = _modes()
+    if state is None or not 0 <= state < len(modes):
+        return str(state)
+    return modes[state]
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    text = ",".join(
+        '{}="{}"'.format(
+            name, value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+        )
+        for name, value in labels
+    )
+    return "{" + text + "}"
+
+
+def _render_simple(
+    lines: List[str], kind: str, samples: Dict[Tuple[str, Labels], float]
+) -> None:
+    for name in sorted({x for x, _ in samples}):
+        lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        for (sample_name, labels), value in sorted(samples.items()):
+            if sample_name == name:
+                lines.append(
+                    f"{PREFIX}{name}{_format_labels(labels)} {_format_value(value)}"
+                )
+
+
+def _render_histograms(
+    lines: List[str],
+    buckets: List[float],
+    histograms: Dict[Tuple[str, Labels], List[float]],
+) -> None:
+    for name in sorted({x for x, _ in histograms}):
+        lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for (sample_name, labels), counts in sorted(histograms.items()):
+            if sample_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ["+Inf"], counts[:-2]):
+                cumulative += count
+                bucket_labels = _format_labels(labels + (("le", f"{bound}"),))
+                lines.append(
+                    f"{PREFIX}{name}_bucket{bucket_labels} {_format_value(cumulative)}"
+                )
+            text = _format_labels(labels)
+            lines.append(f"{PREFIX}{name}_sum{text} {_format_value(counts[-2])}")
+            lines.append(f"{PREFIX}{name}_count{text} {_format_value(counts[-1])}")
+
+
+def _cache_samples() -> List[Sample]:
+    stats = metadata_cache.stats()
+    return [
+        ("counter", "metadata_cache_hits_total", (), stats["hits"]),
+        ("counter", "metadata_cache_misses_total", (), stats["misses"]),
+        ("counter", "metadata_cache_evictions_total", (), stats["evictions"]),
+        ("gauge", "metadata_cache_size", (), stats["size"]),
+    ]
+
+
+register_collector(_cache_samples)
@@ -1,17 +1,73 @@
 import uuid
 
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.types import CHAR, TypeDecorator
+from sqlalchemy.types import BINARY, CHAR, LargeBinary, TypeDecorator
 
 # Suppress invalid no-member messages from pylint.
 # pylint: disable=no-member
 
+# How GUIDs are stored on backends other than PostgreSQL.
+GUID_STORAGE_MODES = ("char", "binary")
+
+
+def guid_hex(value) -> str:
+    """
+    Return a GUID as 32 lowercase hex digits.
+
+    Canonical strings, with or without hyphens, are checked and converted without
+    building a UUID object, which is only done for other spellings.
+
+    :param value: The GUID as a UUID, 16 bytes or a string.
+    :type value: Union[uuid.UUID, bytes, str]
+    :raises ValueError: If the value isn't a GUID.
+    :return: The hex digits.
+    :rtype: str
+    """
+    return guid_bytes(value).hex()
+
+
+def guid_bytes(value) -> bytes:
+    """
+    Return a GUID as 16 big-endian bytes.
+
+    Canonical strings, with or without hyphens, are checked and converted without
+    building a UUID object, which is only done for other spellings.
+
+    :param value: The GUID as a UUID, 16 bytes or a string.
+    :type value: Union[uuid.UUID, bytes, str]
+    :raises ValueError: If the value isn't a GUID.
+    :return: The bytes.
+    :rtype: bytes
+    """
+    if isinstance(value, uuid.UUID):
+        return value.bytes
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        if len(value) != 16:
+            raise ValueError("bytes is not a 16-char string")
+        return value
+    if len(value) == 36 and value[8] == value[13] == value[18] == value[23] == "-":
+        hexstr = value.replace("-", "")
+    elif len(value) == 32:
+        hexstr = value
+    else:
+        return uuid.UUID(value).bytes
+    try:
+        raw = bytes.fromhex(hexstr)
+    except ValueError:
+        raw = b""
+    # fromhex skips whitespace, so check nothing was skipped.
+    if len(raw) != 16:
+        raise ValueError("badly formed hexadecimal UUID string")
+    return raw
+
 
 class GUID(TypeDecorator):
     """Platform-independent GUID type.
 
     Uses PostgreSQL's UUID type, otherwise uses
-    CHAR(32), storing as stringified hex values.
+    CHAR(32), storing as stringified hex values, or, when the storage is set to
+    binary, 16 raw bytes (BLOB on SQLite, BINARY(16) elsewhere).
 
     From: https://docs.sqlalchemy.org/en/14/core/custom_types.html#backend-agnostic-guid-type
     """
@@ -19,9 +75,31 @@ class GUID(TypeDecorator):
     impl = CHAR
     cache_ok = True
 
+    # Set by set_storage before any tables are created or queried.
+    storage = "char"
+
+    @classmethod
+    def set_storage(cls, storage: str) -> None:
+        """
+        Choose how GUIDs are stored on backends other than PostgreSQL. This must be
+        done before the database is first used, and match how existing databases
+        were created; see models.guid_migration to convert them.
+
+        :param storage: One of GUID_STORAGE_MODES.
+        :type storage: str
+        :raises ValueError: If the storage mode is unknown.
+        """
+        if storage not in GUID_STORAGE_MODES:
+            raise ValueError(f"Unknown GUID storage: {storage}")
+        cls.storage = storage
+
     def load_dialect_impl(self, dialect):
         if dialect.name == "postgresql":
             return dialect.type_descriptor(UUID())
+        if self.storage == "binary":
+            if dialect.name == "sqlite":
+                return dialect.type_descriptor(LargeBinary())
+            return dialect.type_descriptor(BINARY(16))
 
         return dialect.type_descriptor(CHAR(32))
 
@@ -30,17 +108,14 @@ class GUID(TypeDecorator):
             return value
         elif dialect.name == "postgresql":
             return str(value)
+        elif self.storage == "binary":
+            return guid_bytes(value)
         else:
-            if not isinstance(value, uuid.UUID):
-                return "%.32x" % uuid.UUID(value).int
-
-            # hexstring
-            return "%.32x" % value.int
+            return guid_hex(value)
 
     def process_result_value(self, value, dialect):
-        if value is None:
+        if value is None or isinstance(value, uuid.UUID):
             return value
-
-        if not isinstance(value, uuid.UUID):
-            value = uuid.UUID(value)
-        return value
+        if isinstance(value, str):
+            return uuid.UUID(hex=value)
+        return uuid.UUID(bytes=bytes(value))
@@ -3,8 +3,10 @@
 
 from .GUID import GUID
 from .game import Game, GameSchema
+from .game_event import GameEvent, RoundSnapshot
 from .gameround import GameRound, GameRoundSchema
 from .hand import Hand, HandSchema
+from .packed_hand import PackedHand
 from .player import Player, PlayerSchema
 from .round_ import Round, RoundSchema
 from .roundteam import RoundTeam, RoundTeamSchema
@@ -0,0 +1,57 @@
+"""
+Append-only log of the actions taken in each round, and snapshots of the state they
+build up, for rebuilding, auditing and analysing games. See pinochle.game_events.
+"""
+from datetime import datetime
+
+from .core import db
+from .GUID import GUID
+
+# Suppress invalid no-member messages from pylint.
+# pylint: disable=no-member
+
+
+class GameEvent(db.Model):
+    __tablename__ = "game_event"
+    # Order of the events across all games.
+    event_id = db.Column(db.Integer, primary_key=True, nullable=False)
+    game_id = db.Column(GUID, nullable=False)
+    round_id = db.Column(GUID, nullable=False)
+    # Order of the events within the round, from 1.
+    seq = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(8), nullable=False)
+    # Compact JSON, see pinochle.game_events.
+    payload = db.Column(db.String, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # A round's events, in order; unique so concurrent appends conflict.
+        db.Index("ix_game_event_round_id_seq", "round_id", "seq", unique=True),
+        # A game's events, in order.
+        db.Index("ix_game_event_game_id_event_id", "game_id", "event_id"),
+    )
+
+    def __repr__(self):
+        output = "<GameEvent: "
+        output += "round_id=%r, " % self.round_id
+        output += "seq=%r, " % self.seq
+        output += "kind=%r, " % self.kind
+        output += "payload=%r" % self.payload
+        output += ">"
+        return output
+
+
+class RoundSnapshot(db.Model):
+    __tablename__ = "round_snapshot"
+    round_id = db.Column(GUID, primary_key=True, nullable=False)
+    # Seq of the last event reflected in the state.
+    seq = db.Column(db.Integer, primary_key=True, nullable=False)
+    # Compact JSON of a pinochle.game_events.RoundState.
+    state = db.Column(db.String, nullable=False)
+
+    def __repr__(self):
+        output = "<RoundSnapshot: "
+        output += "round_id=%r, " % self.round_id
+        output += "seq=%r" % self.seq
+        output += ">"
+        return output
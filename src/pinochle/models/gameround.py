@@ -30,6 +30,11 @@ class GameRound(db.Model):
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    # A game's rounds, in the order they were played.
+    __table_args__ = (
+        db.Index("ix_game_round_game_id_timestamp", "game_id", "timestamp"),
+    )
+
     def __repr__(self):
         output = "<GameRound: "
         output += "game_id=%r, " % self.game_id
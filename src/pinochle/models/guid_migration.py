@@ -0,0 +1,154 @@
+"""
+Copy a database into a new one, converting the stored IDs between the hex (char) and
+16 byte (binary) GUID storage. Run with
+
+    python -m pinochle.models.guid_migration OLD_URL NEW_URL --to binary
+
+then point the application at the new database and set GUID_STORAGE to match.
+PostgreSQL stores IDs in its own UUID type either way, so needs no conversion.
+
+License: GPLv3
+"""
+import argparse
+from typing import Dict, Optional
+
+import sqlalchemy
+
+from .core import db
+from .GUID import GUID, GUID_STORAGE_MODES, guid_bytes, guid_hex
+
+# Rows copied per statement.
+BATCH_SIZE = 1000
+
+
+def convert_value(value, storage: str):
+    """
+    Convert one stored ID to the given storage, whichever storage it's in now.
+
+    :param value: The stored ID, as hex, bytes or a UUID.
+    :type value: Union[str, bytes, uuid.UUID]
+    :param storage: One of GUID_STORAGE_MODES.
+    :type storage: str
+    :return: The ID as it's stored with the given storage.
+    :rtype: Union[str, bytes]
+    """
+    if value is None:
+        return None
+    if storage == "binary":
+        return guid_bytes(value)
+    return guid_hex(value)
+
+
+def migrate(
+    source_url: str, target_url: str, storage: str, batch_size: int = BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Create the tables in an empty target database with the given GUID storage and
+    copy every row of the source database into them.
+
+    :param source_url: SQLAlchemy URL of the database to copy.
+    :type source_url: str
+    :param target_url: SQLAlchemy URL of the new database.
+    :type target_url: str
+    :param storage: GUID storage of the new database, one of GUID_STORAGE_MODES.
+    :type storage: str
+    :param batch_size: Rows copied per statement.
+    :type batch_size: int
+    :raises ValueError: If the storage mode is unknown.
+    :return: Number of rows copied from each table.
+    :rtype: Dict[str, int]
+    """
+    if storage not in GUID_STORAGE_MODES:
+        raise ValueError(f"Unknown GUID storage: {storage}")
+
+    source = sqlalchemy.create_engine(source_url)
+    target = sqlalchemy.create_engine(target_url)
+    copied = {}
+    previous = GUID.storage
+    try:
+        # The column types are chosen when the target's tables are created.
+        GUID.storage = storage
+        db.metadata.create_all(bind=target)
+        source_tables = set(sqlalchemy.inspect(source).get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name in source_tables:
+                copied[table.name] = _copy_table(
+                    source, target, table, storage, batch_size
+                )
+    finally:
+        GUID.storage = previous
+        source.dispose()
+        target.dispose()
+    return copied
+
+
+def _copy_table(source, target, table, storage: str, batch_size: int) -> int:
+    """
+    Copy the rows of one table, converting its GUID columns.
+
+    The rows are read and written as stored, without the column types, so the
+    conversion doesn't depend on the storage this process was configured with.
+    """
+    columns = [x.name for x in table.columns]
+    guid_columns = {x.name for x in table.columns if isinstance(x.type, GUID)}
+    select = sqlalchemy.text(
+        "SELECT {} FROM {}".format(*_quoted(source, table.name, columns))
+    )
+    insert = sqlalchemy.text(
+        "INSERT INTO {1} ({0}) VALUES ({2})".format(
+            *_quoted(target, table.name, columns),
+            ", ".join(":" + x for x in columns),
+        )
+    )
+
+    count = 0
+    with source.connect() as src, target.begin() as dst:
+        result = src.execute(select)
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            dst.execute(
+                insert,
+                [
+                    {
+                        name: convert_value(value, storage)
+                        if name in guid_columns
+                        else value
+                        for name, value in zip(columns, row)
+                    }
+                    for row in rows
+                ],
+            )
+            count += len(rows)
+    return count
+
+
+def _quoted(engine, table_name: str, columns: list) -> tuple:
+    """
+    Quote a table's column list and name for the engine's dialect.
+    """
+    quote = engine.dialect.identifier_preparer.quote
+    return ", ".join(quote(x) for x in columns), quote(table_name)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Copy a pinochle database, converting how IDs are stored."
+    )
+    parser.add_argument("source_url", help="SQLAlchemy URL of the existing database")
+    parser.add_argument("target_url", help="SQLAlchemy URL of the new, empty database")
+    parser.add_argument(
+        "--to",
+        dest="storage",
+        choices=GUID_STORAGE_MODES,
+        default="binary",
+        help="GUID storage of the new database (default: binary)",
+    )
+    args = parser.parse_args(argv)
+    for name, count in migrate(args.source_url, args.target_url, args.storage).items():
+        print(f"{name}: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
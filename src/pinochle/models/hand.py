@@ -16,10 +16,18 @@ class Hand(db.Model):
     # - player.hand_id
     # - round.hand_id
     # - roundteam.hand_id
-    hand_id = db.Column(GUID, index=True, nullable=False)
+    hand_id = db.Column(GUID, nullable=False)
     card = db.Column(db.String, nullable=False)
     seq = db.Column(db.Integer, nullable=False, unique=False, default=-1)
 
+    # Both also serve lookups by hand_id alone.
+    __table_args__ = (
+        # A hand's cards, in seq order.
+        db.Index("ix_hand_hand_id_seq", "hand_id", "seq"),
+        # A specific card in a hand.
+        db.Index("ix_hand_hand_id_card", "hand_id", "card"),
+    )
+
     def __repr__(self):
         output = "<Hand: "
         output += "hand_id=%r, " % self.hand_id
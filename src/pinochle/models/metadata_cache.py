@@ -0,0 +1,193 @@
+"""
+Process-wide read-through cache for game metadata that rarely changes once a game
+is under way: which game a round belongs to, the players on each team and the
+players in each round.
+
+Entries are kept in least-recently-used order up to a maximum size and expire after
+a time-to-live, so a change made by another worker process is seen within that
+time. Changes made by this process are seen immediately, as the write endpoints for
+teams, team players, game rounds and round teams invalidate what they change once
+it's committed (see unit_of_work.invalidate_cached). Empty results aren't cached.
+
+Values are stored as strings and tuples rather than database objects, which belong
+to the session that loaded them.
+
+License: GPLv3
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Defaults, overridden from the application config by configure().
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TTL = 300.0
+
+
+class MetadataCache:
+    """
+    Bounded least-recently-used cache whose entries expire.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_MAXSIZE,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by every invalidation, so a value loaded meanwhile isn't cached.
+        self._generation = 0
+
+    def get(self, namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value, loading and caching it if it's missing or expired.
+        Values of None and empty tuples aren't cached.
+
+        :param namespace: Kind of value, e.g. "round_game".
+        :type namespace: str
+        :param key: Identifies the value within the namespace.
+        :type key: Hashable
+        :param loader: Loads the value from the database.
+        :type loader: Callable[[], Any]
+        :return: The value.
+        :rtype: Any
+        """
+        entry_key = (namespace, key)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+        # Nothing found may only mean it isn't there yet, e.g. a round's players
+        # before its teams are added.
+        if value is None or value == ():
+            return value
+
+        with self._lock:
+            if generation != self._generation:
+                return value
+            self._entries[entry_key] = (now + self.ttl, value)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, namespace: Optional[str] = None, key: Hashable = None):
+        """
+        Forget cached values.
+
+        :param namespace: Kind of value to forget, or None for everything.
+        :type namespace: str, optional
+        :param key: Value to forget within the namespace, or None for all of them.
+        :type key: Hashable, optional
+        """
+        with self._lock:
+            self._generation += 1
+            if namespace is None:
+                self._entries.clear()
+            elif key is not None:
+                self._entries.pop((namespace, key), None)
+            else:
+                for entry_key in [x for x in self._entries if x[0] == namespace]:
+                    del self._entries[entry_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report on the use of the cache, for monitoring.
+
+        :return: Hits, misses, evictions, current size, maximum size and hit ratio.
+        :rtype: Dict[str, Any]
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+CACHE = MetadataCache()
+
+
+def configure(maxsize: int, ttl: float) -> None:
+    """
+    Set the size and time-to-live of the process-wide cache, emptying it.
+
+    :param maxsize: Maximum number of values cached.
+    :type maxsize: int
+    :param ttl: Seconds a value is cached for.
+    :type ttl: float
+    """
+    CACHE.maxsize = maxsize
+    CACHE.ttl = ttl
+    CACHE.invalidate()
+
+
+def cached(namespace: str) -> Callable:
+    """
+    Cache the results of a lookup taking a single ID.
+
+    :param namespace: Kind of value the lookup returns.
+    :type namespace: str
+    :return: Decorator for the lookup.
+    :rtype: Callable
+    """
+
+    def decorator(func: Callable) -> Callable:
+        def load(ident):
+            value = func(ident)
+            # Cache lists as tuples, so callers can't change the cached value.
+            return tuple(value) if isinstance(value, list) else value
+
+        @functools.wraps(func)
+        def wrapper(ident):
+            value = CACHE.get(namespace, str(ident), lambda: load(ident))
+            return list(value) if isinstance(value, tuple) else value
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate(namespace: Optional[str] = None, key: Any = None) -> None:
+    """
+    Forget cached values of the process-wide cache.
+
+    :param namespace: Kind of value to forget, or None for everything.
+    :type namespace: str, optional
+    :param key: ID of the value to forget, or None for all of the namespace.
+    :type key: Any, optional
+    """
+    CACHE.invalidate(namespace, None if key is None else str(key))
+
+
+def stats() -> Dict[str, Any]:
+    """
+    Report on the use of the process-wide cache.
+
+    :return: See MetadataCache.stats.
+    :rtype: Dict[str, Any]
+    """
+    return CACHE.stats()
@@ -0,0 +1,138 @@
+"""
+Alternative storage for hands: one row per hand holding its cards packed into a
+small binary column, instead of one ``Hand`` row per card.
+
+Each card takes two bytes: its card id (see ``cards.compact``) and its ``seq`` plus
+one, so the -1 used for unordered hands is stored as 0. Cards are kept in ``seq``
+order, and in the order they were added for equal ``seq``, which is the order
+``query_hand_list`` returns them for the row storage.
+
+The version column is an optimistic concurrency counter: an update made from a
+stale copy of a hand fails with ``sqlalchemy.orm.exc.StaleDataError``.
+"""
+import uuid
+from typing import List, Optional, Tuple
+
+from ..cards.compact import SVG_NAMES, svg_kind
+from ..exceptions import InvalidValueError
+from .core import db
+from .GUID import GUID
+from .hand import Hand
+
+# Suppress invalid no-member messages from pylint.
+# pylint: disable=no-member
+
+# Largest seq that can be stored.
+MAX_SEQ = 254
+
+
+class PackedHand(db.Model):
+    __tablename__ = "packed_hand"
+    hand_id = db.Column(GUID, primary_key=True, nullable=False)
+    cards = db.Column(db.LargeBinary, nullable=False, default=b"")
+    version = db.Column(db.Integer, nullable=False)
+
+    __mapper_args__ = {"version_id_col": version}
+
+    def __repr__(self):
+        output = "<PackedHand: "
+        output += "hand_id=%r, " % self.hand_id
+        output += "cards=%r, " % [card for card, __ in decode_cards(self.cards)]
+        output += "version=%r, " % self.version
+        output += ">"
+        return output
+
+
+def encode_cards(cards: List[Tuple[str, int]]) -> bytes:
+    """
+    Pack a list of cards.
+
+    :param cards: SVG name and seq of each card, e.g. [("spade_ace", -1)].
+    :type cards: List[Tuple[str, int]]
+    :raises InvalidValueError: When a card isn't a Pinochle card.
+    :raises ValueError: When a seq can't be stored.
+    :return: The packed cards.
+    :rtype: bytes
+    """
+    packed = bytearray()
+    for card, seq in cards:
+        if not -1 <= seq <= MAX_SEQ:
+            raise ValueError("seq %d is out of range." % seq)
+        packed += bytes((svg_kind(card), seq + 1))
+    return bytes(packed)
+
+
+def decode_cards(packed: bytes) -> List[Tuple[str, int]]:
+    """
+    Unpack a list of cards.
+
+    :param packed: The packed cards.
+    :type packed: bytes
+    :return: SVG name and seq of each card.
+    :rtype: List[Tuple[str, int]]
+    """
+    return [
+        (SVG_NAMES[packed[index]], packed[index + 1] - 1)
+        for index in range(0, len(packed), 2)
+    ]
+
+
+def insert_card(packed: bytes, card: str, seq: int = -1) -> bytes:
+    """
+    Add a card to packed cards, after any cards with the same or a lower seq.
+
+    :param packed: The packed cards.
+    :type packed: bytes
+    :param card: SVG name of the card.
+    :type card: str
+    :param seq: Sequence of the card in the hand.
+    :type seq: int
+    :return: The packed cards, including the new card.
+    :rtype: bytes
+    """
+    new_card = encode_cards([(card, seq)])
+    index = len(packed)
+    while index > 0 and packed[index - 1] > seq + 1:
+        index -= 2
+    return packed[:index] + new_card + packed[index:]
+
+
+def remove_card(packed: bytes, card: str) -> Tuple[bytes, Optional[int]]:
+    """
+    Remove the first copy of a card from packed cards.
+
+    :param packed: The packed cards.
+    :type packed: bytes
+    :param card: SVG name of the card.
+    :type card: str
+    :return: The remaining packed cards and the seq of the card removed, or the
+        cards unchanged and None if the card wasn't there.
+    :rtype: Tuple[bytes, Optional[int]]
+    """
+    try:
+        card_id = svg_kind(card)
+    except InvalidValueError:
+        return packed, None
+    for index in range(0, len(packed), 2):
+        if packed[index] == card_id:
+            return packed[:index] + packed[index + 2 :], packed[index + 1] - 1
+    return packed, None
+
+
+def expand(hand_id: str, packed: bytes) -> List[Hand]:
+    """
+    Present packed cards as the (unsaved) ``Hand`` rows row storage would hold, so
+    they serialize the same way. ``_id`` is the card's position in the hand.
+
+    :param hand_id: ID of the hand.
+    :type hand_id: str
+    :param packed: The packed cards.
+    :type packed: bytes
+    :return: One ``Hand`` per card, in seq order.
+    :rtype: List[Hand]
+    """
+    hand_uuid = uuid.UUID(str(hand_id))
+    return [
+        Hand(_id=index + 1, hand_id=hand_uuid, card=card, seq=seq)
+        for index, (card, seq) in enumerate(decode_cards(packed))
+    ]
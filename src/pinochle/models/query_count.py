@@ -0,0 +1,121 @@
+"""
+Count of the SQL statements issued, and the time they took, while handling each
+request or websocket message.
+
+Statements are counted on Flask's ``g``, so each request has its own count; outside
+an application context nothing is counted. In debug mode, or with
+QUERY_COUNT_HEADERS set, the count and time are returned in the X-Query-Count and
+X-Query-Time (milliseconds) headers of each response. Requests and websocket
+messages issuing more than QUERY_COUNT_LOG_THRESHOLD statements are logged, so the
+actions causing the most database traffic can be found.
+
+License: GPLv3
+"""
+import contextlib
+import time
+from typing import Dict, Iterator, Union
+
+from flask import Flask, current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .. import custom_log
+
+LOG = custom_log.get_logger(__name__)
+
+
+def reset() -> None:
+    """
+    Start counting again from zero.
+    """
+    if has_app_context():
+        g.query_count = {"count": 0, "seconds": 0.0}
+
+
+def stats() -> Dict[str, Union[int, float]]:
+    """
+    Report on the statements issued since the count was last reset.
+
+    :return: Number of statements (count) and the seconds they took (seconds).
+    :rtype: Dict[str, Union[int, float]]
+    """
+    if not has_app_context() or "query_count" not in g:
+        return {"count": 0, "seconds": 0.0}
+    return dict(g.query_count)
+
+
+def report(action: str) -> Dict[str, Union[int, float]]:
+    """
+    Log the statements issued for an action if there were more than the threshold.
+
+    :param action: The request or message handled, for the log.
+    :type action: str
+    :return: See stats.
+    :rtype: Dict[str, Union[int, float]]
+    """
+    counted = stats()
+    threshold = current_app.config.get("QUERY_COUNT_LOG_THRESHOLD")
+    if threshold is not None and counted["count"] > threshold:
+        LOG.warning(
+            "%s issued %d SQL statements taking %.1f ms.",
+            action,
+            counted["count"],
+            counted["seconds"] * 1000,
+        )
+    return counted
+
+
+@contextlib.contextmanager
+def measure(action: str) -> Iterator[None]:
+    """
+    Count the statements issued within the block, and report them.
+
+    :param action: What the block handles, for the log.
+    :type action: str
+    """
+    reset()
+    try:
+        yield
+    finally:
+        report(action)
+
+
+def init_app(app: Flask) -> None:
+    """
+    Count the statements issued for each request handled by the application.
+
+    :param app: The application.
+    :type app: Flask
+    """
+    app.before_request(reset)
+    app.after_request(_finish_request)
+
+
+def _finish_request(response):
+    counted = report(f"{request.method} {request.path}")
+    if current_app.debug or current_app.config.get("QUERY_COUNT_HEADERS"):
+        response.headers["X-Query-Count"] = str(counted["count"])
+        response.headers["X-Query-Time"] = "%.3f" % (counted["seconds"] * 1000)
+    return response
+
+
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument,too-many-arguments
+    conn.info.setdefault("query_count_start", []).append(time.perf_counter())
+
+
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument,too-many-arguments
+    started = conn.info.get("query_count_start")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_app_context():
+        if "query_count" not in g:
+            reset()
+        g.query_count["count"] += 1
+        g.query_count["seconds"] += elapsed
+
+
+event.listen(Engine, "before_cursor_execute", _start_statement)
+event.listen(Engine, "after_cursor_execute", _finish_statement)
@@ -0,0 +1,99 @@
+"""
+Request-scoped memoization for the lookups in models.utils.
+
+A single request commonly looks up the same round, player or team several times.
+Lookups wrapped with ``memoize`` are remembered on Flask's ``g`` for the rest of the
+request, keyed by the function and its arguments, so only the first one reaches the
+database. Every commit or rollback forgets what was remembered, since rows may have
+changed. Lookups finding nothing aren't remembered, and outside an application
+context lookups always go to the database.
+
+License: GPLv3
+"""
+import functools
+from typing import Any, Callable, Dict
+
+from flask import g, has_app_context
+from sqlalchemy import event
+
+from .core import db
+
+
+def memoize(func: Callable) -> Callable:
+    """
+    Remember the results of a lookup for the rest of the request.
+
+    :param func: The lookup to wrap.
+    :type func: Callable
+    :return: The wrapped lookup.
+    :rtype: Callable
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not has_app_context():
+            return func(*args, **kwargs)
+
+        state = _state()
+        key = (
+            func.__name__,
+            tuple(str(arg) for arg in args),
+            tuple(sorted((name, str(arg)) for name, arg in kwargs.items())),
+        )
+        try:
+            result = state["entries"][key]
+            state["hits"] += 1
+        except KeyError:
+            state["misses"] += 1
+            result = func(*args, **kwargs)
+            if result is None:
+                return None
+            state["entries"][key] = result
+        # Don't let callers change what's remembered.
+        return list(result) if isinstance(result, list) else result
+
+    return wrapper
+
+
+def clear() -> None:
+    """
+    Forget the lookups remembered for this request. The counters are kept.
+    """
+    if has_app_context() and "query_cache" in g:
+        g.query_cache["entries"].clear()
+
+
+def stats() -> Dict[str, int]:
+    """
+    Report on the lookups made during this request.
+
+    :return: Number of lookups answered from memory (hits) and from the database
+        (misses), and the number of results remembered (size).
+    :rtype: Dict[str, int]
+    """
+    if not has_app_context() or "query_cache" not in g:
+        return {"hits": 0, "misses": 0, "size": 0}
+    state = g.query_cache
+    return {
+        "hits": state["hits"],
+        "misses": state["misses"],
+        "size": len(state["entries"]),
+    }
+
+
+def _state() -> Dict[str, Any]:
+    """
+    Retrieve this request's remembered lookups and counters, creating them as needed.
+    """
+    if "query_cache" not in g:
+        g.query_cache = {"entries": {}, "hits": 0, "misses": 0}
+    return g.query_cache
+
+
+def _forget(session, *args):  # pylint: disable=unused-argument
+    clear()
+
+
+# Rows may have changed once a transaction ends, whichever way it ends.
+event.listen(db.session, "after_commit", _forget)
+event.listen(db.session, "after_soft_rollback", _forget)
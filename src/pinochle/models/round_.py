@@ -34,6 +34,10 @@ class Round(db.Model):
     timestamp = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
+    # Optimistic concurrency counter, see models.unit_of_work.
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     def __repr__(self):
         output = "<Round: "
@@ -54,3 +58,4 @@ class RoundSchema(SQLAlchemyAutoSchema):
         include_fk = True
         include_relationships = True
         load_instance = True
+        exclude = ("version",)
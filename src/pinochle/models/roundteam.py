@@ -38,6 +38,11 @@ class RoundTeam(db.Model):
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    # A round's teams, in team order.
+    __table_args__ = (
+        db.Index("ix_round_team_round_id_team_order", "round_id", "team_order"),
+    )
+
     def __repr__(self):
         output = "<RoundTeam: "
         output += "round_id=%r, " % self.round_id
@@ -0,0 +1,114 @@
+"""
+Tuning for SQLite databases shared by several worker processes and threads.
+
+Every new connection is given the PRAGMAs from the application config:
+
+- journal_mode WAL lets readers carry on while a transaction is being written,
+  instead of every connection queuing for the whole database.
+- synchronous NORMAL syncs the write-ahead log at checkpoints rather than at every
+  commit, which is safe from corruption in WAL mode; only the last commits before
+  a power failure may be lost.
+- busy_timeout makes a connection wait that many milliseconds for another's write
+  to finish rather than failing with "database is locked" straight away.
+- mmap_size and cache_size let reads be answered from memory.
+
+Connections to a database file are kept in a pool, rather than opened for each
+request and given the PRAGMAs again, which is what happens without one. In-memory
+databases can't be shared between connections and keep their single connection.
+
+License: GPLv3
+"""
+from typing import Any, Dict, List, Mapping
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def is_memory_database(database: str) -> bool:
+    """
+    Report whether the database name refers to an in-memory database.
+
+    :param database: DB_NAME from the application config.
+    :type database: str
+    :return: Whether the database is held in memory.
+    :rtype: bool
+    """
+    return database in ("", ":memory:") or database.startswith("file::memory:")
+
+
+def pragmas(config: Mapping[str, Any]) -> List[str]:
+    """
+    Return the PRAGMA statements run on each new connection.
+
+    :param config: The application config.
+    :type config: Mapping[str, Any]
+    :raises ValueError: If the journal or synchronous mode is unknown.
+    :return: The statements.
+    :rtype: List[str]
+    """
+    journal_mode = str(config["SQLITE_JOURNAL_MODE"]).upper()
+    synchronous = str(config["SQLITE_SYNCHRONOUS"]).upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"Unknown SQLite journal mode: {journal_mode}")
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f"Unknown SQLite synchronous mode: {synchronous}")
+
+    statements = []
+    # In-memory databases only have the MEMORY or OFF journal modes.
+    if not is_memory_database(config["DB_NAME"]):
+        statements.append(f"PRAGMA journal_mode={journal_mode}")
+    statements += [
+        f"PRAGMA synchronous={synchronous}",
+        "PRAGMA busy_timeout=%d" % int(config["SQLITE_BUSY_TIMEOUT"]),
+        "PRAGMA mmap_size=%d" % int(config["SQLITE_MMAP_SIZE"]),
+        "PRAGMA cache_size=%d" % int(config["SQLITE_CACHE_SIZE"]),
+    ]
+    return statements
+
+
+def engine_options(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Return the options for creating the engine, for SQLALCHEMY_ENGINE_OPTIONS.
+
+    :param config: The application config.
+    :type config: Mapping[str, Any]
+    :return: Pool options for a database file, or none for an in-memory database.
+    :rtype: Dict[str, Any]
+    """
+    if is_memory_database(config["DB_NAME"]):
+        return {}
+    return {
+        "poolclass": QueuePool,
+        "pool_size": int(config["SQLITE_POOL_SIZE"]),
+        "max_overflow": int(config["SQLITE_POOL_OVERFLOW"]),
+        "pool_timeout": int(config["SQLITE_BUSY_TIMEOUT"]) / 1000,
+        # Pooled connections are handed to whichever thread asks next.
+        "connect_args": {"check_same_thread": False},
+    }
+
+
+def apply_pragmas(engine: Engine, config: Mapping[str, Any]) -> None:
+    """
+    Run the PRAGMAs on each connection the engine opens from now on.
+
+    :param engine: Engine of a SQLite database.
+    :type engine: Engine
+    :param config: The application config.
+    :type config: Mapping[str, Any]
+    """
+    statements = pragmas(config)
+
+    def _on_connect(dbapi_connection, connection_record):
+        # pylint: disable=unused-argument
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    event.listen(engine, "connect", _on_connect)
@@ -30,6 +30,11 @@ class TeamPlayers(db.Model):
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    # A team's players, in player order.
+    __table_args__ = (
+        db.Index("ix_team_players_team_id_player_order", "team_id", "player_order"),
+    )
+
     def __repr__(self):
         output = "<TeamPlayers: "
         output += "team_id=%r, " % self.team_id
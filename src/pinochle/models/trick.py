@@ -31,6 +31,9 @@ class Trick(db.Model):
         index=False,
     )
 
+    # A round's tricks, in the order they were played.
+    __table_args__ = (db.Index("ix_trick_round_id__id", "round_id", "_id"),)
+
     def __repr__(self):
         output = "<Trick: "
         output += "trick_id=%r, " % self.trick_id
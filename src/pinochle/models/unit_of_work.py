@@ -0,0 +1,166 @@
+"""
+One database transaction per game action.
+
+A bid or card play changes several rows through helpers such as hand.addcard,
+player.update and round_.update. Inside ``transaction`` those helpers only flush
+their changes, using ``commit`` from this module in place of the session's, and the
+whole action is committed once at the end. If the action fails, everything it
+changed is rolled back instead of leaving it half applied.
+
+Work that must only happen once the changes are committed, such as broadcasting
+them to the players or forgetting cached values (``invalidate_cached``), is
+registered with ``after_commit`` and run after the commit, or dropped on rollback. Transactions nest: only the outermost one commits.
+
+Outside a transaction, ``commit`` commits and ``after_commit`` runs its callback
+straight away, as before.
+
+Games, rounds and players carry a version counter, so committing a change made
+from a row someone else changed meanwhile fails with StaleDataError instead of
+overwriting their change. Actions wrapped with ``transactional`` are then run
+again from the start, up to CONFLICT_ATTEMPTS times. An action that depends on a
+row without changing it, such as playing a card into a round's trick, calls
+``claim`` on the row so that concurrent actions on it conflict too.
+
+License: GPLv3
+"""
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from flask import g, has_app_context
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
+
+from . import metadata_cache
+from .core import db
+
+# Runs of an action before a conflict with a concurrent action is reported.
+CONFLICT_ATTEMPTS = 3
+
+
+@contextmanager
+def transaction() -> Iterator[None]:
+    """
+    Run the block as one transaction, committing when the outermost block ends
+    and then running the callbacks registered with after_commit.
+    """
+    state = _state()
+    state["depth"] += 1
+    try:
+        yield
+        if state["depth"] == 1:
+            db.session.commit()
+    except BaseException:
+        if state["depth"] == 1:
+            db.session.rollback()
+            state["callbacks"].clear()
+            # Values may have been cached from the changes just rolled back.
+            metadata_cache.invalidate()
+        raise
+    finally:
+        state["depth"] -= 1
+
+    if state["depth"] == 0:
+        callbacks, state["callbacks"] = state["callbacks"], []
+        for callback in callbacks:
+            callback()
+
+
+def transactional(func: Callable) -> Callable:
+    """
+    Run each call of the function as one transaction, running it again if it
+    conflicts with a concurrent action. Calls within another transaction are part
+    of that one, and are run again with it.
+
+    :param func: The function to wrap.
+    :type func: Callable
+    :return: The wrapped function.
+    :rtype: Callable
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if active():
+            return func(*args, **kwargs)
+        for attempt in range(CONFLICT_ATTEMPTS):
+            try:
+                with transaction():
+                    return func(*args, **kwargs)
+            except StaleDataError:
+                if attempt + 1 == CONFLICT_ATTEMPTS:
+                    raise
+        return None  # pragma: no cover
+
+    return wrapper
+
+
+def claim(instance: db.Model) -> None:
+    """
+    Change the row's version when the transaction is committed, even if nothing
+    else about it changes, so a concurrent action claiming or changing the same
+    row conflicts with this one.
+
+    :param instance: A game, round or player.
+    :type instance: db.Model
+    """
+    instance.timestamp = datetime.utcnow()
+    flag_modified(instance, "timestamp")
+
+
+def active() -> bool:
+    """
+    Report whether a transaction is under way.
+
+    :return: Whether changes are being held for a single commit.
+    :rtype: bool
+    """
+    return has_app_context() and "unit_of_work" in g and g.unit_of_work["depth"] > 0
+
+
+def commit() -> None:
+    """
+    Commit the session's changes, or only flush them during a transaction.
+    """
+    if active():
+        db.session.flush()
+    else:
+        db.session.commit()
+
+
+def after_commit(callback: Callable[[], Any]) -> None:
+    """
+    Run the callback once the transaction under way is committed, or now if there's
+    none. Callbacks are run in the order they were registered.
+
+    :param callback: Function called without arguments.
+    :type callback: Callable[[], Any]
+    """
+    if active():
+        g.unit_of_work["callbacks"].append(callback)
+    else:
+        callback()
+
+
+def invalidate_cached(namespace: Optional[str] = None, key: Any = None) -> None:
+    """
+    Forget values of the metadata cache changed by the transaction under way, both
+    now and once it's committed: a request reading them in between would otherwise
+    cache the rows as they were before the commit.
+
+    :param namespace: Kind of value to forget, or None for everything.
+    :type namespace: str, optional
+    :param key: ID of the value to forget, or None for all of the namespace.
+    :type key: Any, optional
+    """
+    metadata_cache.invalidate(namespace, key)
+    after_commit(functools.partial(metadata_cache.invalidate, namespace, key))
+
+
+def _state() -> Dict[str, Any]:
+    """
+    Retrieve this context's transaction depth and callbacks, creating them as needed.
+    """
+    if "unit_of_work" not in g:
+        g.unit_of_work = {"depth": 0, "callbacks": []}
+    return g.unit_of_work
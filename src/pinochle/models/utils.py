@@ -2,12 +2,17 @@
 Database utilities to consolidate db activity and simplify other parts of the application.
 
 """
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
+from sqlalchemy import func
+
+from . import metadata_cache, packed_hand, request_cache
 from .core import db  # pragma: no cover
 from .game import Game
+from .game_event import GameEvent, RoundSnapshot
 from .gameround import GameRound
 from .hand import Hand
+from .packed_hand import PackedHand
 from .player import Player
 from .round_ import Round
 from .roundteam import RoundTeam
@@ -17,6 +22,34 @@ from .trick import Trick
 
 UUID_ZEROS = "00000000-0000-0000-0000-000000000000"
 
+# How cards in hands are stored: "rows", one Hand row per card, or "packed", one
+# PackedHand row per hand.
+HAND_STORAGE_MODES = ("rows", "packed")
+_hand_storage = {"mode": "rows"}
+
+
+def set_hand_storage(mode: str) -> None:
+    """
+    Select how cards in hands are stored.
+
+    :param mode: One of HAND_STORAGE_MODES.
+    :type mode: str
+    """
+    if mode not in HAND_STORAGE_MODES:
+        raise ValueError("Unknown hand storage mode %r." % mode)
+    _hand_storage["mode"] = mode
+
+
+def packed_hands() -> bool:
+    """
+    Whether hands are stored packed, one row per hand.
+
+    :return: True when hands are stored in the packed_hand table.
+    :rtype: bool
+    """
+    return _hand_storage["mode"] == "packed"
+
+
 # This is used for database debugging only. No test coverage needed.
 def dump_db():  # pragma: no cover
     con = db.engine.raw_connection()
@@ -25,6 +58,7 @@ def dump_db():  # pragma: no cover
             print("%s\n" % line)
 
 
+@request_cache.memoize
 def query_game(game_id: str) -> Game:
     """
     Retrieve information about the specified game.
@@ -47,6 +81,33 @@ def query_game_list() -> List[Game]:
     return Game.query.order_by(Game.timestamp.desc()).all()
 
 
+def query_game_state_counts() -> Dict[int, int]:
+    """
+    Count the games in each state.
+
+    :return: Number of games, by state.
+    :rtype: Dict[int, int]
+    """
+    return dict(
+        db.session.query(Game.state, func.count(Game.game_id)).group_by(Game.state)
+    )
+
+
+def query_active_round_state_counts() -> Dict[int, int]:
+    """
+    Count the active rounds, by the state of their game.
+
+    :return: Number of active rounds, by the state of their game.
+    :rtype: Dict[int, int]
+    """
+    return dict(
+        db.session.query(Game.state, func.count(GameRound.round_id))
+        .join(GameRound, GameRound.game_id == Game.game_id)
+        .filter(GameRound.active_flag.is_(True))
+        .group_by(Game.state)
+    )
+
+
 def query_hand_list(hand_id: str) -> List[Hand]:
     """
     Retrieve list of cards contained in the specified hand.
@@ -56,9 +117,48 @@ def query_hand_list(hand_id: str) -> List[Hand]:
     :return: [description]
     :rtype: List[Dict]
     """
+    if packed_hands():
+        a_hand = query_packed_hand(hand_id)
+        if a_hand is None:
+            return []
+        return packed_hand.expand(hand_id, a_hand.cards)
     return Hand.query.filter(Hand.hand_id == hand_id).order_by(Hand.seq).all()
 
 
+def query_packed_hand(hand_id: str) -> Optional[PackedHand]:
+    """
+    Retrieve the packed row of the specified hand.
+
+    :param hand_id: ID of the hand
+    :type hand_id: str
+    :return: The hand's row, or None when it holds no cards.
+    :rtype: Optional[PackedHand]
+    """
+    return PackedHand.query.get(str(hand_id))
+
+
+def query_hand_counts(hand_ids: List[str]) -> Dict[str, int]:
+    """
+    Count the cards in each of the specified hands.
+
+    :param hand_ids: IDs of the hands
+    :type hand_ids: List[str]
+    :return: Number of cards, keyed by hand ID; empty hands may be omitted.
+    :rtype: Dict[str, int]
+    """
+    if packed_hands():
+        return {
+            str(a_hand.hand_id): len(a_hand.cards) // 2
+            for a_hand in PackedHand.query.filter(PackedHand.hand_id.in_(hand_ids))
+        }
+    return {
+        str(hand_id): count
+        for hand_id, count in db.session.query(Hand.hand_id, func.count(Hand._id))
+        .filter(Hand.hand_id.in_(hand_ids))
+        .group_by(Hand.hand_id)
+    }
+
+
 def query_hand_card(hand_id: str, card: str) -> Hand:
     """
     Query whether the specified hand contains the specified card.
@@ -70,12 +170,16 @@ def query_hand_card(hand_id: str, card: str) -> Hand:
     :return: [description]
     :rtype: Dict
     """
-    retval = Hand.query.filter(Hand.hand_id == hand_id, Hand.card == card).all()
+    if packed_hands():
+        retval = [x for x in query_hand_list(hand_id) if x.card == card]
+    else:
+        retval = Hand.query.filter(Hand.hand_id == hand_id, Hand.card == card).all()
     if retval:
         return retval[0]
     return None
 
 
+@request_cache.memoize
 def query_player(player_id: str) -> Player:
     """
     Retrieve information about the specified player.
@@ -98,6 +202,7 @@ def query_player_list() -> List[Player]:
     return Player.query.order_by(Player.name).all()
 
 
+@request_cache.memoize
 def query_round(round_id: str) -> Round:
     """
     Retrieve information about the specified round.
@@ -110,6 +215,7 @@ def query_round(round_id: str) -> Round:
     return Round.query.filter(Round.round_id == round_id).one_or_none()
 
 
+@request_cache.memoize
 def query_gameround(game_id: str, round_id: str) -> GameRound:
     """
     Retrieve information about the specified game/round.
@@ -126,6 +232,7 @@ def query_gameround(game_id: str, round_id: str) -> GameRound:
     ).one_or_none()
 
 
+@request_cache.memoize
 def query_gameround_for_game(game_id: str) -> GameRound:
     """
     Retrieve information about the active round for a given game.
@@ -135,20 +242,14 @@ def query_gameround_for_game(game_id: str) -> GameRound:
     :return: [description]
     :rtype: GameRound
     """
-    temp = GameRound.query.filter(
-        GameRound.game_id == game_id, GameRound.active_flag is True
+    # A Python "is" comparison here would filter out every row before the query
+    # reached the database, so compare in SQL.
+    return GameRound.query.filter(
+        GameRound.game_id == game_id, GameRound.active_flag.is_(True)
     ).one_or_none()
 
-    # Sqlite stores active_flag as 1 but doesn't compare favorably with True.
-    if temp is None:
-        temp = GameRound.query.filter(
-            GameRound.game_id == game_id, GameRound.active_flag == 1
-        ).one_or_none()
-
-    # print(f"gameround={temp}")
-    return temp
-
 
+@request_cache.memoize
 def query_gameround_for_round(round_id: str) -> GameRound:
     """
     Retrieve information about the active round for a given game.
@@ -158,18 +259,65 @@ def query_gameround_for_round(round_id: str) -> GameRound:
     :return: [description]
     :rtype: GameRound
     """
-    temp = GameRound.query.filter(
-        GameRound.round_id == round_id, GameRound.active_flag is True
+    # A Python "is" comparison here would filter out every row before the query
+    # reached the database, so compare in SQL.
+    return GameRound.query.filter(
+        GameRound.round_id == round_id, GameRound.active_flag.is_(True)
     ).one_or_none()
 
-    # Sqlite stores active_flag as 1 but doesn't compare favorably with True.
-    if temp is None:
-        temp = GameRound.query.filter(
-            GameRound.round_id == round_id, GameRound.active_flag == 1
-        ).one_or_none()
 
-    # print(f"gameround={temp}")
-    return temp
+@metadata_cache.cached("round_game")
+def query_game_id_for_round(round_id: str) -> Optional[str]:
+    """
+    Retrieve the ID of the game a round belongs to.
+
+    :param round_id: ID of the round
+    :type round_id: str
+    :return: ID of the game, or None if the round isn't part of a game.
+    :rtype: Optional[str]
+    """
+    temp = (
+        GameRound.query.with_entities(GameRound.game_id)
+        .filter(GameRound.round_id == round_id)
+        .first()
+    )
+    return str(temp.game_id) if temp is not None else None
+
+
+# Not cached across requests: the active round changes with every new round.
+@request_cache.memoize
+def query_active_round_id(game_id: str) -> Optional[str]:
+    """
+    Retrieve the ID of the active round of a game.
+
+    :param game_id: ID of the game
+    :type game_id: str
+    :return: ID of the round, or None if the game has no active round.
+    :rtype: Optional[str]
+    """
+    temp = query_gameround_for_game(game_id)
+    return str(temp.round_id) if temp is not None else None
+
+
+@request_cache.memoize
+def query_active_game_id_for_player(player_id: str) -> Optional[str]:
+    """
+    Retrieve the ID of the game a player is playing, through the active round of
+    their team.
+
+    :param player_id: ID of the player
+    :type player_id: str
+    :return: ID of the game, or None if the player's team isn't in an active round.
+    :rtype: Optional[str]
+    """
+    temp = (
+        db.session.query(GameRound.game_id)
+        .join(RoundTeam, RoundTeam.round_id == GameRound.round_id)
+        .join(TeamPlayers, TeamPlayers.team_id == RoundTeam.team_id)
+        .filter(TeamPlayers.player_id == player_id, GameRound.active_flag.is_(True))
+        .first()
+    )
+    return str(temp.game_id) if temp is not None else None
 
 
 def query_gameround_list() -> List[GameRound]:
@@ -192,6 +340,7 @@ def query_round_list() -> List[Round]:
     return Round.query.order_by(Round.timestamp).all()
 
 
+@request_cache.memoize
 def query_roundteam(round_id: str, team_id: str) -> RoundTeam:
     """
     Retrieve information about a specified round/team pair.
@@ -208,6 +357,7 @@ def query_roundteam(round_id: str, team_id: str) -> RoundTeam:
     ).one_or_none()
 
 
+@request_cache.memoize
 def query_team(team_id: str) -> Team:
     """
     Retrieve information about a specified team pair.
@@ -220,6 +370,7 @@ def query_team(team_id: str) -> Team:
     return Team.query.filter(Team.team_id == team_id).one_or_none()
 
 
+@request_cache.memoize
 def query_roundteam_list(round_id: str) -> List[RoundTeam]:
     """
     Retrieve information about the specified roundteam.
@@ -254,6 +405,7 @@ def query_roundteam_with_hand(round_id: str, team_id: str) -> RoundTeam:
     ).one_or_none()
 
 
+@request_cache.memoize
 def query_teamplayer_list(team_id: str) -> List[TeamPlayers]:
     """
     Retrieve information about the specified teamplayers.
@@ -270,34 +422,99 @@ def query_teamplayer_list(team_id: str) -> List[TeamPlayers]:
     )
 
 
+@metadata_cache.cached("round_players")
 def query_player_ids_for_round(round_id: str) -> List[str]:
     """
-    Query the database for the list of player IDs in this round.
+    Query the database for the list of player IDs in this round, grouped by team in
+    team order.
 
     :param round_id: Round ID to query
     :type round_id: str
     :return: [description]
     :rtype: List[str]
     """
-    # print(f"round_id={round_id}")
-    # Get the round requested
-    a_round: Round = query_round(round_id)
+    return [
+        str(player_id)
+        for player_id, in _round_players_query(round_id)
+        .with_entities(TeamPlayers.player_id)
+        .all()
+    ]
+
+
+@metadata_cache.cached("team_players")
+def query_team_player_ids(team_id: str) -> List[str]:
+    """
+    Query the database for the list of player IDs on this team, in player order.
+
+    :param team_id: Team ID to query
+    :type team_id: str
+    :return: IDs of the team's players.
+    :rtype: List[str]
+    """
+    return [
+        str(player_id)
+        for player_id, in TeamPlayers.query.with_entities(TeamPlayers.player_id)
+        .filter(TeamPlayers.team_id == team_id)
+        .order_by(TeamPlayers.player_order)
+        .all()
+    ]
 
-    # Did we find a round?
-    if a_round is None or a_round == {}:
-        return []
 
-    # Retrieve the information for the round and teams.
-    round_t = query_roundteam_list(round_id)
+def query_round_players(round_id: str) -> List[Tuple[str, Player]]:
+    """
+    Retrieve the players in this round along with their team, in a single query.
+
+    :param round_id: Round ID to query
+    :type round_id: str
+    :return: Team ID and player of each player, grouped by team in team order.
+    :rtype: List[Tuple[str, Player]]
+    """
+    return [
+        (str(team_id), a_player)
+        for team_id, a_player in _round_players_query(round_id)
+        .join(Player, Player.player_id == TeamPlayers.player_id)
+        .with_entities(RoundTeam.team_id, Player)
+        .all()
+    ]
 
-    player_ids = []
-    # Collect the individual players from the round's teams.
-    for t_team_id in [str(x.team_id) for x in round_t]:
-        for team_info in query_teamplayer_list(t_team_id):
-            # Add each player to the list
-            player_ids.append(str(team_info.player_id))
 
-    return player_ids
+def query_team_meld_scores(round_id: str) -> List[Tuple[str, int, int]]:
+    """
+    Retrieve each team's score along with the total meld score of its players, in a
+    single query.
+
+    :param round_id: Round ID to query
+    :type round_id: str
+    :return: Team ID, team score and the team's meld score, in team order.
+    :rtype: List[Tuple[str, int, int]]
+    """
+    return [
+        (str(team_id), score, meld_score or 0)
+        for team_id, score, meld_score in db.session.query(
+            RoundTeam.team_id, Team.score, func.sum(Player.meld_score)
+        )
+        .join(Team, Team.team_id == RoundTeam.team_id)
+        .outerjoin(TeamPlayers, TeamPlayers.team_id == RoundTeam.team_id)
+        .outerjoin(Player, Player.player_id == TeamPlayers.player_id)
+        .filter(RoundTeam.round_id == round_id)
+        .group_by(RoundTeam.team_id, Team.score, RoundTeam.team_order)
+        .order_by(RoundTeam.team_order)
+        .all()
+    ]
+
+
+def _round_players_query(round_id: str):
+    """
+    Build the query joining a round to its teams' players, grouped by team in team
+    order. Rounds that don't exist have no players.
+    """
+    return (
+        db.session.query(TeamPlayers)
+        .join(RoundTeam, RoundTeam.team_id == TeamPlayers.team_id)
+        .join(Round, Round.round_id == RoundTeam.round_id)
+        .filter(RoundTeam.round_id == round_id)
+        .order_by(RoundTeam.team_order, TeamPlayers.player_order)
+    )
 
 
 def query_trick(trick_id: str) -> Trick:
@@ -321,12 +538,11 @@ def query_trick_for_round_id(round_id: str) -> Trick:
     :return: [description]
     :rtype: Dict
     """
-    trick_list = Trick.query.filter(Trick.round_id == round_id).order_by(Trick._id).all()
-    # print(f"query_trick_for_round_id: {trick_list=}")
-    if trick_list:
-        return trick_list[len(trick_list) - 1]
-
-    return None
+    return (
+        Trick.query.filter(Trick.round_id == round_id)
+        .order_by(Trick._id.desc())  # pylint: disable=protected-access
+        .first()
+    )
 
 
 def query_all_tricks_for_round_id(round_id: str) -> List[Trick]:
@@ -351,3 +567,72 @@ def query_all_tricks() -> List[Trick]:
     :rtype: Dict
     """
     return Trick.query.filter().all()
+
+
+def query_last_event_seq(round_id: str) -> int:
+    """
+    Retrieve the sequence number of the last event logged for a round.
+
+    :param round_id: ID of the round.
+    :type round_id: str
+    :return: The sequence number, or 0 when nothing has been logged.
+    :rtype: int
+    """
+    return (
+        db.session.query(func.max(GameEvent.seq))
+        .filter(GameEvent.round_id == round_id)
+        .scalar()
+        or 0
+    )
+
+
+def query_round_events(round_id: str, after_seq: int = 0) -> List[GameEvent]:
+    """
+    Retrieve the events logged for a round after a sequence number, in order.
+
+    :param round_id: ID of the round.
+    :type round_id: str
+    :param after_seq: Sequence number of the last event already known.
+    :type after_seq: int
+    :return: The events.
+    :rtype: List[GameEvent]
+    """
+    return (
+        GameEvent.query.filter(
+            GameEvent.round_id == round_id, GameEvent.seq > after_seq
+        )
+        .order_by(GameEvent.seq)
+        .all()
+    )
+
+
+def query_game_events(game_id: str) -> List[GameEvent]:
+    """
+    Retrieve the events logged for every round of a game, in the order logged.
+
+    :param game_id: ID of the game.
+    :type game_id: str
+    :return: The events.
+    :rtype: List[GameEvent]
+    """
+    return (
+        GameEvent.query.filter(GameEvent.game_id == game_id)
+        .order_by(GameEvent.event_id)
+        .all()
+    )
+
+
+def query_round_snapshot(round_id: str) -> Optional[RoundSnapshot]:
+    """
+    Retrieve the latest snapshot of a round's state.
+
+    :param round_id: ID of the round.
+    :type round_id: str
+    :return: The snapshot, or None when none has been taken.
+    :rtype: Optional[RoundSnapshot]
+    """
+    return (
+        RoundSnapshot.query.filter(RoundSnapshot.round_id == round_id)
+        .order_by(RoundSnapshot.seq.desc())
+        .first()
+    )
@@ -1,15 +1,20 @@
 """
 This is the module that handles Pinochle game play.
+
+Each game action runs as a single database transaction, so it's applied entirely or
+not at all, and its broadcasts are sent once it's committed.
 """
 import json
 import uuid
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from flask import abort, make_response
 from flask.wrappers import Response
 
 from . import (
     game,
+    game_engine,
+    game_events,
     gameround,
     hand,
     player,
@@ -20,12 +25,13 @@ from . import (
     setup_logging,
     team,
     trick,
+    trick_resolver,
 )
 from .cards import utils as card_utils
 from .cards.const import SUITS
 from .cards.deck import PinochleDeck
-from .cards.utils import convert_to_svg_names, deal_hands
-from .models import utils
+from .cards.utils import deal_card_names
+from .models import unit_of_work, utils
 from .models.game import Game
 from .models.gameround import GameRound
 from .models.hand import Hand
@@ -63,7 +69,10 @@ class GameModes:
             self._mode += 1
 
 
-def deal_pinochle(player_ids: list, kitty_len: int = 0, kitty_id: str = None) -> None:
+@unit_of_work.transactional
+def deal_pinochle(
+    player_ids: list, kitty_len: int = 0, kitty_id: str = None
+) -> Dict[str, List[str]]:
     """
     Deal a deck of Pinochle cards into player's hands and the kitty.
 
@@ -73,22 +82,37 @@ def deal_pinochle(player_ids: list, kitty_len: int = 0, kitty_id: str = None) ->
     :type kitty_len: int
     :param kitty_id: [description]
     :type kitty_id: str
+    :return: The cards dealt, by hand ID.
+    :rtype: Dict[str, List[str]]
     """
     # TODO: Think about changing this to 'look' more like a traditional deal. One or
     # three cards dealt from the top of the stack, occassionally contribuing one to the
     # kitty, if applicable. It shouldn't make an actual difference, but...
 
     LOG.debug("player_ids=%s", player_ids)
-    hand_decks, kitty_deck = deal_hands(players=len(player_ids), kitty_cards=kitty_len)
+    hand_cards, kitty_cards = deal_card_names(
+        players=len(player_ids), kitty_cards=kitty_len
+    )
+
+    # Look up every player's hand at once.
+    hand_ids = {
+        str(player_id): str(hand_id)
+        for player_id, hand_id in Player.query.with_entities(
+            Player.player_id, Player.hand_id
+        ).filter(Player.player_id.in_([str(x) for x in player_ids]))
+    }
 
+    dealt = {}
     if kitty_len > 0 and kitty_id is not None:
-        hand.addcards(hand_id=kitty_id, cards=convert_to_svg_names(kitty_deck))
-    for index, __ in enumerate(player_ids):
-        player_info: Optional[Player] = utils.query_player(player_ids[index])
-        hand_id = str(player_info.hand_id) if player_info else utils.UUID_ZEROS
-        hand.addcards(hand_id=hand_id, cards=convert_to_svg_names(hand_decks[index]))
+        dealt[str(kitty_id)] = kitty_cards
+    for index, player_id in enumerate(player_ids):
+        hand_id = hand_ids.get(str(player_id), utils.UUID_ZEROS)
+        dealt.setdefault(hand_id, []).extend(hand_cards[index])
+    hand.addcards_bulk(dealt)
+    return dealt
 
 
+@unit_of_work.transactional
 def set_players_bidding(player_ids: list) -> None:
     """
     Update each player's record to indicate they are participating in this round's
@@ -102,6 +126,7 @@ def set_players_bidding(player_ids: list) -> None:
         player.update(player_id, {"bidding": True})
 
 
+@unit_of_work.transactional
 def set_player_pass(player_id: str) -> None:
     """
     Update supplied player's record to indicate they are no longer participating in this
@@ -124,11 +149,16 @@ def players_still_bidding(round_id: str) -> List[str]:
     :rtype: List[str]
     """
     player_ids = roundteams.create_ordered_player_list(round_id)
-    return [
-        player_id for player_id in player_ids if utils.query_player(player_id).bidding
-    ]
+    bidding = {
+        str(a_player.player_id)
+        for __, a_player in utils.query_round_players(round_id)
+        if a_player.bidding
+    }
+    return [player_id for player_id in player_ids if player_id in bidding]
 
 
+@game_engine.action("round_id")
+@unit_of_work.transactional
 def submit_bid(round_id: str, player_id: str, bid: int):
     """
     This function processes a bid submission for a player.
@@ -151,10 +181,17 @@ def submit_bid(round_id: str, player_id: str, bid: int):
     if a_player is None or a_player == {}:
         abort(404, f"Player {player_id} not found.")
 
+    if not a_player.bidding:
+        # Players who have passed are out of the bidding for the round.
+        abort(409, f"Player {player_id} has already passed.")
+
     if bid != -1 and a_round.bid >= bid:
         # New bid must be higher than current bid.
         abort(409, f"Bid {bid} is below current bid {a_round.bid}.")
 
+    # Bids are taken in turn, so conflict with any other bid for the round.
+    unit_of_work.claim(a_round)
+
     # Determine the next player to bid this round.
     ordered_player_list = players_still_bidding(round_id)
     next_bid_player_idx = determine_next_bidder_player_id(
@@ -162,7 +199,7 @@ def submit_bid(round_id: str, player_id: str, bid: int):
     )
 
     # If the bid is still progressing, continue prompting.
-    game_id = str(utils.query_gameround_for_round(round_id).game_id)
+    game_id = utils.query_game_id_for_round(round_id)
     if bid > 0:
         # Prompt that player to bid.
         send_bid_message(
@@ -172,11 +209,13 @@ def submit_bid(round_id: str, player_id: str, bid: int):
             bid if bid > 0 else a_round.bid,
         )
 
+        game_events.bid(round_id, player_id, bid)
         return round_.update(round_id, {"bid": bid, "bid_winner": player_id})
 
     ## Bid == -1
     # If supplied bid is -1, this indicates the player passed.
     set_player_pass(player_id)
+    game_events.passed(round_id, player_id)
 
     if len(ordered_player_list) == 2:  # Now one since a player passed...
         send_bid_message(
@@ -188,13 +227,12 @@ def submit_bid(round_id: str, player_id: str, bid: int):
         # TODO: Figure out if this can possibly happen more than once. I don't think so,
         # but it would add another set of cards to the player's hand if it did.
         # Add the cards from the kitty, if any, to the player's hand.
-        for hand_obj in utils.query_hand_list(str(utils.query_round(round_id).hand_id)):
-            hand.addcard(
-                str(
-                    utils.query_player(ordered_player_list[next_bid_player_idx]).hand_id
-                ),
-                hand_obj.card,
+        kitty_cards = [x.card for x in utils.query_hand_list(str(a_round.hand_id))]
+        if kitty_cards:
+            winner_hand_id = str(
+                utils.query_player(ordered_player_list[next_bid_player_idx]).hand_id
             )
+            hand.addcards_bulk({winner_hand_id: kitty_cards})
         # Record the bid winner's ID
         round_.update(
             round_id, {"bid_winner": ordered_player_list[next_bid_player_idx]}
@@ -217,6 +255,8 @@ def submit_bid(round_id: str, player_id: str, bid: int):
     return {}, 200
 
 
+@game_engine.action("round_id")
+@unit_of_work.transactional
 def finalize_meld(round_id: str, player_id: str):
     """
     This function processes a meld finalize submission for a player.
@@ -245,14 +285,19 @@ def finalize_meld(round_id: str, player_id: str):
     if player_id not in player_list:
         abort(404, f"Player {player_id} not playing this round.")
 
+    # Conflict with other players finalizing at the same time, so the last of them
+    # sees everyone's meld is final.
+    unit_of_work.claim(a_round)
+
     player.update(player_id, {"meld_final": True})
 
     # Check to see if all players are ready for the next round.
-    if all(utils.query_player(x).meld_final for x in player_list):
+    if all(x.meld_final for __, x in utils.query_round_players(round_id)):
         # All meld is final
         total_team_scores(round_id)
 
 
+@unit_of_work.transactional
 def total_team_scores(round_id: str):
     """
     All meld is final, total the team scores so far and update the database.
@@ -263,16 +308,10 @@ def total_team_scores(round_id: str):
     LOG.debug("finalize_bid: Totalling team scores")
 
     ws_mess = WSM()
-    game_id = str(utils.query_gameround_for_round(round_id).game_id)
+    game_id = utils.query_game_id_for_round(round_id)
 
     # Total each team's meld.
-    for t_roundteam in utils.query_roundteam_list(round_id):
-        team_id = str(t_roundteam.team_id)
-        total = utils.query_team(team_id).score
-        meld_score = sum(
-            utils.query_player(t_player.player_id).meld_score
-            for t_player in utils.query_teamplayer_list(team_id)
-        )
+    for team_id, total, meld_score in utils.query_team_meld_scores(round_id):
         total += meld_score
         team.update(team_id, {"score": total})
 
@@ -336,6 +375,8 @@ def send_bid_message(message_type: str, game_id: str, player_id: str, bid: int):
     ws_mess.websocket_broadcast(game_id, message)
 
 
+@game_engine.action("round_id")
+@unit_of_work.transactional
 def set_trump(round_id: str, player_id: str, trump: str):
     """
     This function processes trump submission by a player.
@@ -372,14 +413,17 @@ def set_trump(round_id: str, player_id: str, trump: str):
         "action": "trump_selected",
         "trump": trump,
     }
-    game_id = str(utils.query_gameround_for_round(round_id).game_id)
+    game_id = utils.query_game_id_for_round(round_id)
     ws_mess.websocket_broadcast(game_id, message)
 
     # Step to next game state.
     game.update(game_id, state=True)
+    game_events.trump(round_id, trump)
     return round_.update(round_id, {"trump": trump})
 
 
+@game_engine.synced("round_id")
+@unit_of_work.transactional
 def start(round_id: str):
     """
     This function starts a round if all the requirements are satisfied.
@@ -393,7 +437,7 @@ def start(round_id: str):
 
     # Get the round requested
     a_round: Round = utils.query_round(round_id)
-    a_gameround: GameRound = utils.query_gameround_for_round(round_id)
+    game_id = utils.query_game_id_for_round(round_id)
 
     # Did we find a round?
     if not a_round:
@@ -409,7 +453,7 @@ def start(round_id: str):
         abort(409, f"No teams found for round {round_id}.")
 
     # Retrieve the information for the associated game.
-    a_game: Game = utils.query_game(str(a_gameround.game_id))
+    a_game: Game = utils.query_game(game_id)
 
     # Did we find a game?
     if a_game is None:
@@ -423,12 +467,11 @@ def start(round_id: str):
 
     # Collect the individual players from the round's teams.
     player_hand_id = {}
-    for t_team_id in [str(x.team_id) for x in round_t]:
-        for team_info in utils.query_teamplayer_list(t_team_id):
-            # Generate new team hand IDs.
-            new_hand_id = str(uuid.uuid4())
-            player_hand_id[str(team_info.player_id)] = new_hand_id
-            player.update(team_info.player_id, {"hand_id": new_hand_id})
+    for player_id in utils.query_player_ids_for_round(round_id):
+        # Generate new team hand IDs.
+        new_hand_id = str(uuid.uuid4())
+        player_hand_id[player_id] = new_hand_id
+        player.update(player_id, {"hand_id": new_hand_id})
 
     LOG.debug("kitty=%s", kitty)
     LOG.debug("player_hand_id=%s", player_hand_id)
@@ -439,17 +482,20 @@ def start(round_id: str):
         trick.create(round_id)
 
     # Time to deal the cards.
-    deal_pinochle(
+    dealt = deal_pinochle(
         player_ids=list(player_hand_id.keys()),
         kitty_len=a_game.kitty_size,
         kitty_id=kitty,
     )
+    game_events.deal(
+        round_id,
+        {x: dealt.get(y, []) for x, y in player_hand_id.items()},
+        dealt.get(kitty, []),
+    )
 
     # Reset player's flags to enable bidding.
     set_players_bidding(list(player_hand_id.keys()))
 
-    game_id = str(a_gameround.game_id)
-
     # Determine the first player to bid this round.
     ordered_player_list = roundteams.create_ordered_player_list(round_id)
     first_bid_player_id = ordered_player_list[
@@ -475,6 +521,8 @@ def start(round_id: str):
     return make_response(f"Round {round_id} started.", 200)
 
 
+@game_engine.action("round_id")
+@unit_of_work.transactional
 def score_hand_meld(round_id: str, player_id: str, cards: str):
     """
     This function scores a player's meld hand given the list of cards.
@@ -489,7 +537,7 @@ def score_hand_meld(round_id: str, player_id: str, cards: str):
     # Get the round requested
     a_round: Round = utils.query_round(round_id)
     a_player: Optional[Player] = utils.query_player(player_id)
-    game_id: str = str(utils.query_gameround_for_round(round_id).game_id)
+    game_id: str = utils.query_game_id_for_round(round_id)
 
     # Did we find a round?
     if a_round is None or a_round == {}:
@@ -532,6 +580,7 @@ def score_hand_meld(round_id: str, player_id: str, cards: str):
         score = score_meld.score(provided_deck)
 
     player.update(player_id=player_id, data={"meld_score": score})
+    game_events.meld(round_id, player_id, card_list, score)
 
     # Send card list and meld score to other players via Websocket
     message = {
@@ -547,6 +596,8 @@ def score_hand_meld(round_id: str, player_id: str, cards: str):
     return make_response(json.dumps({"score": score}), 200)
 
 
+@game_engine.synced("game_id")
+@unit_of_work.transactional
 def new_round(game_id: str, current_round: str) -> Response:
     """
     Cycle the game to a new round.
@@ -586,6 +637,8 @@ def new_round(game_id: str, current_round: str) -> Response:
     return start(temp_round_id)
 
 
+@game_engine.action("round_id")
+@unit_of_work.transactional
 def start_next_trick(round_id: str, player_id: str) -> Response:
     """
     Create a new trick setting player_id as the 'bid winner'.
@@ -610,12 +663,15 @@ def start_next_trick(round_id: str, player_id: str) -> Response:
     if player_id not in round_player_list:
         abort(409, f"No player found for {player_id}.")
 
+    # Conflict with other actions on the round made at the same time.
+    unit_of_work.claim(a_round)
+
     # Create the next trick.
     t_trick, _ = trick.create(round_id)
     trick.update(str(t_trick["trick_id"]), {"trick_starter": player_id})
 
     # Send notice of new trick to all players via Websocket
-    game_id: str = str(utils.query_gameround_for_round(round_id).game_id)
+    game_id: str = utils.query_game_id_for_round(round_id)
     message = {
         "action": "trick_next",
         "game_id": game_id,
@@ -653,6 +709,8 @@ def reorder_players(round_id: str, winner_id: str) -> List[str]:
     return [round_player_id_list[x] for x in ordered_player_index_list]
 
 
+@game_engine.action("round_id")
+@unit_of_work.transactional
 def play_trick_card(round_id: str, player_id: str, card: str) -> Response:
     """
     Accept a card played by player for current trick.
@@ -666,7 +724,7 @@ def play_trick_card(round_id: str, player_id: str, card: str) -> Response:
     # Get the round requested
     a_round: Round = utils.query_round(round_id)
     a_player: Optional[Player] = utils.query_player(player_id)
-    game_id: str = str(utils.query_gameround_for_round(round_id).game_id)
+    game_id: str = utils.query_game_id_for_round(round_id)
 
     # Did we find a round?
     if a_round is None or a_round == {}:
@@ -695,20 +753,26 @@ def play_trick_card(round_id: str, player_id: str, card: str) -> Response:
     if card not in player_hand_list:
         abort(409, f"Card {card} not in player's hand.")
 
-    # TODO: Make sure the player hasn't already sent a card for this trick.
+    # Cards are played to the trick in turn, so conflict with any other card played
+    # to the round at the same time.
+    unit_of_work.claim(a_round)
 
     # Determine the order of the players
     ordered_player_id_list: List[str] = reorder_players(
         str(round_id), str(a_trick.trick_starter)
     )
+    player_seq = ordered_player_id_list.index(player_id)
 
     # Obtain trick hand ID
     trick_hand_id = str(a_trick.hand_id)
 
-    # Add card to trick deck
-    hand.addcard(trick_hand_id, card, ordered_player_id_list.index(player_id))
-    # Remove card from player's hand
-    hand.deletecard(player_hand_id, card)
+    # Make sure the player hasn't already sent a card for this trick.
+    if any(x.seq == player_seq for x in utils.query_hand_list(trick_hand_id)):
+        abort(409, f"Player {player_id} already played to this trick.")
+
+    # Move the card from the player's hand to the trick deck
+    hand.movecard(player_hand_id, trick_hand_id, card, player_seq)
+    game_events.play(round_id, player_id, card)
 
     # Send played card to other players via Websocket
     message = {
@@ -727,32 +791,19 @@ def play_trick_card(round_id: str, player_id: str, card: str) -> Response:
     LOG.debug("play_trick_card: trick_hand_list=%s", trick_hand_list)
     if len(trick_hand_list) == len(ordered_player_id_list):
         LOG.debug("play_trick_card: trick_hand_list=%s", trick_hand_list)
-        winning_card: str = find_winning_trick_card(
-            trick_hand_list, f"{a_round.trump.capitalize()}s"
+        trick_cards = trick_resolver.card_ids([x.card for x in trick_hand_list])
+        winning_card_index = trick_resolver.winning_index(
+            trick_cards, f"{a_round.trump.capitalize()}s"
         )
+        winning_card: str = trick_hand_list[winning_card_index].card
         LOG.debug("play_trick_card: Winning card: %s", winning_card)
-        winning_card_index = -1
-        LOG.debug("play_trick_card: Trick cards: %s", [x.card for x in trick_hand_list])
-        LOG.debug(
-            "play_trick_card: Determining winning card index for %s:", winning_card
-        )
-        for index, t_hand in enumerate(trick_hand_list):
-            LOG.debug("play_trick_card: index: %s = %s", index, t_hand.card)
-            if winning_card == t_hand.card:
-                winning_card_index = index
-                break
-        assert winning_card_index != -1
         LOG.debug("play_trick_card: winning_card_index=%s", winning_card_index)
 
         # Determine the player_id who won the trick and their team_id.
         winning_player_id: str = ordered_player_id_list[winning_card_index]
-        a_roundteam_list = utils.query_roundteam_list(round_id)
-        team_id_list = [x.team_id for x in a_roundteam_list]
         winning_team_id = None
-        for team_id in team_id_list:
-            if winning_player_id in [
-                str(x.player_id) for x in utils.query_teamplayer_list(team_id)
-            ]:
+        for team_id, a_player in utils.query_round_players(round_id):
+            if str(a_player.player_id) == winning_player_id:
                 winning_team_id = team_id
         assert winning_team_id
         winning_team_hand_id = str(
@@ -765,6 +816,7 @@ def play_trick_card(round_id: str, player_id: str, card: str) -> Response:
             hand.addcard(winning_team_hand_id, a_hand.card)
         # Update the trick winner in the database
         trick.update(str(a_trick.trick_id), {"trick_winner": winning_player_id})
+        game_events.trick_won(round_id, winning_player_id, winning_team_id)
 
         # Check to see if a player has cards left in their hand.
         if hand.read_one(player_hand_id):
@@ -799,40 +851,11 @@ def find_winning_trick_card(trick_card_list: List[Hand], trump: str) -> str:
     :return: The card that won the trick.
     :rtype: str
     """
-    # Convert the list of cards (in Hand classes) to PinochleDeck
-    temp_deck = card_utils.convert_from_svg_names([x.card for x in trick_card_list])
-    trick_deck = card_utils.set_trump(trump, temp_deck)
-
-    # If nothing else beats it, the card led for the trick wins.
-    winning_card = trick_deck[0]
-    suit_led = winning_card.suit
-
-    for card in trick_deck:
-        LOG.debug("card=%s  -  winning_card=%s  -  trump=%s", card, winning_card, trump)
-        if winning_card == card:
-            LOG.debug("%s == %s", winning_card, card)
-            continue
-        if card.suit == trump and winning_card.suit != trump:
-            LOG.debug(
-                "%s == %s and %s != %s", card.suit, trump, winning_card.suit, trump
-            )
-            winning_card = card
-            suit_led = winning_card.suit
-            continue
-        if card.suit == suit_led and card > winning_card:
-            LOG.debug(
-                "%s == %s and %s > %s",
-                card.suit,
-                suit_led,
-                card.value,
-                winning_card.value,
-            )
-            winning_card = card
-            continue
-
-    return card_utils.convert_to_svg_name(winning_card)
+    trick_cards = trick_resolver.card_ids([x.card for x in trick_card_list])
+    return trick_card_list[trick_resolver.winning_index(trick_cards, trump)].card
 
 
+@unit_of_work.transactional
 def notify_round_complete(
     game_id: str, round_id: str, winning_player_id: str, winning_team_id: str
 ):
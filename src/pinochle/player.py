@@ -6,8 +6,8 @@ player data
 import sqlalchemy
 from flask import abort, make_response
 
-from . import hand
-from .models import utils
+from . import game_engine, hand
+from .models import unit_of_work, utils
 from .models.core import db
 from .models.hand import HandSchema
 from .models.player import PlayerSchema
@@ -99,7 +99,7 @@ def create(name: dict):
 
         # Add the player to the database
         db.session.add(new_player)
-        db.session.commit()
+        unit_of_work.commit()
 
         # Serialize and return the newly created player in the response
         data = schema.dump(new_player)
@@ -111,6 +111,7 @@ def create(name: dict):
     abort(400, f"Player {name} could not be added to the database.")
 
 
+@game_engine.synced("player_id")
 def addcard(player_id: str, card: dict):
     """
     This function responds to internal (non-API) database access requests
@@ -135,6 +136,7 @@ def addcard(player_id: str, card: dict):
     return hand.addcard(hand_id, s_card)
 
 
+@game_engine.action("player_id", "delete_card")
 def deletecard(player_id: str, card: str):
     """
     This function responds to internal (non-API) database access requests
@@ -194,7 +196,7 @@ def _update_data(player_id: str, data: dict):
 
     # Add the updated data to the transaction.
     db_session.add(local_object)
-    db_session.commit()
+    unit_of_work.commit()
 
     # return updated player in the response
     schema = PlayerSchema()
@@ -218,7 +220,7 @@ def delete(player_id: str):
         db_session = db.session()
         local_object = db_session.merge(player)
         db_session.delete(local_object)
-        db_session.commit()
+        unit_of_work.commit()
         return make_response(f"Player {player_id} deleted", 200)
 
     # Otherwise, nope, didn't find that player
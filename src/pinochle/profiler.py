@@ -0,0 +1,192 @@
+"""
+On-demand profiling of a live worker process, for the /admin/profile endpoint.
+
+StackSampler samples the stack of every thread from an operating-system thread of
+its own, so it keeps sampling while a busy greenlet holds the worker's only thread,
+and the sampled code runs at full speed in between. Under gevent every greenlet
+shares one thread, so while sampling the greenlet switches are traced and each
+stack is filed under the function the running greenlet was spawned to run, with
+time spent waiting in the hub shown as ``gevent hub``. Frames are named
+``module:function``, so time in ws_messenger.websocket_broadcast, score_meld or
+sqlalchemy is told apart.
+
+Samples are returned as collapsed stacks, one line per distinct stack with the
+number of samples seen, ready for flamegraph.pl or speedscope. Alternatively
+profile_pstats() runs cProfile on the thread serving the request, which under
+gevent is the thread running every greenlet, and returns the pstats report.
+
+License: GPLv3
+"""
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+import greenlet
+from gevent import monkey
+from gevent.hub import Hub
+
+# Operating-system threads and sleep, even when gevent has patched the modules.
+_start_new_thread = monkey.get_original("_thread", "start_new_thread")
+_get_ident = monkey.get_original("_thread", "get_ident")
+_sleep = monkey.get_original("time", "sleep")
+
+FORMATS = ("collapsed", "pstats")
+
+
+class StackSampler:
+    """
+    Samples the stacks of the threads, and greenlets, of this process.
+
+    :arg float interval:
+        Seconds between samples.
+    :arg int max_depth:
+        Frames kept from the top of each stack.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._running = False
+        self._finished = True
+        self._sampler_ident: Optional[int] = None
+        # The greenlet last switched to in each thread traced.
+        self._current: Dict[int, greenlet.greenlet] = {}
+        self._previous_trace = None
+
+    def start(self) -> None:
+        """
+        Start sampling, tracing the greenlets of the calling thread.
+        """
+        if self._running:
+            raise RuntimeError("The sampler is already running.")
+        self._running = True
+        self._finished = False
+        self._current[_get_ident()] = greenlet.getcurrent()
+        self._previous_trace = greenlet.settrace(self._trace)
+        _start_new_thread(self._run, ())
+
+    def stop(self) -> Counter:
+        """
+        Stop sampling. Must be called from the thread that started it.
+
+        :return: Number of samples of each collapsed stack.
+        :rtype: Counter
+        """
+        self._running = False
+        greenlet.settrace(self._previous_trace)
+        # The sampler finishes within one interval; don't block the worker meanwhile.
+        while not self._finished:
+            time.sleep(self.interval)
+        return self.counts
+
+    def __enter__(self) -> "StackSampler":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _trace(self, event, args):
+        if event in ("switch", "throw"):
+            self._current[_get_ident()] = args[1]
+        if self._previous_trace is not None:
+            self._previous_trace(event, args)
+
+    def _run(self) -> None:
+        self._sampler_ident = _get_ident()
+        try:
+            while self._running:
+                self._sample()
+                _sleep(self.interval)
+        finally:
+            self._finished = True
+
+    def _sample(self) -> None:
+        # pylint: disable=protected-access
+        frames = sys._current_frames()
+        names = {x.ident: x.name for x in threading.enumerate()}
+        for ident, frame in frames.items():
+            if ident == self._sampler_ident:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                module = frame.f_globals.get("__name__", "?")
+                stack.append(f"{module}:{code.co_name}")
+                frame = frame.f_back
+            stack.append(self._root(ident, names.get(ident, str(ident))))
+            self.counts[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _root(self, ident: int, thread_name: str) -> str:
+        """
+        Name the thread, or greenlet, a stack was sampled from.
+        """
+        current = self._current.get(ident)
+        if current is None:
+            return f"thread {thread_name}"
+        if isinstance(current, Hub):
+            return "gevent hub"
+        if current.parent is None:
+            return f"thread {thread_name}"
+        run = getattr(current, "_run", None) or getattr(current, "run", None)
+        module = getattr(run, "__module__", None) or "?"
+        name = getattr(run, "__qualname__", None) or type(current).__name__
+        return f"greenlet {module}:{name}"
+
+
+def collapse(counts: Counter) -> str:
+    """
+    Format sampled stacks for flame graph tools, the most sampled first.
+
+    :param counts: Number of samples of each collapsed stack.
+    :type counts: Counter
+    :return: One "frame;frame;frame count" line per stack.
+    :rtype: str
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def sample(seconds: float, interval: float = 0.005) -> str:
+    """
+    Sample the stacks of this process for a while.
+
+    :param seconds: How long to sample for.
+    :type seconds: float
+    :param interval: Seconds between samples.
+    :type interval: float
+    :return: Collapsed stacks, see collapse.
+    :rtype: str
+    """
+    with StackSampler(interval) as sampler:
+        time.sleep(seconds)
+    return collapse(sampler.counts)
+
+
+def profile_pstats(seconds: float, limit: int = 60) -> str:
+    """
+    Profile the calling thread, and under gevent every greenlet, for a while.
+
+    :param seconds: How long to profile for.
+    :type seconds: float
+    :param limit: Number of functions reported.
+    :type limit: int
+    :return: The pstats report, by cumulative time.
+    :rtype: str
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        time.sleep(seconds)
+    finally:
+        profile.disable()
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
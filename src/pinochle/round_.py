@@ -7,8 +7,8 @@ from typing import List
 
 from flask import abort, make_response
 
-from . import gameround
-from .models import utils
+from . import game_engine, gameround
+from .models import unit_of_work, utils
 from .models.core import db
 from .models.round_ import Round, RoundSchema
 
@@ -79,7 +79,7 @@ def create(game_id: str):
 
     # Add the round to the database
     db.session.add(_round)
-    db.session.commit()
+    unit_of_work.commit()
 
     # Serialize and return the newly created round in the response
     data = schema.dump(_round)
@@ -91,6 +91,7 @@ def create(game_id: str):
     return gameround.create(game_id=game_id, round_id={"round_id": round_id})
 
 
+@game_engine.synced("round_id")
 def update(round_id: str, a_round: dict):
     """
     This function updates an existing round in the round structure
@@ -129,7 +130,7 @@ def _update_data(round_id: str, data: dict):
 
     # Add the updated data to the transaction.
     db_session.add(local_object)
-    db_session.commit()
+    unit_of_work.commit()
 
     # return updated round in the response
     schema = RoundSchema()
@@ -160,5 +161,5 @@ def delete(game_id: str, round_id: str):
     db_session = db.session()
     local_object = db_session.merge(a_round)
     db_session.delete(local_object)
-    db_session.commit()
+    unit_of_work.commit()
     return make_response(f"Round {round_id} deleted", 200)
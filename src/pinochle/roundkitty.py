@@ -2,8 +2,8 @@
 This is the roundkitty module which supports the REST actions relating to roundkitty data
 """
 
-from . import hand
-from .models import utils
+from . import game_engine, hand
+from .models import unit_of_work, utils
 from .models.core import db
 from .models.round_ import RoundSchema
 
@@ -44,6 +44,7 @@ def read(round_id: str):
     return data
 
 
+@game_engine.synced("round_id")
 def delete(round_id: str):
     """
     This function deletes the kitty cards for the round from the hand table
@@ -68,4 +69,4 @@ def delete(round_id: str):
         a_round.hand_id = None
         # merge the new object into the old and commit it to the db
         db.session.merge(a_round)
-        db.session.commit()
+        unit_of_work.commit()
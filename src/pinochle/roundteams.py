@@ -7,14 +7,13 @@ from typing import Dict, List, Union
 import sqlalchemy
 from flask import abort, make_response
 
-from . import setup_logging
-from .models import utils
+from . import game_engine, game_events, hand, setup_logging
+from .models import unit_of_work, utils
 from .models.core import db
 from .models.hand import Hand, HandSchema
 from .models.round_ import Round
 from .models.roundteam import RoundTeam, RoundTeamSchema
 from .models.team import Team
-from .models.teamplayers import TeamPlayers
 
 # pylint: disable=unused-import
 # from pinochle.models.utils import dump_db
@@ -109,6 +108,7 @@ def read(round_id: str, team_id: str):
     abort(404, f"No cards found for {round_id}/{team_id}")
 
 
+@game_engine.action("round_id", "add_team_card")
 def addcard(round_id: str, team_id: str, card: str):
     """
     This function responds to a PUT for /api/round/{round_id}/{team_id}?card=xxx
@@ -129,13 +129,19 @@ def addcard(round_id: str, team_id: str, card: str):
 
             # Create a hand instance using the schema and the passed in card
             schema = HandSchema()
-            new_card = schema.load(
-                {"hand_id": hand_id, "card": card}, session=db.session
-            )
+            if utils.packed_hands():
+                hand.addcard(hand_id, card)
+                new_card = utils.query_hand_card(hand_id=hand_id, card=card)
+            else:
+                new_card = schema.load(
+                    {"hand_id": hand_id, "card": card}, session=db.session
+                )
 
-            # Add the round to the database
-            db.session.add(new_card)
-            db.session.commit()
+                # Add the round to the database
+                db.session.add(new_card)
+                unit_of_work.commit()
+
+            game_events.discard(round_id, team_id, card)
 
             # Serialize and return the newly created card in the response
             data = schema.dump(new_card)
@@ -146,6 +152,7 @@ def addcard(round_id: str, team_id: str, card: str):
     abort(404, f"Couldn't add {card} to collection for {round_id}/{team_id}")
 
 
+@game_engine.synced("round_id")
 def deletecard(round_id: str, team_id: str, card: str):
     """
     This function responds to a DELETE for /api/round/{round_id}/{team_id}
@@ -169,16 +176,8 @@ def deletecard(round_id: str, team_id: str, card: str):
             # Extract the properly formatted UUID.
             hand_id = str(rt_data.hand_id)
 
-            # Locate the entry in Hand that corresponds to the hand_id and card
-            rt_data = Hand.query.filter(
-                Hand.hand_id == hand_id, Hand.card == card
-            ).one_or_none()
-
             # Delete the card from the database
-            db_session = db.session()
-            local_object = db_session.merge(rt_data)
-            db_session.delete(local_object)
-            db_session.commit()
+            hand.deletecard(hand_id, card)
 
             return 200
 
@@ -230,7 +229,8 @@ def create(round_id: str, teams: list):
         # Add the round to the database
         db.session.add(new_roundteam)
 
-    db.session.commit()
+    unit_of_work.commit()
+    unit_of_work.invalidate_cached("round_players", round_id)
 
     # Serialize and return the newly created round in the response
     data = schema.dump(new_roundteam)
@@ -279,7 +279,8 @@ def _update_data(round_id: str, data: dict):
 
     # Add the updated data to the transaction.
     db_session.add(local_object)
-    db_session.commit()
+    unit_of_work.commit()
+    unit_of_work.invalidate_cached("round_players", round_id)
 
     # return updated round in the response
     schema = RoundTeamSchema()
@@ -307,7 +308,8 @@ def delete(round_id: str, team_id: str):
         db_session = db.session()
         local_object = db_session.merge(a_round)
         db_session.delete(local_object)
-        db_session.commit()
+        unit_of_work.commit()
+        unit_of_work.invalidate_cached("round_players", round_id)
         return make_response(f"team {team_id} deleted from round {round_id}", 200)
 
     # Otherwise, nope, didn't find that round
@@ -324,13 +326,7 @@ def create_ordered_player_list(round_id: str) -> List[str]:
     :rtype:          List[str]
     """
     LOG.info("In roundteams.create_ordered_player_list")
-    round_t: list = utils.query_roundteam_list(round_id)
-    teams = [str(x.team_id) for x in round_t]
-
-    teamplayer_list = []
-    for t_team_id in teams:
-        t_teamplayer_list: List[TeamPlayers] = utils.query_teamplayer_list(t_team_id)
-        teamplayer_list += [str(x.player_id) for x in t_teamplayer_list]
+    teamplayer_list = utils.query_player_ids_for_round(round_id)
 
     # Create a ordered list of players alternating by team.  This assumes two teams,
     # which for pinochle is appropriate.
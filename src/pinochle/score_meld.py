@@ -2,14 +2,124 @@
 This scores a PinochleDeck (not a PinochleStack or list), taking into
 account trump suits.
 
+Hands are reduced to the number of cards held of each of the 24 card kinds and
+scored against a rule table precomputed for each trump suit, so a whole hand is
+scored, with an itemized breakdown, in a single pass over the table.
+
+``score_batch`` applies the same tables to many hands at once. It uses NumPy array
+operations when NumPy is installed and falls back to scoring each hand in turn.
+
 License: GPLv3
 """
 
-from typing import Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
-from . import custom_log
-from .cards import card, const
+from .cards import const
+from .cards.compact import NUM_KINDS, CompactHand, card_kind, kind_index
 from .cards.deck import PinochleDeck
+from .exceptions import InvalidSuitError
+
+# Meld categories, in the order they're reported in a breakdown.
+CATEGORIES = (
+    "nines",
+    "marriages",
+    "jacks",
+    "queens",
+    "kings",
+    "aces",
+    "run",
+    "pinochle",
+)
+
+# A rule scores the number of complete sets of its card kinds in a hand:
+# (category, kinds, points per set, points by number of sets). When the last entry
+# is empty the points are proportional to the number of sets.
+Rule = Tuple[str, Tuple[int, ...], int, Tuple[int, ...]]
+
+
+def _build_rules(trump: Optional[str]) -> Tuple[Rule, ...]:
+    """
+    Build the meld rule table used when the supplied suit is trump.
+
+    :param trump: Trump suit, or None before trump is called.
+    :type trump: str, optional
+    :return: Rules for that trump suit.
+    :rtype: Tuple[Rule, ...]
+    """
+    rules: List[Rule] = []
+
+    # Only nines of trump count for points, once trump is called.
+    if trump is not None:
+        rules.append(("nines", (kind_index("9", trump),), 1, ()))
+
+    # Marriages (king and queen of same suit) score 2 points per, double when trump.
+    for suit in const.SUITS:
+        rules.append(
+            (
+                "marriages",
+                (kind_index("King", suit), kind_index("Queen", suit)),
+                4 if suit == trump else 2,
+                (),
+            )
+        )
+
+    # One of each suit scores the single value, two of each suit ten times that.
+    for category, value, single in (
+        ("jacks", "Jack", 4),
+        ("queens", "Queen", 6),
+        ("kings", "King", 8),
+        ("aces", "Ace", 10),
+    ):
+        rules.append(
+            (
+                category,
+                tuple(kind_index(value, suit) for suit in const.SUITS),
+                0,
+                (0, single, single * 10),
+            )
+        )
+
+    # One of each J, Q, K, 10, A in the trump suit scores 15 points, minus four for
+    # the marriage counted already.
+    if trump is not None:
+        rules.append(
+            (
+                "run",
+                tuple(
+                    kind_index(value, trump) for value in const.VALUES if value != "9"
+                ),
+                11,
+                (),
+            )
+        )
+
+    # A Queen of Spades and a Jack of Diamonds scores 4 points, two of each 30.
+    rules.append(
+        (
+            "pinochle",
+            (kind_index("Queen", "Spades"), kind_index("Jack", "Diamonds")),
+            0,
+            (0, 4, 30),
+        )
+    )
+    return tuple(rules)
+
+
+# Rule tables for each possible trump suit, including no trump at all.
+RULES: Dict[Optional[str], Tuple[Rule, ...]] = {
+    trump: _build_rules(trump) for trump in [None] + const.SUITS
+}
+
+# Numeric trump codes used for batches of hands.
+_CODE_BY_SUIT: Dict[Optional[str], int] = {None: -1, "": -1}
+_CODE_BY_SUIT.update({suit: index for index, suit in enumerate(const.SUITS)})
+_SUIT_BY_CODE: Dict[int, Optional[str]] = {-1: None}
+_SUIT_BY_CODE.update(enumerate(const.SUITS))
 
 
 def score(deck: PinochleDeck) -> int:
@@ -21,37 +131,181 @@ def score(deck: PinochleDeck) -> int:
     :return: Deck's score
     :rtype: int
     """
-    mylog = custom_log.get_logger()
+    return breakdown(deck)[0]
+
+
+def breakdown(deck: PinochleDeck) -> Tuple[int, Dict[str, int]]:
+    """
+    Scores a deck of cards using meld rules, itemizing the score by category.
 
-    value = _nines(deck)
-    value += _marriages(deck)
-    value += _jacks(deck)
-    value += _queens(deck)
-    value += _kings(deck)
-    value += _aces(deck)
-    value += _run(deck)
-    value += _pinochle(deck)
+    :param deck: The deck to be scored.
+    :type deck: PinochleDeck
+    :return: Deck's score and the points scored in each category.
+    :rtype: Tuple[int, Dict[str, int]]
+    """
+    counts = [0] * NUM_KINDS
+    for a_card in deck:
+        counts[card_kind(a_card)] += 1
+    return score_counts(counts, _trump_suit(deck))
 
-    mylog.info("Score total: %s", value)
 
-    return value
+def score_hand(
+    hand: CompactHand, trump: Optional[str] = None
+) -> Tuple[int, Dict[str, int]]:
+    """
+    Scores a compact hand using meld rules, itemizing the score by category.
+
+    :param hand: The hand to be scored.
+    :type hand: CompactHand
+    :param trump: Trump suit, e.g. "Spades", or None before trump is called.
+    :type trump: str, optional
+    :return: Hand's score and the points scored in each category.
+    :rtype: Tuple[int, Dict[str, int]]
+    """
+    return score_counts(hand.counts(), trump)
 
 
-def _trump_suit(deck: PinochleDeck) -> Union[str, None]:
+def score_counts(
+    counts: Sequence[int], trump: Optional[str] = None
+) -> Tuple[int, Dict[str, int]]:
     """
-    Score nines in a deck.
-    Only nines of trump count for points.
+    Scores a hand, given as the number of cards of each kind, using meld rules.
+
+    :param counts: Number of cards of each kind, in ``cards.compact`` kind order.
+    :type counts: Sequence[int]
+    :param trump: Trump suit, e.g. "Spades", or None before trump is called.
+    :type trump: str, optional
+    :return: Hand's score and the points scored in each category.
+    :rtype: Tuple[int, Dict[str, int]]
+    """
+    items = dict.fromkeys(CATEGORIES, 0)
+    for category, kinds, per_set, by_sets in RULES[trump]:
+        sets = min(counts[kind] for kind in kinds)
+        if by_sets:
+            items[category] += by_sets[sets] if sets < len(by_sets) else 0
+        else:
+            items[category] += per_set * sets
+    return sum(items.values()), items
+
+
+def score_batch(counts: Any, trump: Any) -> Any:
+    """
+    Scores many hands at once using meld rules.
+
+    :param counts: Number of cards of each kind in each hand, shaped [N, 24].
+    :type counts: numpy.ndarray or Sequence[Sequence[int]]
+    :param trump: Trump suit of each hand: a suit name or None, or the index of the
+        suit in ``const.SUITS`` with -1 for no trump.
+    :type trump: numpy.ndarray or Sequence
+    :return: Score of each hand; an array when NumPy is available, else a list.
+    :rtype: numpy.ndarray or List[int]
+    """
+    if np is None:
+        return _score_batch_scalar(counts, trump)
+
+    counts = np.asarray(counts, dtype=np.int64).reshape(-1, NUM_KINDS)
+    codes = _trump_code_array(trump)
+    if codes.shape != (counts.shape[0],):
+        raise ValueError(
+            "Expected %d trump suits, got %d." % (counts.shape[0], codes.size)
+        )
+    totals = np.zeros(counts.shape[0], dtype=np.int64)
+    for code in np.unique(codes):
+        rows = codes == code
+        group = counts[rows]
+        points = np.zeros(group.shape[0], dtype=np.int64)
+        for __, kinds, per_set, by_sets in RULES[_SUIT_BY_CODE[code]]:
+            sets = group[:, kinds].min(axis=1)
+            if by_sets:
+                # Anything beyond the table scores nothing.
+                table = np.array(by_sets + (0,), dtype=np.int64)
+                points += table[np.minimum(sets, len(by_sets))]
+            else:
+                points += per_set * sets
+        totals[rows] = points
+    return totals
+
+
+def _score_batch_scalar(counts: Any, trump: Any) -> List[int]:
+    """
+    Scores many hands using meld rules, one hand at a time.
+
+    :param counts: Number of cards of each kind in each hand, shaped [N, 24].
+    :type counts: Sequence[Sequence[int]]
+    :param trump: Trump suit of each hand, as accepted by ``score_batch``.
+    :type trump: Sequence
+    :return: Score of each hand.
+    :rtype: List[int]
+    """
+    counts = [list(row) for row in counts]
+    codes = trump_codes(trump)
+    if len(codes) != len(counts):
+        raise ValueError("Expected %d trump suits, got %d." % (len(counts), len(codes)))
+    return [
+        score_counts(row, _SUIT_BY_CODE[code])[0] for row, code in zip(counts, codes)
+    ]
+
+
+def trump_codes(trump: Any) -> List[int]:
+    """
+    Convert trump suits to the numeric codes used by ``score_batch``.
+
+    :param trump: Suit names (or None), or codes already.
+    :type trump: Sequence
+    :raises InvalidSuitError: When a suit isn't one of ``const.SUITS``.
+    :return: Index of each suit in ``const.SUITS``, -1 for no trump.
+    :rtype: List[int]
+    """
+    codes = []
+    for suit in trump:
+        if suit is None or isinstance(suit, str):
+            try:
+                codes.append(_CODE_BY_SUIT[suit])
+            except KeyError:
+                raise InvalidSuitError("%s is not a valid suit." % suit) from None
+        elif -1 <= int(suit) < len(const.SUITS):
+            codes.append(int(suit))
+        else:
+            raise InvalidSuitError("%s is not a valid suit code." % suit)
+    return codes
+
+
+def _trump_code_array(trump: Any) -> Any:
+    """
+    Convert trump suits to an array of the numeric codes used by ``score_batch``.
+    Codes given as a numeric array are checked in one pass; only suit names are
+    converted one at a time.
+
+    :param trump: Suit names (or None), or codes already.
+    :type trump: numpy.ndarray or Sequence
+    :raises InvalidSuitError: When a suit or code isn't one of ``const.SUITS``.
+    :return: Index of each suit in ``const.SUITS``, -1 for no trump.
+    :rtype: numpy.ndarray
+    """
+    codes = np.asarray(trump)
+    if codes.dtype.kind not in "iu":
+        return np.asarray(trump_codes(trump), dtype=np.int64)
+    codes = codes.astype(np.int64, copy=False)
+    bad = (codes < -1) | (codes >= len(const.SUITS))
+    if bad.any():
+        raise InvalidSuitError("%s is not a valid suit code." % codes[bad][0])
+    return codes
+
+
+def _trump_suit(deck: PinochleDeck) -> Optional[str]:
+    """
+    Determine the trump suit of a deck from its ranks.
 
     :param deck: Deck to be scored
     :type deck: PinochleDeck
     :return: Trump suit
     :rtype: str
     """
-    mylog = custom_log.get_logger()
-
+    for suit, ranks in const.RANKS_BY_TRUMP.items():
+        if deck.ranks is ranks:
+            return suit
     for suit in deck.ranks["suits"]:
         if deck.ranks["suits"][suit] == const.TRUMP_VALUE:
-            mylog.info("Determined that %s is trump.", suit)
             return suit
     return None
 
@@ -66,24 +320,7 @@ def _nines(deck: PinochleDeck) -> int:
     :return: Score for 9s
     :rtype: int
     """
-    mylog = custom_log.get_logger()
-
-    value = 0
-
-    trump = _trump_suit(deck)
-
-    # Nines aren't worth meld points until trump is called.
-    if trump is None:
-        return value
-
-    abbr = card.card_abbrev("9", trump)
-    cards = deck.find(abbr)
-
-    if len(cards) > 0:
-        value += len(cards)
-
-    mylog.info("Nines score: %d", value)
-    return value
+    return breakdown(deck)[1]["nines"]
 
 
 def _marriages(deck: PinochleDeck) -> int:
@@ -94,32 +331,10 @@ def _marriages(deck: PinochleDeck) -> int:
 
     :param deck: Deck to be scored
     :type deck: PinochleDeck
-    :return: Score for 9s
+    :return: Score for marriages
     :rtype: int
     """
-    mylog = custom_log.get_logger()
-
-    value = 0
-
-    trump = _trump_suit(deck)
-
-    for suit in const.SUITS:
-        ksuit = card.card_abbrev("King", suit)
-        qsuit = card.card_abbrev("Queen", suit)
-        kcards = deck.find(ksuit)
-        qcards = deck.find(qsuit)
-
-        temp_score = 2 * min(len(kcards), len(qcards))
-        mylog.info("%d Marriages found!", min(len(kcards), len(qcards)))
-
-        # Score marriages as plain until trump is called.
-        if trump is not None and suit == trump:
-            temp_score = temp_score * 2
-
-        value += temp_score
-
-    mylog.info("Marriages score: %d", value)
-    return value
+    return breakdown(deck)[1]["marriages"]
 
 
 def _jacks(deck: PinochleDeck) -> int:
@@ -129,31 +344,10 @@ def _jacks(deck: PinochleDeck) -> int:
 
     :param deck: Deck to be scored
     :type deck: PinochleDeck
-    :return: Score for 9s
+    :return: Score for jacks
     :rtype: int
     """
-    mylog = custom_log.get_logger()
-
-    value = 0
-
-    array = []
-    for suit in const.SUITS:
-        a_card = card.card_abbrev("Jack", suit)
-        array.append(deck.find(a_card))
-
-    count = 20
-    for index in range(len(const.SUITS)):
-        count = min(count, len(array[index]))
-
-    if count == 1:
-        value += 4
-        mylog.info("Single jacks!")
-    elif count == 2:
-        value += 40
-        mylog.info("Double jacks!!")
-
-    mylog.info("Jacks score: %d", value)
-    return value
+    return breakdown(deck)[1]["jacks"]
 
 
 def _queens(deck: PinochleDeck) -> int:
@@ -163,31 +357,10 @@ def _queens(deck: PinochleDeck) -> int:
 
     :param deck: Deck to be scored
     :type deck: PinochleDeck
-    :return: Score for 9s
+    :return: Score for queens
     :rtype: int
     """
-    mylog = custom_log.get_logger()
-
-    value = 0
-
-    array = []
-    for suit in const.SUITS:
-        a_card = card.card_abbrev("Queen", suit)
-        array.append(deck.find(a_card))
-
-    count = 20
-    for index in range(len(const.SUITS)):
-        count = min(count, len(array[index]))
-
-    if count == 1:
-        value += 6
-        mylog.info("Single Queens!")
-    elif count == 2:
-        value += 60
-        mylog.info("Double Queens!!")
-
-    mylog.info("Queens score: %d", value)
-    return value
+    return breakdown(deck)[1]["queens"]
 
 
 def _kings(deck: PinochleDeck) -> int:
@@ -197,66 +370,24 @@ def _kings(deck: PinochleDeck) -> int:
 
     :param deck: Deck to be scored
     :type deck: PinochleDeck
-    :return: Score for 9s
+    :return: Score for kings
     :rtype: int
     """
-    mylog = custom_log.get_logger()
-
-    value = 0
-
-    array = []
-    for suit in const.SUITS:
-        a_card = card.card_abbrev("King", suit)
-        array.append(deck.find(a_card))
-
-    count = 20
-    for index in range(len(const.SUITS)):
-        count = min(count, len(array[index]))
-
-    if count == 1:
-        value += 8
-        mylog.info("Single Kings!")
-    elif count == 2:
-        value += 80
-        mylog.info("Double Kings!!")
-
-    mylog.info("Kings score: %d", value)
-    return value
+    return breakdown(deck)[1]["kings"]
 
 
 def _aces(deck: PinochleDeck) -> int:
     """
-    Score nines in a deck.
+    Score aces in a deck.
     Four aces (one of each suit) scores 10 points,
     eight aces (two of each suit) scores 100 points.
 
     :param deck: Deck to be scored
     :type deck: PinochleDeck
-    :return: Score for 9s
+    :return: Score for aces
     :rtype: int
     """
-    mylog = custom_log.get_logger()
-
-    value = 0
-
-    array = []
-    for suit in const.SUITS:
-        a_card = card.card_abbrev("Ace", suit)
-        array.append(deck.find(a_card))
-
-    count = 20
-    for index in range(len(const.SUITS)):
-        count = min(count, len(array[index]))
-
-    if count == 1:
-        value += 10
-        mylog.info("Single Aces!")
-    elif count == 2:
-        value += 100
-        mylog.info("Double Aces!!")
-
-    mylog.info("Aces score: %d", value)
-    return value
+    return breakdown(deck)[1]["aces"]
 
 
 def _run(deck: PinochleDeck) -> int:
@@ -267,61 +398,21 @@ def _run(deck: PinochleDeck) -> int:
 
     :param deck: Deck to be scored
     :type deck: PinochleDeck
-    :return: Score for 9s
+    :return: Score for runs
     :rtype: int
     """
-    mylog = custom_log.get_logger()
-
-    value = 0
-    values = const.VALUES.copy()
-    values.remove("9")
-    trump = _trump_suit(deck)
-
-    # Can't score a run until trump is called.
-    if trump is None:
-        return value
-
-    array = []
-    for face in values:
-        a_card = card.card_abbrev(face, trump)
-        array.append(deck.find(a_card))
-
-    count = 20
-    for index in range(len(values)):
-        count = min(count, len(array[index]))
-
-    value += count * 11
-
-    mylog.info("Run score: %d", value)
-    return value
+    return breakdown(deck)[1]["run"]
 
 
 def _pinochle(deck: PinochleDeck) -> int:
     """
-    Score pinochless in a deck.
+    Score pinochles in a deck.
     A Queen of Spades and a Jack of Diamonds scores 4 points,
-    two Queens of Spades and two Jacks of Diamonds scores 35 points.
+    two Queens of Spades and two Jacks of Diamonds scores 30 points.
 
     :param deck: Deck to be scored
     :type deck: PinochleDeck
-    :return: Score for 9s
+    :return: Score for pinochles
     :rtype: int
     """
-    mylog = custom_log.get_logger()
-
-    value = 0
-
-    qspade = card.card_abbrev("Queen", "Spades")
-    jdiamond = card.card_abbrev("Jack", "Diamonds")
-    qcards = deck.find(qspade)
-    jcards = deck.find(jdiamond)
-
-    if min(len(qcards), len(jcards)) == 1:
-        value = 4
-        mylog.info("Single Pinochle!")
-    elif min(len(qcards), len(jcards)) == 2:
-        value = 30
-        mylog.info("Double Pinochle!!")
-
-    mylog.info("Pinochle score: %d", value)
-    return value
+    return breakdown(deck)[1]["pinochle"]
@@ -1,12 +1,26 @@
 """
 This scores a PinochleDeck or a PinochleStack (not a list).
 
+``score_batch`` scores many hands at once, given the number of cards held of each
+kind, using NumPy when it's installed.
+
 License: GPLv3
 """
 
+from typing import Any, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
 from .cards import const
+from .cards.compact import KINDS, NUM_KINDS
 from .cards.stack import PinochleStack
 
+# Trick points scored by each card kind.
+KIND_SCORES = [const.TRICK_SCORES[value] for value, __ in KINDS]
+
 
 def score(deck: PinochleStack) -> int:
     """
@@ -25,3 +39,43 @@ def score(deck: PinochleStack) -> int:
         value += len(card_l) * const.TRICK_SCORES[face]
 
     return value
+
+
+def score_counts(counts: Sequence[int]) -> int:
+    """
+    Scores a hand, given as the number of cards of each kind, using trick rules.
+
+    :param counts: Number of cards of each kind, in ``cards.compact`` kind order.
+    :type counts: Sequence[int]
+    :return: Hand's score
+    :rtype: int
+    """
+    return sum(count * points for count, points in zip(counts, KIND_SCORES))
+
+
+def score_batch(counts: Any) -> Any:
+    """
+    Scores many hands at once using trick rules.
+
+    :param counts: Number of cards of each kind in each hand, shaped [N, 24].
+    :type counts: numpy.ndarray or Sequence[Sequence[int]]
+    :return: Score of each hand; an array when NumPy is available, else a list.
+    :rtype: numpy.ndarray or List[int]
+    """
+    if np is None:
+        return _score_batch_scalar(counts)
+
+    counts = np.asarray(counts, dtype=np.int64).reshape(-1, NUM_KINDS)
+    return counts @ np.array(KIND_SCORES, dtype=np.int64)
+
+
+def _score_batch_scalar(counts: Any) -> List[int]:
+    """
+    Scores many hands using trick rules, one hand at a time.
+
+    :param counts: Number of cards of each kind in each hand, shaped [N, 24].
+    :type counts: Sequence[Sequence[int]]
+    :return: Score of each hand.
+    :rtype: List[int]
+    """
+    return [score_counts(row) for row in counts]
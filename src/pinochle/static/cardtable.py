@@ -1682,6 +1682,9 @@ class WSocketContainer:
     protocol: str
     server: str
     registered_with_server = False
+    # Sequence number of the last broadcast received and the server epoch it's from.
+    last_seq = None
+    epoch = None
 
     def __init__(self) -> None:
         """
@@ -1772,7 +1775,17 @@ class WSocketContainer:
         if "action" not in t_data:
             return
 
+        # Skip broadcasts already received, which may be replayed after reconnecting.
+        if "seq" in t_data and t_data["action"] != "game_snapshot":
+            if (
+                WSocketContainer.last_seq is not None
+                and t_data["seq"] <= WSocketContainer.last_seq
+            ):
+                return
+            WSocketContainer.last_seq = t_data["seq"]
+
         actions = {
+            "game_snapshot": self.apply_game_snapshot,
             "game_start": self.start_game_and_clear_round_globals,
             "notification_player_list": self.update_player_names,
             "game_state": self.set_game_state_from_server,
@@ -1792,6 +1805,61 @@ class WSocketContainer:
         # Dispatch action
         actions[t_data["action"]](t_data)
 
+    def apply_game_snapshot(self, data: Dict):
+        """
+        Bring the user interface up to date with the snapshot of the game sent by the
+        server when registering, e.g. after the page was refreshed.
+
+        :param data: Data from the event.
+        :type data: Dict
+        """
+        mylog.error("In WSocketContainer.apply_game_snapshot.")
+
+        WSocketContainer.epoch = data["epoch"]
+        WSocketContainer.last_seq = data["seq"]
+
+        for t_team in data["teams"]:
+            self.update_team_scores(
+                {"team_id": t_team["team_id"], "score": t_team["score"], "meld_score": 0}
+            )
+
+        t_round = data["round"]
+        if data["mode"] == "bid" and t_round["bidder"]:
+            BidDialog().display_bid_dialog(
+                {"player_id": t_round["bidder"], "bid": t_round["bid"]}
+            )
+        elif data["mode"] == "reveal":
+            self.display_bid_winner(
+                {"player_id": t_round["bid_winner"], "bid": t_round["bid"]}
+            )
+        elif data["mode"] == "meld":
+            self.record_trump_selection({"trump": t_round["trump"]})
+        elif data["mode"] == "trick" and data["trick"]:
+            GameState.player_list = [PlayerID(x) for x in data["player_order"]]
+            GameState.trump = str(t_round["trump"])
+            self.apply_trick_snapshot(data["trick"])
+
+    def apply_trick_snapshot(self, t_trick: Dict):
+        """
+        Place the cards already played to the trick in progress, as described by the
+        game snapshot.
+
+        :param t_trick: Trick from the snapshot.
+        :type t_trick: Dict
+        """
+        mylog.error("In WSocketContainer.apply_trick_snapshot.")
+
+        if t_trick["trick_starter"]:
+            GameState.round_bid_trick_winner = PlayerID(t_trick["trick_starter"])
+        GameState.prepare_for_trick_change()
+        trick_order = GameState.order_player_id_list_for_trick()
+        for t_card in t_trick["cards"]:
+            if t_card["player_id"]:
+                GameState.discard_deck[
+                    trick_order.index(PlayerID(t_card["player_id"]))
+                ] = t_card["card"]
+        rebuild_display()
+
     def update_round_final_score(self, data: Dict):
         """
         Notify players that the final trick has been won.
@@ -2247,6 +2315,8 @@ class WSocketContainer:
                 "action": "register_client",
                 "game_id": GameState.game_id.value,
                 "player_id": GameState.player_id.value,
+                "last_seq": WSocketContainer.last_seq,
+                "epoch": WSocketContainer.epoch,
             }
         )
 
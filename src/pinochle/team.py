@@ -9,6 +9,7 @@ import sqlalchemy
 from flask import abort, make_response
 
 from . import teamplayers
+from .models import unit_of_work
 from .models.core import db
 from .models.team import Team, TeamSchema
 
@@ -76,7 +77,7 @@ def create(name: Dict):
 
         # Add the team to the database
         db.session.add(new_team)
-        db.session.commit()
+        unit_of_work.commit()
 
         # Serialize and return the newly created team in the response
         data = schema.dump(new_team)
@@ -125,7 +126,7 @@ def _update_data(team_id: str, data: dict):
 
     # Add the updated data to the transaction.
     db_session.add(local_object)
-    db_session.commit()
+    unit_of_work.commit()
 
     # return updated team in the response
     schema = TeamSchema()
@@ -150,7 +151,9 @@ def delete(team_id: str):
         db_session = db.session()
         local_object = db_session.merge(team)
         db_session.delete(local_object)
-        db_session.commit()
+        unit_of_work.commit()
+        unit_of_work.invalidate_cached("team_players", team_id)
+        unit_of_work.invalidate_cached("round_players")
         return make_response(f"Team {team_id} deleted", 200)
 
     # Otherwise, nope, didn't find that team
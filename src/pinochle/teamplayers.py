@@ -4,6 +4,7 @@ This is the teamplayer module and supports all the REST actions teamplayer data
 
 from flask import abort, make_response
 
+from .models import unit_of_work
 from .models.core import db
 from .models.player import Player
 from .models.team import Team
@@ -99,7 +100,8 @@ def create(team_id: str, player_id: dict):
     # print(f"teamplayers.create: Adding to database: {new_teamplayer}")
     # Add the team to the database
     db.session.add(new_teamplayer)
-    db.session.commit()
+    unit_of_work.commit()
+    _invalidate_team(team_id)
 
     # Serialize and return the newly created team in the response
     data = schema.dump(new_teamplayer)
@@ -122,8 +124,20 @@ def delete(team_id: str):
         db_session = db.session()
         local_object = db_session.merge(team)
         db_session.delete(local_object)
-        db_session.commit()
+        unit_of_work.commit()
+        _invalidate_team(team_id)
         return make_response(f"Team {team_id} deleted", 200)
 
     # Otherwise, nope, didn't find that team
     abort(404, f"Team not found for Id: {team_id}")
+
+
+def _invalidate_team(team_id: str):
+    """
+    Forget the cached players of a team, and of every round, as any round may
+    include the team.
+
+    :param team_id:   Id of the team whose players changed
+    """
+    unit_of_work.invalidate_cached("team_players", team_id)
+    unit_of_work.invalidate_cached("round_players")
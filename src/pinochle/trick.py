@@ -4,7 +4,7 @@ This is the trick module and supports common database queries for cards in a tri
 
 from flask import abort
 
-from .models import utils
+from .models import unit_of_work, utils
 from .models.core import db
 from .models.trick import TrickSchema
 
@@ -34,7 +34,7 @@ def create(round_id: str):
 
     # Add the trick to the database
     db.session.add(_trick)
-    db.session.commit()
+    unit_of_work.commit()
 
     # Serialize and return the newly created trick in the response
     data = schema.dump(_trick)
@@ -100,7 +100,7 @@ def _update_data(trick_id: str, data: dict):
 
     # Add the updated data to the transaction.
     db_session.add(local_object)
-    db_session.commit()
+    unit_of_work.commit()
 
     # return updated round in the response
     schema = TrickSchema()
@@ -0,0 +1,141 @@
+"""
+Resolve Pinochle tricks using card ids (``PinochleCard.card_id``, which is the same
+as the ``cards.compact`` kind number).
+
+For every combination of suit led and trump suit a table gives the strength of each
+of the 24 cards in that trick: cards of neither suit can't win, cards of the suit led
+win by value, and trump cards beat all of them. Deciding the winner of a trick, or
+which cards may legally be played to it, is then a table lookup per card.
+
+License: GPLv3
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cards import const
+from .cards.compact import KINDS, svg_kind
+from .exceptions import InvalidSuitError
+
+# Strength added to trump cards so they beat every card of the suit led.
+TRUMP_STRENGTH = len(const.VALUES) + 1
+
+# Suit of each card, by card id.
+CARD_SUITS = [suit for __, suit in KINDS]
+
+
+def _build_strengths(led: str, trump: Optional[str]) -> Tuple[int, ...]:
+    """
+    Build the strength of each card in a trick where ``led`` was led and ``trump``
+    is trump. Zero means the card can't win the trick.
+
+    :param led: Suit of the first card played to the trick.
+    :type led: str
+    :param trump: Trump suit, or None.
+    :type trump: str, optional
+    :return: Strength of each card, by card id.
+    :rtype: Tuple[int, ...]
+    """
+    strengths = []
+    for value, suit in KINDS:
+        rank = const.PINOCHLE_RANKS["values"][value]
+        if suit == trump:
+            strengths.append(TRUMP_STRENGTH + rank)
+        elif suit == led:
+            strengths.append(rank)
+        else:
+            strengths.append(0)
+    return tuple(strengths)
+
+
+# Strength tables keyed by (suit led, trump suit).
+STRENGTHS: Dict[Tuple[str, Optional[str]], Tuple[int, ...]] = {
+    (led, trump): _build_strengths(led, trump)
+    for led in const.SUITS
+    for trump in [None] + const.SUITS
+}
+
+
+def strengths(led: str, trump: Optional[str]) -> Tuple[int, ...]:
+    """
+    Return the strength of each card in a trick.
+
+    :param led: Suit of the first card played to the trick.
+    :type led: str
+    :param trump: Trump suit, or None.
+    :type trump: str, optional
+    :raises InvalidSuitError: When either suit isn't a card suit.
+    :return: Strength of each card, by card id.
+    :rtype: Tuple[int, ...]
+    """
+    try:
+        return STRENGTHS[(led, trump)]
+    except KeyError:
+        bad_suit = led if led not in const.SUITS else trump
+        raise InvalidSuitError("%s is not a valid suit." % str(bad_suit)) from None
+
+
+def winning_index(trick: Sequence[int], trump: Optional[str]) -> int:
+    """
+    Determine which card wins a trick. Of identical cards, the first played wins.
+
+    :param trick: Card ids of the cards played, in the order they were played.
+    :type trick: Sequence[int]
+    :param trump: Trump suit, or None.
+    :type trump: str, optional
+    :return: Index in ``trick`` of the winning card.
+    :rtype: int
+    """
+    if not trick:
+        raise ValueError("No cards have been played to the trick.")
+    table = strengths(CARD_SUITS[trick[0]], trump)
+    best = 0
+    for index in range(1, len(trick)):
+        if table[trick[index]] > table[trick[best]]:
+            best = index
+    return best
+
+
+def legal_plays(
+    hand: Sequence[int], trick: Sequence[int], trump: Optional[str]
+) -> List[int]:
+    """
+    Determine which cards in a hand may be played to a trick. A player must follow
+    the suit led, playing a card that beats the trick so far when they can. A player
+    who can't follow suit must play trump, beating the trick so far when they can.
+    Otherwise any card may be played.
+
+    :param hand: Card ids of the cards in the player's hand.
+    :type hand: Sequence[int]
+    :param trick: Card ids of the cards played to the trick so far, in order.
+    :type trick: Sequence[int]
+    :param trump: Trump suit, or None.
+    :type trump: str, optional
+    :return: Indexes in ``hand`` of the cards that may be played.
+    :rtype: List[int]
+    """
+    everything = list(range(len(hand)))
+    if not trick:
+        return everything
+    led = CARD_SUITS[trick[0]]
+    table = strengths(led, trump)
+    best = max(table[card_id] for card_id in trick)
+
+    for suit in (led, trump):
+        if suit is None:
+            continue
+        in_suit = [index for index in everything if CARD_SUITS[hand[index]] == suit]
+        if in_suit:
+            beating = [index for index in in_suit if table[hand[index]] > best]
+            return beating or in_suit
+    return everything
+
+
+def card_ids(svg_names: Sequence[str]) -> List[int]:
+    """
+    Convert SVG card names, as stored in the database, to card ids.
+
+    :param svg_names: SVG names, e.g. ["spade_ace", "club_9"].
+    :type svg_names: Sequence[str]
+    :return: Card ids.
+    :rtype: List[int]
+    """
+    return [svg_kind(name) for name in svg_names]
@@ -0,0 +1,576 @@
+"""
+Broadcast buses used by the WebSocketMessenger to fan messages out to every worker.
+
+Gunicorn runs several worker processes and each one only holds the websockets of the
+clients that happened to connect to it. A broadcast therefore has to be published to
+every worker, each of which delivers the message to its own locally attached clients.
+
+Three backends are available, selected with ``WS_BROADCAST_BACKEND``:
+
+- ``inprocess``: Deliver directly to the local clients. Only suitable for a single
+  worker process. This is the default.
+- ``unix``: A small broker listening on a Unix domain socket relays messages between
+  all the workers on one host. The first worker to start becomes the broker; another
+  worker takes over if it exits.
+- ``redis``: Publish and subscribe through a server speaking the Redis protocol.
+
+License: GPLv3
+"""
+import errno
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from . import custom_log, ws_queue
+
+# Signature of the function receiving broadcasts: (game_id, payload, exclude, key)
+# The payload is the JSON encoded message, ready to be sent to each client as is.
+DeliveryCallback = Callable[[str, str, Optional[str], Optional[str]], None]
+
+RECONNECT_DELAY = 0.5  # seconds
+# Broadcasts kept while the Unix socket broker is unreachable, sent once reconnected.
+BACKLOG_SIZE = 256
+
+
+def encode_envelope(
+    game_id: str,
+    payload: str,
+    exclude: Optional[str] = None,
+    key: Optional[str] = None,
+) -> bytes:
+    """
+    Wrap an encoded broadcast into a single line suitable for any of the transports.
+    The payload is carried verbatim after a small JSON header so that it is never
+    decoded and encoded again on its way to the clients.
+
+    :param game_id: ID of the game
+    :type game_id: str
+    :param payload: JSON encoded message to send.
+    :type payload: str
+    :param exclude: Player ID to exclude from broadcast.
+    :type exclude: str, optional
+    :param key: Key of the message, used when coalescing queued messages.
+    :type key: str, optional
+    :return: Newline-free, UTF-8 encoded envelope.
+    :rtype: bytes
+    """
+    header = json.dumps({"game_id": game_id, "exclude": exclude, "key": key})
+    # JSON text never contains a raw tab or newline, so a tab separates the two parts.
+    return header.encode("utf-8") + b"\t" + payload.encode("utf-8")
+
+
+def decode_envelope(data: bytes) -> Tuple[str, str, Optional[str], Optional[str]]:
+    """
+    Reverse of encode_envelope.
+
+    :param data: Envelope as received from the transport.
+    :type data: bytes
+    :return: Tuple of game_id, payload, excluded player_id and key.
+    :rtype: Tuple[str, str, Optional[str], Optional[str]]
+    """
+    header_data, payload = data.split(b"\t", 1)
+    header = json.loads(header_data.decode("utf-8"))
+    return (
+        header["game_id"],
+        payload.decode("utf-8"),
+        header.get("exclude"),
+        header.get("key"),
+    )
+
+
+class BroadcastBus:
+    """
+    Base class for the broadcast buses. A bus accepts published messages and hands
+    every message published by any worker to the subscribed delivery callback.
+    """
+
+    def __init__(self):
+        self.mylog = custom_log.get_logger(__name__)
+        self._callback: Optional[DeliveryCallback] = None
+
+    def subscribe(self, callback: DeliveryCallback) -> None:
+        """
+        Register the function which delivers messages to the local clients.
+
+        :param callback: Function accepting game_id, payload, exclude and key.
+        :type callback: DeliveryCallback
+        """
+        self._callback = callback
+
+    def publish(
+        self, game_id: str, message: dict, exclude: Optional[str] = None
+    ) -> None:
+        """
+        Publish a message to every worker. The message is encoded exactly once, here.
+
+        :param game_id: ID of the game
+        :type game_id: str
+        :param message: Dictionary containing the structured message to send.
+        :type message: dict
+        :param exclude: Player ID to exclude from broadcast.
+        :type exclude: str, optional
+        """
+        self._send(
+            game_id, json.dumps(message), exclude, ws_queue.coalesce_key(message)
+        )
+
+    def close(self) -> None:
+        """
+        Release any resources held by the bus.
+        """
+
+    def _send(
+        self, game_id: str, payload: str, exclude: Optional[str], key: Optional[str]
+    ) -> None:
+        raise NotImplementedError
+
+    def _dispatch(
+        self, game_id: str, payload: str, exclude: Optional[str], key: Optional[str]
+    ) -> None:
+        if self._callback is None:
+            self.mylog.warning("Broadcast received before a subscriber was registered.")
+            return
+        try:
+            self._callback(game_id, payload, exclude, key)
+        except Exception:  # pylint: disable=broad-except
+            # Never let a delivery problem kill the listener.
+            self.mylog.exception("Error delivering broadcast for game %s", game_id)
+
+    def _dispatch_envelope(self, data: bytes) -> None:
+        try:
+            fields = decode_envelope(data)
+        except (ValueError, KeyError):
+            self.mylog.warning("Discarding malformed broadcast envelope: %r", data)
+            return
+        self._dispatch(*fields)
+
+
+class InProcessBus(BroadcastBus):
+    """
+    Deliver broadcasts directly to the clients attached to this process.
+    """
+
+    def _send(
+        self, game_id: str, payload: str, exclude: Optional[str], key: Optional[str]
+    ) -> None:
+        self._dispatch(game_id, payload, exclude, key)
+
+
+class UnixSocketBus(BroadcastBus):
+    """
+    Relay broadcasts between the workers on one host through a Unix domain socket.
+
+    Every worker connects to the broker as a client and the broker echoes each line it
+    receives to all connected clients, including the sender. The broker role is held
+    by whichever worker owns an exclusive lock on ``<path>.lock``; when that worker
+    exits the lock is released and the remaining workers elect a new broker.
+
+    Publishing never waits for the broker: while it's unreachable broadcasts are kept
+    in a bounded backlog, and the reader thread reconnects and sends them.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._lock_file = None
+        self._server: Optional[socket.socket] = None
+        self._peers: List[socket.socket] = []
+        self._peers_lock = threading.Lock()
+        self._conn: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._backlog: Deque[bytes] = deque(maxlen=BACKLOG_SIZE)
+        self._closed = False
+        self._conn = self._connect()
+        self._reader = threading.Thread(
+            target=self._read_loop, name="ws-bus-unix-reader", daemon=True
+        )
+        self._reader.start()
+
+    @property
+    def is_broker(self) -> bool:
+        """Whether this process is currently acting as the broker."""
+        return self._server is not None
+
+    def _send(
+        self, game_id: str, payload: str, exclude: Optional[str], key: Optional[str]
+    ) -> None:
+        line = encode_envelope(game_id, payload, exclude, key) + b"\n"
+        with self._send_lock:
+            if self._conn is not None and not self._backlog:
+                try:
+                    self._conn.sendall(line)
+                    return
+                except OSError:
+                    self.mylog.warning("Lost connection to broadcast broker.")
+                    self._drop_connection()
+            if len(self._backlog) == self._backlog.maxlen:
+                self.mylog.error(
+                    "Broadcast backlog full. Dropping the oldest broadcast."
+                )
+            self._backlog.append(line)
+
+    def close(self) -> None:
+        self._closed = True
+        self._drop_connection()
+        if self._server is not None:
+            _shutdown(self._server)
+            self._server = None
+            with self._peers_lock:
+                for peer in self._peers:
+                    _shutdown(peer)
+                self._peers = []
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _connect(self) -> socket.socket:
+        """
+        Connect to the broker, becoming the broker first if nobody else is.
+
+        :return: The connection.
+        :rtype: socket.socket
+        """
+        self._try_become_broker()
+        deadline = time.monotonic() + 5
+        while True:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.path)
+                return conn
+            except OSError as err:
+                conn.close()
+                if time.monotonic() > deadline or err.errno not in (
+                    errno.ECONNREFUSED,
+                    errno.ENOENT,
+                ):
+                    raise
+                # The broker may be restarting. Try to take over, then wait a bit.
+                self._try_become_broker()
+                time.sleep(0.05)
+
+    def _send_backlog(self) -> None:
+        """
+        Send the broadcasts published while the broker was unreachable. Call with
+        _send_lock held.
+        """
+        while self._backlog and self._conn is not None:
+            try:
+                self._conn.sendall(self._backlog[0])
+            except OSError:
+                self.mylog.warning("Lost connection to broadcast broker.")
+                self._drop_connection()
+                return
+            self._backlog.popleft()
+
+    def _drop_connection(self) -> None:
+        if self._conn is not None:
+            _shutdown(self._conn)
+            self._conn = None
+
+    def _try_become_broker(self) -> None:
+        if self._server is not None:
+            return
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # Another worker is the broker.
+            lock_file.close()
+            return
+
+        self._lock_file = lock_file
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(64)
+        self._server = server
+        self.mylog.info(
+            "Process %d is now the broadcast broker on %s", os.getpid(), self.path
+        )
+        threading.Thread(
+            target=self._accept_loop, name="ws-bus-unix-broker", daemon=True
+        ).start()
+
+    def _accept_loop(self) -> None:
+        server = self._server
+        while server is not None and not self._closed:
+            try:
+                peer, _ = server.accept()
+            except OSError:
+                return
+            with self._peers_lock:
+                self._peers.append(peer)
+            threading.Thread(
+                target=self._relay_loop,
+                args=(peer,),
+                name="ws-bus-unix-relay",
+                daemon=True,
+            ).start()
+
+    def _relay_loop(self, peer: socket.socket) -> None:
+        """
+        Broker side: copy every line received from one peer to all the peers.
+        """
+        for line in _read_lines(peer):
+            with self._peers_lock:
+                peers = list(self._peers)
+            for target in peers:
+                try:
+                    target.sendall(line + b"\n")
+                except OSError:
+                    self._remove_peer(target)
+        self._remove_peer(peer)
+
+    def _remove_peer(self, peer: socket.socket) -> None:
+        with self._peers_lock:
+            if peer in self._peers:
+                self._peers.remove(peer)
+        _shutdown(peer)
+
+    def _read_loop(self) -> None:
+        """
+        Client side: deliver each line received from the broker.
+        """
+        while not self._closed:
+            conn = self._conn
+            if conn is None:
+                # Connect without the lock, so publishing never waits for it.
+                try:
+                    conn = self._connect()
+                except OSError:
+                    time.sleep(RECONNECT_DELAY)
+                    continue
+                with self._send_lock:
+                    if self._closed:
+                        _shutdown(conn)
+                        return
+                    self._conn = conn
+                    self._send_backlog()
+                continue
+            for line in _read_lines(conn):
+                self._dispatch_envelope(line)
+            if self._closed:
+                return
+            self.mylog.warning("Broadcast broker connection closed. Reconnecting.")
+            with self._send_lock:
+                if self._conn is conn:
+                    self._drop_connection()
+
+
+class RedisBus(BroadcastBus):
+    """
+    Publish and subscribe through a server speaking the Redis protocol (RESP).
+
+    Only PUBLISH, SUBSCRIBE and AUTH are used, so any server implementing that subset
+    of the protocol can stand in for Redis.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        channel: str = "pinochle:ws",
+        password: Optional[str] = None,
+    ):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.channel = channel
+        self.password = password
+        self._pub: Optional[socket.socket] = None
+        self._pub_file = None
+        self._pub_lock = threading.Lock()
+        self._sub: Optional[socket.socket] = None
+        self._subscribed = threading.Event()
+        self._closed = False
+        self._listener = threading.Thread(
+            target=self._listen_loop, name="ws-bus-redis-listener", daemon=True
+        )
+        self._listener.start()
+
+    def wait_until_subscribed(self, timeout: float = 5) -> bool:
+        """
+        Block until the subscription is active. Mostly useful at startup and in tests.
+
+        :param timeout: Maximum number of seconds to wait.
+        :type timeout: float
+        :return: Whether the subscription is active.
+        :rtype: bool
+        """
+        return self._subscribed.wait(timeout)
+
+    def _send(
+        self, game_id: str, payload: str, exclude: Optional[str], key: Optional[str]
+    ) -> None:
+        envelope = encode_envelope(game_id, payload, exclude, key)
+        with self._pub_lock:
+            for _ in range(2):
+                try:
+                    if self._pub is None:
+                        self._pub, self._pub_file = self._open()
+                    self._pub.sendall(
+                        _resp_command(
+                            b"PUBLISH", self.channel.encode("utf-8"), envelope
+                        )
+                    )
+                    _resp_read(self._pub_file)
+                    return
+                except (OSError, RespError) as err:
+                    self.mylog.warning("Redis publish failed (%s). Retrying.", err)
+                    self._close_pub()
+        self.mylog.error("Unable to publish broadcast for game %s.", game_id)
+
+    def close(self) -> None:
+        self._closed = True
+        with self._pub_lock:
+            self._close_pub()
+        if self._sub is not None:
+            _shutdown(self._sub)
+
+    def _open(self):
+        conn = socket.create_connection((self.host, self.port))
+        conn_file = conn.makefile("rb")
+        if self.password:
+            conn.sendall(_resp_command(b"AUTH", self.password.encode("utf-8")))
+            _resp_read(conn_file)
+        return conn, conn_file
+
+    def _close_pub(self) -> None:
+        if self._pub is not None:
+            try:
+                self._pub_file.close()
+                self._pub.close()
+            except OSError:
+                pass
+        self._pub = None
+        self._pub_file = None
+
+    def _listen_loop(self) -> None:
+        while not self._closed:
+            try:
+                self._sub, sub_file = self._open()
+                self._sub.sendall(
+                    _resp_command(b"SUBSCRIBE", self.channel.encode("utf-8"))
+                )
+                while not self._closed:
+                    reply = _resp_read(sub_file)
+                    if not isinstance(reply, list) or len(reply) < 3:
+                        continue
+                    kind = reply[0]
+                    if kind == b"subscribe":
+                        self._subscribed.set()
+                    elif kind == b"message":
+                        self._dispatch_envelope(reply[2])
+            except (OSError, RespError, EOFError) as err:
+                self._subscribed.clear()
+                if self._closed:
+                    return
+                self.mylog.warning("Redis subscription lost (%s). Reconnecting.", err)
+                time.sleep(RECONNECT_DELAY)
+
+
+class RespError(Exception):
+    """Error reply received from a Redis protocol server."""
+
+
+def _resp_command(*args: bytes) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+def _resp_read(conn_file):
+    """
+    Read a single RESP value from a buffered socket file.
+    """
+    line = conn_file.readline()
+    if not line:
+        raise EOFError("Connection closed by server.")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body
+    if kind == b"-":
+        raise RespError(body.decode("utf-8", "replace"))
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = conn_file.read(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [_resp_read(conn_file) for _ in range(count)]
+    raise RespError(f"Unexpected reply: {line!r}")
+
+
+def _shutdown(conn: socket.socket) -> None:
+    """
+    Close a socket, waking up any thread blocked reading from it.
+    """
+    try:
+        conn.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    conn.close()
+
+
+def _read_lines(conn: socket.socket):
+    """
+    Yield newline-terminated frames from a socket until it is closed.
+    """
+    buffer = b""
+    while True:
+        try:
+            chunk = conn.recv(65536)
+        except OSError:
+            return
+        if not chunk:
+            return
+        buffer += chunk
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            if line:
+                yield line
+
+
+def create_bus(config) -> BroadcastBus:
+    """
+    Build the broadcast bus described by the application configuration.
+
+    :param config: Flask application configuration.
+    :type config: dict
+    :return: Newly created bus.
+    :rtype: BroadcastBus
+    """
+    backend = config.get("WS_BROADCAST_BACKEND", "inprocess")
+    if backend == "inprocess":
+        return InProcessBus()
+    if backend == "unix":
+        return UnixSocketBus(
+            config.get("WS_BROADCAST_UNIX_PATH", "/tmp/pinochle-ws.sock")
+        )
+    if backend == "redis":
+        return RedisBus(
+            host=config.get("WS_BROADCAST_REDIS_HOST", "localhost"),
+            port=int(config.get("WS_BROADCAST_REDIS_PORT", 6379)),
+            channel=config.get("WS_BROADCAST_REDIS_CHANNEL", "pinochle:ws"),
+            password=config.get("WS_BROADCAST_REDIS_PASSWORD"),
+        )
+    raise ValueError(f"Unknown WS_BROADCAST_BACKEND: {backend}")
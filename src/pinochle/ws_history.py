@@ -0,0 +1,86 @@
+"""
+Sequence numbers and replay buffers for the websocket broadcasts of each game.
+
+Every broadcast delivered by this process is stamped with the next sequence number
+for its game and remembered in a ring buffer. A client reconnecting with the last
+sequence number it saw receives just the broadcasts it missed; when those are no
+longer in the buffer (or the sequence belongs to another process, identified by its
+epoch) the client is sent a full game snapshot instead.
+
+License: GPLv3
+"""
+import uuid
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+# Identifies the sequence numbers handed out by this process.
+EPOCH = uuid.uuid4().hex
+
+
+def stamp(payload: str, seq: int) -> str:
+    """
+    Add a sequence number to an encoded message without decoding it again.
+
+    :param payload: JSON encoded message; always an object.
+    :type payload: str
+    :param seq: Sequence number to add.
+    :type seq: int
+    :return: JSON encoded message including the "seq" key.
+    :rtype: str
+    """
+    body = payload.rstrip()[:-1].rstrip()
+    if body.endswith("{"):
+        return f'{body}"seq": {seq}}}'
+    return f'{body}, "seq": {seq}}}'
+
+
+class BroadcastHistory:
+    """
+    Sequence counter and ring buffer of recent broadcasts for one game.
+
+    :arg int maxlen:
+        Number of broadcasts retained for replay.
+    """
+
+    def __init__(self, maxlen: int = 256):
+        self.seq = 0
+        self._buffer: Deque[Tuple[int, str, Optional[str]]] = deque(maxlen=maxlen)
+
+    def record(self, payload: str, exclude: Optional[str] = None) -> str:
+        """
+        Stamp a broadcast with the next sequence number and remember it.
+
+        :param payload: JSON encoded message.
+        :type payload: str
+        :param exclude: Player ID excluded from the broadcast.
+        :type exclude: str, optional
+        :return: The stamped message.
+        :rtype: str
+        """
+        self.seq += 1
+        stamped = stamp(payload, self.seq)
+        self._buffer.append((self.seq, stamped, exclude))
+        return stamped
+
+    def since(self, last_seq: int, player_id: str) -> Optional[List[str]]:
+        """
+        Retrieve the broadcasts a player missed after the supplied sequence number.
+
+        :param last_seq: Last sequence number the player received.
+        :type last_seq: int
+        :param player_id: The player, to skip broadcasts excluding them.
+        :type player_id: str
+        :return: Stamped messages in order, or None if the gap can't be replayed.
+        :rtype: Optional[List[str]]
+        """
+        if last_seq > self.seq:
+            return None
+        if last_seq < self.seq:
+            oldest = self._buffer[0][0] if self._buffer else self.seq + 1
+            if last_seq + 1 < oldest:
+                return None
+        return [
+            stamped
+            for seq, stamped, exclude in self._buffer
+            if seq > last_seq and not (exclude and exclude in player_id)
+        ]
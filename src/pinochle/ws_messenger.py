@@ -2,12 +2,17 @@
 Encapsulates websocket message routines and tracks attached clients.
 """
 import json
-from typing import Optional
+import threading
+import time
+from typing import List, Optional
 
 import geventwebsocket
 
-from . import GLOBAL_LOG_LEVEL, custom_log, play_pinochle, roundteams
-from .models import utils
+from . import custom_log, metrics, play_pinochle, roundteams, ws_history, ws_queue
+from .game_snapshot import GameSnapshot
+from .models import unit_of_work, utils
+from .ws_bus import BroadcastBus, InProcessBus
+from .ws_queue import ClientSendQueue
 
 
 class WebSocketMessenger:
@@ -16,6 +21,12 @@ class WebSocketMessenger:
     """
 
     client_sockets = {}
+    _bus: Optional[BroadcastBus] = None
+    send_queue_size = 64
+    backpressure_policy = "drop_oldest"
+    histories = {}
+    history_size = 256
+    _delivery_lock = threading.RLock()
 
     def __new__(cls):
         if not hasattr(cls, "instance"):
@@ -23,10 +34,54 @@ class WebSocketMessenger:
         return cls.instance
 
     def __init__(self):
-        self.mylog = custom_log.get_logger()
-        self.mylog.setLevel(GLOBAL_LOG_LEVEL)
+        self.mylog = custom_log.get_logger(__name__)
         self.mylog.info("Log level: %d", self.mylog.getEffectiveLevel())
 
+    @classmethod
+    def set_bus(cls, bus: BroadcastBus) -> None:
+        """
+        Replace the bus used to fan broadcasts out to every worker process.
+
+        :param bus: The new broadcast bus.
+        :type bus: BroadcastBus
+        """
+        if cls._bus is not None and cls._bus is not bus:
+            cls._bus.close()
+        cls._bus = bus
+        bus.subscribe(cls().deliver_local)
+
+    @classmethod
+    def configure_send_queues(cls, size: int, policy: str) -> None:
+        """
+        Set the size and backpressure policy of the per-client send queues created
+        from now on.
+
+        :param size: Maximum number of messages queued for each client.
+        :type size: int
+        :param policy: One of drop_oldest, coalesce or disconnect.
+        :type policy: str
+        """
+        cls.send_queue_size = int(size)
+        cls.backpressure_policy = policy
+
+    @classmethod
+    def configure_history(cls, size: int) -> None:
+        """
+        Set the number of broadcasts retained per game for replay to reconnecting
+        clients. Applies to games whose history is created from now on.
+
+        :param size: Number of broadcasts retained.
+        :type size: int
+        """
+        cls.history_size = int(size)
+
+    @property
+    def bus(self) -> BroadcastBus:
+        """ Return the broadcast bus, defaulting to in-process delivery. """
+        if self._bus is None:
+            self.set_bus(InProcessBus())
+        return self._bus
+
     @property
     def game_update(self):
         """ Return stored function pointing to game.update """
@@ -38,10 +93,17 @@ class WebSocketMessenger:
         self._game_update = ext_game_update
 
     def register_new_player(
-        self, game_id: str, player_id: str, ws: geventwebsocket.websocket.WebSocket
+        self,
+        game_id: str,
+        player_id: str,
+        ws: geventwebsocket.websocket.WebSocket,
+        last_seq: Optional[int] = None,
+        epoch: Optional[str] = None,
     ) -> None:
         """
-        Handle new player registrations.
+        Handle new player registrations. A player reconnecting with the sequence number
+        of the last broadcast it received is sent the broadcasts it missed; everyone
+        else is sent a snapshot of the whole game.
 
         :param game_id: Game ID where the player wants to register.
         :type game_id: str
@@ -49,105 +111,78 @@ class WebSocketMessenger:
         :type player_id: str
         :param ws: Websocket corresponding to the registered player.
         :type ws: websocket.WebSocket
+        :param last_seq: Sequence number of the last broadcast the player received.
+        :type last_seq: int, optional
+        :param epoch: Epoch that sequence number belongs to.
+        :type epoch: str, optional
         """
         new_data = {"player_id": player_id, "ws": ws}
+        new_data["queue"] = self._new_send_queue(game_id, new_data)
 
-        try:
-            # Try to replace existing WS for same player.
-            self.client_sockets[game_id] = [
-                x for x in self.client_sockets[game_id] if x["player_id"] != player_id
-            ]
-            self.mylog.info("Appending new_data.")
-            self.client_sockets[game_id].append(new_data)
-        except KeyError:
-            self.client_sockets[game_id] = [new_data]
+        missed = None
+        with self._delivery_lock:
+            if last_seq is not None and epoch == ws_history.EPOCH:
+                missed = self.history(game_id).since(int(last_seq), player_id)
+            for payload in missed or []:
+                new_data["queue"].put(payload)
+
+            try:
+                # Try to replace existing WS for same player.
+                for item in self.client_sockets[game_id]:
+                    if item["player_id"] == player_id and "queue" in item:
+                        item["queue"].close()
+                self.client_sockets[game_id] = [
+                    x
+                    for x in self.client_sockets[game_id]
+                    if x["player_id"] != player_id
+                ]
+                self.mylog.info("Appending new_data.")
+                self.client_sockets[game_id].append(new_data)
+            except KeyError:
+                self.client_sockets[game_id] = [new_data]
+
+        # Send the snapshot first: a client reconnecting from another epoch drops
+        # broadcasts numbered up to the last one it saw, until the snapshot resets it.
+        if missed is None:
+            self.send_snapshot(game_id, new_data["queue"])
 
         # Gather information about the number of players and the game state.
         self.distribute_registered_players(game_id)
 
-        try:
-            self.update_refreshed_player_page(game_id, player_id, ws)
-        except geventwebsocket.exceptions.WebSocketError:
-            # Client disconnected unexpectedly.
-            self.mylog.warning("Client disconnected unexpectedly. Continuing.")
-
-    def update_refreshed_player_page(self, game_id, player_id, ws):
-        # Send this player information about the game, as appropriate, in case they've
-        # just refreshed the page.
-        # TODO: Replace this nonsense with a straightforward entire game/round/team/
-        # player status message.
-        game_mode: int = utils.query_game(game_id).state
-        round_id = str(utils.query_gameround_for_game(game_id).round_id)
-        self.update_refreshed_page_team_scores(round_id, ws)
-        if play_pinochle.GameModes.modes[game_mode] == "bid":
-            self.update_refreshed_page_bid(round_id, player_id, ws)
-        elif play_pinochle.GameModes.modes[game_mode] == "reveal":
-            self.update_refreshed_page_reveal(round_id, ws)
-        elif play_pinochle.GameModes.modes[game_mode] == "meld":
-            try:
-                self.update_refreshed_page_bid(round_id, player_id, ws)
-            except IndexError:
-                pass
-            self.update_refreshed_page_trump(round_id, ws)
-
-    def update_refreshed_page_team_scores(self, round_id, ws):
-        a_roundteams = utils.query_roundteam_list(round_id)
-        for a_roundteam in a_roundteams:
-            a_team = utils.query_team(str(a_roundteam.team_id))
-            ws.send(
-                json.dumps(
-                    {
-                        "action": "team_score",
-                        "team_id": str(a_roundteam.team_id),
-                        "score": a_team.score,
-                        "meld_score": 0,
-                    }
-                )
-            )
+    def history(self, game_id: str) -> ws_history.BroadcastHistory:
+        """
+        Return the sequence counter and replay buffer for a game.
 
-    @staticmethod
-    def update_refreshed_page_trump(round_id, ws):
-        a_round = utils.query_round(round_id)
-        ws.send(json.dumps({"action": "trump_selected", "trump": str(a_round.trump),}))
-
-    @staticmethod
-    def update_refreshed_page_reveal(round_id, ws):
-        a_round = utils.query_round(round_id)
-        ws.send(
-            json.dumps(
-                {
-                    "action": "bid_winner",
-                    "player_id": str(a_round.bid_winner),
-                    "bid": a_round.bid,
-                }
+        :param game_id: ID of the game
+        :type game_id: str
+        :return: The game's broadcast history.
+        :rtype: ws_history.BroadcastHistory
+        """
+        try:
+            return self.histories[game_id]
+        except KeyError:
+            return self.histories.setdefault(
+                game_id, ws_history.BroadcastHistory(self.history_size)
             )
-        )
 
-    @staticmethod
-    def update_refreshed_page_bid(round_id, player_id, ws):
-        # Try to figure out who is responsible for the next bid...
-        ordered_player_list = play_pinochle.players_still_bidding(round_id)
-        a_round = utils.query_round(round_id)
+    def send_snapshot(self, game_id: str, queue: ClientSendQueue) -> None:
+        """
+        Send a single message describing the entire state of the game to one client,
+        in case they've just refreshed the page or missed too many broadcasts.
 
-        current_bid = a_round.bid
-        if current_bid > 20:
-            next_bid_player_idx = play_pinochle.determine_next_bidder_player_id(
-                player_id, ordered_player_list
-            )
-            player_bidding = ordered_player_list[next_bid_player_idx]
-        else:
-            player_bidding = ordered_player_list[
-                a_round.round_seq % len(ordered_player_list)
-            ]
-            ws.send(
-                json.dumps(
-                    {
-                        "action": "bid_prompt",
-                        "player_id": player_bidding,
-                        "bid": current_bid,
-                    }
-                )
-            )
+        :param game_id: ID of the game
+        :type game_id: str
+        :param queue: Send queue of the client.
+        :type queue: ClientSendQueue
+        """
+        # Broadcasts made while the snapshot is gathered are already reflected in it,
+        # so take the sequence number first.
+        seq = self.history(game_id).seq
+        snapshot = GameSnapshot(game_id)
+        if not snapshot.found:
+            self.mylog.warning("No active round found for game %s.", game_id)
+            return
+        queue.put(json.dumps(snapshot.to_message(seq, ws_history.EPOCH)))
 
     def distribute_registered_players(self, game_id):
         """
@@ -163,7 +198,7 @@ class WebSocketMessenger:
         if not joined_players:
             return
 
-        round_id = str(utils.query_gameround_for_game(game_id).round_id)
+        round_id = utils.query_active_round_id(game_id)
         ordered_player_list = roundteams.create_ordered_player_list(round_id)
         self.websocket_broadcast(
             game_id,
@@ -176,12 +211,7 @@ class WebSocketMessenger:
         )
 
         # Gather information about the number of players and the game state.
-        temp_round = str(utils.query_gameround_for_game(game_id).round_id)
-        temp_team_list = utils.query_roundteam_list(temp_round)
-        num_players = sum(
-            len(utils.query_teamplayer_list(str(temp_team.team_id)))
-            for temp_team in temp_team_list
-        )
+        num_players = len(utils.query_player_ids_for_round(round_id))
         game_mode = utils.query_game(game_id).state
 
         # In order to make the decision of whether the game should start.
@@ -198,14 +228,17 @@ class WebSocketMessenger:
                     "WebSocketMessenger: game_update was not set before use."
                 )
             # TODO: This should be abstracted to be any kind of game.
-            play_pinochle.start(temp_round)
+            play_pinochle.start(round_id)
 
     def websocket_broadcast(
         self, game_id: str, message: dict, exclude: Optional[str] = None
     ) -> None:
         """
         Send a websocket broadcast message to all players registered to a game,
-        optionally excluding a player.
+        optionally excluding a player. The message is published on the broadcast bus
+        so players attached to other worker processes receive it too. During a
+        transaction it's published once the transaction is committed, so players
+        never see changes that are rolled back.
 
         :param game_id: ID of the game
         :type game_id:  str
@@ -214,18 +247,85 @@ class WebSocketMessenger:
         :param exclude: Player ID to exclude from broadcast.
         :type exclude:  str, optional
         """
+        unit_of_work.after_commit(lambda: self.bus.publish(game_id, message, exclude))
+
+    def deliver_local(
+        self,
+        game_id: str,
+        payload: str,
+        exclude: Optional[str] = None,
+        key: Optional[str] = None,
+    ) -> None:
+        """
+        Queue a broadcast message received from the bus for each of the players
+        attached to this process. The message is sent by each client's own sender, so
+        a slow client doesn't delay the others.
+
+        :param game_id: ID of the game
+        :type game_id:  str
+        :param payload: JSON encoded message to send.
+        :type payload:  str
+        :param exclude: Player ID to exclude from broadcast.
+        :type exclude:  str, optional
+        :param key:     Key of the message, used to coalesce queued messages.
+        :type key:      str, optional
+        """
         # If no registrations have occurred or none for the supplied game, continue.
         if not self.client_sockets or game_id not in self.client_sockets:
             return
 
-        for item in self.client_sockets[game_id]:
-            cli_ws = item["ws"]
-            if exclude and exclude in item["player_id"]:
-                continue
-            try:
-                self.mylog.info("Sending message to client %r", cli_ws)
-                cli_ws.send(json.dumps(message))
-            except geventwebsocket.exceptions.WebSocketError:
-                self.mylog.info(
-                    "stream_socket: gevent WebSocketError: Client's websocket is closed."
-                )
+        started = time.perf_counter()
+        with self._delivery_lock:
+            payload = self.history(game_id).record(payload, exclude)
+            for item in list(self.client_sockets[game_id]):
+                if exclude and exclude in item["player_id"]:
+                    continue
+                if "queue" not in item:
+                    item["queue"] = self._new_send_queue(game_id, item)
+                item["queue"].put(payload, key)
+        metrics.REGISTRY.observe(
+            "ws_fanout_duration_seconds", time.perf_counter() - started
+        )
+        # Workers serving only websockets never reach the request hooks.
+        metrics.start_writer()
+
+    @classmethod
+    def metrics_samples(cls) -> List[metrics.Sample]:
+        """
+        Report the clients attached to this process and the messages sent to them.
+
+        :return: Clients and queued messages by game, and messages by outcome.
+        :rtype: List[metrics.Sample]
+        """
+        samples: List[metrics.Sample] = []
+        for game_id, clients in list(cls.client_sockets.items()):
+            labels = (("game", str(game_id)),)
+            depth = sum(len(x["queue"]) for x in clients if "queue" in x)
+            samples.append(("gauge", "ws_clients", labels, len(clients)))
+            samples.append(("gauge", "ws_queue_depth", labels, depth))
+        for outcome, count in list(ws_queue.STATS.items()):
+            samples.append(
+                ("counter", "ws_messages_total", (("outcome", outcome),), count)
+            )
+        return samples
+
+    def _new_send_queue(self, game_id: str, client: dict) -> ClientSendQueue:
+        def drop_client(_queue: ClientSendQueue) -> None:
+            self.mylog.warning(
+                "Disconnecting player %s: too many unsent messages.",
+                client["player_id"],
+            )
+            if game_id in self.client_sockets:
+                self.client_sockets[game_id] = [
+                    x for x in self.client_sockets[game_id] if x is not client
+                ]
+
+        return ClientSendQueue(
+            client["ws"],
+            maxsize=self.send_queue_size,
+            policy=self.backpressure_policy,
+            on_disconnect=drop_client,
+        )
+
+
+metrics.register_collector(WebSocketMessenger.metrics_samples)
@@ -0,0 +1,193 @@
+"""
+Bounded outbound message queues for websocket clients.
+
+Each attached client gets its own queue, drained by its own greenlet (a thread when
+not monkeypatched by gevent), so a slow or dead client never holds up the request that
+triggered a broadcast or the delivery to the other clients. When a queue is full the
+configured backpressure policy decides what happens to the client:
+
+- ``drop_oldest``: Discard the oldest queued message to make room.
+- ``coalesce``: Discard an older queued message with the same key, since the newer one
+  supersedes it. Only messages carrying a complete state have a key (see
+  ``coalesce_key``); changes such as a card played or a bid are never merged. Falls
+  back to dropping the oldest message.
+- ``disconnect``: Close the client's websocket; it will reconnect and resynchronize.
+
+License: GPLv3
+"""
+import threading
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+import geventwebsocket
+
+from . import custom_log
+
+POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Aggregate counters for all the client queues in this process.
+STATS: Counter = Counter()
+
+# Actions of the messages carrying a complete state, each with the message field
+# naming what the state belongs to, if any.
+COALESCED_ACTIONS: Dict[str, Optional[str]] = {
+    "game_snapshot": None,
+    "notification_player_list": None,
+    "team_score": "team_id",
+}
+
+
+def coalesce_key(message: dict) -> Optional[str]:
+    """
+    Return the key under which a message supersedes older queued ones.
+
+    :param message: Dictionary containing the structured message.
+    :type message: dict
+    :return: The key, or None when the message must never be discarded in favour
+        of a newer one.
+    :rtype: str, optional
+    """
+    action = message.get("action")
+    if action not in COALESCED_ACTIONS:
+        return None
+    field = COALESCED_ACTIONS[action]
+    if field is None:
+        return action
+    return f"{action}:{message.get(field)}"
+
+
+class ClientSendQueue:
+    """
+    Outbound message queue for one websocket client.
+
+    :arg ws:
+        The client's websocket. Only ``send`` and ``close`` are used.
+    :arg int maxsize:
+        Maximum number of messages waiting to be sent.
+    :arg str policy:
+        Backpressure policy applied when the queue is full.
+    :arg on_disconnect:
+        Optional function called with this queue when the ``disconnect`` policy closes
+        the client.
+    """
+
+    def __init__(
+        self,
+        ws,
+        maxsize: int = 64,
+        policy: str = "drop_oldest",
+        on_disconnect: Optional[Callable[["ClientSendQueue"], None]] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Backpressure policy must be one of {POLICIES}.")
+        self.mylog = custom_log.get_logger(__name__)
+        self.ws = ws
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_disconnect = on_disconnect
+        self.stats: Counter = Counter()
+        self.closed = False
+        self._queue: Deque[Tuple[Optional[str], str]] = deque()
+        self._lock = threading.Lock()
+        self._draining = False
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, payload: str, key: Optional[str] = None) -> bool:
+        """
+        Queue an encoded message for the client without blocking.
+
+        :param payload: JSON encoded message.
+        :type payload: str
+        :param key: Messages with the same key supersede each other when coalescing.
+        :type key: str, optional
+        :return: Whether the message was queued.
+        :rtype: bool
+        """
+        disconnect = False
+        with self._lock:
+            if self.closed:
+                return False
+            if len(self._queue) >= self.maxsize:
+                if self.policy == "disconnect":
+                    disconnect = True
+                else:
+                    self._make_room(key)
+            if not disconnect:
+                self._queue.append((key, payload))
+                if not self._draining:
+                    self._draining = True
+                    self._idle.clear()
+                    threading.Thread(
+                        target=self._drain, name="ws-client-sender", daemon=True
+                    ).start()
+
+        if disconnect:
+            self._count("disconnected")
+            self.close()
+            try:
+                self.ws.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
+            if self.on_disconnect is not None:
+                self.on_disconnect(self)
+            return False
+        return True
+
+    def close(self) -> None:
+        """
+        Stop sending to the client and discard any queued messages.
+        """
+        with self._lock:
+            self.closed = True
+            self._queue.clear()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every queued message has been handed to the websocket.
+
+        :param timeout: Maximum number of seconds to wait.
+        :type timeout: float, optional
+        :return: Whether the queue is idle.
+        :rtype: bool
+        """
+        return self._idle.wait(timeout)
+
+    def _make_room(self, key: Optional[str]) -> None:
+        """
+        Remove one message from a full queue according to the policy. Must be called
+        with the lock held.
+        """
+        if self.policy == "coalesce" and key is not None:
+            for index, (queued_key, _) in enumerate(self._queue):
+                if queued_key == key:
+                    del self._queue[index]
+                    self._count("coalesced")
+                    return
+        self._queue.popleft()
+        self._count("dropped")
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if not self._queue or self.closed:
+                    self._draining = False
+                    self._idle.set()
+                    return
+                _, payload = self._queue.popleft()
+            try:
+                self.ws.send(payload)
+                self._count("sent")
+            except geventwebsocket.exceptions.WebSocketError:
+                self.mylog.info("Client's websocket is closed. Discarding its queue.")
+                self._count("failed")
+                with self._lock:
+                    self.closed = True
+                    self._queue.clear()
+
+    def _count(self, name: str) -> None:
+        self.stats[name] += 1
+        STATS[name] += 1
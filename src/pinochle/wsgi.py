@@ -1,21 +1,67 @@
 #!/usr/bin/env python3
 
+import hmac
 import json
+import threading
 
 import geventwebsocket
 from flask import abort, make_response, redirect, render_template, request
 from flask_sockets import Sockets
 
-from . import GLOBAL_LOG_LEVEL, app_factory, custom_log, game
-from .models import utils
+from . import (
+    app_factory,
+    custom_log,
+    game,
+    game_engine,
+    game_event_queue,
+    game_events,
+    metrics,
+    profiler,
+    ws_bus,
+)
+from .models import metadata_cache, query_count, request_cache, utils
 from .ws_messenger import WebSocketMessenger as WSM
 
 application = app_factory.create_app()  # pragma: no cover
 app = application
 
+# Fan websocket broadcasts out to the clients attached to every worker process.
+WSM.set_bus(ws_bus.create_bus(app.config))
+WSM.configure_send_queues(
+    app.config["WS_SEND_QUEUE_SIZE"], app.config["WS_BACKPRESSURE_POLICY"]
+)
+WSM.configure_history(app.config["WS_REPLAY_BUFFER_SIZE"])
+
+# Store hands one row per card or one row per hand.
+utils.set_hand_storage(app.config["HAND_STORAGE"])
+metadata_cache.configure(
+    app.config["METADATA_CACHE_SIZE"], app.config["METADATA_CACHE_TTL"]
+)
+game_events.configure(app.config["GAME_EVENT_SNAPSHOT_INTERVAL"])
+game_event_queue.configure(
+    app.config["GAME_EVENT_WRITE_BEHIND"],
+    app.config["GAME_EVENT_QUEUE_ROUNDS"],
+    app.config["GAME_EVENT_FLUSH_INTERVAL"],
+)
+game_event_queue.init_app(app)
+game_engine.configure(
+    app.config["GAME_ENGINE"],
+    app.config["GAME_ENGINE_DIR"],
+    app.config["GAME_ENGINE_MAX_GAMES"],
+)
+game_engine.init_app(app)
+
+# Count and time requests, database statements and websocket broadcasts.
+metrics.configure(app.config["METRICS_DIR"], app.config["METRICS_FLUSH_INTERVAL"])
+metrics.init_app(app)
+query_count.init_app(app)
+
 # Websockets
 sockets = Sockets(app)
 
+# One profile of this worker at a time.
+PROFILE_LOCK = threading.Lock()
+
 # Create non-blueprint-defined endpoints.
 @sockets.route("/echo")  # pragma: no mutate
 def echo_socket(ws):  # pragma: no cover
@@ -28,8 +74,7 @@ def echo_socket(ws):  # pragma: no cover
 
 @sockets.route("/stream")
 def stream_socket(ws):  # pragma: no cover
-    mylog = custom_log.get_logger()
-    mylog.setLevel(GLOBAL_LOG_LEVEL)
+    mylog = custom_log.get_logger(__name__)
     mylog.info("Log level: %d", mylog.getEffectiveLevel())
 
     while True:
@@ -41,41 +86,103 @@ def stream_socket(ws):  # pragma: no cover
 
         if not message_text:
             continue
+
+        # The socket's request lasts as long as the socket, so treat each message as
+        # a request of its own for lookups remembered by models.utils.
+        request_cache.clear()
         
         mylog.info("stream_socket: Received message: %s", message_text)
 
         # Extract the message into a data structure
         message_data = json.loads(message_text)
 
-        # Dispatch an action
-        if "action" in message_text:
-            msg_game_id = str(message_data["game_id"])
-            ws_mess = WSM()
-            if "register_client" in message_text:
-                msg_player_id = message_data["player_id"]
-                if msg_game_id == "" or msg_player_id == "":
-                    continue
-                ws_mess.game_update = game.update
-                ws_mess.register_new_player(msg_game_id, msg_player_id, ws)
-            elif "reveal_kitty" in message_text:
-                msg_player_id = message_data["player_id"]
-                msg_kitty_card = message_data["card"]
-                round_id = str(utils.query_gameround_for_game(msg_game_id).round_id)
-                bid_winner = str(utils.query_round(round_id).bid_winner)
-                if (
-                    msg_game_id == ""
-                    or msg_player_id == ""
-                    or msg_player_id != bid_winner
-                    or not utils.query_hand_card(
-                        str(utils.query_round(round_id).hand_id), msg_kitty_card
+        # Dispatch an action, counting the SQL statements it issues.
+        with query_count.measure(f"websocket {message_data.get('action')}"):
+            if "action" in message_text:
+                msg_game_id = str(message_data["game_id"])
+                ws_mess = WSM()
+                if "register_client" in message_text:
+                    msg_player_id = message_data["player_id"]
+                    if msg_game_id == "" or msg_player_id == "":
+                        continue
+                    ws_mess.game_update = game.update
+                    ws_mess.register_new_player(
+                        msg_game_id,
+                        msg_player_id,
+                        ws,
+                        last_seq=message_data.get("last_seq"),
+                        epoch=message_data.get("epoch"),
                     )
-                ):
-                    continue
+                elif "reveal_kitty" in message_text:
+                    msg_player_id = message_data["player_id"]
+                    msg_kitty_card = message_data["card"]
+                    round_id = utils.query_active_round_id(msg_game_id)
+                    bid_winner = str(utils.query_round(round_id).bid_winner)
+                    if (
+                        msg_game_id == ""
+                        or msg_player_id == ""
+                        or msg_player_id != bid_winner
+                        or not utils.query_hand_card(
+                            str(utils.query_round(round_id).hand_id), msg_kitty_card
+                        )
+                    ):
+                        continue
+
+                    message_text = {"action": "reveal_kitty", "card": msg_kitty_card}
+                    ws_mess.websocket_broadcast(msg_game_id, message_text)
+                elif "trump_buried" in message_text:
+                    ws_mess.websocket_broadcast(msg_game_id, message_data)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Emit the metrics of every worker process in the Prometheus text format.
+
+    :return: The metrics.
+    :rtype: Response
+    """
+    resp = make_response(metrics.render())
+    resp.mimetype = "text/plain"
+    resp.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    return resp
+
+
+@app.route("/admin/profile", methods=["GET"])
+def profile_endpoint():
+    """
+    Profile this worker process for a number of seconds.
 
-                message_text = {"action": "reveal_kitty", "card": msg_kitty_card}
-                ws_mess.websocket_broadcast(msg_game_id, message_text)
-            elif "trump_buried" in message_text:
-                ws_mess.websocket_broadcast(msg_game_id, message_data)
+    :return: Collapsed stacks, or with format=pstats the cProfile report.
+    :rtype: Response
+    """
+    token = app.config.get("ADMIN_TOKEN")
+    if not token:
+        abort(404)
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(supplied.encode(), str(token).encode()):
+        abort(403, "Incorrect admin token.")
+
+    seconds = request.args.get("seconds", 10, type=float)
+    interval = request.args.get("interval", 0.005, type=float)
+    kind = request.args.get("format", "collapsed")
+    if kind not in profiler.FORMATS or seconds <= 0 or interval <= 0:
+        abort(400, "Incorrect parameters.")
+    seconds = min(seconds, app.config["PROFILE_MAX_SECONDS"])
+
+    if not PROFILE_LOCK.acquire(blocking=False):
+        abort(409, "A profile is already running.")
+    try:
+        if kind == "pstats":
+            output = profiler.profile_pstats(seconds)
+        else:
+            output = profiler.sample(seconds, interval)
+    finally:
+        PROFILE_LOCK.release()
+
+    resp = make_response(output)
+    resp.mimetype = "text/plain"
+    return resp
 
 
 @app.route("/api/setcookie/player_id/<ident>", methods=["GET"])
@@ -1,6 +1,7 @@
 """
 Module to hold test fixtures.
 """
+import contextlib
 import os
 import socket
 from unittest.mock import MagicMock
@@ -11,6 +12,7 @@ from selenium import webdriver
 from selenium.webdriver.edge.options import Options as EdgeOptions
 
 from pinochle import wsgi
+from pinochle.models import query_count
 from pinochle.models.core import db
 from pinochle.ws_messenger import WebSocketMessenger as WSM
 
@@ -85,6 +87,23 @@ def patch_ws_messenger_to_MM():
     WSM.websocket_broadcast.assert_has_calls  # pylint: disable=pointless-statement, no-member
 
 
+@pytest.fixture(scope="function")
+def query_budget(app):  # pylint: disable=unused-argument
+    """
+    Fixture to check that a block issues no more than a given number of SQL
+    statements. Use as ``with query_budget(8): ...``.
+    """
+
+    @contextlib.contextmanager
+    def _budget(limit: int):
+        query_count.reset()
+        yield
+        issued = query_count.stats()["count"]
+        assert issued <= limit, f"{issued} SQL statements issued, budget is {limit}."
+
+    return _budget
+
+
 # Support and automatically skip 'slow' and 'wip' tests unless the appropriate options
 # are given.
 def pytest_addoption(parser):
@@ -0,0 +1,90 @@
+"""
+Benchmark of dealing a round of Pinochle into the database.
+
+Run with ``pytest --runslow -s tests/test_bench_deal.py``.
+
+License: GPLv3
+"""
+import time
+
+import pytest
+from pinochle import play_pinochle
+from pinochle.cards import utils as card_utils
+from pinochle.cards.deck import PinochleDeck
+from pinochle.models import utils
+from pinochle.models.core import db
+from pinochle.models.hand import HandSchema
+
+from . import test_utils
+
+pytestmark = pytest.mark.slow
+
+ROUNDS = 50
+
+
+def baseline_deal_hands(players, kitty_cards):
+    """
+    cards.utils.deal_hands as it was before the bulk path: the kitty dealt from the
+    deck, which is shuffled again, then the rest dealt one card at a time.
+    """
+    deck = card_utils.populate_deck()
+    hands = [PinochleDeck(ranks=deck.ranks, build=False) for _ in range(players)]
+    kitty = PinochleDeck(ranks=deck.ranks, build=False)
+    kitty += deck.deal(kitty_cards)
+    deck.shuffle()
+    while deck.size > 0:
+        for index in range(players):
+            hands[index] += deck.deal()
+    return hands, kitty
+
+
+def baseline_addcards(hand_id, cards):
+    """
+    hand.addcards as it was before the bulk path: each card loaded through the
+    schema and added to the session, then committed.
+    """
+    schema = HandSchema(many=False)
+    for item in cards:
+        db.session.add(
+            schema.load({"hand_id": hand_id, "card": item}, session=db.session)
+        )
+    db.session.commit()
+
+
+def baseline_deal(player_ids, kitty_len, kitty_id):
+    """
+    Deal as deal_pinochle did before the bulk path. The code of that path is kept
+    here, since deal_hands and addcards have changed since; only the deck itself is
+    the current one.
+    """
+    hand_decks, kitty_deck = baseline_deal_hands(len(player_ids), kitty_len)
+    baseline_addcards(kitty_id, card_utils.convert_to_svg_names(kitty_deck))
+    for index, player_id in enumerate(player_ids):
+        hand_id = str(utils.query_player(player_id).hand_id)
+        baseline_addcards(hand_id, card_utils.convert_to_svg_names(hand_decks[index]))
+
+
+def time_deals(deal, player_ids, kitty_id):
+    """
+    Return the mean time, in milliseconds, to deal a round.
+    """
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        deal(player_ids=player_ids, kitty_len=4, kitty_id=kitty_id)
+    return (time.perf_counter() - start) * 1000 / ROUNDS
+
+
+def test_bench_deal(app):
+    """
+    GIVEN a game with four players
+    WHEN a round is dealt repeatedly with the row-by-row and the bulk paths
+    THEN report the latency of each and check the bulk path is faster
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    kitty_id = str(utils.query_round(round_id).hand_id)
+
+    baseline = time_deals(baseline_deal, player_ids, kitty_id)
+    bulk = time_deals(play_pinochle.deal_pinochle, player_ids, kitty_id)
+
+    print(f"\nDeal latency per round: row-by-row {baseline:.2f} ms, bulk {bulk:.2f} ms")
+    assert bulk < baseline
@@ -0,0 +1,145 @@
+"""
+Benchmark of storing IDs as hex characters or as 16 bytes in SQLite: the size of the
+hand table's indexes and the time to look a hand up, plus the cost of converting
+IDs when binding them.
+
+Run with ``pytest --runslow -s tests/test_bench_guid.py``.
+
+License: GPLv3
+"""
+import time
+import uuid
+
+import pytest
+import sqlalchemy
+from sqlalchemy.dialects import sqlite
+
+from pinochle.models import Hand
+from pinochle.models.GUID import GUID
+
+pytestmark = pytest.mark.slow
+
+HANDS = 5000
+CARDS = 12
+LOOKUPS = 2000
+BINDS = 100000
+
+
+def legacy_bind(value):
+    """
+    Bind an ID as GUID did before the fast path, building a UUID every time.
+    """
+    if not isinstance(value, uuid.UUID):
+        return "%.32x" % uuid.UUID(value).int
+    return "%.32x" % value.int
+
+
+def build_hand_table(storage, hand_ids):
+    """
+    Create an in-memory hand table with the given GUID storage and fill it.
+    """
+    GUID.set_storage(storage)
+    engine = sqlalchemy.create_engine("sqlite://")
+    Hand.__table__.create(bind=engine)
+    engine.execute(
+        Hand.__table__.insert(),
+        [
+            {"hand_id": hand_id, "seq": seq, "card": "card%d" % seq}
+            for hand_id in hand_ids
+            for seq in range(CARDS)
+        ],
+    )
+    return engine
+
+
+def index_sizes(engine):
+    """
+    Return the bytes used by the hand table and each of its indexes.
+    """
+    try:
+        rows = engine.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE name != 'sqlite_schema' "
+            "GROUP BY name"
+        ).fetchall()
+    except sqlalchemy.exc.OperationalError:
+        pytest.skip("SQLite was built without the dbstat table.")
+    return dict(rows)
+
+
+def time_lookups(engine, hand_ids):
+    """
+    Return the mean time, in microseconds, to read the cards of a hand.
+    """
+    query = Hand.__table__.select().where(
+        Hand.__table__.c.hand_id == sqlalchemy.bindparam("h")
+    )
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for hand_id in hand_ids[:LOOKUPS]:
+            rows = conn.execute(query, h=str(hand_id)).fetchall()
+            assert len(rows) == CARDS
+    return (time.perf_counter() - start) * 1e6 / LOOKUPS
+
+
+def time_binds(bind, values):
+    """
+    Return the mean time, in nanoseconds, to convert an ID for binding.
+    """
+    start = time.perf_counter()
+    for value in values:
+        bind(value)
+    return (time.perf_counter() - start) * 1e9 / len(values)
+
+
+def test_bench_guid_storage():
+    """
+    GIVEN hand tables storing IDs as hex and as bytes
+    WHEN their sizes are measured and hands are looked up
+    THEN report both and check that binary storage is smaller
+    """
+    hand_ids = [uuid.uuid4() for _ in range(HANDS)]
+    results = {}
+    previous = GUID.storage
+    try:
+        for storage in ("char", "binary"):
+            engine = build_hand_table(storage, hand_ids)
+            results[storage] = (index_sizes(engine), time_lookups(engine, hand_ids))
+            engine.dispose()
+    finally:
+        GUID.set_storage(previous)
+
+    print(f"\n{HANDS} hands of {CARDS} cards:")
+    for storage, (sizes, lookup) in results.items():
+        total = sum(sizes.values())
+        print(f"  {storage:6} {total / 1024:8.0f} KiB, lookup {lookup:.1f} us")
+        for name, size in sorted(sizes.items()):
+            print(f"         {name:30} {size / 1024:8.0f} KiB")
+    assert sum(results["binary"][0].values()) < sum(results["char"][0].values())
+
+
+def test_bench_guid_bind():
+    """
+    GIVEN IDs as canonical strings
+    WHEN they are converted for binding with the old and the new code
+    THEN report the cost of each and check the new code isn't slower
+    """
+    values = [str(uuid.uuid4()) for _ in range(BINDS)]
+    guid = GUID()
+    dialect = sqlite.dialect()
+
+    legacy = time_binds(legacy_bind, values)
+    previous = GUID.storage
+    try:
+        GUID.set_storage("char")
+        char = time_binds(lambda x: guid.process_bind_param(x, dialect), values)
+        GUID.set_storage("binary")
+        binary = time_binds(lambda x: guid.process_bind_param(x, dialect), values)
+    finally:
+        GUID.set_storage(previous)
+
+    print(
+        f"\nBind per ID: legacy {legacy:.0f} ns, char {char:.0f} ns, "
+        f"binary {binary:.0f} ns"
+    )
+    assert char < legacy
+    assert binary < legacy
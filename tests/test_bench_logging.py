@@ -0,0 +1,66 @@
+"""
+Microbenchmark of the logging helpers when INFO is disabled, as it is by default.
+
+Run with ``pytest --runslow -s tests/test_bench_logging.py``.
+
+License: GPLv3
+"""
+import inspect
+import logging
+import sys
+import time
+
+import pytest
+from pinochle import custom_log
+from pinochle.log_decorator import log_decorator
+
+pytestmark = pytest.mark.slow
+
+CALLS = 20000
+
+
+def legacy_get_logger():
+    """
+    Create a logger as get_logger did before loggers were cached: named after the
+    caller found by inspecting the stack, with a new handler every time.
+    """
+    logger = logging.Logger(f"pinochle.{inspect.stack()[1][3]}")
+    logger.addHandler(logging.StreamHandler(stream=sys.stderr))
+    return logger
+
+
+def plain(value, step=1):
+    return value + step
+
+
+decorated = log_decorator(plain)
+
+
+def time_calls(func, *args, calls=CALLS):
+    """
+    Return the mean time, in microseconds, of a call.
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        func(*args)
+    return (time.perf_counter() - start) * 1e6 / calls
+
+
+def test_bench_logging():
+    """
+    GIVEN logging at the default WARNING level
+    WHEN loggers are fetched and decorated functions called repeatedly
+    THEN report the cost of each and check the overhead is negligible
+    """
+    assert not custom_log.get_logger(__name__).isEnabledFor(logging.INFO)
+
+    legacy = time_calls(legacy_get_logger, calls=CALLS // 100)
+    cached = time_calls(custom_log.get_logger, __name__)
+    direct = time_calls(plain, 1)
+    wrapped = time_calls(decorated, 1)
+
+    print(f"\nget_logger: legacy {legacy:.2f} us, cached {cached:.3f} us")
+    print(f"Call: direct {direct:.3f} us, decorated {wrapped:.3f} us")
+    assert cached * 100 < legacy
+    # The decorator adds a single level check to the call.
+    assert wrapped - direct < 1
@@ -0,0 +1,88 @@
+"""
+Benchmark of simultaneous games sharing one SQLite database file, with SQLite's
+defaults and a connection per request, and with the tuning from
+models.sqlite_tuning.
+
+Run with ``pytest --runslow -s tests/test_bench_sqlite.py``.
+
+License: GPLv3
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pinochle import app_factory, play_pinochle, round_, trick
+from pinochle.models import utils
+
+from . import test_utils
+
+pytestmark = pytest.mark.slow
+
+GAMES = 16
+THREADS = 8
+
+
+def play_game(app):
+    """
+    Create a game of four players and play a whole round of it.
+    """
+    with app.app_context():
+        game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(0)
+        play_pinochle.start(round_id)
+        round_.update(round_id, {"bid_winner": player_ids[0], "trump": "heart"})
+        trick_id = str(utils.query_trick_for_round_id(round_id).trick_id)
+        trick.update(trick_id, {"trick_starter": player_ids[0]})
+
+        hand_ids = [test_utils.query_player_hand_id(x) for x in player_ids]
+        while utils.query_hand_list(hand_ids[0]):
+            a_trick = utils.query_trick_for_round_id(round_id)
+            for player_id in play_pinochle.reorder_players(
+                round_id, str(a_trick.trick_starter)
+            ):
+                hand_id = test_utils.query_player_hand_id(player_id)
+                card = utils.query_hand_list(hand_id)[0].card
+                play_pinochle.play_trick_card(round_id, player_id, card)
+            if utils.query_hand_list(hand_ids[0]):
+                winner = utils.query_trick(str(a_trick.trick_id)).trick_winner
+                play_pinochle.start_next_trick(round_id, str(winner))
+        return game_id
+
+
+def time_games(app):
+    """
+    Play GAMES games on THREADS threads, returning the games per second and the
+    number of games that failed.
+    """
+    with ThreadPoolExecutor(THREADS) as executor:
+        start = time.perf_counter()
+        futures = [executor.submit(play_game, app) for _ in range(GAMES)]
+        failed = 0
+        for future in futures:
+            if future.exception() is not None:
+                failed += 1
+        elapsed = time.perf_counter() - start
+    return (GAMES - failed) / elapsed, failed
+
+
+def test_bench_sqlite_concurrency(tmp_path):
+    """
+    GIVEN databases with SQLite's defaults and with the tuning profile
+    WHEN several games are played at the same time against each
+    THEN report the throughput of each and check the tuned database loses no games
+    """
+    results = {}
+    for tuned in (False, True):
+        app = app_factory.create_app(
+            register_blueprints=False,
+            config={
+                "DB_NAME": str(tmp_path / ("tuned.db" if tuned else "default.db")),
+                "SQLITE_TUNING": tuned,
+            },
+        )
+        results[tuned] = time_games(app)
+
+    print(f"\n{GAMES} games on {THREADS} threads:")
+    for tuned, (rate, failed) in results.items():
+        name = "tuned" if tuned else "default"
+        print(f"  {name:8} {rate:6.2f} games/s, {failed} failed")
+    assert results[True][1] == 0
@@ -20,10 +20,12 @@ Modernized and modified for Pinochle by Paul Kronenwetter
 # Imports
 # ===============================================================================
 
+import copy
+import pickle
 import unittest
 
 import pytest
-from pinochle.cards import card
+from pinochle.cards import card, const
 from pinochle.exceptions import InvalidSuitError, InvalidValueError
 
 # ===============================================================================
@@ -177,3 +179,49 @@ class TestCard(unittest.TestCase):
         """
         with pytest.raises(InvalidValueError):
             _ = card.PinochleCard(value="NotAValue", suit="Spades")
+
+    def test_interned(self):
+        """
+        Tests that each distinct card has a single instance.
+        """
+        self.assertIs(card.PinochleCard("Ace", "Spades"), self.reference_card)
+        self.assertIs(card.PinochleCard("ace", "spades"), self.reference_card)
+        self.assertIs(copy.deepcopy(self.reference_card), self.reference_card)
+        self.assertIs(
+            pickle.loads(pickle.dumps(self.reference_card)), self.reference_card
+        )
+        self.assertFalse(hasattr(self.reference_card, "__dict__"))
+
+    def test_immutable(self):
+        """
+        Tests that the shared instances can't be modified.
+        """
+        with pytest.raises(AttributeError):
+            self.reference_card.suit = "Hearts"
+        with pytest.raises(AttributeError):
+            del self.reference_card.value
+        self.assertEqual(self.reference_card.suit, "Spades")
+
+    def test_card_id(self):
+        """
+        Tests that card ids number the cards suit-major.
+        """
+        for card_id, a_card in enumerate(card.CARDS):
+            self.assertEqual(a_card.card_id, card_id)
+            self.assertIs(card.card_from_id(card_id), a_card)
+            self.assertEqual(
+                (a_card.value, a_card.suit),
+                (
+                    const.VALUES[card_id % len(const.VALUES)],
+                    const.SUITS[card_id // len(const.VALUES)],
+                ),
+            )
+        self.assertEqual(len({hash(x) for x in card.CARDS}), len(card.CARDS))
+
+    def test_sort_key(self):
+        """
+        Tests that sort keys order cards as the comparison functions do.
+        """
+        for a_card in card.CARDS:
+            for other in card.CARDS:
+                self.assertEqual(a_card.sort_key > other.sort_key, a_card.gt(other))
@@ -0,0 +1,90 @@
+"""
+Tests for the compact card hand representation.
+
+License: GPLv3
+"""
+import unittest
+
+import pytest
+from pinochle.cards import compact, utils
+from pinochle.cards.card import PinochleCard
+from pinochle.exceptions import InvalidSuitError, InvalidValueError
+
+
+class TestCompactHand(unittest.TestCase):
+    def test_kind_numbering(self):
+        """"""
+        self.assertEqual(compact.NUM_KINDS, 24)
+        self.assertEqual(compact.kind_index("9", "Diamonds"), 0)
+        self.assertEqual(compact.kind_index("Ace", "Spades"), 23)
+        self.assertEqual(compact.kind_index("ace", "spades"), 23)
+        self.assertEqual(compact.SVG_NAMES[23], "spade_ace")
+        self.assertEqual(compact.svg_kind("club_10"), compact.kind_index("10", "Clubs"))
+        self.assertEqual(compact.kind_card(23), PinochleCard("Ace", "Spades"))
+
+    def test_invalid_cards(self):
+        """"""
+        with pytest.raises(InvalidValueError):
+            compact.kind_index("2", "Spades")
+        with pytest.raises(InvalidSuitError):
+            compact.kind_index("Ace", "Stars")
+        with pytest.raises(InvalidValueError):
+            compact.svg_kind("spade_2")
+
+    def test_add_remove_count(self):
+        """"""
+        hand = compact.CompactHand()
+        self.assertEqual(len(hand), 0)
+        hand.add(5)
+        hand.add(5)
+        hand.add(7)
+        self.assertEqual(hand.count(5), 2)
+        self.assertEqual(hand.count(7), 1)
+        self.assertEqual(len(hand), 3)
+        self.assertIn(7, hand)
+        hand.remove(7)
+        self.assertNotIn(7, hand)
+        self.assertEqual(len(hand), 2)
+        with pytest.raises(ValueError):
+            hand.remove(7)
+        with pytest.raises(ValueError):
+            hand.add(5)
+        self.assertEqual(hand.count(5), 2)
+
+    def test_svg_round_trip(self):
+        """"""
+        names = ["spade_ace", "club_9", "spade_ace", "heart_queen"]
+        hand = compact.CompactHand.from_svg_names(names)
+        self.assertEqual(sorted(hand.to_svg_names()), sorted(names))
+        self.assertEqual(hand, compact.CompactHand(hand.bits))
+        self.assertEqual(hash(hand), hash(compact.CompactHand(hand.bits)))
+
+    def test_deck_round_trip(self):
+        """"""
+        deck = utils.populate_deck()
+        hand = compact.CompactHand.from_deck(deck)
+        self.assertEqual(len(hand), 48)
+        self.assertEqual(hand.counts(), [2] * 24)
+        self.assertEqual(hand.bits.bit_length(), 48)
+        new_deck = hand.to_deck()
+        self.assertEqual(
+            sorted(utils.convert_to_svg_names(new_deck)),
+            sorted(utils.convert_to_svg_names(deck)),
+        )
+
+    def test_counts_and_addition(self):
+        """"""
+        counts = [index % 3 for index in range(24)]
+        hand = compact.CompactHand.from_counts(counts)
+        self.assertEqual(hand.counts(), counts)
+        self.assertEqual(len(hand), sum(counts))
+        other = compact.CompactHand.from_kinds([0, 0, 1])
+        self.assertEqual((hand + other).counts()[:3], [2, 2, 2])
+        with pytest.raises(ValueError):
+            compact.CompactHand.from_counts([4] + [0] * 23)
+        with pytest.raises(ValueError):
+            compact.CompactHand.from_counts([3] + [0] * 23)
+        with pytest.raises(ValueError):
+            compact.CompactHand(3 << 10)
+        with pytest.raises(ValueError):
+            compact.CompactHand(1 << 48)
@@ -6,6 +6,7 @@ from unittest import TestCase
 
 from pinochle.cards import card, stack, utils
 from pinochle.cards.deck import PinochleDeck
+from pinochle.exceptions import InvalidSuitError
 
 
 class TestDeck(TestCase):
@@ -128,6 +129,28 @@ class TestDeck(TestCase):
             one, two = test_deck.deal(2)
             self.assertEqual(one, two)
 
+    def test_deck_sort_trump(self):
+        """
+        Tests sorting a trump view of a deck using the precomputed rank tables.
+        """
+        test_deck = PinochleDeck(build=True)
+        test_deck.shuffle()
+        trump_deck = test_deck.with_trump("Clubs")
+        plain_deck = PinochleDeck(
+            cards=list(test_deck),
+            ranks={
+                "suits": dict(trump_deck.ranks["suits"]),
+                "values": dict(trump_deck.ranks["values"]),
+            },
+        )
+        trump_deck.sort()
+        plain_deck.sort()
+
+        self.assertEqual(list(trump_deck), list(plain_deck))
+        self.assertEqual(trump_deck[0].suit, "Clubs")
+        with self.assertRaises(InvalidSuitError):
+            test_deck.with_trump("NotASuit")
+
     def test_verify(self):
         """
         Tests a specific combination of pinochle players and kitty sizes.
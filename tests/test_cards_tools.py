@@ -79,6 +79,19 @@ class TestTools(unittest.TestCase):
 
         self.assertEqual(result, True)
 
+    def test_sort_cards_rank_tables(self):
+        """
+        Tests that sorting with the precomputed keys of the shared rank tables
+        matches sorting with an equivalent plain rank dict.
+        """
+        cards = list(deck.PinochleDeck(build=True))
+        for trump, ranks in const.RANKS_BY_TRUMP.items():
+            plain = {"suits": dict(ranks["suits"]), "values": dict(ranks["values"])}
+            self.assertIsNone(tools.rank_sort_keys(plain))
+            self.assertEqual(
+                tools.sort_cards(cards, ranks), tools.sort_cards(cards, plain), trump
+            )
+
     def test_check_term(self):
         """"""
         result = tools.check_term(self.deck[0], "9 of Diamonds")
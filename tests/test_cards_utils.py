@@ -4,7 +4,7 @@ Tests for the application module.
 from unittest import TestCase
 
 import pytest
-from pinochle.cards import deck, utils
+from pinochle.cards import const, deck, utils
 from pinochle.exceptions import InvalidDeckError, InvalidSuitError
 
 
@@ -112,6 +112,20 @@ class TestUtils(TestCase):
         assert len(hands) == 4
         assert len(kitty) == 0
 
+    def test_deal_card_names(self):
+        """
+        Tests dealing SVG card names directly from a shuffled deck.
+        """
+        full_deck = sorted(utils.convert_to_svg_names(utils.populate_deck()))
+        for players, kitty_cards, size in [(4, 4, 11), (4, 0, 12), (5, 0, 9)]:
+            hands, kitty = utils.deal_card_names(players, kitty_cards)
+            assert len(hands) == players
+            assert [len(x) for x in hands] == [size] * players
+            assert sorted(kitty + sum(hands, [])) == full_deck
+
+        with pytest.raises(AssertionError):
+            utils.deal_card_names(players=5, kitty_cards=1)
+
     def test_trump_suit_exception(self):
         """
         Tests that an exception is raised as appropriate.
@@ -120,6 +134,21 @@ class TestUtils(TestCase):
         with pytest.raises(InvalidSuitError):
             utils.set_trump(trump="NotASuit", f_deck=temp_deck)
 
+    def test_set_trump_shares_cards(self):
+        """
+        Tests that setting trump doesn't copy the deck or change its ranks.
+        """
+        temp_deck = deck.PinochleDeck(build=True)
+        trump_deck = utils.set_trump(trump="Hearts", f_deck=temp_deck)
+
+        assert trump_deck.cards is temp_deck.cards
+        assert trump_deck.ranks is const.RANKS_BY_TRUMP["Hearts"]
+        assert trump_deck.ranks["suits"]["Hearts"] == const.TRUMP_VALUE
+        assert temp_deck.ranks is const.PINOCHLE_RANKS
+        assert temp_deck.ranks["suits"]["Hearts"] == 3
+        with pytest.raises(TypeError):
+            trump_deck.ranks["suits"]["Spades"] = const.TRUMP_VALUE
+
     def test_trump_deck_exception(self):
         """
         Tests that an exception is raised as appropriate.
@@ -0,0 +1,84 @@
+"""
+Tests for the cached loggers and the log decorator.
+
+License: GPLv3
+"""
+import logging
+
+from pinochle import custom_log
+from pinochle.log_decorator import log_decorator
+
+
+class Noisy:
+    """
+    Counts how often it is formatted for a log record.
+    """
+
+    formatted = 0
+
+    def __repr__(self):
+        Noisy.formatted += 1
+        return "Noisy()"
+
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    @log_decorator
+    def add(self, amount, step=1):
+        self.count += amount * step
+        return self.count
+
+
+@log_decorator
+def echo(value):
+    return value
+
+
+def test_get_logger_cached():
+    """
+    GIVEN loggers asked for by module name
+    WHEN they are asked for again
+    THEN check that the same logger is returned, named after the calling module
+    """
+    logger = custom_log.get_logger()
+    assert logger.name == __name__
+    assert custom_log.get_logger(__name__) is logger
+    assert custom_log.get_logger("pinochle.other") is not logger
+    assert not logger.propagate
+
+
+def test_log_decorator_levels():
+    """
+    GIVEN functions wrapped by log_decorator
+    WHEN they are called with INFO disabled and enabled
+    THEN check that arguments are only formatted when records are emitted
+    """
+    logger = custom_log.get_logger(__name__)
+    records = []
+    handler = logging.Handler()
+    handler.emit = lambda record: records.append(record.getMessage())
+    logger.addHandler(handler)
+    level = logger.level
+    try:
+        logger.setLevel(logging.WARNING)
+        noisy = Noisy()
+        assert echo(noisy) is noisy
+        assert Counter().add(2, step=3) == 6
+        assert not records
+        assert Noisy.formatted == 0
+
+        logger.setLevel(logging.INFO)
+        assert echo(noisy) is noisy
+        assert Counter().add(2, step=3) == 6
+    finally:
+        logger.setLevel(level)
+        logger.removeHandler(handler)
+
+    assert records == [
+        "Begin function: Arguments: Noisy(), ",
+        "End function  : Returned: Noisy()",
+        "Begin function: Arguments: 2, step=3",
+        "End function  : Returned: 6",
+    ]
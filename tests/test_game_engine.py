@@ -0,0 +1,221 @@
+"""
+Tests for the in-memory game engine, and the routing of games to their owner.
+
+License: GPLv3
+"""
+import json
+
+import pytest
+from werkzeug import exceptions
+
+from pinochle import game_engine, play_pinochle, player, roundteams
+from pinochle.cards.compact import CompactHand, svg_kind
+from pinochle.models import utils
+
+from . import test_game_events, test_utils
+
+# The state of a round held by the engine, compared with the database's.
+ROUND_STATE = (
+    "bid",
+    "bid_winner",
+    "trump",
+    "kitty",
+    "hands",
+    "bidding",
+    "meld",
+    "meld_final",
+    "team_cards",
+    "team_scores",
+    "trick_starter",
+    "trick_winner",
+    "trick",
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """
+    Play games in memory, writing their actions and dropping the engines afterwards.
+    """
+    game_engine.configure(True, str(tmp_path))
+    yield
+    game_engine.flush()
+    game_engine.forget()
+    game_engine.configure(False)
+
+
+@pytest.fixture
+def broadcasts(monkeypatch):
+    """
+    Record the action of each broadcast, as it's made.
+    """
+    sent = []
+    monkeypatch.setattr(
+        play_pinochle.WSM,
+        "websocket_broadcast",
+        lambda self, game_id, message, exclude=None: sent.append(message["action"]),
+    )
+    return sent
+
+
+def test_round_played_in_memory(app, engine, broadcasts):
+    """
+    GIVEN games played in memory
+    WHEN a whole round is played
+    THEN check that it's only written, and broadcast, on flush, as the engine has it
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    bidders = play_pinochle.players_still_bidding(round_id)
+    winner = bidders[0]
+    broadcasts.clear()
+
+    play_pinochle.submit_bid(round_id, winner, 21)
+    for player_id in bidders[1:]:
+        play_pinochle.submit_bid(round_id, player_id, -1)
+    play_pinochle.set_trump(round_id, winner, "heart")
+    state = game_engine.for_game(game_id)
+    assert len(state.hands[winner]) == 15
+
+    team_id = state.team_of[winner]
+    for card in state.hands[winner].to_svg_names()[:4]:
+        roundteams.addcard(round_id, team_id, card)
+        player.deletecard(winner, card)
+    meld = ",".join(state.hands[winner].to_svg_names()[:6])
+    response = play_pinochle.score_hand_meld(round_id, winner, meld)
+    assert json.loads(response.get_data())["score"] == state.meld[winner]
+    for player_id in player_ids:
+        play_pinochle.finalize_meld(round_id, player_id)
+
+    starter = winner
+    while state.hands[starter]:
+        for player_id in play_pinochle.reorder_players(round_id, starter):
+            card = state.hands[player_id].to_svg_names()[0]
+            play_pinochle.play_trick_card(round_id, player_id, card)
+        starter = state.trick_winner
+        if state.hands[starter]:
+            play_pinochle.start_next_trick(round_id, starter)
+
+    assert not broadcasts
+    assert utils.query_round(round_id).bid_winner is None
+    assert game_engine.flush() == 4 + 1 + 8 + 1 + 4 + 44 + 10
+    assert broadcasts[-1] == "score_round"
+
+    loaded = game_engine.GameEngine(game_id)
+    loaded.load()
+    for name in ROUND_STATE:
+        assert getattr(loaded, name) == getattr(state, name), name
+    test_game_events.check_replay(round_id, team_ids, player_ids)
+
+
+def test_actions_checked_in_memory(app, engine, query_budget):
+    """
+    GIVEN a game held in memory
+    WHEN bids are made, and refused
+    THEN check that no SQL statements are issued until they're written
+    """
+    __, round_id, __, __ = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    bidders = play_pinochle.players_still_bidding(round_id)
+    play_pinochle.submit_bid(round_id, bidders[0], 21)
+
+    with query_budget(0):
+        play_pinochle.submit_bid(round_id, bidders[1], -1)
+        for bid in (25, -1):
+            with pytest.raises(exceptions.Conflict):
+                play_pinochle.submit_bid(round_id, bidders[1], bid)
+        with pytest.raises(exceptions.Conflict):
+            play_pinochle.submit_bid(round_id, bidders[2], 21)
+        with pytest.raises(exceptions.Conflict):
+            play_pinochle.set_trump(round_id, bidders[2], "heart")
+
+    assert game_engine.flush() == 2
+    assert utils.query_round(round_id).bid == 21
+    assert play_pinochle.players_still_bidding(round_id) == [
+        x for x in bidders if x != bidders[1]
+    ]
+
+
+def test_direct_change_after_actions(app, engine):
+    """
+    GIVEN a game held in memory, with an action not yet written
+    WHEN a hand is changed directly
+    THEN check that the action is written first, and the engine loaded again
+    """
+    game_id, round_id, __, __ = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    winner = play_pinochle.players_still_bidding(round_id)[0]
+    play_pinochle.submit_bid(round_id, winner, 21)
+    state = game_engine.for_game(game_id)
+    assert state.loaded and state.pending
+
+    kind = next(x for x in range(24) if not state.hands[winner].count(x))
+    card = CompactHand.from_kinds([kind]).to_svg_names()[0]
+    player.addcard(winner, {"card": card})
+    assert not state.loaded and not state.pending
+    assert utils.query_round(round_id).bid == 21
+
+    play_pinochle.score_hand_meld(round_id, winner, card)
+    assert svg_kind(card) in state.hands[winner]
+
+
+def test_refused_action_reloads_engine(app, engine):
+    """
+    GIVEN a game held in memory, and changed in the database behind its back
+    WHEN an action the database refuses is written
+    THEN check that it's dropped, and the engine loaded again
+    """
+    __, round_id, __, __ = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    bidders = play_pinochle.players_still_bidding(round_id)
+    play_pinochle.submit_bid(round_id, bidders[0], 21)
+    game_engine.flush()
+
+    player.update(bidders[1], {"bidding": False})
+    play_pinochle.submit_bid(round_id, bidders[1], 25)
+    assert game_engine.flush() == 0
+    assert utils.query_round(round_id).bid == 21
+
+    with pytest.raises(exceptions.Conflict):
+        play_pinochle.submit_bid(round_id, bidders[1], 30)
+
+
+def test_forwarded_to_owner(app, engine, tmp_path, monkeypatch):
+    """
+    GIVEN a game owned by another worker
+    WHEN actions are taken in it here
+    THEN check that they're forwarded to the owner until it stops
+    """
+    game_id, round_id, __, __ = test_utils.setup_complete_game(4)
+    other = game_engine.Router(str(tmp_path))
+    forwarded = []
+    call = other._call
+    monkeypatch.setattr(
+        other,
+        "_call",
+        lambda app, request: forwarded.append(request) or call(app, request),
+    )
+    other.start(app)
+    try:
+        assert other.claim(game_id) is None
+        assert game_engine.ROUTER.claim(game_id) == other.address
+
+        play_pinochle.start(round_id)
+        bidders = play_pinochle.players_still_bidding(round_id)
+        data, status = play_pinochle.submit_bid(round_id, bidders[0], 21)
+        assert (data["bid"], status) == (21, 200)
+        with pytest.raises(exceptions.Conflict):
+            play_pinochle.submit_bid(round_id, bidders[1], 21)
+        assert [x["name"] for x in forwarded] == [
+            "pinochle.play_pinochle.start",
+            "pinochle.play_pinochle.submit_bid",
+            "pinochle.play_pinochle.submit_bid",
+        ]
+    finally:
+        other.close()
+
+    assert game_engine.ROUTER.claim(game_id) is None
+    play_pinochle.submit_bid(round_id, bidders[1], -1)
+    assert len(forwarded) == 3
+    assert game_engine.flush(game_id) == 2
+    assert utils.query_round(round_id).bid == 21
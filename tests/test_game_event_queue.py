@@ -0,0 +1,118 @@
+"""
+Tests for the game event log written behind the actions.
+
+License: GPLv3
+"""
+import pytest
+
+from pinochle import game_event_queue, game_events, play_pinochle
+from pinochle.models import unit_of_work, utils
+from pinochle.models.GUID import guid_hex
+
+from . import test_game_events, test_utils
+
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    """
+    Write the event log behind the actions, dropping the queues afterwards.
+    """
+    monkeypatch.setitem(game_event_queue._settings, "write_behind", True)
+    yield
+    game_event_queue.flush()
+    game_event_queue.forget()
+
+
+def test_events_written_behind(app, write_behind):
+    """
+    GIVEN events written behind the actions
+    WHEN a round is played
+    THEN check that its events are only written, with a snapshot, on flush
+    """
+    __, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    bidders = play_pinochle.players_still_bidding(round_id)
+    winner = bidders[0]
+    play_pinochle.submit_bid(round_id, winner, 21)
+    for player_id in bidders[1:]:
+        play_pinochle.submit_bid(round_id, player_id, -1)
+
+    assert not utils.query_round_events(round_id)
+    queue = game_event_queue.for_round(round_id)
+    assert [(x.seq, x.kind) for x in queue.pending] == [
+        (1, "deal"),
+        (2, "bid"),
+        (3, "pass"),
+        (4, "pass"),
+        (5, "pass"),
+    ]
+    play_pinochle.set_trump(round_id, winner, "heart")
+
+    assert game_event_queue.flush() == 6
+    assert queue.idle()
+    assert utils.query_round_snapshot(round_id).seq == 6
+    state = test_game_events.check_replay(round_id, team_ids, player_ids)
+    assert state.__dict__ == queue.state.__dict__
+    assert state.bid_winner == guid_hex(winner)
+
+
+def test_events_of_rolled_back_actions(app, write_behind):
+    """
+    GIVEN events written behind the actions
+    WHEN an action is rolled back
+    THEN check that its events are dropped and no seq is skipped
+    """
+    __, round_id, __, __ = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    with pytest.raises(RuntimeError):
+        with unit_of_work.transaction():
+            game_events.trump(round_id, "spade")
+            raise RuntimeError("Rolled back.")
+    game_events.trump(round_id, "heart")
+
+    queue = game_event_queue.for_round(round_id)
+    assert [(x.seq, x.kind) for x in queue.pending] == [(1, "deal"), (2, "trump")]
+    assert queue.state.trump == "heart"
+
+
+def test_flush_failure_requeues(app, write_behind, monkeypatch):
+    """
+    GIVEN events written behind the actions
+    WHEN writing them fails
+    THEN check that they are written with the next batch
+    """
+    __, round_id, __, __ = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+
+    def fail():
+        raise RuntimeError("Database unavailable.")
+
+    monkeypatch.setattr(unit_of_work, "commit", fail)
+    with pytest.raises(RuntimeError):
+        game_event_queue.flush()
+    queue = game_event_queue.for_round(round_id)
+    assert [x.seq for x in queue.pending] == [1]
+
+    monkeypatch.undo()
+    monkeypatch.setitem(game_event_queue._settings, "write_behind", True)
+    assert game_event_queue.flush() == 1
+    assert [x.seq for x in utils.query_round_events(round_id)] == [1]
+
+
+def test_queues_evicted(app, write_behind, monkeypatch):
+    """
+    GIVEN more rounds than queues kept
+    WHEN rounds are used
+    THEN check that only those with every event written are dropped
+    """
+    monkeypatch.setitem(game_event_queue._settings, "max_rounds", 1)
+    round_ids = [test_utils.setup_complete_game(4)[1] for __ in range(3)]
+    for round_id in round_ids:
+        play_pinochle.start(round_id)
+    assert set(game_event_queue._rounds) == {guid_hex(x) for x in round_ids}
+
+    assert game_event_queue.flush() == 3
+    assert list(game_event_queue._rounds) == [guid_hex(round_ids[2])]
+    game_event_queue.for_round(round_ids[0])
+    assert list(game_event_queue._rounds) == [guid_hex(round_ids[0])]
+    assert game_events.replay(round_ids[2]).seq == 1
@@ -0,0 +1,183 @@
+"""
+Tests for the log of game events and the replay of rounds from it.
+
+License: GPLv3
+"""
+import pytest
+
+from pinochle import game_events, play_pinochle, player, roundteams
+from pinochle.models import unit_of_work, utils
+from pinochle.models.core import db
+from pinochle.models.game_event import GameEvent
+from pinochle.models.GUID import guid_hex
+
+from . import test_utils
+
+
+def hand_cards(hand_id: str):
+    return sorted(x.card for x in utils.query_hand_list(hand_id))
+
+
+def check_replay(round_id, team_ids, player_ids):
+    """
+    Replay the round and check it agrees with the hands in the database.
+    """
+    state = game_events.replay(round_id)
+    for player_id in player_ids:
+        assert sorted(state.hands[guid_hex(player_id)]) == hand_cards(
+            test_utils.query_player_hand_id(player_id)
+        )
+    for team_id in team_ids:
+        assert sorted(state.team_cards.get(guid_hex(team_id), [])) == hand_cards(
+            test_utils.query_team_hand_id(round_id, team_id)
+        )
+    # Replaying every event gives the same state as starting from a snapshot.
+    assert game_events.replay(round_id, from_snapshot=False).__dict__ == state.__dict__
+    return state
+
+
+def test_replay_round(app, monkeypatch):
+    """
+    GIVEN a round being played
+    WHEN it is replayed from its events and snapshots
+    THEN check that the state agrees with the database
+    """
+    monkeypatch.setitem(game_events._settings, "snapshot_interval", 5)
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    bidders = play_pinochle.players_still_bidding(round_id)
+    winner = bidders[0]
+
+    play_pinochle.submit_bid(round_id, winner, 21)
+    for player_id in bidders[1:]:
+        play_pinochle.submit_bid(round_id, player_id, -1)
+    play_pinochle.set_trump(round_id, winner, "heart")
+    # Any single card but the nine of trump, which is worth a point, scores nothing.
+    meld_card = next(
+        x.card
+        for x in utils.query_hand_list(test_utils.query_player_hand_id(winner))
+        if x.card != "heart_9"
+    )
+    play_pinochle.score_hand_meld(round_id, winner, meld_card)
+
+    state = check_replay(round_id, team_ids, player_ids)
+    assert state.bid == 21
+    assert state.bid_winner == guid_hex(winner)
+    assert state.passed == [guid_hex(x) for x in bidders[1:]]
+    assert state.trump == "heart"
+    assert state.meld == {guid_hex(winner): 0}
+
+    # Three whole tricks and half of another.
+    for count in range(4):
+        a_trick = utils.query_trick_for_round_id(round_id)
+        players = play_pinochle.reorder_players(round_id, str(a_trick.trick_starter))
+        for player_id in players[: 2 if count == 3 else 4]:
+            hand_id = test_utils.query_player_hand_id(player_id)
+            card = utils.query_hand_list(hand_id)[0].card
+            play_pinochle.play_trick_card(round_id, player_id, card)
+        if count < 3:
+            winner = utils.query_trick(str(a_trick.trick_id)).trick_winner
+            play_pinochle.start_next_trick(round_id, str(winner))
+
+    state = check_replay(round_id, team_ids, player_ids)
+    assert sum(state.tricks_won.values()) == 3
+    assert sorted(card for __, card in state.trick) == hand_cards(
+        str(utils.query_trick_for_round_id(round_id).hand_id)
+    )
+    # Seven events to declare trump, five for each trick and two cards played.
+    assert state.seq == utils.query_last_event_seq(round_id) == 24
+    assert utils.query_round_snapshot(round_id).seq == 20
+
+
+def test_replay_discards(app):
+    """
+    GIVEN a bid winner discarding cards to their team's pile
+    WHEN the round is replayed
+    THEN check that the discards left their hand for the team's pile
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    bidders = play_pinochle.players_still_bidding(round_id)
+    for player_id in bidders[:-1]:
+        play_pinochle.submit_bid(round_id, player_id, -1)
+    winner = bidders[-1]
+    play_pinochle.set_trump(round_id, winner, "heart")
+
+    team_id = next(
+        x for x, y in utils.query_round_players(round_id) if str(y.player_id) == winner
+    )
+    cards = hand_cards(test_utils.query_player_hand_id(winner))[:4]
+    for card in cards:
+        roundteams.addcard(round_id, team_id, card)
+        player.deletecard(winner, card)
+
+    state = check_replay(round_id, team_ids, player_ids)
+    assert state.team_cards[guid_hex(team_id)] == cards
+    assert [x["kind"] for x in game_events.read(game_id)][-4:] == ["discard"] * 4
+
+
+def test_read_game_events(app):
+    """
+    GIVEN a round that has been dealt and bid on
+    WHEN the game's events are read
+    THEN check that they are in order, with the cards named
+    """
+    game_id, round_id, _, player_ids = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    play_pinochle.submit_bid(round_id, player_ids[0], 21)
+
+    events = game_events.read(game_id)
+    assert [(x["seq"], x["kind"]) for x in events] == [(1, "deal"), (2, "bid")]
+    dealt = events[0]["payload"]
+    assert sorted(dealt["h"][guid_hex(player_ids[1])]) == hand_cards(
+        test_utils.query_player_hand_id(player_ids[1])
+    )
+    assert sorted(dealt["k"]) == hand_cards(str(utils.query_round(round_id).hand_id))
+    assert events[1]["payload"] == {"p": guid_hex(player_ids[0]), "b": 21}
+
+
+def test_concurrent_events_retried(app, monkeypatch):
+    """
+    GIVEN an action logging an event to a round
+    WHEN another action logs an event with the same seq meanwhile
+    THEN check that the first action is run again, rather than failing
+    """
+    game_id, round_id, __, __ = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+    query_last_event_seq = utils.query_last_event_seq
+    attempts = []
+
+    def concurrent_event(a_round_id):
+        seq = query_last_event_seq(a_round_id)
+        attempts.append(seq)
+        if len(attempts) == 1:
+            db.session.execute(
+                GameEvent.__table__.insert().values(
+                    game_id=str(game_id),
+                    round_id=str(round_id),
+                    seq=seq + 1,
+                    kind=game_events.TRUMP,
+                    payload='{"s": "spade"}',
+                )
+            )
+        return seq
+
+    monkeypatch.setattr(utils, "query_last_event_seq", concurrent_event)
+    unit_of_work.transactional(game_events.trump)(round_id, "heart")
+    assert attempts == [1, 1]
+    assert [(x.seq, x.kind) for x in utils.query_round_events(round_id)] == [
+        (1, "deal"),
+        (2, "trump"),
+    ]
+
+
+def test_unknown_event():
+    """
+    GIVEN an event of an unknown kind
+    WHEN it is applied to a round's state
+    THEN check that it is refused
+    """
+    with pytest.raises(ValueError):
+        game_events.RoundState().apply("shuffle", {})
+    with pytest.raises(ValueError):
+        game_events.configure(0)
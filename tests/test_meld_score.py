@@ -3,10 +3,11 @@ Tests for the meld scoring module.
 
 License: GPLv3
 """
+import random
 import unittest
 
-from pinochle import score_meld
-from pinochle.cards import card, deck, utils
+from pinochle import exceptions, score_meld
+from pinochle.cards import card, compact, const, deck, utils
 
 #pragma: pylint: disable=protected-access
 
@@ -191,3 +192,108 @@ class TestMeldScoring(unittest.TestCase):
         assert score_meld.score(utils.set_trump("Diamonds", temp_deck)) == 54
         assert score_meld.score(utils.set_trump("Hearts", temp_deck)) == 54
         assert score_meld.score(utils.set_trump("Spades", temp_deck)) == 54
+
+    def test_breakdown(self):
+        """"""
+        temp_deck = deck.PinochleDeck(build=True)
+        temp_deck += deck.PinochleDeck(build=True)
+
+        total, items = score_meld.breakdown(utils.set_trump("Hearts", temp_deck))
+        assert items == {
+            "nines": 2,
+            "marriages": 20,
+            "jacks": 40,
+            "queens": 60,
+            "kings": 80,
+            "aces": 100,
+            "run": 22,
+            "pinochle": 30,
+        }
+        assert total == sum(items.values())
+        assert total == score_meld.score(utils.set_trump("Hearts", temp_deck))
+
+    def test_score_hand(self):
+        """"""
+        temp_deck = deck.PinochleDeck(build=True)
+        hand = compact.CompactHand.from_deck(temp_deck)
+
+        assert score_meld.score_hand(hand) == score_meld.breakdown(temp_deck)
+        assert score_meld.score_hand(hand, "Clubs") == score_meld.breakdown(
+            utils.set_trump("Clubs", temp_deck)
+        )
+
+    def test_random_hands(self):
+        """"""
+        rng = random.Random(1234)
+        for _ in range(500):
+            counts = [rng.randint(0, 2) for _ in range(compact.NUM_KINDS)]
+            for trump in [None] + const.SUITS:
+                total, items = score_meld.score_counts(counts, trump)
+                assert items == reference_breakdown(counts, trump)
+                assert total == sum(items.values())
+
+    def test_score_batch(self):
+        """"""
+        rng = random.Random(4321)
+        full_deck = list(deck.PinochleDeck(build=True)) * 2
+        decks, trumps = [], []
+        for _ in range(200):
+            trump = rng.choice([None] + const.SUITS)
+            cards = rng.sample(full_deck, rng.randint(0, 24))
+            temp_deck = deck.PinochleDeck(cards=cards)
+            decks.append(utils.set_trump(trump, temp_deck) if trump else temp_deck)
+            trumps.append(trump)
+        counts = [compact.CompactHand.from_deck(x).counts() for x in decks]
+        expected = [score_meld.score(x) for x in decks]
+
+        assert score_meld._score_batch_scalar(counts, trumps) == expected
+        if score_meld.np is None:
+            self.skipTest("NumPy is not installed.")
+        codes = score_meld.np.array(score_meld.trump_codes(trumps))
+        scores = score_meld.score_batch(score_meld.np.array(counts), codes)
+        assert scores.tolist() == expected
+        assert score_meld.score_batch(counts, trumps).tolist() == expected
+
+    def test_score_batch_bad_trump(self):
+        """"""
+        with self.assertRaises(exceptions.InvalidSuitError):
+            score_meld.score_batch([[0] * compact.NUM_KINDS], ["Stars"])
+        with self.assertRaises(ValueError):
+            score_meld.score_batch([[0] * compact.NUM_KINDS], [None, None])
+        if score_meld.np is None:
+            self.skipTest("NumPy is not installed.")
+        with self.assertRaises(exceptions.InvalidSuitError):
+            score_meld.score_batch(
+                [[0] * compact.NUM_KINDS] * 2, score_meld.np.array([0, 4])
+            )
+
+
+def reference_breakdown(counts, trump):
+    """
+    Straightforward restatement of the meld rules, to check the rule tables against.
+    """
+
+    def count(value, suit):
+        return counts[compact.kind_index(value, suit)]
+
+    def around(value, single):
+        sets = min(count(value, suit) for suit in const.SUITS)
+        return {1: single, 2: single * 10}.get(sets, 0)
+
+    marriages = 0
+    for suit in const.SUITS:
+        pairs = min(count("King", suit), count("Queen", suit))
+        marriages += pairs * (4 if suit == trump else 2)
+    pinochles = min(count("Queen", "Spades"), count("Jack", "Diamonds"))
+    return {
+        "nines": count("9", trump) if trump else 0,
+        "marriages": marriages,
+        "jacks": around("Jack", 4),
+        "queens": around("Queen", 6),
+        "kings": around("King", 8),
+        "aces": around("Ace", 10),
+        "run": 11 * min(count(value, trump) for value in const.VALUES[1:])
+        if trump
+        else 0,
+        "pinochle": {1: 4, 2: 30}.get(pinochles, 0),
+    }
@@ -0,0 +1,120 @@
+"""
+Tests for the /metrics endpoint.
+
+License: GPLv3
+"""
+import json
+import os
+import time
+
+import pytest
+
+from pinochle import metrics
+from pinochle.ws_messenger import WebSocketMessenger as WSM
+
+from . import test_utils
+
+
+def test_metrics_endpoint(app):
+    """
+    GIVEN a game and a request for it
+    WHEN the metrics are requested
+    THEN check that the request, its queries and the game are counted
+    """
+    game_id = test_utils.create_game(4)
+    with app.test_client() as test_client:
+        response = test_client.get(f"/api/game/{game_id}")
+        assert response.status_code == 200
+        response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+
+    text = response.get_data(as_text=True)
+    assert "# TYPE pinochle_http_requests_total counter" in text
+    assert (
+        'pinochle_http_requests_total{operation="pinochle.game.read_one",'
+        'method="GET",status="200"}' in text
+    )
+    assert (
+        'pinochle_http_request_duration_seconds_bucket{operation="pinochle.game.'
+        'read_one",le="+Inf"}' in text
+    )
+    assert 'pinochle_db_queries_total{statement="SELECT"}' in text
+    assert 'pinochle_games{state="game"}' in text
+    assert "pinochle_metadata_cache_size" in text
+
+
+def test_metrics_of_workers(app, tmp_path, monkeypatch):
+    """
+    GIVEN metrics written by another worker that has stopped
+    WHEN the metrics are gathered
+    THEN check that its counters are added up, and retired, but its gauges are
+        left out
+    """
+    monkeypatch.setattr(WSM, "client_sockets", {"g1": [{"queue": [1, 2]}, {}]})
+    (tmp_path / "metrics-999999999.json").write_text(
+        json.dumps(
+            {
+                "pid": 999999999,
+                "buckets": list(metrics.REGISTRY.buckets),
+                "counters": [["db_queries_total", [["statement", "DELETE"]], 5]],
+                "gauges": [["ws_clients", [["game", "g1"]], 7]],
+                "histograms": [],
+            }
+        )
+    )
+    metrics.REGISTRY.inc("db_queries_total", (("statement", "DELETE"),), 2)
+    metrics.configure(str(tmp_path))
+    try:
+        texts = [metrics.render(), metrics.render()]
+    finally:
+        metrics.configure(None)
+
+    for text in texts:
+        assert 'pinochle_db_queries_total{statement="DELETE"} ' in text
+        count = text.split('pinochle_db_queries_total{statement="DELETE"} ')[1]
+        assert int(count.split()[0]) >= 7
+    assert not (tmp_path / "metrics-999999999.json").exists()
+    retired = json.loads((tmp_path / "metrics-retired.json").read_text())
+    assert ["db_queries_total", [["statement", "DELETE"]], 5] in retired["counters"]
+    assert not retired["gauges"]
+    assert 'pinochle_ws_clients{game="g1"} 2\n' in text
+    assert 'pinochle_ws_queue_depth{game="g1"} 2\n' in text
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+
+def test_writer_started_by_configure(app, tmp_path):
+    """
+    GIVEN a worker that hasn't handled any request
+    WHEN the metrics directory is configured
+    THEN check that the worker writes its metrics there
+    """
+    metrics.configure(str(tmp_path), 0.01)
+    try:
+        path = tmp_path / f"metrics-{os.getpid()}.json"
+        for __ in range(200):
+            if path.exists():
+                break
+            time.sleep(0.01)
+        assert json.loads(path.read_text())["pid"] == os.getpid()
+    finally:
+        metrics.configure(None)
+
+
+def test_registry_histogram():
+    """
+    GIVEN a registry
+    WHEN observations are recorded
+    THEN check that each lands in the smallest bucket that holds it
+    """
+    registry = metrics.Registry(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        registry.observe("wait", value, (("kind", "x"),))
+    registry.inc("calls", (), 3)
+    snapshot = registry.snapshot()
+    [[name, labels, counts]] = snapshot["histograms"]
+    assert (name, labels) == ("wait", (("kind", "x"),))
+    assert counts == [2, 1, 1, pytest.approx(3.65), 4]
+    assert snapshot["counters"] == [["calls", (), 3]]
+    registry.clear()
+    assert registry.snapshot()["histograms"] == []
@@ -0,0 +1,117 @@
+"""
+Tests for the GUID column type and the migration between its storage modes.
+
+License: GPLv3
+"""
+import uuid
+
+import pytest
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from pinochle.models import Game, guid_migration
+from pinochle.models.GUID import GUID, guid_bytes, guid_hex
+
+AN_ID = uuid.UUID("0f1e2d3c-4b5a-6978-8796-a5b4c3d2e1f0")
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        AN_ID,
+        str(AN_ID),
+        str(AN_ID).upper(),
+        AN_ID.hex,
+        AN_ID.bytes,
+        "{%s}" % AN_ID,
+        AN_ID.urn,
+    ],
+)
+def test_guid_conversions(value):
+    """
+    GIVEN an ID spelled in any of the ways uuid.UUID accepts, or as bytes
+    WHEN it is converted for storage
+    THEN check that it is stored as the same hex digits or bytes
+    """
+    assert guid_hex(value) == AN_ID.hex
+    assert guid_bytes(value) == AN_ID.bytes
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "invalid id",
+        "0f1e2d3c-4b5a-6978-8796-a5b4c3d2e1fz",
+        "0f1e2d3c4b5a6978 8796a5b4c3d2e1f0",
+        AN_ID.bytes[:15],
+    ],
+)
+def test_guid_invalid(value):
+    """
+    GIVEN something that isn't an ID
+    WHEN it is converted for storage
+    THEN check that ValueError is raised, as uuid.UUID does
+    """
+    with pytest.raises(ValueError):
+        guid_bytes(value)
+
+
+def test_guid_storage_modes():
+    """
+    GIVEN each GUID storage mode
+    WHEN IDs are bound and read back
+    THEN check the stored form and that UUIDs are returned
+    """
+    guid = GUID()
+    sqlite_dialect = sqlite.dialect()
+    previous = GUID.storage
+    try:
+        GUID.set_storage("char")
+        assert guid.process_bind_param(str(AN_ID), sqlite_dialect) == AN_ID.hex
+        assert guid.process_result_value(AN_ID.hex, sqlite_dialect) == AN_ID
+        assert guid.process_bind_param(AN_ID, postgresql.dialect()) == str(AN_ID)
+
+        GUID.set_storage("binary")
+        assert guid.process_bind_param(str(AN_ID), sqlite_dialect) == AN_ID.bytes
+        assert guid.process_result_value(AN_ID.bytes, sqlite_dialect) == AN_ID
+        assert isinstance(
+            guid.load_dialect_impl(sqlite_dialect), sqlalchemy.LargeBinary
+        )
+    finally:
+        GUID.set_storage(previous)
+
+    with pytest.raises(ValueError):
+        GUID.set_storage("text")
+
+
+def test_guid_migration(tmp_path):
+    """
+    GIVEN a database storing IDs as hex
+    WHEN it is migrated to binary storage and back
+    THEN check that the rows are copied and the IDs are stored as bytes, then hex
+    """
+    game_ids = [uuid.uuid4() for _ in range(3)]
+    urls = ["sqlite:///" + str(tmp_path / x) for x in ("char", "binary", "back")]
+
+    engine = sqlalchemy.create_engine(urls[0])
+    Game.__table__.create(bind=engine)
+    engine.execute(
+        Game.__table__.insert(), [{"game_id": x, "kitty_size": 4} for x in game_ids]
+    )
+    engine.dispose()
+
+    assert guid_migration.migrate(urls[0], urls[1], "binary") == {"game": 3}
+    assert guid_migration.migrate(urls[1], urls[2], "char")["game"] == 3
+
+    for url, stored in zip(urls[1:], ("blob", "text")):
+        engine = sqlalchemy.create_engine(url)
+        rows = engine.execute(
+            "SELECT game_id, typeof(game_id), kitty_size FROM game"
+        ).fetchall()
+        engine.dispose()
+        assert {GUID().process_result_value(x[0], None) for x in rows} == set(game_ids)
+        assert {x[1] for x in rows} == {stored}
+        assert {x[2] for x in rows} == {4}
+
+    with pytest.raises(ValueError):
+        guid_migration.migrate(urls[0], urls[1], "text")
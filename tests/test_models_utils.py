@@ -0,0 +1,300 @@
+"""
+Tests for the set-based queries in models.utils.
+
+License: GPLv3
+"""
+import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from pinochle import gameround, play_pinochle, player, roundteams, team, teamplayers
+from pinochle.models import metadata_cache, request_cache, unit_of_work, utils
+from pinochle.models.core import db
+from pinochle.models.gameround import GameRound
+from pinochle.models.roundteam import RoundTeam
+
+from . import test_utils
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the SQL statements executed within the block, starting with nothing
+    remembered from earlier lookups.
+    """
+    statements = []
+    request_cache.clear()
+    metadata_cache.invalidate()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_engine()
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+def test_query_player_ids_for_round(app):
+    """
+    GIVEN a round with two teams of two players
+    WHEN the round's players are queried
+    THEN check that they are grouped by team in one query
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+
+    with count_queries() as statements:
+        round_player_ids = utils.query_player_ids_for_round(round_id)
+    assert len(statements) == 1
+
+    expected = []
+    for team_id in team_ids:
+        expected += [str(x.player_id) for x in utils.query_teamplayer_list(team_id)]
+    assert round_player_ids == expected == player_ids
+    assert roundteams.create_ordered_player_list(round_id) == (
+        expected[::2] + expected[1::2]
+    )
+
+    assert utils.query_player_ids_for_round(str(uuid.uuid4())) == []
+
+
+def test_query_round_players(app):
+    """
+    GIVEN a round with two teams of two players
+    WHEN the round's players are queried with their teams
+    THEN check that each player is paired with their team
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+
+    with count_queries() as statements:
+        round_players = utils.query_round_players(round_id)
+    assert len(statements) == 1
+
+    assert [str(x.player_id) for __, x in round_players] == player_ids
+    for team_id, a_player in round_players:
+        assert str(a_player.player_id) in [
+            str(x.player_id) for x in utils.query_teamplayer_list(team_id)
+        ]
+
+
+def test_query_team_meld_scores(app):
+    """
+    GIVEN a round with two teams of two players holding meld
+    WHEN the teams' meld scores are queried
+    THEN check that each team's players' meld is totalled in one query
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    meld = dict(zip(player_ids, [10, 20, 40, 80]))
+    for player_id, meld_score in meld.items():
+        player.update(player_id, {"meld_score": meld_score})
+    team.update(team_ids[0], {"score": 100})
+
+    with count_queries() as statements:
+        scores = utils.query_team_meld_scores(round_id)
+    assert len(statements) == 1
+
+    expected = []
+    for team_id in team_ids:
+        expected.append(
+            (
+                team_id,
+                utils.query_team(team_id).score,
+                sum(
+                    meld[str(x.player_id)] for x in utils.query_teamplayer_list(team_id)
+                ),
+            )
+        )
+    assert scores == expected
+
+
+def test_players_still_bidding_queries(app):
+    """
+    GIVEN a round with two teams of two players, one of whom has passed
+    WHEN the players still bidding are determined
+    THEN check that only a couple of queries are needed
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    play_pinochle.set_players_bidding(player_ids)
+    play_pinochle.set_player_pass(player_ids[1])
+
+    with count_queries() as statements:
+        still_bidding = play_pinochle.players_still_bidding(round_id)
+    assert len(statements) <= 2
+
+    ordered = roundteams.create_ordered_player_list(round_id)
+    assert still_bidding == [x for x in ordered if x != player_ids[1]]
+
+
+def test_request_cache(app):
+    """
+    GIVEN a request looking up the same round repeatedly
+    WHEN the round is looked up again before and after a commit
+    THEN check that only the first lookup after each commit reaches the database
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+
+    team_players = utils.query_teamplayer_list(team_ids[0])
+
+    # A fresh application context, as each request is given.
+    with app.app_context():
+        assert request_cache.stats() == {"hits": 0, "misses": 0, "size": 0}
+        with count_queries() as statements:
+            a_round = utils.query_round(round_id)
+            assert utils.query_round(round_id) is a_round
+            assert utils.query_round(uuid.UUID(round_id)) is a_round
+            assert utils.query_teamplayer_list(team_ids[0]) == team_players
+            assert utils.query_teamplayer_list(team_ids[0]) == team_players
+        assert len(statements) == 2
+        assert request_cache.stats() == {"hits": 3, "misses": 2, "size": 2}
+
+        # Changing what's returned doesn't change what's remembered.
+        utils.query_teamplayer_list(team_ids[0]).clear()
+        assert utils.query_teamplayer_list(team_ids[0]) == team_players
+
+        player.update(player_ids[0], {"meld_score": 20})
+        assert request_cache.stats()["size"] == 0
+        with count_queries() as statements:
+            assert utils.query_player(player_ids[0]).meld_score == 20
+        assert len(statements) == 1
+
+        # Lookups finding nothing aren't remembered.
+        missing_id = str(uuid.uuid4())
+        assert utils.query_round(missing_id) is None
+        assert utils.query_round(missing_id) is None
+        assert request_cache.stats()["size"] == 1
+
+
+def test_metadata_cache_lru_ttl():
+    """
+    GIVEN a small metadata cache with a controllable clock
+    WHEN values are looked up, evicted and expired
+    THEN check that only missing or expired values are loaded
+    """
+    now = [0.0]
+    cache = metadata_cache.MetadataCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    loads = []
+
+    def loader(value):
+        def _load():
+            loads.append(value)
+            return value
+
+        return _load
+
+    assert cache.get("ns", "a", loader("A")) == "A"
+    assert cache.get("ns", "a", loader("A2")) == "A"
+    assert cache.get("ns", "b", loader("B")) == "B"
+    # "a" was used more recently than "b", so "b" is evicted.
+    cache.get("ns", "a", loader("A3"))
+    assert cache.get("ns", "c", loader("C")) == "C"
+    assert cache.get("ns", "b", loader("B2")) == "B2"
+    assert loads == ["A", "B", "C", "B2"]
+
+    now[0] = 11.0
+    assert cache.get("ns", "b", loader("B3")) == "B3"
+    assert cache.get("ns", "none", loader(None)) is None
+    assert cache.get("ns", "none", loader(None)) is None
+
+    cache.invalidate("ns", "b")
+    assert cache.get("ns", "b", loader("B4")) == "B4"
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 8
+    assert stats["size"] == 2
+    assert stats["maxsize"] == 2
+    assert stats["evictions"] == 2
+    assert stats["hit_ratio"] == 2 / 10
+
+
+def test_metadata_cache_invalidation(app):
+    """
+    GIVEN a round whose players and game are cached
+    WHEN the round's teams and team players change through the write endpoints
+    THEN check that the cached values are refreshed
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    metadata_cache.invalidate()
+
+    assert utils.query_game_id_for_round(round_id) == game_id
+    assert utils.query_active_round_id(game_id) == round_id
+    assert utils.query_team_player_ids(team_ids[0]) == player_ids[:2]
+
+    # Cached values don't reach the database, even in a new request.
+    request_cache.clear()
+    hits = metadata_cache.stats()["hits"]
+    assert utils.query_game_id_for_round(round_id) == game_id
+    assert metadata_cache.stats()["hits"] == hits + 1
+
+    new_player_id = test_utils.create_player("New")
+    teamplayers.create(team_id=team_ids[0], player_id={"player_id": new_player_id})
+    assert utils.query_team_player_ids(team_ids[0]) == player_ids[:2] + [new_player_id]
+    assert new_player_id in utils.query_player_ids_for_round(round_id)
+
+    roundteams.delete(round_id, team_ids[1])
+    assert utils.query_player_ids_for_round(round_id) == player_ids[:2] + [
+        new_player_id
+    ]
+
+    gameround.update(game_id, round_id, {"active_flag": False})
+    assert utils.query_active_round_id(game_id) is None
+
+
+def test_metadata_cache_empty_not_cached(app):
+    """
+    GIVEN a round without teams yet
+    WHEN teams are added without invalidating any cache, as by another worker
+        process
+    THEN check that the round's players are found
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    RoundTeam.query.filter(RoundTeam.round_id == round_id).delete()
+    db.session.commit()
+    metadata_cache.invalidate()
+    assert utils.query_player_ids_for_round(round_id) == []
+
+    for order, team_id in enumerate(team_ids):
+        db.session.add(
+            RoundTeam(round_id=round_id, team_id=team_id, team_order=order + 1)
+        )
+    db.session.commit()
+    request_cache.clear()
+    assert sorted(utils.query_player_ids_for_round(round_id)) == sorted(player_ids)
+
+
+def test_metadata_cache_invalidated_on_commit(app):
+    """
+    GIVEN a team's players being changed in a transaction
+    WHEN another request caches the team's players before the change is committed
+    THEN check that the cached players are forgotten once it's committed
+    """
+    __, __, team_ids, player_ids = test_utils.setup_complete_game(4)
+    new_player_id = test_utils.create_player("New")
+    with unit_of_work.transaction():
+        teamplayers.create(team_id=team_ids[0], player_id={"player_id": new_player_id})
+        # The other request still reads the rows as they were.
+        metadata_cache.CACHE.get(
+            "team_players", str(team_ids[0]), lambda: tuple(player_ids[:2])
+        )
+    request_cache.clear()
+    assert utils.query_team_player_ids(team_ids[0]) == player_ids[:2] + [new_player_id]
+
+
+def test_active_round_not_cached(app):
+    """
+    GIVEN a game whose active round is changed without invalidating any cache, as
+        by another worker process
+    WHEN its active round is looked up again after the change is committed
+    THEN check that the new round is returned
+    """
+    game_id, round_id, __, __ = test_utils.setup_complete_game(4)
+    assert utils.query_active_round_id(game_id) == round_id
+
+    GameRound.query.filter(GameRound.round_id == round_id).update(
+        {"active_flag": False}
+    )
+    db.session.commit()
+    assert utils.query_active_round_id(game_id) is None
@@ -0,0 +1,221 @@
+"""
+Tests for storing each hand packed into a single row.
+
+License: GPLv3
+"""
+import json
+from random import choice
+
+import pytest
+from werkzeug import exceptions
+
+from pinochle import hand, play_pinochle, player
+from pinochle.cards import utils as card_utils
+from pinochle.models import packed_hand, utils
+from pinochle.models.packed_hand import PackedHand
+
+from . import test_play_pinochle, test_utils
+
+# Suppress invalid redefined-outer-name messages from pylint.
+# pragma pylint: disable=redefined-outer-name
+
+
+@pytest.fixture
+def packed():
+    """
+    Store hands packed for the duration of a test.
+    """
+    utils.set_hand_storage("packed")
+    yield
+    utils.set_hand_storage("rows")
+
+
+def test_encode_decode():
+    """
+    GIVEN a list of cards
+    WHEN they are packed and unpacked
+    THEN check that the same cards come back in the same order
+    """
+    cards = [("spade_ace", -1), ("club_9", -1), ("heart_jack", 0), ("diamond_10", 3)]
+    packed_cards = packed_hand.encode_cards(cards)
+    assert len(packed_cards) == 2 * len(cards)
+    assert packed_hand.decode_cards(packed_cards) == cards
+
+
+def test_encode_bad_seq():
+    """
+    GIVEN a card with a seq that doesn't fit in a byte
+    WHEN it is packed
+    THEN check that ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        packed_hand.encode_cards([("spade_ace", packed_hand.MAX_SEQ + 1)])
+
+
+def test_insert_remove_card():
+    """
+    GIVEN packed cards
+    WHEN cards are inserted and removed
+    THEN check that the cards stay in seq order and copies are removed one at a time
+    """
+    packed_cards = b""
+    packed_cards = packed_hand.insert_card(packed_cards, "club_9", 2)
+    packed_cards = packed_hand.insert_card(packed_cards, "spade_ace", 0)
+    packed_cards = packed_hand.insert_card(packed_cards, "heart_king", 2)
+    packed_cards = packed_hand.insert_card(packed_cards, "club_9", 1)
+    assert packed_hand.decode_cards(packed_cards) == [
+        ("spade_ace", 0),
+        ("club_9", 1),
+        ("club_9", 2),
+        ("heart_king", 2),
+    ]
+
+    packed_cards, seq = packed_hand.remove_card(packed_cards, "club_9")
+    assert seq == 1
+    assert [card for card, __ in packed_hand.decode_cards(packed_cards)] == [
+        "spade_ace",
+        "club_9",
+        "heart_king",
+    ]
+
+    unchanged, seq = packed_hand.remove_card(packed_cards, "diamond_jack")
+    assert unchanged == packed_cards
+    assert seq is None
+    unchanged, seq = packed_hand.remove_card(packed_cards, "not_a_card")
+    assert unchanged == packed_cards
+    assert seq is None
+
+
+def test_read_hand_matches_rows(app, packed):
+    """
+    GIVEN a Flask application configured for testing, storing hands packed
+    WHEN the '/api/player/{player_id}/hand' page is requested (GET)
+    THEN check that the response has the same shape as with row storage
+    """
+    player_id = test_utils.create_player(choice(test_utils.PLAYER_NAMES))
+    hand_id = test_utils.query_player_hand_id(player_id=player_id)
+
+    card_choice = [choice(test_utils.CARD_LIST) for _ in range(5)]
+    for temp_card in card_choice:
+        player.addcard(player_id=player_id, card={"card": temp_card})
+
+    with app.test_client() as test_client:
+        response = test_client.get(f"/api/player/{player_id}/hand")
+        assert response.status == "200 OK"
+        response_data = json.loads(response.get_data(as_text=True))
+
+    assert [x["card"] for x in response_data] == card_choice
+    for index, item in enumerate(response_data):
+        assert item == {
+            "_id": index + 1,
+            "hand_id": hand_id,
+            "card": card_choice[index],
+            "seq": -1,
+        }
+    assert hand.read_one(hand_id)["cards"] == card_choice
+    assert len(PackedHand.query.get(hand_id).cards) == 2 * len(card_choice)
+
+
+def test_add_delete_card(app, packed):
+    """
+    GIVEN a Flask application configured for testing, storing hands packed
+    WHEN cards are added to and deleted from a hand
+    THEN check that the hand's row follows, and is removed once empty
+    """
+    player_id = test_utils.create_player(choice(test_utils.PLAYER_NAMES))
+    hand_id = test_utils.query_player_hand_id(player_id=player_id)
+
+    hand.addcards(hand_id, ["club_9", "spade_ace", "club_9"])
+    assert utils.query_hand_card(hand_id, "spade_ace") is not None
+    assert utils.query_hand_counts([hand_id]) == {hand_id: 3}
+
+    with app.test_client() as test_client:
+        response = test_client.delete(f"/api/player/{player_id}/hand/club_9")
+        assert response.status == "200 OK"
+        response = test_client.delete(f"/api/player/{player_id}/hand/heart_king")
+        assert response.status == "404 NOT FOUND"
+
+    assert hand.read_one(hand_id)["cards"] == ["spade_ace", "club_9"]
+
+    hand.deleteallcards(hand_id)
+    assert hand.read_one(hand_id) is None
+    assert utils.query_packed_hand(hand_id) is None
+
+
+def test_add_invalid_card(app, packed):
+    """
+    GIVEN a Flask application configured for testing, storing hands packed
+    WHEN a card that isn't a Pinochle card is added to a hand
+    THEN check that the request is rejected and the hand is unchanged
+    """
+    player_id = test_utils.create_player(choice(test_utils.PLAYER_NAMES))
+    hand_id = test_utils.query_player_hand_id(player_id=player_id)
+
+    with pytest.raises(exceptions.Conflict):
+        hand.addcard(hand_id, "club_2")
+    with pytest.raises(exceptions.Conflict):
+        hand.addcards(hand_id, ["club_9", "joker"])
+    assert hand.read_one(hand_id) is None
+
+
+def test_movecard(app, packed):
+    """
+    GIVEN a Flask application configured for testing, storing hands packed
+    WHEN a card is moved between hands
+    THEN check that it leaves one hand and arrives in the other at the given seq
+    """
+    from_hand_id = test_utils.query_player_hand_id(
+        test_utils.create_player(choice(test_utils.PLAYER_NAMES))
+    )
+    to_hand_id = test_utils.query_player_hand_id(
+        test_utils.create_player(choice(test_utils.PLAYER_NAMES))
+    )
+    hand.addcards(from_hand_id, ["club_9", "spade_ace"])
+
+    assert hand.movecard(from_hand_id, to_hand_id, "spade_ace", 2)
+    assert not hand.movecard(from_hand_id, to_hand_id, "heart_king", 3)
+
+    assert hand.read_one(from_hand_id)["cards"] == ["club_9"]
+    moved = utils.query_hand_list(to_hand_id)
+    assert [(x.card, x.seq) for x in moved] == [("spade_ace", 2)]
+
+
+def test_deal_whole_deck(app, packed):
+    """
+    GIVEN a Flask application configured for testing, storing hands packed
+    WHEN the cards are dealt
+    THEN check that the hands and kitty together hold exactly one Pinochle deck
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+
+    kitty_hand = str(utils.query_round(round_id=round_id).hand_id)
+    play_pinochle.deal_pinochle(player_ids=player_ids, kitty_len=4, kitty_id=kitty_hand)
+
+    dealt = [x.card for x in utils.query_hand_list(kitty_hand)]
+    for p_id in player_ids:
+        cards = utils.query_hand_list(utils.query_player(p_id).hand_id)
+        assert len(cards) == 11
+        dealt += [x.card for x in cards]
+    assert sorted(dealt) == sorted(
+        card_utils.convert_to_svg_names(card_utils.populate_deck())
+    )
+
+
+def test_set_hand_storage_invalid():
+    """
+    GIVEN an unknown hand storage mode
+    WHEN it is selected
+    THEN check that ValueError is raised and the mode is unchanged
+    """
+    with pytest.raises(ValueError):
+        utils.set_hand_storage("columns")
+    assert not utils.packed_hands()
+
+
+def test_play_trick_card(app, packed):
+    """
+    GIVEN a Flask application configured for testing, storing hands packed
+    WHEN a whole round of tricks is played
+    THEN check that cards move through the trick and team hands as with row storage
+    """
+    test_play_pinochle.test_play_trick_card_normal(app)
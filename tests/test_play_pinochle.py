@@ -47,6 +47,27 @@ def test_deal_to_players_w_kitty(app):
         assert len(cards) == 11
 
 
+def test_deal_whole_deck(app):
+    """
+    GIVEN a Flask application configured for testing
+    WHEN the cards are dealt
+    THEN check that the hands and kitty together hold exactly one Pinochle deck
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+
+    kitty_hand = str(utils.query_round(round_id=round_id).hand_id)
+    play_pinochle.deal_pinochle(player_ids=player_ids, kitty_len=4, kitty_id=kitty_hand)
+
+    dealt = [x.card for x in utils.query_hand_list(kitty_hand)]
+    for p_id in player_ids:
+        dealt += [
+            x.card for x in utils.query_hand_list(utils.query_player(p_id).hand_id)
+        ]
+    assert sorted(dealt) == sorted(
+        card_utils.convert_to_svg_names(card_utils.populate_deck())
+    )
+
+
 def test_deal_to_players_no_kitty(app):
     """
     GIVEN a Flask application configured for testing
@@ -125,6 +146,24 @@ def test_player_bid_submission(app, patch_geventws):
     assert str(a_round.bid_winner) == player_list[0]
 
 
+def test_bid_after_passing(app, patch_geventws):
+    """
+    GIVEN a player who has passed
+    WHEN they bid, or pass, again
+    THEN check that it is refused
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    play_pinochle.set_players_bidding(player_ids)
+    play_pinochle.submit_bid(round_id, player_ids[0], 21)
+    play_pinochle.submit_bid(round_id, player_ids[1], -1)
+
+    for bid in (25, -1):
+        with pytest.raises(exceptions.Conflict):
+            play_pinochle.submit_bid(round_id, player_ids[1], bid)
+    assert utils.query_round(round_id).bid == 21
+    assert len(play_pinochle.players_still_bidding(round_id)) == 3
+
+
 def test_submit_trump_not_bid_winner(app, patch_geventws):
     """
     GIVEN a Flask application configured for testing
@@ -0,0 +1,88 @@
+"""
+Tests for the profiler and the /admin/profile endpoint.
+
+License: GPLv3
+"""
+import threading
+import time
+
+import gevent
+
+from pinochle import profiler
+
+
+def busy(seconds):
+    """
+    Keep the CPU busy, without yielding to other greenlets.
+    """
+    finish = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < finish:
+        total += 1
+    return total
+
+
+def test_sampler_threads():
+    """
+    GIVEN a thread keeping the CPU busy
+    WHEN the stacks are sampled
+    THEN check that its function is found in the collapsed stacks
+    """
+    thread = threading.Thread(target=busy, args=(0.3,))
+    with profiler.StackSampler(0.002) as sampler:
+        thread.start()
+        thread.join()
+    assert sampler.samples > 0
+    text = profiler.collapse(sampler.counts)
+    assert "tests.test_profiler:busy" in text
+    for line in text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert "profiler:_run" not in stack
+
+
+def test_sampler_greenlets():
+    """
+    GIVEN a greenlet keeping the CPU busy
+    WHEN the stacks are sampled
+    THEN check that its stacks are filed under the greenlet
+    """
+    with profiler.StackSampler(0.002) as sampler:
+        gevent.spawn(busy, 0.3).join()
+    roots = {stack.split(";")[0] for stack in sampler.counts}
+    assert "greenlet tests.test_profiler:busy" in roots
+
+
+def test_profile_endpoint(app, monkeypatch):
+    """
+    GIVEN the /admin/profile endpoint
+    WHEN it is requested with and without the admin token
+    THEN check that only requests with the token are profiled
+    """
+    with app.test_client() as test_client:
+        monkeypatch.setitem(app.config, "ADMIN_TOKEN", None)
+        response = test_client.get("/admin/profile?seconds=0.05")
+        assert response.status_code == 404
+
+        monkeypatch.setitem(app.config, "ADMIN_TOKEN", "secret")
+        response = test_client.get(
+            "/admin/profile?seconds=0.05", headers={"X-Admin-Token": "wrong"}
+        )
+        assert response.status_code == 403
+
+        headers = {"X-Admin-Token": "secret"}
+        response = test_client.get("/admin/profile?format=svg", headers=headers)
+        assert response.status_code == 400
+
+        response = test_client.get(
+            "/admin/profile?seconds=0.05&interval=0.002", headers=headers
+        )
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+        assert "pinochle.wsgi:profile_endpoint" in response.get_data(as_text=True)
+
+        response = test_client.get(
+            "/admin/profile?seconds=0.05&format=pstats", headers=headers
+        )
+        assert response.status_code == 200
+        assert "function calls" in response.get_data(as_text=True)
@@ -0,0 +1,107 @@
+"""
+Budgets of the SQL statements issued by each game action and by the hot read
+endpoints, so that a change adding lookups to them fails here.
+
+The budgets are the counts issued at the time they were set. When a change lowers
+a count, lower the budget with it.
+
+License: GPLv3
+"""
+from pinochle import play_pinochle
+from pinochle.models import metadata_cache, query_count, utils
+
+from . import test_utils
+
+# Statements allowed for each action, with nothing cached beforehand.
+BUDGETS = {
+    "start": 24,
+    "bid": 10,
+    "pass": 10,
+    "last pass": 20,
+    "set_trump": 9,
+    "score_hand_meld": 8,
+    "play card": 14,
+    "play last card of trick": 25,
+    "start_next_trick": 7,
+}
+
+
+def test_game_action_budgets(query_budget):
+    """
+    GIVEN a game being played
+    WHEN each action is taken
+    THEN check that none issues more SQL statements than its budget
+    """
+    _, round_id, _, _ = test_utils.setup_complete_game(4)
+
+    def action(name, func, *args):
+        metadata_cache.invalidate()
+        with query_budget(BUDGETS[name]):
+            func(*args)
+
+    action("start", play_pinochle.start, round_id)
+    bidders = play_pinochle.players_still_bidding(round_id)
+    winner = bidders[0]
+    action("bid", play_pinochle.submit_bid, round_id, winner, 21)
+    action("pass", play_pinochle.submit_bid, round_id, bidders[1], -1)
+    action("pass", play_pinochle.submit_bid, round_id, bidders[2], -1)
+    action("last pass", play_pinochle.submit_bid, round_id, bidders[3], -1)
+    action("set_trump", play_pinochle.set_trump, round_id, winner, "heart")
+    card = utils.query_hand_list(test_utils.query_player_hand_id(winner))[0].card
+    action("score_hand_meld", play_pinochle.score_hand_meld, round_id, winner, card)
+
+    a_trick = utils.query_trick_for_round_id(round_id)
+    players = play_pinochle.reorder_players(round_id, str(a_trick.trick_starter))
+    for player_id in players:
+        card = utils.query_hand_list(test_utils.query_player_hand_id(player_id))[0]
+        name = "play last card of trick" if player_id == players[-1] else "play card"
+        action(name, play_pinochle.play_trick_card, round_id, player_id, card.card)
+    trick_winner = str(utils.query_trick(str(a_trick.trick_id)).trick_winner)
+    action("start_next_trick", play_pinochle.start_next_trick, round_id, trick_winner)
+
+
+def test_read_endpoint_budgets(app, query_budget, monkeypatch):
+    """
+    GIVEN a dealt game
+    WHEN the endpoints read during play are requested
+    THEN check that each reports, and stays within, its budget of SQL statements
+    """
+    monkeypatch.setitem(app.config, "QUERY_COUNT_HEADERS", True)
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    play_pinochle.start(round_id)
+
+    budgets = {
+        f"/api/game/{game_id}": 1,
+        f"/api/round/{round_id}": 1,
+        f"/api/round/{round_id}/kitty": 1,
+        f"/api/round/{round_id}/{team_ids[0]}": 2,
+        f"/api/player/{player_ids[0]}/hand": 2,
+    }
+    with app.test_client() as test_client:
+        for url, budget in budgets.items():
+            metadata_cache.invalidate()
+            with query_budget(budget):
+                response = test_client.get(url)
+            assert response.status_code == 200
+            assert int(response.headers["X-Query-Count"]) <= budget
+            assert float(response.headers["X-Query-Time"]) >= 0
+
+
+def test_statements_over_threshold_logged(app, monkeypatch):
+    """
+    GIVEN a threshold of SQL statements
+    WHEN an action issues more than that
+    THEN check that it is logged
+    """
+    records = []
+    monkeypatch.setitem(app.config, "QUERY_COUNT_LOG_THRESHOLD", 0)
+    monkeypatch.setattr(query_count.LOG, "warning", lambda *x: records.append(x))
+    with query_count.measure("test action"):
+        utils.query_game_list()
+    assert records and records[0][1] == "test action"
+
+    records.clear()
+    monkeypatch.setitem(app.config, "QUERY_COUNT_LOG_THRESHOLD", 1)
+    with query_count.measure("test action"):
+        utils.query_game_list()
+    assert not records
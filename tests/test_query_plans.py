@@ -0,0 +1,195 @@
+"""
+Query-plan regression tests for the lookups in models.utils.
+
+Each lookup is run against SQLite and the plan of every statement it issues is
+checked with EXPLAIN QUERY PLAN. Lookups used during play must be answered from an
+index: a full scan of a table, or sorting rows in a temporary b-tree, gets slower
+as the table grows and fails the test. Lookups of whole tables are expected to
+scan and are listed separately, so every lookup in models.utils is accounted for.
+
+License: GPLv3
+"""
+import inspect
+import re
+
+import pytest
+from sqlalchemy import event
+
+from pinochle import play_pinochle, trick
+from pinochle.models import metadata_cache, request_cache, utils
+from pinochle.models.core import db
+
+from . import test_utils
+
+# Lookups returning or counting whole tables, for which a scan is the right plan.
+FULL_TABLE_LOOKUPS = {
+    "query_game_list",
+    "query_player_list",
+    "query_gameround_list",
+    "query_round_list",
+    "query_all_tricks",
+    "query_game_state_counts",
+    "query_active_round_state_counts",
+}
+
+# Lookups sorting the few rows of one round's teams after joining them, which is
+# cheap however large the tables grow.
+SORTED_AFTER_JOIN = {
+    "query_player_ids_for_round",
+    "query_round_players",
+    "query_team_meld_scores",
+}
+
+# Plan details that mean rows are visited or sorted regardless of the lookup.
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+$")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+
+@pytest.fixture
+def ids(app):
+    """
+    Create and deal a game, giving every table some rows.
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    kitty_hand = str(utils.query_round(round_id).hand_id)
+    play_pinochle.deal_pinochle(player_ids=player_ids, kitty_len=4, kitty_id=kitty_hand)
+    t_trick, _ = trick.create(round_id)
+    player_id = player_ids[0]
+    hand_id = str(utils.query_player(player_id).hand_id)
+    return {
+        "game_id": game_id,
+        "round_id": round_id,
+        "team_id": team_ids[0],
+        "player_id": player_id,
+        "hand_id": hand_id,
+        "card": utils.query_hand_list(hand_id)[0].card,
+        "trick_id": str(t_trick["trick_id"]),
+    }
+
+
+def hot_lookups(ids):
+    """
+    Calls of each lookup used during play, keyed by the lookup's name.
+    """
+    return {
+        "query_game": lambda: utils.query_game(ids["game_id"]),
+        "query_hand_list": lambda: utils.query_hand_list(ids["hand_id"]),
+        "query_packed_hand": lambda: utils.query_packed_hand(ids["hand_id"]),
+        "query_hand_counts": lambda: utils.query_hand_counts([ids["hand_id"]]),
+        "query_hand_card": lambda: utils.query_hand_card(ids["hand_id"], ids["card"]),
+        "query_player": lambda: utils.query_player(ids["player_id"]),
+        "query_round": lambda: utils.query_round(ids["round_id"]),
+        "query_gameround": lambda: utils.query_gameround(
+            ids["game_id"], ids["round_id"]
+        ),
+        "query_gameround_for_game": lambda: utils.query_gameround_for_game(
+            ids["game_id"]
+        ),
+        "query_gameround_for_round": lambda: utils.query_gameround_for_round(
+            ids["round_id"]
+        ),
+        "query_game_id_for_round": lambda: utils.query_game_id_for_round(
+            ids["round_id"]
+        ),
+        "query_active_round_id": lambda: utils.query_active_round_id(ids["game_id"]),
+        "query_active_game_id_for_player": lambda: (
+            utils.query_active_game_id_for_player(ids["player_id"])
+        ),
+        "query_roundteam": lambda: utils.query_roundteam(
+            ids["round_id"], ids["team_id"]
+        ),
+        "query_team": lambda: utils.query_team(ids["team_id"]),
+        "query_roundteam_list": lambda: utils.query_roundteam_list(ids["round_id"]),
+        "query_roundteam_with_hand": lambda: utils.query_roundteam_with_hand(
+            ids["round_id"], ids["team_id"]
+        ),
+        "query_teamplayer_list": lambda: utils.query_teamplayer_list(ids["team_id"]),
+        "query_player_ids_for_round": lambda: utils.query_player_ids_for_round(
+            ids["round_id"]
+        ),
+        "query_team_player_ids": lambda: utils.query_team_player_ids(ids["team_id"]),
+        "query_round_players": lambda: utils.query_round_players(ids["round_id"]),
+        "query_team_meld_scores": lambda: utils.query_team_meld_scores(ids["round_id"]),
+        "query_trick": lambda: utils.query_trick(ids["trick_id"]),
+        "query_trick_for_round_id": lambda: utils.query_trick_for_round_id(
+            ids["round_id"]
+        ),
+        "query_all_tricks_for_round_id": lambda: utils.query_all_tricks_for_round_id(
+            ids["round_id"]
+        ),
+        "query_last_event_seq": lambda: utils.query_last_event_seq(ids["round_id"]),
+        "query_round_events": lambda: utils.query_round_events(ids["round_id"], 1),
+        "query_game_events": lambda: utils.query_game_events(ids["game_id"]),
+        "query_round_snapshot": lambda: utils.query_round_snapshot(ids["round_id"]),
+    }
+
+
+def query_plans(lookup):
+    """
+    Run a lookup, bypassing the caches, and explain each statement it issued.
+
+    :return: Each statement issued, with the details of its plan.
+    """
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    request_cache.clear()
+    metadata_cache.invalidate()
+    engine = db.get_engine()
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        lookup()
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    plans = []
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for statement, parameters in statements:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans.append((statement, [row[-1] for row in cursor.fetchall()]))
+    finally:
+        connection.close()
+    return plans
+
+
+def test_every_lookup_is_checked(ids):
+    """
+    GIVEN the lookups in models.utils
+    WHEN they are compared with the lookups checked here
+    THEN check that each is either checked or known to read a whole table
+    """
+    lookups = {
+        name
+        for name, func in inspect.getmembers(utils, inspect.isfunction)
+        if name.startswith("query_") and func.__module__ == utils.__name__
+    }
+    assert lookups == set(hot_lookups(ids)) | FULL_TABLE_LOOKUPS
+
+
+@pytest.mark.parametrize("storage", utils.HAND_STORAGE_MODES)
+def test_hot_lookups_use_indexes(ids, storage):
+    """
+    GIVEN a dealt game
+    WHEN each lookup used during play is explained
+    THEN check that none scans a whole table or, unless it joins a round's teams,
+    sorts in a temporary b-tree
+    """
+    utils.set_hand_storage(storage)
+    try:
+        failures = []
+        for name, lookup in hot_lookups(ids).items():
+            for statement, details in query_plans(lookup):
+                bad = [x for x in details if FULL_SCAN.match(x)]
+                if name not in SORTED_AFTER_JOIN:
+                    bad += [x for x in details if TEMP_SORT.search(x)]
+                if bad:
+                    failures.append((name, bad, statement))
+    finally:
+        utils.set_hand_storage("rows")
+    assert not failures, "\n".join(
+        "%s: %s\n    %s" % (name, bad, statement) for name, bad, statement in failures
+    )
@@ -0,0 +1,75 @@
+"""
+Tests for the tuning of SQLite connections.
+
+License: GPLv3
+"""
+import pytest
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+
+from pinochle import app_factory
+from pinochle.models import sqlite_tuning
+from pinochle.models.core import db
+
+
+def read_pragmas(app):
+    """
+    Return the journal mode, synchronous setting and busy timeout of a connection.
+    """
+    with app.app_context():
+        engine = db.get_engine()
+        with engine.connect() as conn:
+            return engine.pool, [
+                conn.execute(f"PRAGMA {name}").scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout")
+            ]
+
+
+def test_tuned_database_file(tmp_path):
+    """
+    GIVEN a SQLite database file
+    WHEN the application is created with and without the tuning
+    THEN check that the tuned connections are pooled and given the PRAGMAs
+    """
+    app = app_factory.create_app(
+        register_blueprints=False,
+        config={"DB_NAME": str(tmp_path / "tuned.db"), "SQLITE_BUSY_TIMEOUT": 2500},
+    )
+    pool, values = read_pragmas(app)
+    assert isinstance(pool, QueuePool)
+    # synchronous NORMAL is 1.
+    assert values == ["wal", 1, 2500]
+
+    app = app_factory.create_app(
+        register_blueprints=False,
+        config={"DB_NAME": str(tmp_path / "plain.db"), "SQLITE_TUNING": False},
+    )
+    pool, values = read_pragmas(app)
+    assert isinstance(pool, NullPool)
+    assert values[0] == "delete"
+
+
+def test_tuned_memory_database(app):
+    """
+    GIVEN the in-memory database used by the tests
+    WHEN its connection is inspected
+    THEN check that it keeps its single connection and is given the PRAGMAs
+    """
+    pool, values = read_pragmas(app)
+    assert isinstance(pool, StaticPool)
+    assert values == ["memory", 1, app.config["SQLITE_BUSY_TIMEOUT"]]
+
+
+def test_invalid_pragmas():
+    """
+    GIVEN an unknown journal mode
+    WHEN the PRAGMAs are prepared
+    THEN check that it is refused
+    """
+    with pytest.raises(ValueError):
+        sqlite_tuning.pragmas(
+            {
+                "DB_NAME": "pinochle.db",
+                "SQLITE_JOURNAL_MODE": "fast",
+                "SQLITE_SYNCHRONOUS": "NORMAL",
+            }
+        )
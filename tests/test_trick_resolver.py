@@ -0,0 +1,97 @@
+"""
+Tests for the trick resolver module.
+
+License: GPLv3
+"""
+import random
+
+import pytest
+from pinochle import trick_resolver
+from pinochle.cards import card, const
+from pinochle.exceptions import InvalidSuitError
+
+
+def reference_winner(trick, trump):
+    """
+    Winning index as determined by comparing PinochleCards in play order.
+    """
+    cards = [card.card_from_id(x) for x in trick]
+    winner = 0
+    suit_led = cards[0].suit
+    for index, a_card in enumerate(cards):
+        if a_card.suit == trump and cards[winner].suit != trump:
+            winner = index
+            suit_led = trump
+        elif a_card.suit == suit_led and a_card > cards[winner]:
+            winner = index
+    return winner
+
+
+def test_winning_index_random_tricks():
+    """
+    GIVEN random tricks of four cards
+    WHEN the winning card is determined
+    THEN check that it agrees with comparing the cards one at a time
+    """
+    rng = random.Random(99)
+    for _ in range(2000):
+        trick = [rng.randrange(len(card.CARDS)) for _ in range(4)]
+        trump = rng.choice([None] + const.SUITS)
+        assert trick_resolver.winning_index(trick, trump) == reference_winner(
+            trick, trump
+        )
+
+
+def test_winning_index_duplicates():
+    """
+    GIVEN a trick where the same card is played twice
+    WHEN the winning card is determined
+    THEN check that the first one played wins
+    """
+    trick = trick_resolver.card_ids(["heart_9", "heart_ace", "heart_ace", "club_ace"])
+    assert trick_resolver.winning_index(trick, "Spades") == 1
+    assert trick_resolver.winning_index(trick, "Clubs") == 3
+
+
+def test_winning_index_bad_input():
+    """
+    GIVEN invalid tricks
+    WHEN the winning card is determined
+    THEN check that an exception is raised
+    """
+    with pytest.raises(ValueError):
+        trick_resolver.winning_index([], "Spades")
+    with pytest.raises(InvalidSuitError):
+        trick_resolver.winning_index([0, 1], "Stars")
+
+
+def test_legal_plays():
+    """
+    GIVEN a hand and a trick in progress
+    WHEN the legal plays are requested
+    THEN check that suit must be followed, trump played when void, and the trick
+         beaten when possible
+    """
+    hand = trick_resolver.card_ids(
+        ["heart_9", "heart_king", "heart_ace", "spade_10", "club_jack"]
+    )
+    # Nothing has been played, so anything goes.
+    assert trick_resolver.legal_plays(hand, [], "Spades") == [0, 1, 2, 3, 4]
+    # Must beat the heart 10 with the ace.
+    trick = trick_resolver.card_ids(["heart_10"])
+    assert trick_resolver.legal_plays(hand, trick, "Spades") == [2]
+    # Can't beat the heart ace, so any heart.
+    trick = trick_resolver.card_ids(["heart_ace"])
+    assert trick_resolver.legal_plays(hand, trick, "Spades") == [0, 1, 2]
+    # Trumped already; hearts can't win, but must still be followed.
+    trick = trick_resolver.card_ids(["heart_10", "spade_9"])
+    assert trick_resolver.legal_plays(hand, trick, "Spades") == [0, 1, 2]
+    # Void in diamonds, so must trump.
+    trick = trick_resolver.card_ids(["diamond_ace"])
+    assert trick_resolver.legal_plays(hand, trick, "Spades") == [3]
+    # Void in diamonds with no trump suit, so anything goes.
+    assert trick_resolver.legal_plays(hand, trick, None) == [0, 1, 2, 3, 4]
+    # Void in diamonds and trump; the spade 10 can't beat the spade ace but must
+    # still be played.
+    trick = trick_resolver.card_ids(["diamond_ace", "spade_ace"])
+    assert trick_resolver.legal_plays(hand, trick, "Spades") == [3]
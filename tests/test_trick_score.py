@@ -3,10 +3,11 @@ Tests for the trick scoring module.
 
 License: GPLv3
 """
+import random
 import unittest
 
 from pinochle import score_tricks
-from pinochle.cards import card, deck
+from pinochle.cards import card, compact, deck
 
 
 class TestTrickScoring(unittest.TestCase):
@@ -111,3 +112,21 @@ class TestTrickScoring(unittest.TestCase):
         temp_deck = deck.PinochleDeck(build=True)
 
         assert score_tricks.score(temp_deck) == 12
+
+    def test_score_batch(self):
+        """"""
+        rng = random.Random(4321)
+        full_deck = list(deck.PinochleDeck(build=True)) * 2
+        decks = [
+            deck.PinochleDeck(cards=rng.sample(full_deck, rng.randint(0, 24)))
+            for _ in range(200)
+        ]
+        counts = [compact.CompactHand.from_deck(x).counts() for x in decks]
+        expected = [score_tricks.score(x) for x in decks]
+
+        assert score_tricks._score_batch_scalar(counts) == expected
+        if score_tricks.np is None:
+            self.skipTest("NumPy is not installed.")
+        assert (
+            score_tricks.score_batch(score_tricks.np.array(counts)).tolist() == expected
+        )
@@ -0,0 +1,148 @@
+"""
+Tests for running each game action as a single transaction.
+
+License: GPLv3
+"""
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.exceptions import Conflict
+
+from pinochle import play_pinochle, player, round_, trick
+from pinochle.models import unit_of_work, utils
+from pinochle.models.core import db
+from pinochle.models.round_ import Round
+from pinochle.ws_messenger import WebSocketMessenger as WSM
+
+from . import test_utils
+
+# pragma pylint: disable=redefined-outer-name
+
+# Taken before the patch_ws_messenger_to_MM fixture replaces it for the session.
+WEBSOCKET_BROADCAST = WSM.websocket_broadcast
+
+
+@pytest.fixture
+def events(monkeypatch):
+    """
+    Record commits and broadcasts published on the bus, in the order they happen.
+    """
+    recorded = []
+    bus = MagicMock()
+    bus.publish.side_effect = lambda game_id, message, exclude=None: recorded.append(
+        message["action"]
+    )
+    monkeypatch.setattr(WSM, "_bus", bus)
+    monkeypatch.setattr(WSM, "websocket_broadcast", WEBSOCKET_BROADCAST)
+
+    def _commit(session):
+        recorded.append("commit")
+
+    event.listen(db.session, "after_commit", _commit)
+    yield recorded
+    event.remove(db.session, "after_commit", _commit)
+
+
+def test_action_commits_once(app, events):
+    """
+    GIVEN a game ready to start
+    WHEN the round is started
+    THEN check that its changes are committed once, before anything is broadcast
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    events.clear()
+
+    play_pinochle.start(round_id)
+
+    assert events == ["commit", "bid_prompt", "game_start"]
+    assert not unit_of_work.active()
+    for player_id in player_ids:
+        assert utils.query_player(player_id).bidding
+        assert len(utils.query_hand_list(str(utils.query_player(player_id).hand_id)))
+
+
+def test_failed_action_rolled_back(app, events):
+    """
+    GIVEN a transaction that changes a player and broadcasts it
+    WHEN it fails part way through
+    THEN check that the change is rolled back and nothing is broadcast
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    meld_score = utils.query_player(player_ids[0]).meld_score
+    events.clear()
+
+    with pytest.raises(ValueError):
+        with unit_of_work.transaction():
+            player.update(player_ids[0], {"meld_score": meld_score + 50})
+            with unit_of_work.transaction():
+                WSM().websocket_broadcast(game_id, {"action": "meld_update"})
+            assert utils.query_player(player_ids[0]).meld_score == meld_score + 50
+            raise ValueError("Failed part way through.")
+
+    assert events == []
+    assert utils.query_player(player_ids[0]).meld_score == meld_score
+
+    # Outside a transaction, changes are committed and broadcast straight away.
+    player.update(player_ids[0], {"meld_score": meld_score + 10})
+    WSM().websocket_broadcast(game_id, {"action": "meld_update"})
+    assert events == ["commit", "meld_update"]
+
+
+def test_conflict_retried(app):
+    """
+    GIVEN a round changed by someone else while an action is changing it
+    WHEN the action's change is committed
+    THEN check that the action is run again, up to CONFLICT_ATTEMPTS times
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    round_table = Round.__table__
+    attempts = []
+
+    @unit_of_work.transactional
+    def raise_bid(conflicts):
+        a_round = utils.query_round(round_id)
+        attempts.append(a_round.version)
+        if len(attempts) <= conflicts:
+            # A concurrent action changing the round after it was read.
+            db.session.execute(
+                round_table.update()
+                .where(round_table.c.round_id == round_id)
+                .values(version=round_table.c.version + 1)
+            )
+        a_round.bid += 5
+        unit_of_work.commit()
+
+    version = utils.query_round(round_id).version
+    bid = utils.query_round(round_id).bid
+    raise_bid(unit_of_work.CONFLICT_ATTEMPTS - 1)
+    assert attempts == [version] * unit_of_work.CONFLICT_ATTEMPTS
+    assert utils.query_round(round_id).bid == bid + 5
+    assert utils.query_round(round_id).version == version + 1
+
+    attempts.clear()
+    with pytest.raises(StaleDataError):
+        raise_bid(unit_of_work.CONFLICT_ATTEMPTS)
+    assert len(attempts) == unit_of_work.CONFLICT_ATTEMPTS
+    assert utils.query_round(round_id).bid == bid + 5
+
+
+def test_card_played_twice(app):
+    """
+    GIVEN a player who has played a card to the current trick
+    WHEN the player plays another card to it
+    THEN check that the second card is refused
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+    round_.update(round_id, {"bid_winner": player_ids[0], "trump": "heart"})
+    t_trick, _ = trick.create(round_id)
+    trick.update(str(t_trick["trick_id"]), {"trick_starter": player_ids[0]})
+    play_pinochle.deal_pinochle(player_ids)
+
+    hand_id = test_utils.query_player_hand_id(player_ids[0])
+    cards = [x.card for x in utils.query_hand_list(hand_id)]
+    play_pinochle.play_trick_card(round_id, player_ids[0], cards[0])
+    with pytest.raises(Conflict):
+        play_pinochle.play_trick_card(round_id, player_ids[0], cards[1])
+    assert [x.card for x in utils.query_hand_list(hand_id)] == cards[1:]
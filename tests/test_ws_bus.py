@@ -0,0 +1,294 @@
+"""
+Tests for the websocket broadcast bus module.
+
+License: GPLv3
+"""
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from pinochle import ws_bus, ws_queue
+from pinochle.ws_messenger import WebSocketMessenger as WSM
+
+# pragma pylint: disable=redefined-outer-name
+
+
+def wait_for(predicate, timeout=5.0):
+    """
+    Poll predicate until it is true or the timeout expires.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class Collector:
+    """
+    Delivery callback recording every message received.
+    """
+
+    def __init__(self):
+        self.received = []
+
+    def __call__(self, game_id, payload, exclude, key):
+        message = json.loads(payload)
+        assert key == ws_queue.coalesce_key(message)
+        self.received.append((game_id, message, exclude))
+
+
+class RespStandIn(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    Minimal stand-in for a Redis server, implementing only PUBLISH and SUBSCRIBE.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), RespHandler)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                # pylint: disable=protected-access
+                command = ws_bus._resp_read(self.rfile)
+            except EOFError:
+                break
+            name = command[0].upper()
+            if name == b"SUBSCRIBE":
+                channel = command[1]
+                with self.server.lock:
+                    self.server.subscribers.setdefault(channel, []).append(self.wfile)
+                self.wfile.write(
+                    b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:1\r\n"
+                    % (len(channel), channel)
+                )
+            elif name == b"PUBLISH":
+                channel, payload = command[1], command[2]
+                with self.server.lock:
+                    targets = list(self.server.subscribers.get(channel, []))
+                for target in targets:
+                    target.write(
+                        b"*3\r\n$7\r\nmessage\r\n$%d\r\n%s\r\n$%d\r\n%s\r\n"
+                        % (len(channel), channel, len(payload), payload)
+                    )
+                self.wfile.write(b":%d\r\n" % len(targets))
+
+
+@pytest.fixture()
+def socket_path():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield os.path.join(tmpdir, "ws.sock")
+
+
+@pytest.fixture()
+def resp_server():
+    server = RespStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_envelope_round_trip():
+    """
+    GIVEN a broadcast
+    WHEN it is encoded and decoded
+    THEN check that the original values are returned
+    """
+    payload = json.dumps({"action": "trick_card", "card": "club\t9\n"})
+    data = ws_bus.encode_envelope("g1", payload, "p1", "trick_card")
+    assert b"\n" not in data
+    assert ws_bus.decode_envelope(data) == ("g1", payload, "p1", "trick_card")
+
+
+def test_inprocess_bus_delivers_directly():
+    """
+    GIVEN an in-process bus
+    WHEN a message is published
+    THEN check that the subscriber receives it immediately
+    """
+    collector = Collector()
+    bus = ws_bus.InProcessBus()
+    bus.subscribe(collector)
+    bus.publish("g1", {"action": "game_state"})
+    assert collector.received == [("g1", {"action": "game_state"}, None)]
+
+
+def test_unix_bus_fans_out_between_workers(socket_path):
+    """
+    GIVEN two workers connected through the Unix socket broker
+    WHEN one of them publishes a message
+    THEN check that both of them receive it
+    """
+    first, second = Collector(), Collector()
+    bus_a = ws_bus.UnixSocketBus(socket_path)
+    bus_b = ws_bus.UnixSocketBus(socket_path)
+    try:
+        bus_a.subscribe(first)
+        bus_b.subscribe(second)
+        assert bus_a.is_broker
+        assert not bus_b.is_broker
+
+        bus_b.publish("g1", {"action": "bid_prompt", "bid": 21}, "p2")
+
+        expected = [("g1", {"action": "bid_prompt", "bid": 21}, "p2")]
+        assert wait_for(lambda: first.received == expected)
+        assert wait_for(lambda: second.received == expected)
+    finally:
+        bus_b.close()
+        bus_a.close()
+
+
+def test_unix_bus_broker_takeover(socket_path):
+    """
+    GIVEN two workers connected through the Unix socket broker
+    WHEN the broker worker goes away
+    THEN check that the other worker takes over and keeps delivering
+    """
+    collector = Collector()
+    bus_a = ws_bus.UnixSocketBus(socket_path)
+    bus_b = ws_bus.UnixSocketBus(socket_path)
+    bus_b.subscribe(collector)
+    try:
+        bus_a.close()
+        bus_c = ws_bus.UnixSocketBus(socket_path)
+        try:
+            assert wait_for(lambda: bus_b.is_broker or bus_c.is_broker)
+            assert wait_for(lambda: len(bus_c._peers or bus_b._peers) >= 2)
+            bus_c.publish("g2", {"action": "trick_next"})
+            assert wait_for(
+                lambda: ("g2", {"action": "trick_next"}, None) in collector.received
+            )
+        finally:
+            bus_c.close()
+    finally:
+        bus_b.close()
+
+
+def test_unix_bus_publishes_while_reconnecting(socket_path, monkeypatch):
+    """
+    GIVEN a worker which lost its connection to the Unix socket broker
+    WHEN it publishes a message before reconnecting
+    THEN check that publishing doesn't wait and the message is sent once reconnected
+    """
+    collector = Collector()
+    bus_a = ws_bus.UnixSocketBus(socket_path)
+    bus_b = ws_bus.UnixSocketBus(socket_path)
+    bus_a.subscribe(collector)
+    reconnect = threading.Event()
+    connect = bus_b._connect
+
+    def slow_connect():
+        reconnect.wait(5)
+        return connect()
+
+    monkeypatch.setattr(bus_b, "_connect", slow_connect)
+    try:
+        with bus_b._send_lock:
+            bus_b._drop_connection()
+        started = time.monotonic()
+        bus_b.publish("g3", {"action": "trick_card"})
+        assert time.monotonic() - started < 1
+        assert len(bus_b._backlog) == 1
+
+        reconnect.set()
+        assert wait_for(
+            lambda: collector.received == [("g3", {"action": "trick_card"}, None)]
+        )
+        assert not bus_b._backlog
+    finally:
+        reconnect.set()
+        bus_b.close()
+        bus_a.close()
+
+
+def test_redis_bus_with_stand_in(resp_server):
+    """
+    GIVEN two workers subscribed through a Redis protocol server
+    WHEN one of them publishes a message
+    THEN check that both of them receive it
+    """
+    host, port = resp_server.server_address
+    first, second = Collector(), Collector()
+    bus_a = ws_bus.RedisBus(host=host, port=port, channel="test:ws")
+    bus_b = ws_bus.RedisBus(host=host, port=port, channel="test:ws")
+    try:
+        bus_a.subscribe(first)
+        bus_b.subscribe(second)
+        assert bus_a.wait_until_subscribed()
+        assert bus_b.wait_until_subscribed()
+
+        bus_a.publish("g3", {"action": "score_round"})
+
+        expected = [("g3", {"action": "score_round"}, None)]
+        assert wait_for(lambda: first.received == expected)
+        assert wait_for(lambda: second.received == expected)
+    finally:
+        bus_a.close()
+        bus_b.close()
+
+
+def test_create_bus_from_config(socket_path):
+    """
+    GIVEN application configuration values
+    WHEN create_bus is called
+    THEN check that the appropriate bus is returned
+    """
+    assert isinstance(ws_bus.create_bus({}), ws_bus.InProcessBus)
+    bus = ws_bus.create_bus(
+        {"WS_BROADCAST_BACKEND": "unix", "WS_BROADCAST_UNIX_PATH": socket_path}
+    )
+    try:
+        assert isinstance(bus, ws_bus.UnixSocketBus)
+    finally:
+        bus.close()
+    with pytest.raises(ValueError):
+        ws_bus.create_bus({"WS_BROADCAST_BACKEND": "carrier-pigeon"})
+
+
+def test_messenger_delivers_bus_messages(socket_path):
+    """
+    GIVEN a WebSocketMessenger using the Unix socket bus
+    WHEN a message is published by another worker
+    THEN check that the locally registered client receives it
+    """
+    ws_mess = WSM()
+    previous_bus = ws_mess.bus
+    other_worker = None
+    try:
+        WSM.set_bus(ws_bus.UnixSocketBus(socket_path))
+        other_worker = ws_bus.UnixSocketBus(socket_path)
+        other_worker.subscribe(Collector())
+
+        client_ws = MagicMock()
+        ws_mess.client_sockets.clear()
+        ws_mess.client_sockets["g4"] = [{"player_id": "p1", "ws": client_ws}]
+
+        other_worker.publish("g4", {"action": "trick_won"})
+        assert wait_for(lambda: "queue" in ws_mess.client_sockets["g4"][0])
+        ws_mess.client_sockets["g4"][0]["queue"].wait_idle(5)
+        assert wait_for(lambda: client_ws.send.called)
+        assert json.loads(client_ws.send.call_args.args[0]) == {
+            "action": "trick_won",
+            "seq": ws_mess.history("g4").seq,
+        }
+    finally:
+        if other_worker is not None:
+            other_worker.close()
+        WSM.set_bus(ws_bus.InProcessBus())
+        previous_bus.close()
+        ws_mess.client_sockets.clear()
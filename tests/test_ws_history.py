@@ -0,0 +1,50 @@
+"""
+Tests for the websocket broadcast history module.
+
+License: GPLv3
+"""
+import json
+
+from pinochle import ws_history
+
+
+def test_stamp():
+    """
+    GIVEN encoded messages
+    WHEN a sequence number is added
+    THEN check that the result decodes to the message plus the sequence number
+    """
+    assert json.loads(ws_history.stamp('{"action": "x"}', 7)) == {
+        "action": "x",
+        "seq": 7,
+    }
+    assert json.loads(ws_history.stamp("{}", 1)) == {"seq": 1}
+
+
+def test_since_within_buffer():
+    """
+    GIVEN a history holding every broadcast
+    WHEN the broadcasts since a sequence number are requested
+    THEN check that the later ones are returned, less those excluding the player
+    """
+    history = ws_history.BroadcastHistory(maxlen=4)
+    history.record('{"n": 1}')
+    history.record('{"n": 2}', exclude="p2")
+    history.record('{"n": 3}')
+    assert [json.loads(x)["n"] for x in history.since(1, "p1")] == [2, 3]
+    assert [json.loads(x)["n"] for x in history.since(1, "p2")] == [3]
+    assert history.since(3, "p1") == []
+
+
+def test_since_gap_too_large():
+    """
+    GIVEN a history which has discarded old broadcasts
+    WHEN broadcasts older than the buffer are requested
+    THEN check that None is returned, so a snapshot is sent instead
+    """
+    history = ws_history.BroadcastHistory(maxlen=2)
+    for index in range(5):
+        history.record(json.dumps({"n": index}))
+    assert history.since(2, "p1") is None
+    assert len(history.since(3, "p1")) == 2
+    assert history.since(6, "p1") is None
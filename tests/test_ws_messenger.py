@@ -4,10 +4,11 @@ Tests for the ws_messenger module.
 License: GPLv3
 """
 
+import json
 from unittest.mock import MagicMock
 
 import geventwebsocket
-from pinochle import game, play_pinochle
+from pinochle import game, play_pinochle, round_, roundteams, ws_bus, ws_history
 from pinochle.models import utils
 from pinochle.ws_messenger import WebSocketMessenger as WSM
 
@@ -83,35 +84,51 @@ def test_register_new_players_game_0(
     ws_mess.distribute_registered_players.assert_called_with(game_id)
 
 
+def registered_snapshot(game_id, player_id):
+    """
+    Return the game snapshot sent to the registered player.
+    """
+    ws_mess = WSM()
+    client = [x for x in ws_mess.client_sockets[game_id] if x["player_id"] == player_id]
+    assert client[0]["queue"].wait_idle(5)
+    messages = [
+        json.loads(call.args[0]) for call in client[0]["ws"].send.call_args_list
+    ]
+    snapshots = [x for x in messages if x["action"] == "game_snapshot"]
+    assert len(snapshots) == 1
+    return snapshots[0]
+
+
 def test_register_new_players_game_bid(
     app, patch_geventws
 ):  # pylint: disable=unused-argument
     """
     GIVEN a Flask application configured for testing
     WHEN the register_new_player function is called
-    THEN check that the response is successful
+    THEN check that a snapshot with the player to bid is sent
     """
     game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
 
     ws_mess = WSM()
     ws_mess.client_sockets.clear()
     ws_mess.game_update = game.update
-    ws_mess.update_refreshed_page_bid = MagicMock()
-    ws_mess.update_refreshed_page_reveal = MagicMock()
-    ws_mess.update_refreshed_page_trump = MagicMock()
 
-    dummy_ws = geventwebsocket.websocket.WebSocket(None, None, None)
     play_pinochle.start(round_id)
     test_utils.set_game_state(game_id, 1)
     assert utils.query_game(game_id).state == 1
-    ws_mess.register_new_player(game_id, player_ids[0], dummy_ws)
-    ws_mess.register_new_player(game_id, player_ids[1], dummy_ws)
-
-    ws_mess.update_refreshed_page_bid.assert_called_with(
-        round_id, player_ids[1], dummy_ws
+    ws_mess.register_new_player(game_id, player_ids[0], MagicMock())
+    ws_mess.register_new_player(game_id, player_ids[1], MagicMock())
+
+    snapshot = registered_snapshot(game_id, player_ids[1])
+    assert snapshot["mode"] == "bid"
+    assert snapshot["round"]["round_id"] == round_id
+    assert (
+        snapshot["round"]["bidder"]
+        == roundteams.create_ordered_player_list(round_id)[0]
     )
-    ws_mess.update_refreshed_page_reveal.assert_not_called()
-    ws_mess.update_refreshed_page_trump.assert_not_called()
+    assert sorted(x["team_id"] for x in snapshot["teams"]) == sorted(team_ids)
+    assert snapshot["kitty_count"] == 4
+    assert all(x["hand_count"] == 11 for x in snapshot["players"])
 
 
 def test_register_new_players_game_reveal(
@@ -120,27 +137,24 @@ def test_register_new_players_game_reveal(
     """
     GIVEN a Flask application configured for testing
     WHEN the register_new_player function is called
-    THEN check that the response is successful
+    THEN check that a snapshot in the reveal mode is sent
     """
     game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
 
     ws_mess = WSM()
     ws_mess.client_sockets.clear()
     ws_mess.game_update = game.update
-    ws_mess.update_refreshed_page_bid = MagicMock()
-    ws_mess.update_refreshed_page_reveal = MagicMock()
-    ws_mess.update_refreshed_page_trump = MagicMock()
 
-    dummy_ws = geventwebsocket.websocket.WebSocket(None, None, None)
     play_pinochle.start(round_id)
     test_utils.set_game_state(game_id, 3)
     assert utils.query_game(game_id).state == 3
-    ws_mess.register_new_player(game_id, player_ids[0], dummy_ws)
-    ws_mess.register_new_player(game_id, player_ids[1], dummy_ws)
+    ws_mess.register_new_player(game_id, player_ids[0], MagicMock())
+    ws_mess.register_new_player(game_id, player_ids[1], MagicMock())
 
-    ws_mess.update_refreshed_page_bid.assert_not_called()
-    ws_mess.update_refreshed_page_reveal.assert_called_with(round_id, dummy_ws)
-    ws_mess.update_refreshed_page_trump.assert_not_called()
+    snapshot = registered_snapshot(game_id, player_ids[1])
+    assert snapshot["mode"] == "reveal"
+    assert snapshot["round"]["bid"] == utils.query_round(round_id).bid
+    assert snapshot["round"]["bidder"] is None
 
 
 def test_register_new_players_game_trump(
@@ -149,26 +163,100 @@ def test_register_new_players_game_trump(
     """
     GIVEN a Flask application configured for testing
     WHEN the register_new_player function is called
-    THEN check that the response is successful
+    THEN check that a snapshot with the trump suit is sent
     """
     game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
 
     ws_mess = WSM()
     ws_mess.client_sockets.clear()
     ws_mess.game_update = game.update
-    ws_mess.update_refreshed_page_bid = MagicMock()
-    ws_mess.update_refreshed_page_reveal = MagicMock()
-    ws_mess.update_refreshed_page_trump = MagicMock()
 
-    dummy_ws = geventwebsocket.websocket.WebSocket(None, None, None)
     play_pinochle.start(round_id)
+    round_.update(round_id, {"trump": "club"})
     test_utils.set_game_state(game_id, 4)
     assert utils.query_game(game_id).state == 4
-    ws_mess.register_new_player(game_id, player_ids[0], dummy_ws)
-    ws_mess.register_new_player(game_id, player_ids[1], dummy_ws)
+    ws_mess.register_new_player(game_id, player_ids[0], MagicMock())
+    ws_mess.register_new_player(game_id, player_ids[1], MagicMock())
+
+    snapshot = registered_snapshot(game_id, player_ids[1])
+    assert snapshot["mode"] == "meld"
+    assert snapshot["round"]["trump"] == "club"
 
-    ws_mess.update_refreshed_page_bid.assert_called_with(
-        round_id, player_ids[1], dummy_ws
+
+def test_reconnect_replays_missed_broadcasts(
+    app, patch_geventws
+):  # pylint: disable=unused-argument
+    """
+    GIVEN a player who saw some of a game's broadcasts
+    WHEN the player reconnects with the last sequence number seen
+    THEN check that only the missed broadcasts are sent, without a snapshot
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+
+    ws_mess = WSM()
+    ws_mess.client_sockets.clear()
+    ws_mess.game_update = game.update
+    ws_mess.distribute_registered_players = MagicMock()
+    try:
+        ws_mess.register_new_player(game_id, player_ids[0], MagicMock())
+        history = ws_mess.history(game_id)
+        for index in range(3):
+            ws_mess.deliver_local(game_id, json.dumps({"action": "a", "i": index}))
+        ws_mess.deliver_local(game_id, '{"action": "b"}', exclude=player_ids[1])
+        last_seq = history.seq - 3
+
+        new_ws = MagicMock()
+        ws_mess.register_new_player(
+            game_id, player_ids[1], new_ws, last_seq=last_seq, epoch=ws_history.EPOCH
+        )
+        snapshot_ws = MagicMock()
+        ws_mess.register_new_player(
+            game_id, player_ids[2], snapshot_ws, last_seq=0, epoch="elsewhere"
+        )
+        for item in ws_mess.client_sockets[game_id]:
+            assert item["queue"].wait_idle(5)
+    finally:
+        del ws_mess.distribute_registered_players
+
+    replayed = [json.loads(call.args[0]) for call in new_ws.send.call_args_list]
+    assert replayed == [
+        {"action": "a", "i": 1, "seq": last_seq + 1},
+        {"action": "a", "i": 2, "seq": last_seq + 2},
+    ]
+    sent = [json.loads(call.args[0]) for call in snapshot_ws.send.call_args_list]
+    assert [x["action"] for x in sent] == ["game_snapshot"]
+    assert sent[0]["seq"] == history.seq
+    assert sent[0]["epoch"] == ws_history.EPOCH
+
+
+def test_reconnect_snapshot_before_player_list(
+    app, patch_geventws, monkeypatch
+):  # pylint: disable=unused-argument
+    """
+    GIVEN a player who saw broadcasts from another server epoch
+    WHEN the player reconnects
+    THEN check that the snapshot is sent before the player list, which follows it
+    """
+    game_id, round_id, team_ids, player_ids = test_utils.setup_complete_game(4)
+
+    ws_mess = WSM()
+    ws_mess.client_sockets.clear()
+    ws_mess.game_update = game.update
+    WSM.set_bus(ws_bus.InProcessBus())
+    monkeypatch.setattr(
+        WSM,
+        "websocket_broadcast",
+        lambda self, game_id, message, exclude=None: self.bus.publish(
+            game_id, message, exclude
+        ),
+    )
+    client = MagicMock()
+    ws_mess.register_new_player(
+        game_id, player_ids[0], client, last_seq=1000, epoch="elsewhere"
     )
-    ws_mess.update_refreshed_page_reveal.assert_not_called()
-    ws_mess.update_refreshed_page_trump.assert_called_with(round_id, dummy_ws)
+    assert ws_mess.client_sockets[game_id][0]["queue"].wait_idle(5)
+    ws_mess.client_sockets.clear()
+
+    sent = [json.loads(call.args[0]) for call in client.send.call_args_list]
+    assert [x["action"] for x in sent] == ["game_snapshot", "notification_player_list"]
+    assert sent[1]["seq"] > sent[0]["seq"]
@@ -0,0 +1,225 @@
+"""
+Tests for the per-client websocket send queues.
+
+License: GPLv3
+"""
+import json
+import threading
+from unittest.mock import MagicMock
+
+import geventwebsocket
+import pytest
+from pinochle import ws_bus, ws_queue
+from pinochle.ws_messenger import WebSocketMessenger as WSM
+
+# pragma pylint: disable=redefined-outer-name
+
+
+class BlockedSocket:
+    """
+    Websocket stand-in whose send blocks until released, like a stalled client.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.sending = threading.Event()
+        self.sent = []
+        self.closed = False
+
+    def send(self, payload):
+        self.sending.set()
+        self.release.wait(5)
+        self.sent.append(payload)
+
+    def close(self):
+        self.closed = True
+
+
+def stalled_queue(policy, maxsize=2):
+    """
+    Return a queue whose sender is stuck sending the first message.
+    """
+    client = BlockedSocket()
+    queue = ws_queue.ClientSendQueue(client, maxsize=maxsize, policy=policy)
+    queue.put('{"action": "first"}', "first")
+    assert client.sending.wait(5)
+    return client, queue
+
+
+def test_messages_sent_in_order():
+    """
+    GIVEN a client send queue
+    WHEN several messages are queued
+    THEN check that they are all sent in order
+    """
+    client = MagicMock()
+    queue = ws_queue.ClientSendQueue(client)
+    for index in range(5):
+        assert queue.put(str(index))
+    assert queue.wait_idle(5)
+    assert [call.args[0] for call in client.send.call_args_list] == [
+        "0",
+        "1",
+        "2",
+        "3",
+        "4",
+    ]
+    assert queue.stats["sent"] == 5
+
+
+def test_drop_oldest_policy():
+    """
+    GIVEN a full queue using the drop_oldest policy
+    WHEN another message is queued
+    THEN check that the oldest waiting message is discarded
+    """
+    client, queue = stalled_queue("drop_oldest")
+    queue.put("a", "x")
+    queue.put("b", "y")
+    queue.put("c", "x")
+    client.release.set()
+    assert queue.wait_idle(5)
+    assert client.sent == ['{"action": "first"}', "b", "c"]
+    assert queue.stats["dropped"] == 1
+
+
+def test_coalesce_policy():
+    """
+    GIVEN a full queue using the coalesce policy
+    WHEN a message with the same action as a waiting one is queued
+    THEN check that the older message with that action is discarded
+    """
+    client, queue = stalled_queue("coalesce")
+    queue.put("a", "x")
+    queue.put("b", "y")
+    queue.put("c", "y")
+    queue.put("d", "z")
+    client.release.set()
+    assert queue.wait_idle(5)
+    assert client.sent == ['{"action": "first"}', "c", "d"]
+    assert queue.stats["coalesced"] == 1
+    assert queue.stats["dropped"] == 1
+
+
+def test_coalesce_keeps_changes():
+    """
+    GIVEN a full queue using the coalesce policy
+    WHEN changes and complete states are queued
+    THEN check that only the older complete states are discarded
+    """
+    client, queue = stalled_queue("coalesce", maxsize=5)
+    messages = [
+        {"action": "trick_card", "player_id": "p1", "card": "spade_ace"},
+        {"action": "notification_player_list", "player_order": ["p1"]},
+        {"action": "trick_card", "player_id": "p2", "card": "spade_9"},
+        {"action": "team_score", "team_id": "t1", "score": 10},
+        {"action": "team_score", "team_id": "t2", "score": 20},
+        {"action": "notification_player_list", "player_order": ["p1", "p2"]},
+    ]
+    for message in messages:
+        queue.put(json.dumps(message), ws_queue.coalesce_key(message))
+    client.release.set()
+    assert queue.wait_idle(5)
+    assert [json.loads(x) for x in client.sent[1:]] == [
+        messages[0],
+        messages[2],
+        messages[3],
+        messages[4],
+        messages[5],
+    ]
+    assert queue.stats["coalesced"] == 1
+    assert not queue.stats["dropped"]
+
+
+def test_coalesce_key():
+    """
+    GIVEN broadcast messages
+    WHEN their coalescing keys are computed
+    THEN check that only complete states have one, per team for scores
+    """
+    assert ws_queue.coalesce_key({"action": "game_snapshot"}) == "game_snapshot"
+    assert (
+        ws_queue.coalesce_key({"action": "team_score", "team_id": "t1"})
+        == "team_score:t1"
+    )
+    for action in ("trick_card", "bid_prompt", "meld_update", None):
+        assert ws_queue.coalesce_key({"action": action}) is None
+
+
+def test_disconnect_policy():
+    """
+    GIVEN a full queue using the disconnect policy
+    WHEN another message is queued
+    THEN check that the client is closed and the callback invoked
+    """
+    client = BlockedSocket()
+    dropped = []
+    queue = ws_queue.ClientSendQueue(
+        client, maxsize=1, policy="disconnect", on_disconnect=dropped.append
+    )
+    queue.put("first")
+    assert client.sending.wait(5)
+    queue.put("second")
+    assert not queue.put("third")
+    assert client.closed
+    assert dropped == [queue]
+    assert queue.stats["disconnected"] == 1
+    assert not queue.put("fourth")
+    client.release.set()
+
+
+def test_failed_send_closes_queue():
+    """
+    GIVEN a client whose websocket is closed
+    WHEN a message is queued
+    THEN check that the failure is counted and the queue stops accepting messages
+    """
+    client = MagicMock()
+    client.send.side_effect = geventwebsocket.exceptions.WebSocketError
+    queue = ws_queue.ClientSendQueue(client)
+    queue.put("a")
+    assert queue.wait_idle(5)
+    assert queue.stats["failed"] == 1
+    assert not queue.put("b")
+
+
+def test_invalid_policy():
+    """
+    GIVEN an unknown backpressure policy
+    WHEN a queue is created
+    THEN check that it is refused
+    """
+    with pytest.raises(ValueError):
+        ws_queue.ClientSendQueue(MagicMock(), policy="panic")
+
+
+def test_broadcast_encoded_once(monkeypatch):
+    """
+    GIVEN several clients registered to a game
+    WHEN a message is broadcast
+    THEN check that it is encoded once and every client but the excluded one gets it
+    """
+    ws_mess = WSM()
+    WSM.set_bus(ws_bus.InProcessBus())
+    encode = MagicMock(side_effect=json.dumps)
+    monkeypatch.setattr(ws_bus.json, "dumps", encode)
+    clients = [MagicMock() for _ in range(4)]
+    ws_mess.client_sockets.clear()
+    ws_mess.client_sockets["g5"] = [
+        {"player_id": f"p{index}", "ws": client} for index, client in enumerate(clients)
+    ]
+    try:
+        # websocket_broadcast may be replaced by a mock elsewhere in the test suite.
+        ws_mess.bus.publish("g5", {"action": "trick_next"}, "p3")
+        for item in ws_mess.client_sockets["g5"]:
+            if "queue" in item:
+                assert item["queue"].wait_idle(5)
+    finally:
+        ws_mess.client_sockets.clear()
+
+    payloads = [call.args[0] for call in encode.call_args_list]
+    assert payloads == [{"action": "trick_next"}]
+    seq = ws_mess.history("g5").seq
+    for client in clients[:3]:
+        client.send.assert_called_once_with(f'{{"action": "trick_next", "seq": {seq}}}')
+    clients[3].send.assert_not_called()